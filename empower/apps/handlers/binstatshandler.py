@@ -20,7 +20,10 @@
 from empower.core.app import EmpowerApp
 from empower.core.app import DEFAULT_MONITORING_PERIOD
 from empower.core.app import DEFAULT_PERIOD
-import statistics
+
+# metrics published in the tenant metrics store
+LVAP_TX_THROUGHPUT_MBPS = 'lvap_tx_throughput_mbps'
+LVAP_RX_THROUGHPUT_MBPS = 'lvap_rx_throughput_mbps'
 
 
 class BinStatsHandler(EmpowerApp):
@@ -43,7 +46,8 @@ class BinStatsHandler(EmpowerApp):
                               'tx_bytes',
                               'tx_packets']
         self.__moving_window_metrics = ['tx_throughput_mbps', 'rx_throughput_mbps']
-        self.__bin_stats_handler = {'message': 'Bin stats handler is online!', 'lvaps': {}}
+        # lvaps stats indexed by lvap address
+        self.__lvaps = {}
 
     def loop(self):
         """Periodic job."""
@@ -57,57 +61,48 @@ class BinStatsHandler(EmpowerApp):
 
     def bin_stats_callback(self, bin_stats):
         """ New stats available. """
-        lvap_addr = str(bin_stats.to_dict()['lvap'])
-        if lvap_addr not in self.__bin_stats_handler['lvaps']:
-            self.__bin_stats_handler['lvaps'][lvap_addr] = {
-                'bin_stats': bin_stats.to_dict(),
-                'tx_throughput_mbps': {
-                    "values": [],
-                    "mean": None,
-                    "median": None,
-                    "stdev": None
-                },
-                'rx_throughput_mbps': {
-                    "values": [],
-                    "mean": None,
-                    "median": None,
-                    "stdev": None
-                }
+        lvap_addr = bin_stats.lvap
+        crr_bin_stats = bin_stats.to_dict()
+        for metric in self.__raw_metrics:
+            crr_bin_stats[metric + '_moving'] = []
+
+        if lvap_addr not in self.__lvaps:
+            self.__lvaps[lvap_addr] = {
+                'bin_stats': crr_bin_stats,
+                'tx_throughput_mbps': self.tenant.metrics.window(lvap_addr, LVAP_TX_THROUGHPUT_MBPS),
+                'rx_throughput_mbps': self.tenant.metrics.window(lvap_addr, LVAP_RX_THROUGHPUT_MBPS)
             }
         else:
-            self.__bin_stats_handler['lvaps'][lvap_addr]['bin_stats'] = bin_stats.to_dict()
-
-        for metric in self.__raw_metrics:
-            self.__bin_stats_handler['lvaps'][lvap_addr]['bin_stats'][metric + '_moving'] = []
+            self.__lvaps[lvap_addr]['bin_stats'] = crr_bin_stats
 
         if self.__db_monitor is not None:
 
-            rx_bytes = self.__bin_stats_handler['lvaps'][lvap_addr]['bin_stats']['rx_bytes'][0]
-            rx_packets = self.__bin_stats_handler['lvaps'][lvap_addr]['bin_stats']['rx_packets'][0]
-            tx_bytes = self.__bin_stats_handler['lvaps'][lvap_addr]['bin_stats']['tx_bytes'][0]
-            tx_packets = self.__bin_stats_handler['lvaps'][lvap_addr]['bin_stats']['tx_packets'][0]
+            rx_bytes = crr_bin_stats['rx_bytes'][0]
+            rx_packets = crr_bin_stats['rx_packets'][0]
+            tx_bytes = crr_bin_stats['tx_bytes'][0]
+            tx_packets = crr_bin_stats['tx_packets'][0]
 
             # bytes per second
-            if not self.__bin_stats_handler['lvaps'][lvap_addr]['bin_stats']['rx_bytes_per_second']:
+            if not crr_bin_stats['rx_bytes_per_second']:
                 rx_bytes_per_second = 0  # as None
             else:
-                rx_bytes_per_second = self.__bin_stats_handler['lvaps'][lvap_addr]['bin_stats']['rx_bytes_per_second'][0]
+                rx_bytes_per_second = crr_bin_stats['rx_bytes_per_second'][0]
 
             # packets per second
-            if not self.__bin_stats_handler['lvaps'][lvap_addr]['bin_stats']['rx_packets_per_second']:
+            if not crr_bin_stats['rx_packets_per_second']:
                 rx_packets_per_second = 0  # as None
             else:
-                rx_packets_per_second = self.__bin_stats_handler['lvaps'][lvap_addr]['bin_stats']['rx_packets_per_second'][0]
+                rx_packets_per_second = crr_bin_stats['rx_packets_per_second'][0]
 
-            if not self.__bin_stats_handler['lvaps'][lvap_addr]['bin_stats']['tx_bytes_per_second']:
+            if not crr_bin_stats['tx_bytes_per_second']:
                 tx_bytes_per_second = 0  # as None
             else:
-                tx_bytes_per_second = self.__bin_stats_handler['lvaps'][lvap_addr]['bin_stats']['tx_bytes_per_second'][0]
+                tx_bytes_per_second = crr_bin_stats['tx_bytes_per_second'][0]
 
-            if not self.__bin_stats_handler['lvaps'][lvap_addr]['bin_stats']['tx_packets_per_second']:
+            if not crr_bin_stats['tx_packets_per_second']:
                 tx_packets_per_second = 0  # as None
             else:
-                tx_packets_per_second = self.__bin_stats_handler['lvaps'][lvap_addr]['bin_stats']['tx_packets_per_second'][0]
+                tx_packets_per_second = crr_bin_stats['tx_packets_per_second'][0]
 
             if tx_bytes_per_second == 0:
                 tx_throughput_mbps = 0
@@ -119,32 +114,15 @@ class BinStatsHandler(EmpowerApp):
             else:
                 rx_throughput_mbps = rx_bytes_per_second / 125000
 
-            self.__bin_stats_handler['lvaps'][lvap_addr]['tx_throughput_mbps']['values'].append(tx_throughput_mbps)
-            self.__bin_stats_handler['lvaps'][lvap_addr]['rx_throughput_mbps']['values'].append(rx_throughput_mbps)
-
-            for metric in self.__moving_window_metrics:
-                if len(self.__bin_stats_handler['lvaps'][lvap_addr][metric]['values']) > 10:
-                    self.__bin_stats_handler['lvaps'][lvap_addr][metric]['values'].pop(0)
-
-                if len(self.__bin_stats_handler['lvaps'][lvap_addr][metric]['values']) >= 2:
-                    # Mean
-                    self.__bin_stats_handler['lvaps'][lvap_addr][metric]['mean'] = statistics.mean(
-                        self.__bin_stats_handler['lvaps'][lvap_addr][metric]['values'])
-
-                    # Median
-                    self.__bin_stats_handler['lvaps'][lvap_addr][metric]['median'] = statistics.median(
-                        self.__bin_stats_handler['lvaps'][lvap_addr][metric]['values'])
-
-                    # STDEV
-                    self.__bin_stats_handler['lvaps'][lvap_addr][metric]['stdev'] = statistics.stdev(
-                        self.__bin_stats_handler['lvaps'][lvap_addr][metric]['values'])
+            self.tenant.metrics.add(lvap_addr, LVAP_TX_THROUGHPUT_MBPS, tx_throughput_mbps)
+            self.tenant.metrics.add(lvap_addr, LVAP_RX_THROUGHPUT_MBPS, rx_throughput_mbps)
 
             fields = ['LVAP_ADDR',
                       'RX_BYTES', 'RX_BYTES_PER_SECOND', 'RX_PACKETS', 'RX_PACKETS_PER_SECOND',
                       'TX_BYTES', 'TX_BYTES_PER_SECOND', 'TX_PACKETS', 'TX_PACKETS_PER_SECOND',
                       'TX_THROUGHPUT_MBPS', 'RX_THROUGHPUT_MBPS']
 
-            values = [str(bin_stats.to_dict()['lvap']),
+            values = [str(lvap_addr),
                       rx_bytes, rx_bytes_per_second, rx_packets, rx_packets_per_second,
                       tx_bytes, tx_bytes_per_second, tx_packets, tx_packets_per_second,
                       tx_throughput_mbps, rx_throughput_mbps]
@@ -166,16 +144,19 @@ class BinStatsHandler(EmpowerApp):
     @property
     def bin_stats_handler(self):
         """Return default bin_stats_handler"""
-        return self.__bin_stats_handler
-
-    @bin_stats_handler.setter
-    def bin_stats_handler(self, value):
-        """Set bin_stats_handler"""
-        self.__bin_stats_handler = value
+        return self.to_dict()
 
     def to_dict(self):
         """ Return a JSON-serializable."""
-        return self.__bin_stats_handler
+        out = {'message': 'Bin stats handler is online!', 'lvaps': {}}
+
+        for lvap_addr, crr_lvap in self.__lvaps.items():
+            lvap_dict = {'bin_stats': crr_lvap['bin_stats']}
+            for metric in self.__moving_window_metrics:
+                lvap_dict[metric] = crr_lvap[metric].to_dict()
+            out['lvaps'][str(lvap_addr)] = lvap_dict
+
+        return out
 
 
 def launch(tenant_id, db_monitor=None, every=DEFAULT_PERIOD):
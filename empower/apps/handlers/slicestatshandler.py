@@ -20,9 +20,16 @@
 from empower.core.app import EmpowerApp
 from empower.core.app import DEFAULT_MONITORING_PERIOD
 from empower.core.app import DEFAULT_PERIOD
-from empower.datatypes.dscp import DSCP
-from empower.datatypes.etheraddress import EtherAddress
-import statistics
+
+# metrics published in the tenant metrics store
+SLICE_TX_BYTES = 'slice_tx_bytes'
+SLICE_THROUGHPUT_MBPS = 'slice_throughput_mbps'
+SLICE_QUEUE_DELAY_MS = 'slice_queue_delay_ms'
+WTP_THROUGHPUT_MBPS = 'wtp_throughput_mbps'
+WTP_QUEUE_DELAY_MS = 'wtp_queue_delay_ms'
+
+WTP_METRICS = {'throughput_mbps': WTP_THROUGHPUT_MBPS,
+               'queue_delay_ms': WTP_QUEUE_DELAY_MS}
 
 
 class SliceStatsHandler(EmpowerApp):
@@ -40,10 +47,13 @@ class SliceStatsHandler(EmpowerApp):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.__db_monitor = self.db_monitor
-        self.__slice_stats_handler = {"message": "Slice stats handler is online!", "wtps": {}}
         self.__tx_metrics = ['tx_bytes', 'tx_packets']
         self.__raw_metrics = ['deficit_used', 'deficit_avg', 'deficit', 'max_queue_length', 'crr_queue_length']
         self.__moving_window_metrics = ['queue_delay_ms', 'throughput_mbps']
+        # slices stats indexed by (wtp address, dscp)
+        self.__slices = {}
+        # overall stats indexed by wtp address
+        self.__wtps = {}
 
     def loop(self):
         """Periodic job."""
@@ -60,115 +70,67 @@ class SliceStatsHandler(EmpowerApp):
 
     def slice_stats_callback(self, slice_stats):
         """ New stats available. """
-        crr_wtp_addr = str(slice_stats.block.addr)
-        crr_dscp = str(slice_stats.dscp)
-
-        if crr_wtp_addr not in self.__slice_stats_handler['wtps']:
-            self.__slice_stats_handler['wtps'][crr_wtp_addr] = {'slices': {}, 'overall': {
-                'queue_delay_ms': {
-                    "values": [],
-                    "mean": None,
-                    "median": None,
-                    "stdev": None
-                },
-                'throughput_mbps': {
-                    "values": [],
-                    "mean": None,
-                    "median": None,
-                    "stdev": None
-                }
-            }}
-
-        if crr_dscp not in self.__slice_stats_handler['wtps'][crr_wtp_addr]['slices']:
-            self.__slice_stats_handler['wtps'][crr_wtp_addr]['slices'][crr_dscp] = {
+        crr_wtp_addr = slice_stats.block.addr
+        crr_dscp = slice_stats.dscp
+        raw_stats = slice_stats.slice_stats
+        metrics = self.tenant.metrics
+
+        if crr_wtp_addr not in self.__wtps:
+            self.__wtps[crr_wtp_addr] = {
+                'slices': [],
+                'queue_delay_ms': metrics.window(crr_wtp_addr, WTP_QUEUE_DELAY_MS),
+                'throughput_mbps': metrics.window(crr_wtp_addr, WTP_THROUGHPUT_MBPS)
+            }
+
+        key = (crr_wtp_addr, crr_dscp)
+
+        if key not in self.__slices:
+            self.__slices[key] = {
                 'tx_bytes': 0,
                 'tx_packets': 0,
-                'throughput_mbps': {
-                    "values": [],
-                    "mean": None,
-                    "median": None,
-                    "stdev": None
-                },
+                'throughput_mbps': metrics.window(key, SLICE_THROUGHPUT_MBPS),
                 'deficit_used': None,
                 'deficit_avg': None,
                 'deficit': None,
-                'queue_delay_ms': {
-                    "values": [],
-                    "mean": None,
-                    "median": None,
-                    "stdev": None
-                },
+                'queue_delay_ms': metrics.window(key, SLICE_QUEUE_DELAY_MS),
                 'max_queue_length': None,
                 'crr_queue_length': None,
                 'tx_bytes_moving': [],
                 'tx_packets_moving': []
             }
+            self.__wtps[crr_wtp_addr]['slices'].append(crr_dscp)
+
+        crr_slice = self.__slices[key]
 
-        # Computing TX metrics...
+        # Computing TX metrics (difference with the previous sample)...
         for metric in self.__tx_metrics:
-            self.__slice_stats_handler['wtps'][crr_wtp_addr]['slices'][crr_dscp][
-                metric + '_moving'].append(
-                slice_stats.to_dict()['slice_stats'][metric])
-
-            if len(self.__slice_stats_handler['wtps'][crr_wtp_addr]['slices'][crr_dscp][
-                       metric + '_moving']) >= 2:
-                # Calculate diff
-                self.__slice_stats_handler['wtps'][crr_wtp_addr]['slices'][crr_dscp][metric] = \
-                    self.__slice_stats_handler['wtps'][crr_wtp_addr]['slices'][crr_dscp][
-                        metric + '_moving'][1] - \
-                    self.__slice_stats_handler['wtps'][crr_wtp_addr]['slices'][crr_dscp][
-                        metric + '_moving'][0]
-
-                self.__slice_stats_handler['wtps'][crr_wtp_addr]['slices'][crr_dscp][
-                    metric + '_moving'].pop(0)
+            crr_slice[metric + '_moving'].append(raw_stats[metric])
+            if len(crr_slice[metric + '_moving']) >= 2:
+                crr_slice[metric] = crr_slice[metric + '_moving'][1] - crr_slice[metric + '_moving'][0]
+                crr_slice[metric + '_moving'].pop(0)
+        metrics.set(key, SLICE_TX_BYTES, crr_slice['tx_bytes'])
 
         # Computing TX megabits
-        crr_tx_megabits = self.__slice_stats_handler['wtps'][crr_wtp_addr]['slices'][crr_dscp][
-                              'tx_bytes'] / 125000  # from bytes to megabits
+        crr_tx_megabits = crr_slice['tx_bytes'] / 125000  # from bytes to megabits
 
         # Computing throughput metric...
         crr_throughput_mbps = 0
-        if self.__slice_stats_handler['wtps'][crr_wtp_addr]['slices'][crr_dscp]['tx_bytes'] > 0:
-            crr_throughput_mbps = self.__slice_stats_handler['wtps'][crr_wtp_addr]['slices'][crr_dscp][
-                                      'tx_bytes'] / 1000 / 1000 * 8  # from bytes to Mbps
-        self.__slice_stats_handler['wtps'][crr_wtp_addr]['slices'][crr_dscp]['throughput_mbps']['values'].append(
-            crr_throughput_mbps)
+        if crr_slice['tx_bytes'] > 0:
+            crr_throughput_mbps = crr_slice['tx_bytes'] / 1000 / 1000 * 8  # from bytes to Mbps
+        metrics.add(key, SLICE_THROUGHPUT_MBPS, crr_throughput_mbps)
 
+        # Computing queue delay metric...
         crr_queue_delay_ms = 0
-        if self.__slice_stats_handler['wtps'][crr_wtp_addr]['slices'][crr_dscp]['tx_bytes'] > 0:
-            crr_queue_delay_sec = slice_stats.to_dict()['slice_stats']['queue_delay_sec']  # getting seconds...
-            crr_queue_delay_ms = slice_stats.to_dict()['slice_stats']['queue_delay_usec'] / 1000  # from usec to ms
-            crr_queue_delay_ms += crr_queue_delay_sec * 1000  # from sec to ms
-        self.__slice_stats_handler['wtps'][crr_wtp_addr]['slices'][crr_dscp]['queue_delay_ms']['values'].append(
-            crr_queue_delay_ms)
-
-        for metric in self.__moving_window_metrics:
-            if len(self.__slice_stats_handler['wtps'][crr_wtp_addr]['slices'][crr_dscp][metric]['values']) > 10:
-                self.__slice_stats_handler['wtps'][crr_wtp_addr]['slices'][crr_dscp][metric]['values'].pop(0)
-
-            if len(self.__slice_stats_handler['wtps'][crr_wtp_addr]['slices'][crr_dscp][metric]['values']) >= 2:
-                # Mean
-                self.__slice_stats_handler['wtps'][crr_wtp_addr]['slices'][crr_dscp][metric][
-                    'mean'] = statistics.mean(
-                    self.__slice_stats_handler['wtps'][crr_wtp_addr]['slices'][crr_dscp][metric]['values'])
-
-                # Median
-                self.__slice_stats_handler['wtps'][crr_wtp_addr]['slices'][crr_dscp][metric][
-                    'median'] = statistics.median(
-                    self.__slice_stats_handler['wtps'][crr_wtp_addr]['slices'][crr_dscp][metric]['values'])
-
-                # STDEV
-                self.__slice_stats_handler['wtps'][crr_wtp_addr]['slices'][crr_dscp][metric][
-                    'stdev'] = statistics.stdev(
-                    self.__slice_stats_handler['wtps'][crr_wtp_addr]['slices'][crr_dscp][metric]['values'])
+        if crr_slice['tx_bytes'] > 0:
+            crr_queue_delay_ms = raw_stats['queue_delay_usec'] / 1000  # from usec to ms
+            crr_queue_delay_ms += raw_stats['queue_delay_sec'] * 1000  # from sec to ms
+        metrics.add(key, SLICE_QUEUE_DELAY_MS, crr_queue_delay_ms)
 
-        # Computing queue delay metric...
         for metric in self.__raw_metrics:
-            if self.slice_stats_handler['wtps'][crr_wtp_addr]['slices'][crr_dscp]['tx_bytes'] == 0:
-                self.slice_stats_handler['wtps'][crr_wtp_addr]['slices'][crr_dscp][metric] = 0
+            if crr_slice['tx_bytes'] == 0:
+                crr_slice[metric] = 0
             else:
-                self.slice_stats_handler['wtps'][crr_wtp_addr]['slices'][crr_dscp][metric] = \
-                slice_stats.to_dict()['slice_stats'][metric]
+                crr_slice[metric] = raw_stats[metric]
 
         # Update wtp counters
         self.update_wtp_overall_counters(crr_wtp_addr=crr_wtp_addr)
@@ -176,11 +138,13 @@ class SliceStatsHandler(EmpowerApp):
         # Saving slice stats into db
         if self.__db_monitor is not None:
 
+            tenant_slice = self.tenant.slices[crr_dscp]
+
             # If there is a specific slice configuration for this WTP
-            if EtherAddress(crr_wtp_addr) in self.tenant.slices[DSCP(crr_dscp)].wifi['wtps']:
-                crr_quantum = self.tenant.slices[DSCP(crr_dscp)].wifi['wtps'][EtherAddress(crr_wtp_addr)]['static-properties']['quantum']
+            if crr_wtp_addr in tenant_slice.wifi['wtps']:
+                crr_quantum = tenant_slice.wifi['wtps'][crr_wtp_addr]['static-properties']['quantum']
             else:
-                crr_quantum = self.tenant.slices[DSCP(crr_dscp)].wifi['static-properties']['quantum']
+                crr_quantum = tenant_slice.wifi['static-properties']['quantum']
 
             fields = ['WTP_ADDR', 'DSCP', 'WTP_DSCP',
                       'DEFICIT', 'DEFICIT_AVG', 'DEFICIT_USED',
@@ -188,61 +152,32 @@ class SliceStatsHandler(EmpowerApp):
                       'CURRENT_QUANTUM', 'QUEUE_DELAY_MSEC',
                       'TX_BYTES', 'TX_PACKETS', 'TX_MBITS', 'THROUGHPUT_MBPS']
             values = [str(crr_wtp_addr), str(crr_dscp), 'WTP: ' + str(crr_wtp_addr) + ' - Slice: ' + str(crr_dscp),
-                    self.__slice_stats_handler['wtps'][crr_wtp_addr]['slices'][crr_dscp]['deficit'],
-                    self.__slice_stats_handler['wtps'][crr_wtp_addr]['slices'][crr_dscp]['deficit_avg'],
-                    self.__slice_stats_handler['wtps'][crr_wtp_addr]['slices'][crr_dscp]['deficit_used'],
-                    self.__slice_stats_handler['wtps'][crr_wtp_addr]['slices'][crr_dscp]['max_queue_length'],
-                    self.__slice_stats_handler['wtps'][crr_wtp_addr]['slices'][crr_dscp]['crr_queue_length'],
-                    crr_quantum,
-                    crr_queue_delay_ms,
-                    self.__slice_stats_handler['wtps'][crr_wtp_addr]['slices'][crr_dscp]['tx_bytes'],
-                    self.__slice_stats_handler['wtps'][crr_wtp_addr]['slices'][crr_dscp]['tx_packets'],
-                    crr_tx_megabits,
-                    crr_throughput_mbps]
+                      crr_slice['deficit'],
+                      crr_slice['deficit_avg'],
+                      crr_slice['deficit_used'],
+                      crr_slice['max_queue_length'],
+                      crr_slice['crr_queue_length'],
+                      crr_quantum,
+                      crr_queue_delay_ms,
+                      crr_slice['tx_bytes'],
+                      crr_slice['tx_packets'],
+                      crr_tx_megabits,
+                      crr_throughput_mbps]
 
             # Saving into db
             self.monitor.insert_into_db(table='slice_stats', fields=fields, values=values)
 
     def update_wtp_overall_counters(self, crr_wtp_addr):
-        wtp_queue_delay_ms_overall = 0
-        wtp_throughput_mbps_overall = 0
-        for dscp in self.__slice_stats_handler['wtps'][crr_wtp_addr]['slices']:
-            wtp_queue_delay_ms_overall += \
-                self.__slice_stats_handler['wtps'][crr_wtp_addr]['slices'][dscp]['queue_delay_ms']['values'][-1]
-            wtp_throughput_mbps_overall += \
-                self.__slice_stats_handler['wtps'][crr_wtp_addr]['slices'][dscp]['throughput_mbps']['values'][-1]
-
-        self.__slice_stats_handler['wtps'][crr_wtp_addr]['overall']['queue_delay_ms']['values'].append(
-            wtp_queue_delay_ms_overall)
-        self.__slice_stats_handler['wtps'][crr_wtp_addr]['overall']['throughput_mbps']['values'].append(
-            wtp_throughput_mbps_overall)
-
+        crr_wtp = self.__wtps[crr_wtp_addr]
         for metric in self.__moving_window_metrics:
-            if len(self.__slice_stats_handler['wtps'][crr_wtp_addr]['overall'][metric]['values']) > 10:
-                self.__slice_stats_handler['wtps'][crr_wtp_addr]['overall'][metric]['values'].pop(0)
-
-            if len(self.__slice_stats_handler['wtps'][crr_wtp_addr]['overall'][metric]['values']) >= 2:
-                # Mean
-                self.__slice_stats_handler['wtps'][crr_wtp_addr]['overall'][metric]['mean'] = statistics.mean(
-                    self.__slice_stats_handler['wtps'][crr_wtp_addr]['overall'][metric]['values'])
-
-                # Median
-                self.__slice_stats_handler['wtps'][crr_wtp_addr]['overall'][metric]['median'] = statistics.median(
-                    self.__slice_stats_handler['wtps'][crr_wtp_addr]['overall'][metric]['values'])
-
-                # STDEV
-                self.__slice_stats_handler['wtps'][crr_wtp_addr]['overall'][metric]['stdev'] = statistics.stdev(
-                    self.__slice_stats_handler['wtps'][crr_wtp_addr]['overall'][metric]['values'])
+            self.tenant.metrics.add(crr_wtp_addr, WTP_METRICS[metric],
+                                    sum(self.__slices[(crr_wtp_addr, dscp)][metric].last
+                                        for dscp in crr_wtp['slices']))
 
     @property
     def slice_stats_handler(self):
         """Return default slice_stats_handler"""
-        return self.__slice_stats_handler
-
-    @slice_stats_handler.setter
-    def slice_stats_handler(self, value):
-        """Set slice_stats_handler"""
-        self.__slice_stats_handler = value
+        return self.to_dict()
 
     @property
     def db_monitor(self):
@@ -257,7 +192,23 @@ class SliceStatsHandler(EmpowerApp):
 
     def to_dict(self):
         """ Return a JSON-serializable."""
-        return self.__slice_stats_handler
+        out = {"message": "Slice stats handler is online!", "wtps": {}}
+
+        for crr_wtp_addr, crr_wtp in self.__wtps.items():
+            out['wtps'][str(crr_wtp_addr)] = {
+                'slices': {},
+                'overall': {metric: crr_wtp[metric].to_dict() for metric in self.__moving_window_metrics}
+            }
+
+        for (crr_wtp_addr, crr_dscp), crr_slice in self.__slices.items():
+            slice_dict = dict(crr_slice)
+            for metric in self.__moving_window_metrics:
+                slice_dict[metric] = crr_slice[metric].to_dict()
+            for metric in self.__tx_metrics:
+                slice_dict[metric + '_moving'] = list(crr_slice[metric + '_moving'])
+            out['wtps'][str(crr_wtp_addr)]['slices'][str(crr_dscp)] = slice_dict
+
+        return out
 
 
 def launch(tenant_id, db_monitor=None, every=DEFAULT_PERIOD):
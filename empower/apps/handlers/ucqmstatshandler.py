@@ -20,10 +20,11 @@
 from empower.core.app import EmpowerApp
 from empower.core.app import DEFAULT_MONITORING_PERIOD
 from empower.core.app import DEFAULT_PERIOD
-from empower.datatypes.etheraddress import EtherAddress
-import statistics
 import time
 
+# metrics published in the tenant metrics store
+STA_RSSI = 'sta_rssi'
+
 
 class UCQMStatsHandler(EmpowerApp):
     """UCQM Stats Handler APP
@@ -40,7 +41,8 @@ class UCQMStatsHandler(EmpowerApp):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.__db_monitor = self.db_monitor
-        self.__ucqm_stats_handler = {"message": "UCQM stats handler is online!", "wtps": {}}
+        # stations stats indexed by (wtp address, sta address)
+        self.__stas = {}
 
     def wtp_up(self, wtp):
         for block in wtp.supports:
@@ -57,59 +59,25 @@ class UCQMStatsHandler(EmpowerApp):
 
     def ucqm_stats_callback(self, ucqm_stats):
         """ New stats available. """
-        crr_wtp_addr = str(ucqm_stats.block.addr)
+        crr_wtp_addr = ucqm_stats.block.addr
         if crr_wtp_addr is not None:
-            if crr_wtp_addr not in self.__ucqm_stats_handler['wtps']:
-                self.__ucqm_stats_handler['wtps'][crr_wtp_addr] = {'lvaps': {}}
-
             ucqm = ucqm_stats.block.ucqm
             for sta in ucqm:
-                if self.lvap(EtherAddress(sta)) is not None:
+                if self.lvap(sta) is not None:
                     # This is a station of this tenant
-                    if str(sta) not in self.__ucqm_stats_handler['wtps'][crr_wtp_addr]['lvaps']:
-                        self.__ucqm_stats_handler['wtps'][crr_wtp_addr]['lvaps'][str(sta)] = {
+                    key = (crr_wtp_addr, sta)
+                    if key not in self.__stas:
+                        self.__stas[key] = {
                             'hist_packets': None,
                             'last_packets': None,
-                            'mov_rssi': {
-                                "values": [],
-                                "mean": None,
-                                "median": None,
-                                "stdev": None
-                            }}
+                            'mov_rssi': self.tenant.metrics.window(key, STA_RSSI)}
 
                     # Hist and Last packets
-                    self.__ucqm_stats_handler['wtps'][crr_wtp_addr]['lvaps'][str(sta)][
-                        'hist_packets'] = ucqm[sta]['hist_packets']
-                    self.__ucqm_stats_handler['wtps'][crr_wtp_addr]['lvaps'][str(sta)][
-                        'last_packets'] = ucqm[sta]['last_packets']
+                    self.__stas[key]['hist_packets'] = ucqm[sta]['hist_packets']
+                    self.__stas[key]['last_packets'] = ucqm[sta]['last_packets']
 
                     # RSSI moving window (last_rssi_avg and last_rssi_std not used here)
-                    self.__ucqm_stats_handler['wtps'][crr_wtp_addr]['lvaps'][str(sta)]['mov_rssi'][
-                        'values'].append(ucqm[sta]['mov_rssi'])
-
-                    if len(self.__ucqm_stats_handler['wtps'][crr_wtp_addr]['lvaps'][str(sta)][
-                               'mov_rssi']['values']) > 10:
-                        self.__ucqm_stats_handler['wtps'][crr_wtp_addr]['lvaps'][str(sta)][
-                            'mov_rssi']['values'].pop(0)
-
-                    if len(self.__ucqm_stats_handler['wtps'][crr_wtp_addr]['lvaps'][str(sta)][
-                               'mov_rssi']['values']) >= 2:
-                        # Mean
-                        self.__ucqm_stats_handler['wtps'][crr_wtp_addr]['lvaps'][str(sta)][
-                            'mov_rssi']['mean'] = statistics.mean(
-                            self.__ucqm_stats_handler['wtps'][crr_wtp_addr]['lvaps'][str(sta)][
-                                'mov_rssi']['values'])
-                        # Median
-                        self.__ucqm_stats_handler['wtps'][crr_wtp_addr]['lvaps'][str(sta)][
-                            'mov_rssi']['median'] = statistics.median(
-                            self.__ucqm_stats_handler['wtps'][crr_wtp_addr]['lvaps'][str(sta)][
-                                'mov_rssi']['values'])
-
-                        # STDEV
-                        self.__ucqm_stats_handler['wtps'][crr_wtp_addr]['lvaps'][str(sta)][
-                            'mov_rssi']['stdev'] = statistics.stdev(
-                            self.__ucqm_stats_handler['wtps'][crr_wtp_addr]['lvaps'][str(sta)][
-                                'mov_rssi']['values'])
+                    self.tenant.metrics.add(key, STA_RSSI, ucqm[sta]['mov_rssi'])
 
             if self.__db_monitor is not None:
                 crr_time_in_ms = int(round(time.time()))
@@ -132,12 +100,7 @@ class UCQMStatsHandler(EmpowerApp):
     @property
     def ucqm_stats_handler(self):
         """Return default ucqm_stats_handler"""
-        return self.__ucqm_stats_handler
-
-    @ucqm_stats_handler.setter
-    def ucqm_stats_handler(self, value):
-        """Set ucqm_stats_handler"""
-        self.__ucqm_stats_handler = value
+        return self.to_dict()
 
     @property
     def db_monitor(self):
@@ -152,7 +115,16 @@ class UCQMStatsHandler(EmpowerApp):
 
     def to_dict(self):
         """ Return a JSON-serializable."""
-        return self.__ucqm_stats_handler
+        out = {"message": "UCQM stats handler is online!", "wtps": {}}
+
+        for (crr_wtp_addr, sta), crr_sta in self.__stas.items():
+            crr_wtp = out['wtps'].setdefault(str(crr_wtp_addr), {'lvaps': {}})
+            crr_wtp['lvaps'][str(sta)] = {
+                'hist_packets': crr_sta['hist_packets'],
+                'last_packets': crr_sta['last_packets'],
+                'mov_rssi': crr_sta['mov_rssi'].to_dict()}
+
+        return out
 
 
 def launch(tenant_id, db_monitor=None, db_user=None, db_pass=None, every=DEFAULT_PERIOD):
@@ -20,7 +20,9 @@
 from empower.core.app import EmpowerApp
 from empower.core.app import DEFAULT_MONITORING_PERIOD
 from empower.core.app import DEFAULT_PERIOD
-import statistics
+
+# metrics published in the tenant metrics store
+WTP_CHANNEL_UTILIZATION = 'wtp_channel_utilization'
 
 
 class WiFiStatsHandler(EmpowerApp):
@@ -38,7 +40,8 @@ class WiFiStatsHandler(EmpowerApp):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.__db_monitor = self.db_monitor
-        self.__wifi_stats_handler = {"message": "WiFi stats handler is online!", "wtps": {}}
+        # wtps stats indexed by wtp address
+        self.__wtps = {}
 
     def wtp_up(self, wtp):
         for block in wtp.supports:
@@ -55,65 +58,43 @@ class WiFiStatsHandler(EmpowerApp):
 
     def wifi_stats_callback(self, wifi_stats):
         """ New stats available. """
-        crr_wtp_addr = str(wifi_stats.block.addr)
+        crr_wtp_addr = wifi_stats.block.addr
         if crr_wtp_addr is not None:
-            if crr_wtp_addr not in self.__wifi_stats_handler['wtps']:
-                self.__wifi_stats_handler['wtps'][crr_wtp_addr] = {
+            if crr_wtp_addr not in self.__wtps:
+                self.__wtps[crr_wtp_addr] = {
                     "tx_per_second": None,
                     "rx_per_second": None,
                     "channel": None,
-                    "channel_utilization": {
-                        "values": [],
-                        "mean": None,
-                        "median": None,
-                        "stdev": None
-                    }
+                    "channel_utilization": self.tenant.metrics.window(crr_wtp_addr, WTP_CHANNEL_UTILIZATION)
                 }
 
+            crr_wtp = self.__wtps[crr_wtp_addr]
+
             # TX and RX metrics
             if wifi_stats.tx_per_second > 0:
-                self.__wifi_stats_handler['wtps'][crr_wtp_addr]['tx_per_second'] = wifi_stats.tx_per_second / 125000  # to Mbps
+                crr_wtp['tx_per_second'] = wifi_stats.tx_per_second / 125000  # to Mbps
             else:
-                self.__wifi_stats_handler['wtps'][crr_wtp_addr]['tx_per_second'] = wifi_stats.tx_per_second
+                crr_wtp['tx_per_second'] = wifi_stats.tx_per_second
 
             if wifi_stats.rx_per_second > 0:
-                self.__wifi_stats_handler['wtps'][crr_wtp_addr]['rx_per_second'] = wifi_stats.rx_per_second / 125000  # to Mbps
+                crr_wtp['rx_per_second'] = wifi_stats.rx_per_second / 125000  # to Mbps
             else:
-                self.__wifi_stats_handler['wtps'][crr_wtp_addr]['rx_per_second'] = wifi_stats.rx_per_second
+                crr_wtp['rx_per_second'] = wifi_stats.rx_per_second
 
             # Channel is not going to change at runtime
-            self.__wifi_stats_handler['wtps'][crr_wtp_addr]['channel'] = wifi_stats.block.channel
+            crr_wtp['channel'] = wifi_stats.block.channel
 
             # Channel utilization moving window
-            self.__wifi_stats_handler['wtps'][crr_wtp_addr]['channel_utilization']['values'].append(
-                wifi_stats.tx_per_second + wifi_stats.rx_per_second)
-
-            if len(self.__wifi_stats_handler['wtps'][crr_wtp_addr]['channel_utilization']['values']) > 10:
-                self.__wifi_stats_handler['wtps'][crr_wtp_addr]['channel_utilization']['values'].pop(0)
-
-            if len(self.__wifi_stats_handler['wtps'][crr_wtp_addr]['channel_utilization']['values']) >= 2:
-                # Mean
-                self.__wifi_stats_handler['wtps'][crr_wtp_addr]['channel_utilization'][
-                    'mean'] = statistics.mean(
-                    self.__wifi_stats_handler['wtps'][crr_wtp_addr]['channel_utilization']['values'])
-
-                # Median
-                self.__wifi_stats_handler['wtps'][crr_wtp_addr]['channel_utilization'][
-                    'median'] = statistics.median(
-                    self.__wifi_stats_handler['wtps'][crr_wtp_addr]['channel_utilization']['values'])
-
-                # STDEV
-                self.__wifi_stats_handler['wtps'][crr_wtp_addr]['channel_utilization'][
-                    'stdev'] = statistics.stdev(
-                    self.__wifi_stats_handler['wtps'][crr_wtp_addr]['channel_utilization']['values'])
+            self.tenant.metrics.add(crr_wtp_addr, WTP_CHANNEL_UTILIZATION,
+                                    wifi_stats.tx_per_second + wifi_stats.rx_per_second)
 
             if self.__db_monitor is not None:
                 fields = ['WTP_ADDR', 'TX', 'RX', 'CHANNEL', 'CHANNEL_UTILIZATION']
                 values = [str(crr_wtp_addr),
-                          self.__wifi_stats_handler['wtps'][crr_wtp_addr]['tx_per_second'],
-                          self.__wifi_stats_handler['wtps'][crr_wtp_addr]['rx_per_second'],
-                          self.__wifi_stats_handler['wtps'][crr_wtp_addr]['channel'],
-                          (self.__wifi_stats_handler['wtps'][crr_wtp_addr]['tx_per_second'] + self.__wifi_stats_handler['wtps'][crr_wtp_addr]['rx_per_second'])]
+                          crr_wtp['tx_per_second'],
+                          crr_wtp['rx_per_second'],
+                          crr_wtp['channel'],
+                          (crr_wtp['tx_per_second'] + crr_wtp['rx_per_second'])]
 
                 # Saving into db
                 self.monitor.insert_into_db(table='wifi_stats', fields=fields, values=values)
@@ -121,12 +102,7 @@ class WiFiStatsHandler(EmpowerApp):
     @property
     def wifi_stats_handler(self):
         """Return default wifi_stats_handler"""
-        return self.__wifi_stats_handler
-
-    @wifi_stats_handler.setter
-    def wifi_stats_handler(self, value):
-        """Set wifi_stats_handler"""
-        self.__wifi_stats_handler = value
+        return self.to_dict()
 
     @property
     def db_monitor(self):
@@ -141,7 +117,14 @@ class WiFiStatsHandler(EmpowerApp):
 
     def to_dict(self):
         """ Return a JSON-serializable."""
-        return self.__wifi_stats_handler
+        out = {"message": "WiFi stats handler is online!", "wtps": {}}
+
+        for crr_wtp_addr, crr_wtp in self.__wtps.items():
+            wtp_dict = dict(crr_wtp)
+            wtp_dict['channel_utilization'] = crr_wtp['channel_utilization'].to_dict()
+            out['wtps'][str(crr_wtp_addr)] = wtp_dict
+
+        return out
 
 
 def launch(tenant_id, db_monitor=None, every=DEFAULT_PERIOD):
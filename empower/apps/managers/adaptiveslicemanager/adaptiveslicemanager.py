@@ -20,7 +20,12 @@
 from empower.core.app import EmpowerApp
 from empower.core.app import DEFAULT_PERIOD
 from empower.datatypes.dscp import DSCP
+from empower.datatypes.etheraddress import EtherAddress
 from empower.main import RUNTIME
+from empower.apps.handlers.slicestatshandler import SLICE_TX_BYTES
+from empower.apps.handlers.slicestatshandler import SLICE_THROUGHPUT_MBPS
+from empower.apps.handlers.slicestatshandler import SLICE_QUEUE_DELAY_MS
+from empower.apps.handlers.binstatshandler import LVAP_RX_THROUGHPUT_MBPS
 from empower.apps.managers.adaptiveslicemanager.parsers import sliceconfigrequest
 
 
@@ -63,20 +68,25 @@ class AdaptiveSliceManager(EmpowerApp):
         """Periodic job."""
         if self.__active:
             if self.get_slice_stats() and self.get_active_flows() and self.get_sta_stats():
+                # Slices tx bytes indexed by wtp address and dscp
+                wtps = {}
+                for (crr_wtp_addr, dscp), tx_bytes in self.__slice_stats_handler.items():
+                    wtps.setdefault(crr_wtp_addr, {})[dscp] = tx_bytes
+
                 # Run only when there are QoS flows
                 if self.__active_flows_handler['qos_flows']:
-                    for crr_wtp_addr in self.__slice_stats_handler['wtps']:
-                        if self.requirements_met(wtp=crr_wtp_addr):
+                    for crr_wtp_addr, slices in wtps.items():
+                        if self.requirements_met(wtp=crr_wtp_addr, slices=slices):
                             factor = self.__quantum_increase_rate
                         else:
                             factor = self.__quantum_decrease_rate
 
                         # Reconfigure all slices in the WTP
-                        self.reconfigure(factor, crr_wtp_addr)
+                        self.reconfigure(factor, slices)
                 else:
-                    for crr_wtp_addr in self.__slice_stats_handler['wtps']:
+                    for slices in wtps.values():
                         # Reconfigure all slices in the WTP
-                        self.reset_all(crr_wtp_addr)
+                        self.reset_all(slices)
 
             if self.__db_monitor is not None:
                 fields = ['MIN_QUANTUM', 'MAX_QUANTUM', 'INC_RATE', 'DEC_RATE']
@@ -89,19 +99,18 @@ class AdaptiveSliceManager(EmpowerApp):
                 # Keeping only the last measurements in db
                 self.monitor.keep_last_measurements_only('adaptive_slicing')
 
-    def reset_all(self, crr_wtp_addr):
-        for dscp in self.__slice_stats_handler['wtps'][crr_wtp_addr]['slices']:
-            current_quantum = self.tenant.slices[DSCP(dscp)].wifi['static-properties']['quantum']
+    def reset_all(self, slices):
+        for dscp in slices:
+            current_quantum = self.tenant.slices[dscp].wifi['static-properties']['quantum']
             if self.__maximum_quantum != current_quantum:
-                self.send_slice_config_to_wtp(dscp=dscp,
+                self.send_slice_config_to_wtp(dscp=str(dscp),
                                               new_quantum=self.__maximum_quantum)
 
-    def reconfigure(self, factor, crr_wtp_addr):
+    def reconfigure(self, factor, slices):
         for be_dscp in self.__active_flows_handler['be_slices']:
-            if be_dscp in self.__slice_stats_handler['wtps'][crr_wtp_addr]['slices']:
-                slice = self.__slice_stats_handler['wtps'][crr_wtp_addr]['slices'][be_dscp]
+            if DSCP(be_dscp) in slices:
                 # only if the slice active...
-                if slice['tx_bytes'] > 0:
+                if slices[DSCP(be_dscp)] > 0:
                     current_quantum = self.tenant.slices[DSCP(be_dscp)].wifi['static-properties']['quantum']
                     adapted_quantum = int(current_quantum * factor)
                     if adapted_quantum > self.__maximum_quantum:
@@ -112,20 +121,20 @@ class AdaptiveSliceManager(EmpowerApp):
                         self.send_slice_config_to_wtp(dscp=be_dscp,
                                                       new_quantum=adapted_quantum)
 
-    def requirements_met(self, wtp):
+    def requirements_met(self, wtp, slices):
+        metrics = self.tenant.metrics
         for qos_flow_id in self.__active_flows_handler['qos_flows']:
             qos_flow = self.__active_flows_handler['flows'][qos_flow_id]
             # If downlink QoS flow
-            if qos_flow['flow_dscp'] in self.__slice_stats_handler['wtps'][wtp]['slices']:
+            if qos_flow['flow_dscp'] is not None and DSCP(qos_flow['flow_dscp']) in slices:
+                key = (wtp, DSCP(qos_flow['flow_dscp']))
                 # Checking queueing delay
-                queue_delay_median = \
-                    self.__slice_stats_handler['wtps'][wtp]['slices'][qos_flow['flow_dscp']]['queue_delay_ms']['median']
+                queue_delay_median = metrics.get(key, SLICE_QUEUE_DELAY_MS).median
                 if queue_delay_median is not None and qos_flow['flow_delay_req_ms'] is not None:
                     if qos_flow['flow_delay_req_ms'] < queue_delay_median:
                         return False
                 # Checking throughput
-                slc_throughput_mbps_mean = \
-                    self.__slice_stats_handler['wtps'][wtp]['slices'][qos_flow['flow_dscp']]['throughput_mbps']['median']
+                slc_throughput_mbps_mean = metrics.get(key, SLICE_THROUGHPUT_MBPS).median
                 if slc_throughput_mbps_mean is not None and qos_flow['flow_bw_req_mbps'] is not None:
                     if qos_flow['flow_bw_req_mbps'] < slc_throughput_mbps_mean:
                         return False
@@ -133,17 +142,17 @@ class AdaptiveSliceManager(EmpowerApp):
             # If uplink QoS flow
             elif qos_flow['flow_dscp'] is None:
                 if 'flow_src_mac_addr' in qos_flow:
-                    if qos_flow['flow_src_mac_addr'] in self.lvap_stats_handler['lvaps']:
+                    sta_addr = EtherAddress(qos_flow['flow_src_mac_addr'])
+                    if sta_addr in self.lvap_stats_handler:
                         # Checking throughput
-                        sta_rx_bw_mean = \
-                        self.lvap_stats_handler['lvaps'][qos_flow['flow_src_mac_addr']]['rx_throughput_mbps']['mean']
+                        sta_rx_bw_mean = self.lvap_stats_handler[sta_addr].mean
                         if sta_rx_bw_mean is not None:
                             # less bw that required...
                             if sta_rx_bw_mean < qos_flow['flow_bw_req_mbps']:
                                 # Search if the LVAP is connected to the WTP being analyzed
                                 for lvap in self.lvaps():
-                                    if str(lvap.addr) == qos_flow['flow_src_mac_addr']:
-                                        if str(lvap.blocks[0].addr) == wtp:
+                                    if lvap.addr == sta_addr:
+                                        if lvap.blocks[0].addr == wtp:
                                             return False
         return True
 
@@ -165,8 +174,7 @@ class AdaptiveSliceManager(EmpowerApp):
 
     def get_slice_stats(self):
         if 'empower.apps.handlers.slicestatshandler' in RUNTIME.tenants[self.tenant_id].components:
-            self.__slice_stats_handler = RUNTIME.tenants[self.tenant_id].components[
-                'empower.apps.handlers.slicestatshandler'].to_dict()
+            self.__slice_stats_handler = self.tenant.metrics.entities(SLICE_TX_BYTES)
             return True
         else:
             raise ValueError("APP 'empower.apps.handlers.slicestatshandler' is not online!")
@@ -174,8 +182,7 @@ class AdaptiveSliceManager(EmpowerApp):
 
     def get_sta_stats(self):
         if 'empower.apps.handlers.binstatshandler' in RUNTIME.tenants[self.tenant_id].components:
-            self.__lvap_stats_handler = RUNTIME.tenants[self.tenant_id].components[
-                'empower.apps.handlers.binstatshandler'].to_dict()
+            self.__lvap_stats_handler = self.tenant.metrics.entities(LVAP_RX_THROUGHPUT_MBPS)
             return True
         else:
             raise ValueError("APP 'empower.apps.handlers.binstatshandler' is not online!")
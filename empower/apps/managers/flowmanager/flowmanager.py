@@ -48,6 +48,9 @@ class FlowManager(EmpowerApp):
                                'lvap_load_expected_map': {}}        # expected load
         self.__process_handler = {'flows': {}}
 
+        # Incremented on every change of the flows
+        self.__version = 0
+
         # Flow params
         self.__flow_id = None
         self.__flow_type = None
@@ -133,6 +136,8 @@ class FlowManager(EmpowerApp):
         return False
 
     def add_flow(self):
+        self.__version += 1
+
         flow = {
             'flow_type': self.__flow_type,
             'flow_dscp': self.__flow_dscp,
@@ -195,6 +200,8 @@ class FlowManager(EmpowerApp):
         self.__flow_manager['flows'][self.__flow_id] = flow
 
     def remove_flow(self, flow_id):
+        self.__version += 1
+
         flow = self.__flow_manager['flows'][flow_id]
 
         del self.__flow_manager['flows'][flow_id]
@@ -471,8 +478,14 @@ class FlowManager(EmpowerApp):
     @flow_manager.setter
     def flow_manager(self, value):
         """Set Flow Manager"""
+        self.__version += 1
         self.__flow_manager = value
 
+    @property
+    def version(self):
+        """Return the version of the flows, incremented on every change."""
+        return self.__version
+
     def to_dict(self):
         """ Return a JSON-serializable."""
         return self.__flow_manager
@@ -19,6 +19,10 @@
 
 from empower.core.app import EmpowerApp
 from empower.main import RUNTIME
+from empower.apps.handlers.slicestatshandler import WTP_THROUGHPUT_MBPS
+from empower.apps.handlers.wifistatshandler import WTP_CHANNEL_UTILIZATION
+from empower.apps.handlers.ucqmstatshandler import STA_RSSI
+from empower.apps.handlers.binstatshandler import LVAP_RX_THROUGHPUT_MBPS
 import statistics
 
 DEFAULT_LONG_PERIOD = 20000
@@ -45,10 +49,12 @@ class GomezHandoverManager(EmpowerApp):
             'wtps': {},
         }
 
-        # Stats handlers
+        # Stats handlers (read-only views of the tenant metrics)
         self.__slice_stats_handler = None   # AP load
         self.__wifi_stats_handler = None    # Channel load
         self.__ucqm_stats_handler = None    # RSSIs
+        self.__lvap_stats_handler = None    # LVAP load
+        self.__loop_state = None
         self.__active = False
         self.__gomez_handover_manager['active'] = self.__active
         self.__avg_rssis = []
@@ -67,10 +73,8 @@ class GomezHandoverManager(EmpowerApp):
                 crr_wtp_addr = str(block.addr)
 
                 # If sta within range...
-                if crr_lvap_addr in self.__ucqm_stats_handler['wtps'][crr_wtp_addr]['lvaps']:
-                    wtp_sta_mean_rssi_dbm = \
-                        self.__ucqm_stats_handler['wtps'][crr_wtp_addr]['lvaps'][crr_lvap_addr]['mov_rssi'][
-                            'mean']
+                if (block.addr, lvap.addr) in self.__ucqm_stats_handler:
+                    wtp_sta_mean_rssi_dbm = self.__ucqm_stats_handler[(block.addr, lvap.addr)].mean
                     if decision_factor is None:
                         decision_factor = wtp_sta_mean_rssi_dbm * (
                                 self.__gomez_handover_manager['wtps'][crr_wtp_addr]['throughput_mbps'] +
@@ -92,6 +96,11 @@ class GomezHandoverManager(EmpowerApp):
         """Periodic job."""
         if self.__active:
 
+            # Nothing new since the last successful run
+            loop_state = self.get_loop_state()
+            if loop_state == self.__loop_state:
+                return
+
             for wtp in self.wtps():
                 self.add_wtp_structure(str(wtp.addr))
 
@@ -141,9 +150,25 @@ class GomezHandoverManager(EmpowerApp):
                 if (max(self.__avg_rssis) - min(self.__avg_rssis)) > statistics.median(self.__avg_rssis):
                     self.handover_process()
 
+            # Skip the next runs until any of the inputs changes
+            self.__loop_state = loop_state
+
         # Reset all params for the next iteration
         self.reset_all_params()
 
+    def get_loop_state(self):
+        """Return the inputs of a run: metrics and LVAP blocks."""
+
+        lvaps = frozenset((lvap.addr, lvap.blocks[0]) for lvap in self.lvaps())
+
+        metrics = tuple(self.tenant.metrics.get_versions(metric)
+                        for metric in (WTP_THROUGHPUT_MBPS,
+                                       WTP_CHANNEL_UTILIZATION,
+                                       STA_RSSI,
+                                       LVAP_RX_THROUGHPUT_MBPS))
+
+        return (metrics, lvaps)
+
     def add_wtp_structure(self, wtp_addr):
         self.__gomez_handover_manager['wtps'][wtp_addr] = {
             'throughput_mbps': None,
@@ -153,8 +178,7 @@ class GomezHandoverManager(EmpowerApp):
 
     def get_slice_stats(self):
         if 'empower.apps.handlers.slicestatshandler' in RUNTIME.tenants[self.tenant_id].components:
-            self.__slice_stats_handler = RUNTIME.tenants[self.tenant_id].components[
-                'empower.apps.handlers.slicestatshandler'].to_dict()
+            self.__slice_stats_handler = self.tenant.metrics.entities(WTP_THROUGHPUT_MBPS)
             return True
         else:
             raise ValueError("APP 'empower.apps.handlers.slicestatshandler' is not online!")
@@ -162,9 +186,8 @@ class GomezHandoverManager(EmpowerApp):
 
     def parse_slice_stats(self):
         try:
-            for wtp in self.__slice_stats_handler['wtps']:
-                self.__gomez_handover_manager['wtps'][wtp]['throughput_mbps'] = \
-                self.__slice_stats_handler['wtps'][wtp]['overall']['throughput_mbps']['mean']
+            for wtp, throughput_mbps in self.__slice_stats_handler.items():
+                self.__gomez_handover_manager['wtps'][str(wtp)]['throughput_mbps'] = throughput_mbps.mean
         except:
             raise ValueError("APP 'empower.apps.handlers.slicestatshandler' is not parsed!")
             return False
@@ -173,8 +196,7 @@ class GomezHandoverManager(EmpowerApp):
 
     def get_channel_load_stats(self):
         if 'empower.apps.handlers.wifistatshandler' in RUNTIME.tenants[self.tenant_id].components:
-            self.__wifi_stats_handler = RUNTIME.tenants[self.tenant_id].components[
-                'empower.apps.handlers.wifistatshandler'].to_dict()
+            self.__wifi_stats_handler = self.tenant.metrics.entities(WTP_CHANNEL_UTILIZATION)
             return True
         else:
             raise ValueError("APP 'empower.apps.handlers.wifistatshandler' is not online!")
@@ -182,9 +204,8 @@ class GomezHandoverManager(EmpowerApp):
 
     def parse_channel_stats(self):
         try:
-            for wtp in self.__wifi_stats_handler['wtps']:
-                self.__gomez_handover_manager['wtps'][wtp]['channel_utilization'] = \
-                    self.__wifi_stats_handler['wtps'][wtp]['channel_utilization']['mean']
+            for wtp, channel_utilization in self.__wifi_stats_handler.items():
+                self.__gomez_handover_manager['wtps'][str(wtp)]['channel_utilization'] = channel_utilization.mean
         except:
             raise ValueError("APP 'empower.apps.handlers.wifistatshandler' is not parsed!")
             return False
@@ -194,8 +215,7 @@ class GomezHandoverManager(EmpowerApp):
     def get_ucqm_stats(self):
         # UCQM stats handler
         if 'empower.apps.handlers.ucqmstatshandler' in RUNTIME.tenants[self.tenant_id].components:
-            self.__ucqm_stats_handler = RUNTIME.tenants[self.tenant_id].components[
-                'empower.apps.handlers.ucqmstatshandler'].to_dict()
+            self.__ucqm_stats_handler = self.tenant.metrics.entities(STA_RSSI)
             return True
         else:
             raise ValueError("APP 'empower.apps.handlers.ucqmstatshandler' is not online!")
@@ -204,11 +224,9 @@ class GomezHandoverManager(EmpowerApp):
     def parse_ucqm_stats(self):
         try:
             for lvap in self.lvaps():
-                crr_lvap_addr = str(lvap.addr)
                 if lvap.blocks[0] is not None:
                     crr_wtp_addr = str(lvap.blocks[0].addr)
-                    wtp_sta_mean_rssi_dbm = \
-                    self.__ucqm_stats_handler['wtps'][crr_wtp_addr]['lvaps'][crr_lvap_addr]['mov_rssi']['mean']
+                    wtp_sta_mean_rssi_dbm = self.__ucqm_stats_handler[(lvap.blocks[0].addr, lvap.addr)].mean
                     if wtp_sta_mean_rssi_dbm is not None:
                         self.__gomez_handover_manager['wtps'][crr_wtp_addr]['rssi'].append(wtp_sta_mean_rssi_dbm)
         except:
@@ -219,8 +237,7 @@ class GomezHandoverManager(EmpowerApp):
 
     def get_lvap_stats(self):
         if 'empower.apps.handlers.binstatshandler' in RUNTIME.tenants[self.tenant_id].components:
-            self.__lvap_stats_handler = RUNTIME.tenants[self.tenant_id].components[
-                'empower.apps.handlers.binstatshandler'].to_dict()
+            self.__lvap_stats_handler = self.tenant.metrics.entities(LVAP_RX_THROUGHPUT_MBPS)
             return True
         else:
             raise ValueError("APP 'empower.apps.handlers.binstatshandler' is not online!")
@@ -229,13 +246,11 @@ class GomezHandoverManager(EmpowerApp):
     def add_lvap_stats(self):
         # Getting LVAPs load and filling the structure
         for lvap in self.lvaps():
-            crr_lvap_addr = str(lvap.addr)
             if lvap.blocks[0] is not None:
                 crr_wtp_addr = str(lvap.blocks[0].addr)
                 if crr_wtp_addr in self.__gomez_handover_manager['wtps']:
-                    if crr_lvap_addr in self.__lvap_stats_handler['lvaps']:
-                        lvap_mean_throughput_mbps = \
-                            self.__lvap_stats_handler['lvaps'][crr_lvap_addr]['rx_throughput_mbps']['mean']
+                    if lvap.addr in self.__lvap_stats_handler:
+                        lvap_mean_throughput_mbps = self.__lvap_stats_handler[lvap.addr].mean
                         if lvap_mean_throughput_mbps is not None:
                             self.__gomez_handover_manager['wtps'][crr_wtp_addr]['throughput_mbps'] += lvap_mean_throughput_mbps
                     else:
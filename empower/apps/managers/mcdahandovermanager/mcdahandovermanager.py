@@ -20,13 +20,27 @@
 from empower.core.app import EmpowerApp
 from empower.core.app import DEFAULT_LONG_PERIOD
 from empower.main import RUNTIME
+from empower.datatypes.etheraddress import EtherAddress
+from empower.apps.handlers.slicestatshandler import WTP_THROUGHPUT_MBPS
+from empower.apps.handlers.slicestatshandler import WTP_QUEUE_DELAY_MS
+from empower.apps.handlers.wifistatshandler import WTP_CHANNEL_UTILIZATION
+from empower.apps.handlers.ucqmstatshandler import STA_RSSI
 
-from skcriteria import Data, MIN, MAX
-from skcriteria.madm import closeness, simple
+from empower.apps.managers.mcdahandovermanager.topsis import topsis
+from empower.apps.managers.mcdahandovermanager.topsis import MIN
+from empower.apps.managers.mcdahandovermanager.topsis import MAX
+
+import numpy as np
 import math
 import time
 import json
 
+# Metrics read for each criteria
+CRITERIA_METRICS = {'wtp_load_measured_mbps': [WTP_THROUGHPUT_MBPS],
+                    'wtp_queue_delay_ms': [WTP_QUEUE_DELAY_MS],
+                    'wtp_channel_load_rate': [WTP_CHANNEL_UTILIZATION],
+                    'wtp_sta_rssi_dbm': [STA_RSSI]}
+
 
 class MCDAHandoverManager(EmpowerApp):
     """MCDA handover manager APP.
@@ -46,7 +60,7 @@ class MCDAHandoverManager(EmpowerApp):
         super().__init__(**kwargs)
         self.__mcda_handover_manager = {"message": "MCDA handover manager is online!", "wtps": {}}
 
-        # Stats handlers
+        # Stats handlers (read-only views of the tenant metrics)
         self.__slice_stats_handler = None
         self.__wifi_stats_handler = None
         self.__ucqm_stats_handler = None
@@ -65,6 +79,8 @@ class MCDAHandoverManager(EmpowerApp):
 
         self.__mcda_descriptor = None
         self.__mcda_targets = None
+        self.__mcda_descriptor_version = 0
+        self.__loop_state = None
 
         # Load MCDA descriptor from JSON
         try:
@@ -86,6 +102,11 @@ class MCDAHandoverManager(EmpowerApp):
         """Periodic job."""
         if self.__mcda_descriptor is not None and self.__active:
 
+            # Nothing new since the last successful run
+            loop_state = self.get_loop_state()
+            if loop_state == self.__loop_state:
+                return
+
             # Step 1: creating structure to handle all metrics
             self.create_mcda_structure()
 
@@ -120,92 +141,75 @@ class MCDAHandoverManager(EmpowerApp):
                         self.compute_wtp_load_expected_mbps()
 
                     # Step 6: for each lvap in the network, get a decision using the TOPSIS method
-                    for lvap in self.lvaps():
-                        crr_lvap_addr = str(lvap.addr)
-
-                        # Create MCDA structure
-                        mtx = []
-                        wtp_addresses = []
-                        for crr_wtp_addr in self.__mcda_handover_manager['wtps']:
-                            wtp_addresses.append(crr_wtp_addr)
-                            if crr_lvap_addr in self.__mcda_handover_manager['wtps'][crr_wtp_addr]['lvaps']:
-                                mtx.append(
-                                    self.__mcda_handover_manager['wtps'][crr_wtp_addr]['lvaps'][crr_lvap_addr]['metrics'][
-                                        'values'])
-
-                        # if any of the (active) flows in this LVAP is QoS, use QoS weights
-                        # otherwise, stick with the BE weights
-                        mcda_weights = self.__mcda_descriptor['weights_be']
-                        if crr_lvap_addr in self.__flow_handler['lvap_flow_map']:
-                            if any(i in self.__flow_handler['lvap_flow_map'][crr_lvap_addr] for i in self.__flow_handler['qos_flows']):
-                                mcda_weights = self.__mcda_descriptor['weights_qos']
-
-
-                        # Lists must have the same length
-                        data = Data(mtx,
-                                    self.__mcda_targets,
-                                    weights=mcda_weights,
-                                    anames=wtp_addresses,
-                                    cnames=self.__mcda_descriptor['criteria'])
-
-                        dm = closeness.TOPSIS()
-                        dec = dm.decide(data)
-                        best_alternative_wtp_addr = data.anames[dec.best_alternative_]
-
-                        if self.__db_monitor:
-                            for i in range(0, len(mtx)):
-                                closeness_list = dec.e_.closeness.tolist()
-                                ranks = dec.rank_.tolist()
-                                closeness_res = closeness_list[i]
-                                if math.isnan(closeness_res):
-                                    closeness_res = None
-
-                                fields = ['LVAP_ADDR', 'WTP_ADDR'] + \
-                                         self.__mcda_descriptor['criteria'] + \
-                                         ['RANK', 'CLOSENESS']
-
-                                values = [crr_lvap_addr, wtp_addresses[i]] + mtx[i] + [ranks[i], closeness_res]
-                                # Saving into db
-                                self.monitor.insert_into_db(table='mcda_results', fields=fields, values=values)
-
-                            # # TODO: Improve writing info...
-                            # f = open(self.__mcda_results_filename, 'w+')
-                            # f.write('Decision for LVAP: ' + crr_lvap_addr + '\n' + str(
-                            #     dec) + '\nMove to WTP: ' + best_alternative_wtp_addr + '\n')
-                            # f.close()
-
-                        # Step 7: is handover needed? Do it and set the flag to 0 for all other blocks
-                        # (this could be improved, but get block with given address should be implemented)
-                        # Compute WTP expected load if present in the criteria
-                        if 'sta_association_flag' in self.__mcda_descriptor['criteria']:
-                            sta_association_index = self.__mcda_descriptor['criteria'].index('sta_association_flag')
-                        old_wtp_addr = None
-                        for block in self.blocks():
-                            crr_wtp_addr = str(block.addr)
+                    # All LVAPs are ranked at once, again for the remaining ones if the expected load changes
+                    lvaps = list(self.lvaps())
+                    wtp_addresses = list(self.__mcda_handover_manager['wtps'])
+
+                    # WTP address to block index (first block of each WTP)
+                    blocks = {}
+                    for block in self.blocks():
+                        blocks.setdefault(str(block.addr), block)
+
+                    if 'sta_association_flag' in self.__mcda_descriptor['criteria']:
+                        sta_association_index = self.__mcda_descriptor['criteria'].index('sta_association_flag')
+
+                    crr_lvap_index = 0
+                    while crr_lvap_index < len(lvaps) and wtp_addresses:
+                        lvaps_to_rank = lvaps[crr_lvap_index:]
+                        values, mask, closeness_mtx, ranks_mtx, best_alternatives = \
+                            self.rank_wtps(lvaps_to_rank, wtp_addresses)
+
+                        for i, lvap in enumerate(lvaps_to_rank):
+                            crr_lvap_index += 1
+                            crr_lvap_addr = str(lvap.addr)
+
+                            # if there are no alternative WTPs
+                            if not mask[i].any():
+                                continue
+
+                            best_alternative_wtp_addr = wtp_addresses[best_alternatives[i]]
+
+                            if self.__db_monitor:
+                                for j in mask[i].nonzero()[0]:
+                                    closeness_res = float(closeness_mtx[i][j])
+                                    if math.isnan(closeness_res):
+                                        closeness_res = None
+
+                                    fields = ['LVAP_ADDR', 'WTP_ADDR'] + \
+                                             self.__mcda_descriptor['criteria'] + \
+                                             ['RANK', 'CLOSENESS']
+
+                                    values_db = [crr_lvap_addr, wtp_addresses[j]] + values[i][j] + \
+                                                [int(ranks_mtx[i][j]), closeness_res]
+                                    # Saving into db
+                                    self.monitor.insert_into_db(table='mcda_results', fields=fields, values=values_db)
+
+                            # Step 7: is handover needed? Do it and set the flag to 0 for all other blocks
+                            old_wtp_addr = None
                             if lvap.blocks[0] is not None:
-                                if crr_wtp_addr == best_alternative_wtp_addr:
-                                    # Do handover to this block only if the station is not connected to it
-                                    sta_crr_wtp_addr = str(lvap.blocks[0].addr)
-                                    if sta_crr_wtp_addr != best_alternative_wtp_addr:
-                                        self.log.info("Handover triggered!")
-                                        old_wtp_addr = sta_crr_wtp_addr
-                                        # Handover now..
-                                        lvap.blocks = block
-                                    # and update metrics
-                                    if 'sta_association_flag' in self.__mcda_descriptor['criteria']:
+                                sta_crr_wtp_addr = str(lvap.blocks[0].addr)
+                                # Do handover to this block only if the station is not connected to it
+                                if best_alternative_wtp_addr in blocks and sta_crr_wtp_addr != best_alternative_wtp_addr:
+                                    self.log.info("Handover triggered!")
+                                    old_wtp_addr = sta_crr_wtp_addr
+                                    # Handover now..
+                                    lvap.blocks = blocks[best_alternative_wtp_addr]
+                                # and update metrics
+                                if 'sta_association_flag' in self.__mcda_descriptor['criteria']:
+                                    for crr_wtp_addr in blocks:
                                         self.__mcda_handover_manager['wtps'][crr_wtp_addr]['lvaps'][crr_lvap_addr]['metrics'][
-                                            'values'][sta_association_index] = 1
-                                elif 'sta_association_flag' in self.__mcda_descriptor['criteria']:
-                                    self.__mcda_handover_manager['wtps'][crr_wtp_addr]['lvaps'][crr_lvap_addr]['metrics'][
-                                        'values'][sta_association_index] = 0
-
-                        # Recalculate WTP expected load on handover, if any...
-                        # OBS: not possible to access lvap.blocks[0] while performing handover
-                        if 'wtp_load_expected_mbps' in self.__mcda_descriptor['criteria']:
-                            if old_wtp_addr is not None:
-                                self.recalculate_wtp_load_expected_mbps(old_wtp_addr=old_wtp_addr,
-                                                                        best_alternative_wtp_addr=best_alternative_wtp_addr,
-                                                                        moving_lvap_addr=crr_lvap_addr)
+                                            'values'][sta_association_index] = \
+                                            1 if crr_wtp_addr == best_alternative_wtp_addr else 0
+
+                            # Recalculate WTP expected load on handover, if any...
+                            # OBS: not possible to access lvap.blocks[0] while performing handover
+                            if 'wtp_load_expected_mbps' in self.__mcda_descriptor['criteria']:
+                                if old_wtp_addr is not None:
+                                    self.recalculate_wtp_load_expected_mbps(old_wtp_addr=old_wtp_addr,
+                                                                            best_alternative_wtp_addr=best_alternative_wtp_addr,
+                                                                            moving_lvap_addr=crr_lvap_addr)
+                                    # the remaining LVAPs must be ranked again
+                                    break
 
             # Start considering association and expected load from now on...
             if self.__initial_association:
@@ -229,6 +233,56 @@ class MCDAHandoverManager(EmpowerApp):
                 self.monitor.keep_last_measurements_only('mcda_results')
                 self.monitor.keep_last_measurements_only('mcda_weights')
 
+            # Skip the next runs until any of the inputs changes
+            self.__loop_state = loop_state
+
+    def get_loop_state(self):
+        """Return the inputs of a run: metrics, LVAP blocks, flows and weights."""
+
+        lvaps = frozenset((lvap.addr, lvap.blocks[0]) for lvap in self.lvaps())
+
+        metrics = []
+        for crr_criteria in self.__mcda_descriptor['criteria']:
+            for metric in CRITERIA_METRICS.get(crr_criteria, []):
+                metrics.append(self.tenant.metrics.get_versions(metric))
+
+        flow_manager = RUNTIME.tenants[self.tenant_id].components.get(
+            'empower.apps.managers.flowmanager.flowmanager')
+        flows = None
+        if flow_manager is not None:
+            flows = flow_manager.version
+
+        return (tuple(metrics), lvaps, flows, self.__mcda_descriptor_version)
+
+    def rank_wtps(self, lvaps, wtp_addresses):
+        """Rank the WTPs for all the given LVAPs with a single TOPSIS pass."""
+        values = [[self.__mcda_handover_manager['wtps'][crr_wtp_addr]['lvaps'][str(lvap.addr)]['metrics']['values']
+                   for crr_wtp_addr in wtp_addresses]
+                  for lvap in lvaps]
+
+        # lvaps x wtps x criteria, missing values are nan
+        mtx = np.array(values, dtype=float)
+
+        # Checking if all values are valid for the alternative WTP
+        mask = ~np.isnan(mtx).any(axis=2)
+
+        # if any of the (active) flows in the LVAP is QoS, use QoS weights
+        # otherwise, stick with the BE weights
+        qos = np.array([self.has_qos_flows(str(lvap.addr)) for lvap in lvaps], dtype=bool)
+        weights = np.where(qos[:, np.newaxis],
+                           self.__mcda_descriptor['weights_qos'],
+                           self.__mcda_descriptor['weights_be'])
+
+        closeness_mtx, ranks_mtx, best_alternatives = topsis(mtx, self.__mcda_targets, weights, mask)
+
+        return values, mask, closeness_mtx, ranks_mtx, best_alternatives
+
+    def has_qos_flows(self, crr_lvap_addr):
+        """Return True if any of the active flows of the LVAP is QoS."""
+        if crr_lvap_addr in self.__flow_handler['lvap_flow_map']:
+            return any(i in self.__flow_handler['lvap_flow_map'][crr_lvap_addr] for i in self.__flow_handler['qos_flows'])
+        return False
+
     def recalculate_wtp_load_expected_mbps(self, old_wtp_addr, best_alternative_wtp_addr, moving_lvap_addr):
         wtp_load_expected_mbps_index = self.__mcda_descriptor['criteria'].index('wtp_load_expected_mbps')
 
@@ -299,14 +353,12 @@ class MCDAHandoverManager(EmpowerApp):
     def get_wtp_load_measurements(self):
         # Slice stats handler
         if 'empower.apps.handlers.slicestatshandler' in RUNTIME.tenants[self.tenant_id].components:
-            self.__slice_stats_handler = RUNTIME.tenants[self.tenant_id].components[
-                'empower.apps.handlers.slicestatshandler'].to_dict()
+            self.__slice_stats_handler = self.tenant.metrics.entities(WTP_THROUGHPUT_MBPS)
             crr_criteria_index = self.__mcda_descriptor['criteria'].index('wtp_load_measured_mbps')
             for crr_wtp_addr in self.__mcda_handover_manager['wtps']:
-                if crr_wtp_addr in self.__slice_stats_handler['wtps']:
+                if EtherAddress(crr_wtp_addr) in self.__slice_stats_handler:
                     for crr_lvap_addr in self.__mcda_handover_manager['wtps'][crr_wtp_addr]['lvaps']:
-                        wtp_mean_throughput_mbps = \
-                            self.__slice_stats_handler['wtps'][crr_wtp_addr]['overall']['throughput_mbps']['mean']
+                        wtp_mean_throughput_mbps = self.__slice_stats_handler[EtherAddress(crr_wtp_addr)].mean
                         if wtp_mean_throughput_mbps is not None:
                             self.__mcda_handover_manager['wtps'][crr_wtp_addr]['lvaps'][crr_lvap_addr]['metrics']['values'][
                                 crr_criteria_index] = wtp_mean_throughput_mbps
@@ -324,14 +376,12 @@ class MCDAHandoverManager(EmpowerApp):
     def get_wtp_queue_delay_measurements(self):
         # Slice stats handler
         if 'empower.apps.handlers.slicestatshandler' in RUNTIME.tenants[self.tenant_id].components:
-            self.__slice_stats_handler = RUNTIME.tenants[self.tenant_id].components[
-                'empower.apps.handlers.slicestatshandler'].to_dict()
+            self.__slice_stats_handler = self.tenant.metrics.entities(WTP_QUEUE_DELAY_MS)
             crr_criteria_index = self.__mcda_descriptor['criteria'].index('wtp_queue_delay_ms')
             for crr_wtp_addr in self.__mcda_handover_manager['wtps']:
-                if crr_wtp_addr in self.__slice_stats_handler['wtps']:
+                if EtherAddress(crr_wtp_addr) in self.__slice_stats_handler:
                     for crr_lvap_addr in self.__mcda_handover_manager['wtps'][crr_wtp_addr]['lvaps']:
-                        wtp_mean_queue_delay_ms = \
-                            self.__slice_stats_handler['wtps'][crr_wtp_addr]['overall']['queue_delay_ms']['mean']
+                        wtp_mean_queue_delay_ms = self.__slice_stats_handler[EtherAddress(crr_wtp_addr)].mean
                         if wtp_mean_queue_delay_ms is not None:
                             self.__mcda_handover_manager['wtps'][crr_wtp_addr]['lvaps'][crr_lvap_addr]['metrics']['values'][
                                 crr_criteria_index] = wtp_mean_queue_delay_ms
@@ -349,14 +399,12 @@ class MCDAHandoverManager(EmpowerApp):
     def get_wtp_channel_load_measurements(self):
         # WiFi stats handler
         if 'empower.apps.handlers.wifistatshandler' in RUNTIME.tenants[self.tenant_id].components:
-            self.__wifi_stats_handler = RUNTIME.tenants[self.tenant_id].components[
-                'empower.apps.handlers.wifistatshandler'].to_dict()
+            self.__wifi_stats_handler = self.tenant.metrics.entities(WTP_CHANNEL_UTILIZATION)
             crr_criteria_index = self.__mcda_descriptor['criteria'].index('wtp_channel_load_rate')
             for crr_wtp_addr in self.__mcda_handover_manager['wtps']:
-                if crr_wtp_addr in self.__wifi_stats_handler['wtps']:
+                if EtherAddress(crr_wtp_addr) in self.__wifi_stats_handler:
                     for crr_lvap_addr in self.__mcda_handover_manager['wtps'][crr_wtp_addr]['lvaps']:
-                        wtp_mean_channel_load_rate = \
-                            self.__wifi_stats_handler['wtps'][crr_wtp_addr]['channel_utilization']['mean']
+                        wtp_mean_channel_load_rate = self.__wifi_stats_handler[EtherAddress(crr_wtp_addr)].mean
                         if wtp_mean_channel_load_rate is not None:
                             self.__mcda_handover_manager['wtps'][crr_wtp_addr]['lvaps'][crr_lvap_addr]['metrics']['values'][
                                 crr_criteria_index] = wtp_mean_channel_load_rate
@@ -374,16 +422,15 @@ class MCDAHandoverManager(EmpowerApp):
     def get_lvap_rssi_measurements(self):
         # UCQM stats handler
         if 'empower.apps.handlers.ucqmstatshandler' in RUNTIME.tenants[self.tenant_id].components:
-            self.__ucqm_stats_handler = RUNTIME.tenants[self.tenant_id].components[
-                'empower.apps.handlers.ucqmstatshandler'].to_dict()
+            self.__ucqm_stats_handler = self.tenant.metrics.entities(STA_RSSI)
             crr_criteria_index = self.__mcda_descriptor['criteria'].index('wtp_sta_rssi_dbm')
+            ucqm_wtps = {wtp_addr for wtp_addr, _ in self.__ucqm_stats_handler}
             for crr_wtp_addr in self.__mcda_handover_manager['wtps']:
-                if crr_wtp_addr in self.__ucqm_stats_handler['wtps']:
+                if EtherAddress(crr_wtp_addr) in ucqm_wtps:
                     for crr_lvap_addr in self.__mcda_handover_manager['wtps'][crr_wtp_addr]['lvaps']:
-                        if crr_lvap_addr in self.__ucqm_stats_handler['wtps'][crr_wtp_addr]['lvaps']:
-                            wtp_sta_mean_rssi_dbm = \
-                                self.__ucqm_stats_handler['wtps'][crr_wtp_addr]['lvaps'][crr_lvap_addr]['mov_rssi'][
-                                    'mean']
+                        key = (EtherAddress(crr_wtp_addr), EtherAddress(crr_lvap_addr))
+                        if key in self.__ucqm_stats_handler:
+                            wtp_sta_mean_rssi_dbm = self.__ucqm_stats_handler[key].mean
                             if wtp_sta_mean_rssi_dbm is not None:
                                 self.__mcda_handover_manager['wtps'][crr_wtp_addr]['lvaps'][crr_lvap_addr]['metrics']['values'][
                                     crr_criteria_index] = wtp_sta_mean_rssi_dbm
@@ -460,6 +507,7 @@ class MCDAHandoverManager(EmpowerApp):
     def mcda_descriptor(self, value):
         """Set mcda_descriptor"""
         self.__mcda_descriptor = value
+        self.__mcda_descriptor_version += 1
         self.load_targets()
 
     @property
@@ -471,6 +519,7 @@ class MCDAHandoverManager(EmpowerApp):
     def mcda_targets(self, value):
         """Set mcda_targets"""
         self.__mcda_targets = value
+        self.__mcda_descriptor_version += 1
 
     @property
     def slice_stats_handler(self):
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2020 Pedro Heleno Isolani
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Batched TOPSIS decision engine."""
+
+import numpy as np
+
+MAX = 1
+MIN = -1
+
+
+def topsis(mtx, targets, weights, mask=None):
+    """Rank the alternatives of several decision problems at once.
+
+    The result of every problem is the same of skcriteria closeness.TOPSIS
+    with the default normalizations (vector for the matrix, sum for the
+    weights). Masked alternatives are left out of the normalization, get a
+    nan closeness, and are ranked last.
+
+    Args:
+        mtx: the values (problems x alternatives x criteria), None or nan
+            for the missing ones
+        targets: the criteria targets, MAX or MIN (criteria)
+        weights: the criteria weights (problems x criteria)
+        mask: True for the valid alternatives (problems x alternatives),
+            all the alternatives are valid if None
+
+    Returns:
+        closeness: the relative closeness (problems x alternatives)
+        rank: the 1-based ordinal rank (problems x alternatives)
+        best: the index of the best alternative (problems)
+    """
+
+    mtx = np.asarray(mtx, dtype=float)
+    targets = np.asarray(targets)
+    weights = np.asarray(weights, dtype=float)
+
+    if mask is None:
+        mask = np.ones(mtx.shape[:2], dtype=bool)
+
+    valid = mask[:, :, np.newaxis]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+
+        # vector normalization of each criterion over the valid alternatives
+        mtx = np.where(valid, mtx, 0.0)
+        nmtx = mtx / np.sqrt(np.sum(mtx * mtx, axis=1, keepdims=True))
+
+        # sum normalization of the weights
+        nweights = weights / np.sum(weights, axis=1, keepdims=True)
+        wmtx = nmtx * nweights[:, np.newaxis, :]
+
+        maxs = np.max(np.where(valid, wmtx, -np.inf), axis=1)
+        mins = np.min(np.where(valid, wmtx, np.inf), axis=1)
+
+        ideal = np.where(targets == MAX, maxs, mins)[:, np.newaxis, :]
+        anti_ideal = np.where(targets == MIN, maxs, mins)[:, np.newaxis, :]
+
+        d_better = np.sqrt(np.sum((wmtx - ideal) ** 2, axis=2))
+        d_worst = np.sqrt(np.sum((wmtx - anti_ideal) ** 2, axis=2))
+
+        closeness = d_worst / (d_better + d_worst)
+
+    # highest closeness first, ties by position, nan and masked last
+    keys = np.where(np.isnan(closeness), np.inf, -closeness)
+    keys[~mask] = np.nan
+
+    closeness[~mask] = np.nan
+
+    order = np.argsort(keys, axis=1, kind='stable')
+
+    rank = np.empty(order.shape, dtype=int)
+    np.put_along_axis(rank, order,
+                      np.broadcast_to(np.arange(1, order.shape[1] + 1),
+                                      order.shape), axis=1)
+
+    return closeness, rank, order[:, 0]
@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2018 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Buffered capture writer and reader for the survey app."""
+
+import atexit
+import collections
+import glob
+import json
+import os
+import re
+import struct
+import threading
+
+from optparse import OptionParser
+
+import empower.logger
+
+from empower.datatypes.etheraddress import EtherAddress
+
+FORMAT_CSV = 'csv'
+FORMAT_COLUMNAR = 'svc'
+
+FORMATS = [FORMAT_CSV, FORMAT_COLUMNAR]
+
+DEFAULT_MAX_OPEN = 64
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_FLUSH_INTERVAL_MS = 1000
+
+# the fields of a captured frame, in the order they are stored
+FIELDS = ('tsft', 'rate', 'rtype', 'rssi', 'length', 'type', 'subtype',
+          'ra', 'ta', 'seq')
+
+CSV_LINE = "%u,%g,%s,%d,%u,%s,%s,%s,%s,%s\n"
+
+# columnar chunk: header, numeric columns, address columns, string columns
+CHUNK_MAGIC = b'SVC1'
+CHUNK_HEADER = struct.Struct('!4sI')
+NUMERIC_COLUMNS = (('tsft', 'Q'), ('rate', 'd'), ('rssi', 'h'),
+                   ('length', 'I'), ('seq', 'I'))
+ADDRESS_COLUMNS = ('ra', 'ta')
+STRING_COLUMNS = ('rtype', 'type', 'subtype')
+
+# rotated files are named <base>.<index>.<ext>
+FILENAME = re.compile(r'^(?P<base>.+?)(\.(?P<index>\d+))?\.(?P<ext>csv|svc)$')
+
+
+def encode_csv(rows):
+    """Encode a list of rows in CSV."""
+
+    return ''.join(CSV_LINE % (row[0], row[1], row[2], row[3], row[4],
+                               row[5], row[6], row[7], row[8], row[9])
+                   for row in rows).encode()
+
+
+def encode_columnar(rows):
+    """Encode a list of rows as a single columnar chunk."""
+
+    count = len(rows)
+    columns = dict(zip(FIELDS, zip(*rows)))
+
+    out = [CHUNK_HEADER.pack(CHUNK_MAGIC, count)]
+
+    for name, fmt in NUMERIC_COLUMNS:
+        out.append(struct.pack('!%u%s' % (count, fmt), *columns[name]))
+
+    for name in ADDRESS_COLUMNS:
+        out.append(b''.join(addr.to_raw() for addr in columns[name]))
+
+    # low cardinality strings are dictionary encoded
+    for name in STRING_COLUMNS:
+        codes = {}
+        indexes = [codes.setdefault(value, len(codes))
+                   for value in columns[name]]
+        out.append(struct.pack('!H', len(codes)))
+        for value in codes:
+            value = value.encode()
+            out.append(struct.pack('!B', len(value)) + value)
+        out.append(struct.pack('!%uH' % count, *indexes))
+
+    return b''.join(out)
+
+
+class CaptureWriter:
+    """
+    Buffered capture writer
+    * rows are buffered in memory and written by a background thread when
+      batch_size rows are pending or every flush_interval_ms
+    * a row written to several files is encoded only once
+    * at most max_open files are kept open, the least recently used file
+      is closed when a new one must be opened
+    * files larger than rotate_bytes (if not 0) are renamed to
+      <base>.<index>.<ext> and a new file is started
+    """
+
+    def __init__(self, path='.', fmt=FORMAT_CSV, max_open=DEFAULT_MAX_OPEN,
+                 batch_size=DEFAULT_BATCH_SIZE,
+                 flush_interval_ms=DEFAULT_FLUSH_INTERVAL_MS,
+                 rotate_bytes=0):
+
+        if fmt not in FORMATS:
+            raise ValueError('Invalid capture format ' + str(fmt))
+
+        self.path = path
+        self.fmt = fmt
+        self.max_open = int(max_open)
+        self.batch_size = int(batch_size)
+        self.flush_interval = int(flush_interval_ms) / 1000
+        self.rotate_bytes = int(rotate_bytes)
+
+        # counters
+        self.queued = 0
+        self.written = 0
+        self.rotated = 0
+        self.failed = 0
+
+        self.__pending = []
+        self.__files = collections.OrderedDict()
+        self.__cond = threading.Condition()
+        self.__flush_lock = threading.Lock()
+        self.__stopped = False
+
+        self.log = empower.logger.get_logger()
+
+        self.__thread = threading.Thread(target=self.__run,
+                                         name='capture-writer',
+                                         daemon=True)
+        self.__thread.start()
+
+        atexit.register(self.close)
+
+    def write(self, frame, *names):
+        """Queue a frame for the files names (without extension).
+
+        Raises:
+            ValueError, if the writer has been closed
+        """
+
+        row = tuple(frame[field] for field in FIELDS)
+
+        with self.__cond:
+
+            if self.__stopped:
+                raise ValueError("Capture writer closed")
+
+            self.__pending.append((row, names))
+            self.queued += 1
+
+            if len(self.__pending) >= self.batch_size:
+                self.__cond.notify_all()
+
+    def stats(self):
+        """Return the writer counters."""
+
+        with self.__cond:
+            return {'pending': len(self.__pending),
+                    'open_files': len(self.__files),
+                    'queued': self.queued,
+                    'written': self.written,
+                    'rotated': self.rotated,
+                    'failed': self.failed}
+
+    def flush(self):
+        """Write all the pending rows."""
+
+        with self.__flush_lock:
+
+            with self.__cond:
+                pending = self.__pending
+                self.__pending = []
+
+            if not pending:
+                return
+
+            rows = collections.OrderedDict()
+
+            for row, names in pending:
+
+                # rows shared by several files are encoded only once
+                if self.fmt == FORMAT_CSV:
+                    row = encode_csv([row])
+
+                for name in names:
+                    rows.setdefault(name, []).append(row)
+
+            for name, file_rows in rows.items():
+
+                try:
+
+                    if self.fmt == FORMAT_CSV:
+                        data = b''.join(file_rows)
+                    else:
+                        data = encode_columnar(file_rows)
+
+                    self.__write_file(name, data)
+
+                    with self.__cond:
+                        self.written += len(file_rows)
+
+                except Exception as ex:
+
+                    with self.__cond:
+                        self.failed += len(file_rows)
+
+                    self.log.error("Unable to write capture %s: %s",
+                                   name, ex)
+
+    def close(self):
+        """Stop the writer thread, write the pending rows and close all the
+        files. The writer can not be used afterwards."""
+
+        with self.__cond:
+
+            if self.__stopped:
+                return
+
+            self.__stopped = True
+            self.__cond.notify_all()
+
+        if self.__thread is not threading.current_thread():
+            self.__thread.join()
+
+        self.flush()
+
+        with self.__flush_lock:
+            while self.__files:
+                self.__files.popitem(last=False)[1].close()
+
+        atexit.unregister(self.close)
+
+    def __filename(self, name, index=None):
+
+        if index is None:
+            return os.path.join(self.path, "%s.%s" % (name, self.fmt))
+
+        return os.path.join(self.path, "%s.%u.%s" % (name, index, self.fmt))
+
+    def __write_file(self, name, data):
+
+        if name in self.__files:
+            self.__files.move_to_end(name)
+        else:
+            if len(self.__files) >= self.max_open:
+                self.__files.popitem(last=False)[1].close()
+            self.__files[name] = open(self.__filename(name), 'ab')
+
+        file_d = self.__files[name]
+        file_d.write(data)
+
+        if self.rotate_bytes and file_d.tell() >= self.rotate_bytes:
+            self.__rotate(name)
+
+    def __rotate(self, name):
+
+        self.__files.pop(name).close()
+
+        index = 1
+        while os.path.exists(self.__filename(name, index)):
+            index += 1
+
+        os.rename(self.__filename(name), self.__filename(name, index))
+
+        with self.__cond:
+            self.rotated += 1
+
+    def __run(self):
+
+        while True:
+
+            with self.__cond:
+
+                self.__cond.wait_for(
+                    lambda: len(self.__pending) >= self.batch_size or
+                    self.__stopped,
+                    timeout=self.flush_interval)
+
+                if self.__stopped:
+                    return
+
+            self.flush()
+
+
+def read_csv(filename):
+    """Read the frames in a CSV capture file."""
+
+    with open(filename) as file_d:
+        for line in file_d:
+
+            if not line.strip():
+                continue
+
+            values = line.rstrip('\n').split(',')
+
+            yield {'tsft': int(values[0]),
+                   'rate': float(values[1]),
+                   'rtype': values[2],
+                   'rssi': int(values[3]),
+                   'length': int(values[4]),
+                   'type': values[5],
+                   'subtype': values[6],
+                   'ra': EtherAddress(values[7]),
+                   'ta': EtherAddress(values[8]),
+                   'seq': int(values[9])}
+
+
+def read_columnar(filename):
+    """Read the frames in a columnar capture file."""
+
+    with open(filename, 'rb') as file_d:
+        data = file_d.read()
+
+    offset = 0
+
+    while offset < len(data):
+
+        magic, count = CHUNK_HEADER.unpack_from(data, offset)
+        offset += CHUNK_HEADER.size
+
+        if magic != CHUNK_MAGIC:
+            raise ValueError("Invalid chunk in %s" % filename)
+
+        columns = {}
+
+        for name, fmt in NUMERIC_COLUMNS:
+            column = struct.Struct('!%u%s' % (count, fmt))
+            columns[name] = column.unpack_from(data, offset)
+            offset += column.size
+
+        for name in ADDRESS_COLUMNS:
+            columns[name] = [EtherAddress(data[offset + 6 * i:
+                                               offset + 6 * i + 6])
+                             for i in range(count)]
+            offset += 6 * count
+
+        for name in STRING_COLUMNS:
+
+            codes = []
+            size, = struct.unpack_from('!H', data, offset)
+            offset += 2
+
+            for _ in range(size):
+                length = data[offset]
+                codes.append(data[offset + 1:offset + 1 + length].decode())
+                offset += 1 + length
+
+            indexes = struct.unpack_from('!%uH' % count, data, offset)
+            offset += 2 * count
+
+            columns[name] = [codes[index] for index in indexes]
+
+        for i in range(count):
+            yield {field: columns[field][i] for field in FIELDS}
+
+
+def read_capture(filename):
+    """Read the frames in a capture file (CSV or columnar)."""
+
+    if filename.endswith('.' + FORMAT_COLUMNAR):
+        return read_columnar(filename)
+
+    return read_csv(filename)
+
+
+def link_histograms(path='.'):
+    """Rebuild the per-link RSSI histograms from the link capture files.
+
+    The output has the same layout of the links attribute of the survey
+    app, i.e. {link: {rssi: frames}}.
+    """
+
+    links = {}
+
+    filenames = glob.glob(os.path.join(path, 'link_*.csv')) + \
+        glob.glob(os.path.join(path, 'link_*.svc'))
+
+    for filename in sorted(filenames):
+
+        match = FILENAME.match(os.path.basename(filename))
+
+        if not match:
+            continue
+
+        link = match.group('base')[len('link_'):]
+        histogram = links.setdefault(link, {})
+
+        for frame in read_capture(filename):
+            histogram[frame['rssi']] = histogram.get(frame['rssi'], 0) + 1
+
+    return links
+
+
+def main():
+    """Print the per-link RSSI histograms of a capture directory."""
+
+    parser = OptionParser(usage="%prog [options]")
+
+    parser.add_option("-p", "--path", dest="path", default=".",
+                      help="The capture directory, default: .")
+
+    (args, _) = parser.parse_args()
+
+    print(json.dumps(link_histograms(args.path), indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
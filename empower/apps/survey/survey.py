@@ -20,6 +20,8 @@
 from empower.core.app import EmpowerApp
 from empower.core.app import DEFAULT_PERIOD
 from empower.core.resourcepool import BANDS
+from empower.apps.survey.capture import CaptureWriter
+from empower.apps.survey.capture import FORMAT_CSV
 
 
 class Survey(EmpowerApp):
@@ -28,6 +30,10 @@ class Survey(EmpowerApp):
     Command Line Parameters:
         tenant_id: tenant id
         every: loop period in ms (optional, default 5000ms)
+        capture_format: capture files format, csv or svc (columnar)
+            (optional, default csv)
+        rotate_bytes: rotate capture files larger than this size (optional,
+            default 0, no rotation)
 
     Example:
         ./empower-runtime.py apps.survey.survey \
@@ -35,8 +41,12 @@ class Survey(EmpowerApp):
     """
 
     def __init__(self, **kwargs):
+        self.capture_format = FORMAT_CSV
+        self.rotate_bytes = 0
         super().__init__(**kwargs)
         self.links = {}
+        self.capture = CaptureWriter(fmt=self.capture_format,
+                                     rotate_bytes=self.rotate_bytes)
 
     def wtp_up(self, wtp):
         """New WTP."""
@@ -44,11 +54,18 @@ class Survey(EmpowerApp):
         for block in wtp.supports:
             self.summary(block=block, callback=self.summary_callback)
 
+    def stop(self):
+        """Stop control loop."""
+
+        super().stop()
+        self.capture.close()
+
     def to_dict(self):
         """ Return a JSON-serializable dictionary representing the Summary """
 
         out = super().to_dict()
         out['links'] = self.links
+        out['capture'] = self.capture.stats()
         return out
 
     def summary_callback(self, summary):
@@ -57,29 +74,12 @@ class Survey(EmpowerApp):
         self.log.info("New summary from %s addr %s frames %u", summary.block,
                       summary.addr, len(summary.frames))
 
-        # per block log
-        filename = "survey_%s_%u_%s.csv" % (summary.block.addr,
-                                            summary.block.channel,
-                                            BANDS[summary.block.band])
-
-        for frame in summary.frames:
-
-            line = "%u,%g,%s,%d,%u,%s,%s,%s,%s,%s\n" % \
-                (frame['tsft'], frame['rate'], frame['rtype'], frame['rssi'],
-                 frame['length'], frame['type'], frame['subtype'],
-                 frame['ra'], frame['ta'], frame['seq'])
-
-            with open(filename, 'a') as file_d:
-                file_d.write(line)
+        block = "%s_%u_%s" % (summary.block.addr, summary.block.channel,
+                              BANDS[summary.block.band])
 
-        # per link log
         for frame in summary.frames:
 
-            link = "%s_%s_%u_%s" % (frame['ta'], summary.block.addr,
-                                    summary.block.channel,
-                                    BANDS[summary.block.band])
-
-            filename = "link_%s.csv" % link
+            link = "%s_%s" % (frame['ta'], block)
 
             if link not in self.links:
                 self.links[link] = {}
@@ -89,16 +89,13 @@ class Survey(EmpowerApp):
 
             self.links[link][frame['rssi']] += 1
 
-            line = "%u,%g,%s,%d,%u,%s,%s,%s,%s,%s\n" % \
-                (frame['tsft'], frame['rate'], frame['rtype'], frame['rssi'],
-                 frame['length'], frame['type'], frame['subtype'],
-                 frame['ra'], frame['ta'], frame['seq'])
-
-            with open(filename, 'a') as file_d:
-                file_d.write(line)
+            # per block and per link log
+            self.capture.write(frame, "survey_%s" % block, "link_%s" % link)
 
 
-def launch(tenant_id, every=DEFAULT_PERIOD):
+def launch(tenant_id, every=DEFAULT_PERIOD, capture_format=FORMAT_CSV,
+           rotate_bytes=0):
     """ Initialize the module. """
 
-    return Survey(tenant_id=tenant_id, every=every)
+    return Survey(tenant_id=tenant_id, every=every,
+                  capture_format=capture_format, rotate_bytes=rotate_bytes)
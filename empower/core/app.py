@@ -22,8 +22,12 @@ import empower.logger
 
 from empower.core.resourcepool import ResourcePool
 from empower.core.cellpool import CellPool
+from empower.core.eventbus import EV_WTP_UP
+from empower.core.eventbus import EV_WTP_DOWN
 from empower.lvapp.lvappserver import LVAPPServer
 from empower.lvapp import PT_LVAP_JOIN
+from empower.lvapp import PT_LVAP_LEAVE
+from empower.lvapp import PT_LVAP_HANDOVER
 from empower.grafana.postgresql.common import EmpowerMon
 
 from empower.main import RUNTIME
@@ -33,9 +37,20 @@ DEFAULT_CONTROL_PERIOD = 10000
 DEFAULT_PERIOD = 5000
 DEFAULT_MONITORING_PERIOD = 1000
 
+# Events delivered through the runtime event bus
+EVENTS = [PT_LVAP_JOIN, PT_LVAP_LEAVE, PT_LVAP_HANDOVER, EV_WTP_UP,
+          EV_WTP_DOWN]
+
 
 class EmpowerApp:
-    """EmpowerApp base app class."""
+    """EmpowerApp base app class.
+
+    Apps are subscribed only to the events whose handler they override. If
+    DEFERRED_EVENTS is True the events are delivered in batch at the next
+    IOLoop iteration.
+    """
+
+    DEFERRED_EVENTS = False
 
     def __init__(self, tenant_id, **kwargs):
 
@@ -48,8 +63,15 @@ class EmpowerApp:
         for param in kwargs:
             setattr(self, param, kwargs[param])
 
-        # uncommen the following lines after updating the event handling
-        #self._register_lvapp_event(PT_LVAP_JOIN, self.lvap_join)
+        for event in EVENTS:
+
+            if getattr(type(self), event) is getattr(EmpowerApp, event):
+                continue
+
+            RUNTIME.events.subscribe(event, getattr(self, event),
+                                     tenant_id=self.tenant_id,
+                                     deferred=self.DEFERRED_EVENTS,
+                                     owner=self)
 
     @classmethod
     def _register_lvapp_event(cls, message, handler):
@@ -210,12 +232,13 @@ class EmpowerApp:
         if self.tenant_id not in RUNTIME.tenants:
             return None
 
-        lvaps = RUNTIME.tenants[self.tenant_id].lvaps.values()
+        lvaps = RUNTIME.tenants[self.tenant_id].lvaps
 
         if not block:
-            return lvaps
+            return lvaps.values()
 
-        return [x for x in lvaps if x.blocks[0] == block]
+        return [x for x in RUNTIME.lvaps_by_block(block)
+                if x.blocks[0] == block and x.addr in lvaps]
 
     def lvap(self, addr):
         """Return a particular LVAP in this tenant."""
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2018 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Executor delivering module callbacks to remote XML-RPC endpoints."""
+
+import collections
+import threading
+import xmlrpc.client
+
+import empower.logger
+
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_PENDING = 1000
+
+
+class CallbackExecutor:
+    """Remote callback executor.
+
+    Results are sent to the remote XML-RPC endpoints by a bounded pool of
+    threads, so that the network round trip does not take place on the
+    IOLoop. Results must be already encoded to JSON when submitted: the
+    threads must not access the state of the modules, which is modified by
+    the IOLoop.
+
+    Pending results are keyed by endpoint, method, and module. If a newer
+    result for the same module is submitted before the previous one has
+    been delivered the stale result is replaced (coalesced). When more than
+    max_pending results are waiting new results are dropped.
+
+    A persistent ServerProxy is kept for every endpoint and at most one
+    call per endpoint is in flight at any time.
+
+    Attributes:
+        workers: the number of delivery threads
+        max_pending: the maximum number of results waiting for delivery
+        queued: the number of results accepted for delivery
+        coalesced: the number of stale results replaced by newer ones
+        dropped: the number of results dropped because the queue was full
+        delivered: the number of results delivered
+        failed: the number of results whose delivery failed
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS,
+                 max_pending=DEFAULT_MAX_PENDING):
+
+        self.workers = workers
+        self.max_pending = max_pending
+
+        # counters
+        self.queued = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.delivered = 0
+        self.failed = 0
+
+        self.__pending = collections.OrderedDict()
+        self.__busy = set()
+        self.__proxies = {}
+        self.__cond = threading.Condition()
+        self.__threads = []
+
+        self.log = empower.logger.get_logger()
+
+    def submit(self, callback, key, as_json):
+        """Queue a result for delivery. Return False if it was dropped.
+
+        Args:
+            callback, a list whose entries are the URL of the remote xmlrpc
+                server and the method to be called
+            key, the identity of the module generating the result
+            as_json, the result encoded to JSON
+        """
+
+        url, method = callback
+        entry = (url, method, key)
+
+        with self.__cond:
+
+            if not self.__threads:
+                self.__start()
+
+            if entry in self.__pending:
+                self.__pending[entry] = as_json
+                self.coalesced += 1
+                return True
+
+            if len(self.__pending) >= self.max_pending:
+                self.dropped += 1
+                return False
+
+            self.__pending[entry] = as_json
+            self.queued += 1
+
+            self.__cond.notify()
+
+        return True
+
+    def __start(self):
+
+        for i in range(self.workers):
+            thread = threading.Thread(target=self.__run,
+                                      name='callback-worker-%u' % i,
+                                      daemon=True)
+            thread.start()
+            self.__threads.append(thread)
+
+    def __next(self):
+        """Pop the oldest result whose endpoint is not busy."""
+
+        for entry in self.__pending:
+            if entry[0] not in self.__busy:
+                self.__busy.add(entry[0])
+                return entry, self.__pending.pop(entry)
+
+        return None
+
+    def __run(self):
+
+        while True:
+
+            with self.__cond:
+
+                item = self.__next()
+
+                while item is None:
+                    self.__cond.wait()
+                    item = self.__next()
+
+            (url, method, _), as_json = item
+
+            try:
+
+                if url not in self.__proxies:
+                    self.__proxies[url] = xmlrpc.client.ServerProxy(url)
+
+                getattr(self.__proxies[url], method)(as_json)
+
+                with self.__cond:
+                    self.delivered += 1
+
+            except Exception as ex:
+
+                # reconnect on the next call
+                self.__proxies.pop(url, None)
+
+                with self.__cond:
+                    self.failed += 1
+
+                self.log.error("Unable to deliver callback to %s: %s",
+                               url, ex)
+
+            finally:
+
+                with self.__cond:
+                    self.__busy.discard(url)
+                    self.__cond.notify_all()
+
+    def to_dict(self):
+        """Return JSON-serializable representation of the object."""
+
+        with self.__cond:
+            return {'workers': self.workers,
+                    'max_pending': self.max_pending,
+                    'pending': len(self.__pending),
+                    'queued': self.queued,
+                    'coalesced': self.coalesced,
+                    'dropped': self.dropped,
+                    'delivered': self.delivered,
+                    'failed': self.failed}
@@ -42,7 +42,12 @@ from empower.core.account import ROLE_ADMIN
 from empower.core.account import ROLE_USER
 from empower.core.tenant import Tenant
 from empower.core.acl import ACL
+from empower.core.scheduler import TimerWheel
+from empower.core.callbacks import CallbackExecutor
+from empower.core.eventbus import EventBus
+from empower.core.moduleregistry import ModuleRegistry
 from empower.persistence.persistence import TblAllow
+from empower.persistence.persistence import TblTrafficRule
 from empower.core.tenant import T_TYPES
 
 import empower.logger
@@ -103,6 +108,24 @@ class EmpowerRuntime:
         self.vbses = {}
         self.datapaths = {}
         self.allowed = {}
+
+        # reverse indexes, kept in sync by the LVAP and VAP life-cycles
+        self.wtp_lvaps = {}
+        self.wtp_vaps = {}
+        self.block_lvaps = {}
+
+        # scheduler shared by all the periodic modules
+        self.scheduler = TimerWheel()
+
+        # executor delivering the remote module callbacks
+        self.callbacks = CallbackExecutor()
+
+        # tenant-scoped event bus used to notify the apps
+        self.events = EventBus()
+
+        # module workers and running modules, indexed for the lookups
+        self.modules = ModuleRegistry()
+
         self.log = empower.logger.get_logger()
 
         self.log.info("Starting EmPOWER Runtime")
@@ -115,6 +138,7 @@ class EmpowerRuntime:
         self.log.info("Loading EmPOWER Runtime defaults")
         self.__load_accounts()
         self.__load_tenants()
+        self.__load_traffic_rules()
         self.__load_acl()
 
         if options.ctrl_adv:
@@ -182,6 +206,19 @@ class EmpowerRuntime:
                        tenant.bssid_type,
                        tenant.plmn_id)
 
+    def __load_traffic_rules(self):
+        """Load the traffic rules of all the tenants."""
+
+        for rule in Session().query(TblTrafficRule).all():
+
+            if rule.tenant_id not in self.tenants:
+                continue
+
+            self.tenants[rule.tenant_id].cache_traffic_rule(rule.match,
+                                                            rule.dscp,
+                                                            rule.label,
+                                                            rule.priority)
+
     def __load_acl(self):
         """ Load ACL list. """
 
@@ -293,15 +330,16 @@ class EmpowerRuntime:
     def add_allowed(self, sta_addr, label=None):
         """ Add entry to ACL. """
 
-        allow = Session().query(TblAllow) \
-                         .filter(TblAllow.addr == sta_addr) \
-                         .first()
-        if allow:
+        if sta_addr in self.allowed:
             raise ValueError("Address already defined %s" % sta_addr)
 
-        session = Session()
-        session.add(TblAllow(addr=sta_addr, label=label))
-        session.commit()
+        try:
+            session = Session()
+            session.add(TblAllow(addr=sta_addr, label=label))
+            session.commit()
+        except IntegrityError:
+            session.rollback()
+            raise ValueError("Address already defined %s" % sta_addr)
 
         acl = ACL(sta_addr, label)
         self.allowed[sta_addr] = acl
@@ -311,14 +349,13 @@ class EmpowerRuntime:
     def remove_allowed(self, sta_addr):
         """ Remove entry from ACL. """
 
-        allow = Session().query(TblAllow) \
-                         .filter(TblAllow.addr == sta_addr) \
-                         .first()
-        if not allow:
+        if sta_addr not in self.allowed:
             raise KeyError("Address not found %s" % sta_addr)
 
         session = Session()
-        session.delete(allow)
+        session.query(TblAllow) \
+               .filter(TblAllow.addr == sta_addr) \
+               .delete()
         session.commit()
 
         del self.allowed[sta_addr]
@@ -361,14 +398,13 @@ class EmpowerRuntime:
         if username == 'root':
             raise ValueError("Cannot removed root account")
 
-        account = Session().query(TblAccount) \
-                           .filter(TblAccount.username == str(username)) \
-                           .first()
-        if not account:
+        if username not in self.accounts:
             raise KeyError(username)
 
         session = Session()
-        session.delete(account)
+        session.query(TblAccount) \
+               .filter(TblAccount.username == str(username)) \
+               .delete()
         session.commit()
 
         del self.accounts[username]
@@ -432,6 +468,8 @@ class EmpowerRuntime:
 
         app.stop()
 
+        self.events.unsubscribe_owner(app)
+
         del tenant.components[app_id]
 
     def unregister(self, name):
@@ -449,6 +487,8 @@ class EmpowerRuntime:
         for module_id in list(self.components[name].modules.keys()):
             self.components[name].remove_module(module_id)
 
+        self.modules.remove_worker(worker)
+
         del self.components[name]
 
     def get_account(self, username):
@@ -502,8 +542,12 @@ class EmpowerRuntime:
                                 bssid_type=bssid_type,
                                 plmn_id=plmn_id)
 
-        session.add(request)
-        session.commit()
+        try:
+            session.add(request)
+            session.commit()
+        except IntegrityError:
+            session.rollback()
+            raise ValueError("Tenant %s exists" % tenant_name)
 
         self.tenants[request.tenant_id] = \
             Tenant(request.tenant_id,
@@ -533,35 +577,36 @@ class EmpowerRuntime:
         for dscp in list(tenant.slices):
             tenant.del_slice(dscp)
 
+        # slices must be removed from the db before the tenant
+        tenant.flush_slices()
+
         # remove lvaps in this tenant
         for lvap_addr in list(tenant.lvaps):
             self.remove_lvap(lvap_addr)
 
+        # remove vaps in this tenant, keeping the per-WTP index in sync
+        for vap in list(tenant.vaps.values()):
+            self.remove_vap(vap)
+
         # remove tenant
         del self.tenants[tenant_id]
 
-        tenant = Session().query(TblTenant) \
-                          .filter(TblTenant.tenant_id == tenant_id) \
-                          .first()
+        # remove the event subscriptions of the tenant apps
+        self.events.unsubscribe_tenant(tenant_id)
 
+        # the traffic rules go away with the tenant
         session = Session()
-        session.delete(tenant)
+        session.query(TblTrafficRule) \
+               .filter(TblTrafficRule.tenant_id == tenant_id) \
+               .delete()
+        session.query(TblTenant) \
+               .filter(TblTenant.tenant_id == tenant_id) \
+               .delete()
         session.commit()
 
         # remove running modules
-        for component in self.components.values():
-
-            if not hasattr(component, 'modules'):
-                continue
-
-            to_be_removed = []
-
-            for module in component.modules.values():
-                if module.tenant_id == tenant_id:
-                    to_be_removed.append(module.module_id)
-
-            for module_id in to_be_removed:
-                component.remove_module(module_id)
+        for module in self.modules.modules(tenant_id):
+            module.unload()
 
     def load_tenant(self, tenant_name):
         """Load tenant from network name (SSID)."""
@@ -608,6 +653,86 @@ class EmpowerRuntime:
 
         del self.lvaps[lvap.addr]
 
+        # periodic modules would unload themselves at their next run anyway
+        from empower.core.module import ModulePeriodic
+
+        for module in self.modules.modules_by_entity('lvap', lvap.addr):
+            if isinstance(module, ModulePeriodic):
+                module.unload()
+
+    def update_lvap_index(self, lvap, old_blocks):
+        """Move an LVAP from its old blocks to its current blocks.
+
+        Must be called every time the blocks assigned to an LVAP change.
+        """
+
+        for block in old_blocks:
+
+            if block is None:
+                continue
+
+            if block in self.block_lvaps:
+                self.block_lvaps[block].pop(lvap.addr, None)
+                if not self.block_lvaps[block]:
+                    del self.block_lvaps[block]
+
+            wtp_addr = block.radio.addr
+
+            if wtp_addr in self.wtp_lvaps:
+                self.wtp_lvaps[wtp_addr].pop(lvap.addr, None)
+                if not self.wtp_lvaps[wtp_addr]:
+                    del self.wtp_lvaps[wtp_addr]
+
+        for block in lvap.blocks:
+
+            if block is None:
+                continue
+
+            self.block_lvaps.setdefault(block, {})[lvap.addr] = lvap
+            self.wtp_lvaps.setdefault(block.radio.addr, {})[lvap.addr] = lvap
+
+    def lvaps_by_wtp(self, wtp):
+        """Return the LVAPs having at least one block on the WTP."""
+
+        if wtp.addr not in self.wtp_lvaps:
+            return []
+
+        return list(self.wtp_lvaps[wtp.addr].values())
+
+    def lvaps_by_block(self, block):
+        """Return the LVAPs having the specified block."""
+
+        if block not in self.block_lvaps:
+            return []
+
+        return list(self.block_lvaps[block].values())
+
+    def add_vap(self, vap):
+        """Add VAP to its tenant."""
+
+        vap.tenant.vaps[vap.bssid] = vap
+        self.wtp_vaps.setdefault(vap.block.radio.addr, {})[vap.bssid] = vap
+
+    def remove_vap(self, vap):
+        """Remove VAP from its tenant."""
+
+        vap.tenant.vaps.pop(vap.bssid, None)
+
+        wtp_addr = vap.block.radio.addr
+
+        if wtp_addr in self.wtp_vaps:
+            self.wtp_vaps[wtp_addr].pop(vap.bssid, None)
+            if not self.wtp_vaps[wtp_addr]:
+                del self.wtp_vaps[wtp_addr]
+
+    def vaps_by_wtp(self, wtp):
+        """Return the VAPs hosted by the WTP."""
+
+        if wtp.addr not in self.wtp_vaps:
+            return []
+
+        return list(self.wtp_vaps[wtp.addr].values())
+
     def remove_ue(self, ue_id):
         """Remove UE from the network"""
 
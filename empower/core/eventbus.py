@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2018 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Tenant-scoped event bus."""
+
+import time
+import tornado.ioloop
+
+import empower.logger
+
+# Events raised when a WTP connects and disconnects
+EV_WTP_UP = "wtp_up"
+EV_WTP_DOWN = "wtp_down"
+
+
+class Subscription:
+    """An event subscription.
+
+    Attributes:
+        event: the event name (e.g. lvap_join)
+        handler: the function called when the event is raised
+        tenant_id: only events of this tenant are delivered (None for all)
+        wtp: only events raised on this WTP are delivered (None for all)
+        block: only events raised on this block are delivered (None for all)
+        deferred: if True, events are delivered in batch at the next IOLoop
+            iteration
+        owner: the object that created the subscription (e.g. an app)
+    """
+
+    def __init__(self, event, handler, tenant_id=None, wtp=None, block=None,
+                 deferred=False, owner=None):
+
+        self.event = event
+        self.handler = handler
+        self.tenant_id = tenant_id
+        self.wtp = wtp
+        self.block = block
+        self.deferred = deferred
+        self.owner = owner
+
+    def match(self, wtp, blocks):
+        """Return True if the event raised on wtp/blocks is of interest."""
+
+        if self.wtp is not None and self.wtp != wtp:
+            return False
+
+        if self.block is not None and self.block not in blocks:
+            return False
+
+        return True
+
+    def to_dict(self):
+        """Return JSON-serializable representation of the object."""
+
+        return {'event': self.event,
+                'tenant_id': self.tenant_id,
+                'wtp': self.wtp,
+                'block': self.block,
+                'deferred': self.deferred}
+
+
+class EventBus:
+    """Event bus.
+
+    Subscriptions are indexed by event and by tenant, so raising an event
+    only visits the subscribers of that event in the tenant (plus the
+    subscribers interested in every tenant). Events not bound to a tenant
+    (e.g. wtp_up) are delivered to the subscribers of every tenant.
+
+    Deferred subscriptions do not receive the events immediately. Events
+    are instead queued and delivered in a single batch at the next IOLoop
+    iteration, which keeps the IOLoop responsive during mass reconnects.
+
+    The time spent dispatching every event is accounted in the stats
+    attribute.
+
+    Attributes:
+        stats: per event counters (events raised, total and max dispatch
+            time in ms)
+    """
+
+    def __init__(self):
+
+        self.stats = {}
+
+        self.__subscriptions = {}
+        self.__deferred = []
+
+        self.log = empower.logger.get_logger()
+
+    def subscribe(self, event, handler, tenant_id=None, wtp=None, block=None,
+                  deferred=False, owner=None):
+        """Subscribe to an event. Return the subscription."""
+
+        subscription = Subscription(event, handler, tenant_id, wtp, block,
+                                    deferred, owner)
+
+        self.__subscriptions.setdefault(event, {}) \
+            .setdefault(tenant_id, []).append(subscription)
+
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Remove a subscription."""
+
+        tenants = self.__subscriptions.get(subscription.event, {})
+        subscriptions = tenants.get(subscription.tenant_id, [])
+
+        if subscription in subscriptions:
+            subscriptions.remove(subscription)
+
+        if not subscriptions:
+            tenants.pop(subscription.tenant_id, None)
+
+    def unsubscribe_owner(self, owner):
+        """Remove all the subscriptions of an owner."""
+
+        for subscription in self.subscriptions():
+            if subscription.owner is owner:
+                self.unsubscribe(subscription)
+
+    def unsubscribe_tenant(self, tenant_id):
+        """Remove all the subscriptions of a tenant."""
+
+        for tenants in self.__subscriptions.values():
+            tenants.pop(tenant_id, None)
+
+    def subscriptions(self, event=None):
+        """Return the subscriptions, optionally filtered by event."""
+
+        events = [event] if event else list(self.__subscriptions)
+
+        return [subscription
+                for name in events
+                for subscriptions in self.__subscriptions.get(name,
+                                                              {}).values()
+                for subscription in subscriptions]
+
+    def publish(self, event, *args, tenant_id=None, wtp=None, blocks=()):
+        """Raise an event.
+
+        Args:
+            event, the event name
+            args, the arguments passed to the handlers
+            tenant_id, the tenant the event belongs to (None for all)
+            wtp, the address of the WTP raising the event, if any
+            blocks, the blocks on which the event is raised, if any
+        """
+
+        tenants = self.__subscriptions.get(event)
+
+        if not tenants:
+            return
+
+        started = time.time()
+
+        if tenant_id is None:
+            targets = list(tenants.values())
+        else:
+            targets = [tenants.get(tenant_id, []), tenants.get(None, [])]
+
+        deferred = []
+
+        for subscriptions in targets:
+
+            # handlers may subscribe or unsubscribe while being called
+            for subscription in list(subscriptions):
+
+                if not subscription.match(wtp, blocks):
+                    continue
+
+                if subscription.deferred:
+                    deferred.append((subscription, args))
+                    continue
+
+                try:
+                    subscription.handler(*args)
+                except Exception as ex:
+                    self.log.exception(ex)
+
+        if deferred:
+            self.__defer(deferred)
+
+        self.__account(event, started)
+
+    def __defer(self, entries):
+
+        if not self.__deferred:
+            tornado.ioloop.IOLoop.current().add_callback(self.__flush)
+
+        self.__deferred.extend(entries)
+
+    def __flush(self):
+        """Deliver all the deferred events."""
+
+        started = time.time()
+
+        entries = self.__deferred
+        self.__deferred = []
+
+        for subscription, args in entries:
+            try:
+                subscription.handler(*args)
+            except Exception as ex:
+                self.log.exception(ex)
+
+        self.__account('deferred', started)
+
+    def __account(self, event, started):
+
+        elapsed = (time.time() - started) * 1000
+
+        if event not in self.stats:
+            self.stats[event] = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+
+        stats = self.stats[event]
+        stats['count'] += 1
+        stats['total_ms'] += elapsed
+        stats['max_ms'] = max(stats['max_ms'], elapsed)
+
+    def to_dict(self):
+        """Return JSON-serializable representation of the object."""
+
+        return {'subscriptions': len(self.subscriptions()),
+                'pending': len(self.__deferred),
+                'stats': self.stats}
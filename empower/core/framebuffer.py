@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2018 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Framing buffer for length-prefixed southbound protocols."""
+
+import struct
+
+# Maximum number of bytes requested from the socket in a single read
+READ_CHUNK = 65536
+
+# Initial size of the receive buffer
+DEFAULT_BUFSIZE = 4 * READ_CHUNK
+
+
+class FrameBuffer:
+    """Receive buffer splitting a byte stream into protocol messages.
+
+    Bytes read from the socket are copied once into a preallocated
+    bytearray. Complete messages are then returned as memoryview slices of
+    that buffer, so no per-message concatenation or copy takes place. A
+    view is only valid until the next call to feed().
+
+    Attributes:
+        length_fmt: struct format of the message length field
+        length_offset: offset of the length field within the header
+    """
+
+    def __init__(self, length_fmt, length_offset, size=DEFAULT_BUFSIZE):
+
+        self.__length = struct.Struct(length_fmt)
+        self.__length_offset = length_offset
+        self.__hdr_len = length_offset + self.__length.size
+        self.__buffer = bytearray(size)
+        self.__start = 0
+        self.__end = 0
+
+    def __len__(self):
+        return self.__end - self.__start
+
+    def feed(self, data):
+        """Append data read from the socket to the buffer."""
+
+        size = len(data)
+        pending = self.__end - self.__start
+
+        if self.__end + size > len(self.__buffer):
+
+            if pending + size > len(self.__buffer):
+
+                # not enough room, allocate a larger buffer. A new object is
+                # used since views handed out earlier may still be alive
+                new_size = len(self.__buffer)
+                while pending + size > new_size:
+                    new_size *= 2
+
+                buffer = bytearray(new_size)
+                buffer[0:pending] = self.__buffer[self.__start:self.__end]
+                self.__buffer = buffer
+
+            else:
+
+                # move the pending bytes at the beginning of the buffer
+                self.__buffer[0:pending] = \
+                    self.__buffer[self.__start:self.__end]
+
+            self.__start = 0
+            self.__end = pending
+
+        self.__buffer[self.__end:self.__end + size] = data
+        self.__end += size
+
+    def frames(self):
+        """Yield every complete message currently in the buffer."""
+
+        view = memoryview(self.__buffer)
+        unpack_from = self.__length.unpack_from
+
+        while self.__end - self.__start >= self.__hdr_len:
+
+            length = unpack_from(self.__buffer,
+                                 self.__start + self.__length_offset)[0]
+
+            if length < self.__hdr_len:
+                raise ValueError("Invalid message length %u" % length)
+
+            if self.__end - self.__start < length:
+                break
+
+            frame = view[self.__start:self.__start + length]
+            self.__start += length
+
+            yield frame
+
+        if self.__start == self.__end:
+            self.__start = 0
+            self.__end = 0
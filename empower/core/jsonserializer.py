@@ -41,30 +41,95 @@ class IterEncoder(json.JSONEncoder):
             return super().default(obj)
 
 
+def _to_str(obj):
+    return str(obj)
+
+
+def _to_name(obj):
+    return obj.__name__
+
+
+def _to_dict(obj):
+    return obj.to_dict()
+
+
+def _to_isoformat(obj):
+    return obj.isoformat()
+
+
+def _to_list(obj):
+    return list(obj)
+
+
+# Encoders by type, subclasses use the encoder of the closest base class
+ENCODERS = {types.FunctionType: _to_name,
+            types.MethodType: _to_name,
+            uuid.UUID: _to_str,
+            ipaddress.IPv4Address: _to_str,
+            empower.datatypes.dscp.DSCP: _to_str,
+            empower.datatypes.ssid.SSID: _to_str,
+            empower.datatypes.plmnid.PLMNID: _to_str,
+            empower.datatypes.etheraddress.EtherAddress: _to_str,
+            empower.datatypes.dpid.DPID: _to_str,
+            empower.datatypes.match.Match: _to_str}
+
+# Encoders resolved for every concrete type met so far
+_RESOLVED = {}
+
+
+def register_encoder(cls, encoder):
+    """Register the function used to encode the instances of cls."""
+
+    ENCODERS[cls] = encoder
+    _RESOLVED.clear()
+
+
+def _resolve(cls):
+    """Return the encoder of a type, None if the type is not supported."""
+
+    for base in cls.__mro__:
+        if base in ENCODERS:
+            return ENCODERS[base]
+
+    if hasattr(cls, 'to_dict'):
+        return _to_dict
+
+    if hasattr(cls, 'isoformat'):
+        return _to_isoformat
+
+    if hasattr(cls, '__iter__'):
+        return _to_list
+
+    return None
+
+
 class EmpowerEncoder(IterEncoder):
-    """Handle the representation of the EmPOWER datatypes in JSON format."""
+    """Handle the representation of the EmPOWER datatypes in JSON format.
+
+    The encoder is looked up by type in a dispatch table, the lookup is done
+    once for every concrete type.
+    """
 
     def default(self, obj):
 
-        if isinstance(obj, (types.FunctionType, types.MethodType)):
-            return obj.__name__
+        cls = obj.__class__
+
+        try:
+            encoder = _RESOLVED[cls]
+        except KeyError:
+            encoder = _RESOLVED[cls] = _resolve(cls)
+
+        if encoder is None:
+            return super().default(obj)
 
-        instances = (uuid.UUID,
-                     ipaddress.IPv4Address,
-                     empower.datatypes.dscp.DSCP,
-                     empower.datatypes.ssid.SSID,
-                     empower.datatypes.plmnid.PLMNID,
-                     empower.datatypes.etheraddress.EtherAddress,
-                     empower.datatypes.dpid.DPID,
-                     empower.datatypes.match.Match)
+        return encoder(obj)
 
-        if isinstance(obj, instances):
-            return str(obj)
 
-        if hasattr(obj, 'to_dict'):
-            return obj.to_dict()
+def dumps(value, pretty=False):
+    """Serialize a value, compact unless pretty is True."""
 
-        if hasattr(obj, 'isoformat'):
-            return obj.isoformat()
+    if pretty:
+        return json.dumps(value, sort_keys=True, indent=4,
+                          cls=EmpowerEncoder)
 
-        return super().default(obj)
+    return json.dumps(value, separators=(',', ':'), cls=EmpowerEncoder)
@@ -23,6 +23,7 @@ from empower.core.resourcepool import ResourceBlock
 from empower.core.resourcepool import BANDS
 from empower.core.resourcepool import BT_HT20
 from empower.core.tenant import T_TYPE_SHARED
+from empower.core.versioned import Versioned
 from empower.datatypes.etheraddress import EtherAddress
 from empower.datatypes.ssid import SSID
 
@@ -38,7 +39,7 @@ PROCESS_RUNNING = "running"
 PROCESS_REMOVING = "removing"
 
 
-class LVAP:
+class LVAP(Versioned):
     """ The EmPOWER Light Virtual Access Point
 
     One LVAP is created for every station probing the network (unless the MAC
@@ -245,6 +246,13 @@ class LVAP:
         # set uplink blocks
         self.__assign_uplink(self.target_blocks[1:])
 
+    def __update_index(self, old_blocks):
+        """Update the runtime indexes after a change of blocks."""
+
+        from empower.main import RUNTIME
+
+        RUNTIME.update_lvap_index(self, old_blocks)
+
     def _removing_spawning(self):
 
         # set new state
@@ -297,8 +305,10 @@ class LVAP:
             self.pending.append(xid)
 
         # reset uplink and downlink
+        old_blocks = self.blocks
         self._downlink = None
         self._uplink = []
+        self.__update_index(old_blocks)
 
     def _running_running(self):
 
@@ -497,7 +507,9 @@ class LVAP:
         dl_block.radio.connection.send_add_lvap(self, dl_block, True)
 
         # save block
+        old_blocks = self.blocks
         self._downlink = dl_block
+        self.__update_index(old_blocks)
 
     def __assign_uplink(self, ul_blocks):
         """Set the downlink blocks."""
@@ -508,7 +520,9 @@ class LVAP:
             block.radio.connection.send_add_lvap(self, block, False)
 
             # save block into the list
+            old_blocks = self.blocks
             self._uplink.append(block)
+            self.__update_index(old_blocks)
 
     @property
     def wtp(self):
@@ -536,8 +550,22 @@ class LVAP:
         for block in self.blocks:
             block.radio.connection.send_del_lvap(self.addr)
 
+        old_blocks = self.blocks
         self._downlink = None
         self._uplink = []
+        self.__update_index(old_blocks)
+
+    def etag_key(self):
+        """Return the versions the representation depends on."""
+
+        key = (self.version,)
+
+        # the blocks (and the WTP) are embedded in the representation
+        for block in self.blocks:
+            if block:
+                key += block.radio.etag_key()
+
+        return key
 
     def to_dict(self):
         """ Return a JSON-serializable dictionary representing the LVAP """
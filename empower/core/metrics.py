@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2018 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Per-tenant metrics store."""
+
+import types
+
+import empower.logger
+
+from empower.core.rollingwindow import RollingWindow
+from empower.core.rollingwindow import DEFAULT_WINDOW
+
+
+class MetricsStore:
+    """In-memory store of the metrics produced by the apps of a tenant.
+
+    Series are keyed by (entity, metric), where entity is a typed key such
+    as a WTP address or a (WTP address, DSCP) tuple. A series is either a
+    RollingWindow or a plain value. Readers get the stored objects, not
+    copies, so they must treat them as read-only.
+
+    Every update increments the version of the store and sets the version
+    of the series to it, so that a series never gets a version it had
+    before, even if it is removed and added again. A reader can therefore
+    skip its computation if the versions of the series it reads did not
+    change since its last run. Handlers can also subscribe to a metric in
+    order to be notified of every update.
+
+    Attributes:
+        version: incremented on every update of any series
+    """
+
+    def __init__(self):
+
+        self.version = 0
+
+        self.__series = {}
+        self.__versions = {}
+        self.__metrics = {}
+        self.__subscribers = {}
+
+        self.log = empower.logger.get_logger()
+
+    def __contains__(self, key):
+        return key in self.__series
+
+    def window(self, entity, metric, size=DEFAULT_WINDOW):
+        """Return the window of a series, creating it if needed."""
+
+        key = (entity, metric)
+
+        if key not in self.__series:
+            self.__insert(entity, metric, RollingWindow(size))
+
+        return self.__series[key]
+
+    def add(self, entity, metric, value):
+        """Add a sample to a windowed series. Return the window."""
+
+        window = self.window(entity, metric)
+        window.add(value)
+
+        self.__touch(entity, metric, window)
+
+        return window
+
+    def set(self, entity, metric, value):
+        """Set the value of a plain series."""
+
+        key = (entity, metric)
+
+        if key in self.__series:
+            self.__series[key] = value
+            self.__metrics[metric][entity] = value
+        else:
+            self.__insert(entity, metric, value)
+
+        self.__touch(entity, metric, value)
+
+    def get(self, entity, metric, default=None):
+        """Return a series (a window or a value)."""
+
+        return self.__series.get((entity, metric), default)
+
+    def get_version(self, entity, metric):
+        """Return the version of a series (0 if it does not exist)."""
+
+        return self.__versions.get((entity, metric), 0)
+
+    def get_versions(self, metric):
+        """Return the versions of all the series of a metric, as a tuple."""
+
+        return tuple(self.__versions[(entity, metric)]
+                     for entity in self.__metrics.get(metric, ()))
+
+    def entities(self, metric):
+        """Return a read-only live view {entity: series} of a metric."""
+
+        if metric not in self.__metrics:
+            self.__metrics[metric] = {}
+
+        return types.MappingProxyType(self.__metrics[metric])
+
+    def remove(self, entity):
+        """Remove all the series of an entity."""
+
+        for metric, entities in self.__metrics.items():
+            if entity in entities:
+                del entities[entity]
+                del self.__series[(entity, metric)]
+                del self.__versions[(entity, metric)]
+
+        self.version += 1
+
+    def subscribe(self, metric, handler):
+        """Call handler(entity, metric, series) on every update of metric."""
+
+        self.__subscribers.setdefault(metric, []).append(handler)
+
+    def unsubscribe(self, metric, handler):
+        """Remove a subscription."""
+
+        if handler in self.__subscribers.get(metric, []):
+            self.__subscribers[metric].remove(handler)
+
+    def __insert(self, entity, metric, series):
+
+        self.__series[(entity, metric)] = series
+        self.__versions[(entity, metric)] = 0
+        self.__metrics.setdefault(metric, {})[entity] = series
+
+    def __touch(self, entity, metric, series):
+
+        self.version += 1
+        self.__versions[(entity, metric)] = self.version
+
+        for handler in self.__subscribers.get(metric, []):
+            try:
+                handler(entity, metric, series)
+            except Exception as ex:
+                self.log.exception(ex)
+
+    def to_dict(self):
+        """Return JSON-serializable representation of the object."""
+
+        return {'version': self.version,
+                'metrics': {metric: len(entities)
+                            for metric, entities in self.__metrics.items()}}
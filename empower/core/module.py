@@ -19,48 +19,33 @@
 
 import json
 import types
-import xmlrpc.client
-
-from multiprocessing.pool import ThreadPool
-
-import tornado.web
-import tornado.httpserver
-
-from tornado.ioloop import IOLoop
 
 import empower.logger
 
 from empower.core.jsonserializer import EmpowerEncoder
+from empower.core.versioned import Versioned
 from empower.main import RUNTIME
 
+# raised with the module every time the module has a new result
+EV_MODULE_RESULT = "module_result"
 
-_WORKERS = ThreadPool(10)
-
-
-def exec_xmlrpc(callback, args=()):
-    """Execute XML-RPC call."""
 
-    proxy = xmlrpc.client.ServerProxy(callback[0])
-    func = getattr(proxy, callback[1])
-    run_background(func, on_complete, args)
+def freeze(value):
+    """Return a hashable version of a module parameter."""
 
+    if isinstance(value, dict):
+        return frozenset((k, freeze(v)) for k, v in value.items())
 
-def run_background(func, callback, args=(), kwds=None):
-    """Run callback in background."""
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
 
-    def _callback(result):
-        IOLoop.instance().add_callback(lambda: callback(result))
+    if isinstance(value, set):
+        return frozenset(freeze(v) for v in value)
 
-    _WORKERS.apply_async(func, args, kwds, _callback)
+    return value
 
 
-def on_complete(_):
-    """XML RPC Callback."""
-
-    pass
-
-
-class Module:
+class Module(Versioned):
     """Module object.
 
     Attributes:
@@ -99,6 +84,9 @@ class Module:
             None
         """
 
+        RUNTIME.events.publish(EV_MODULE_RESULT, self,
+                               tenant_id=self.tenant_id)
+
         # call callback if defined
         if not self.callback:
             return
@@ -107,16 +95,18 @@ class Module:
 
         try:
 
-            as_dict = serializable.to_dict()
-            as_json = json.dumps(as_dict, cls=EmpowerEncoder)
-
             if isinstance(callback, (types.FunctionType, types.MethodType)):
 
                 callback(serializable)
 
             elif isinstance(callback, list) and len(callback) == 2:
 
-                exec_xmlrpc(callback, (as_json, ))
+                # the result is encoded here since the module state keeps
+                # changing on the IOLoop, the delivery takes place off it
+                key = (self.tenant_id, self.module_type, self.module_id)
+                as_json = json.dumps(serializable.to_dict(),
+                                     cls=EmpowerEncoder)
+                RUNTIME.callbacks.submit(callback, key, as_json)
 
             else:
 
@@ -205,14 +195,36 @@ class Module:
 
         return out
 
+    def etag_key(self):
+        """Return the versions the representation depends on."""
+
+        key = (self.version,)
+
+        # modules bound to a block embed it in their representation
+        radio = getattr(getattr(self, 'block', None), 'radio', None)
+
+        if isinstance(radio, Versioned):
+            key += radio.etag_key()
+
+        return key
+
+    @property
+    def key(self):
+        """Return the identity key of this module.
+
+        Two modules with the same key are equivalent. Subclasses extend the
+        key with their own parameters.
+        """
+
+        return (self.module_type, self.tenant_id)
+
     def __hash__(self):
         return hash(str(self.tenant_id) + str(self.module_id))
 
     def __eq__(self, other):
 
         if isinstance(other, Module):
-            return self.module_type == other.module_type and \
-                self.tenant_id == other.tenant_id
+            return freeze(self.key) == freeze(other.key)
 
         return False
 
@@ -266,9 +278,7 @@ class ModulePeriodic(Module):
             self.run_once()
             return
 
-        self.__periodic = \
-            tornado.ioloop.PeriodicCallback(self.run_once, self.every)
-        self.__periodic.start()
+        RUNTIME.scheduler.add(self)
 
     def stop(self):
         """Stop worker."""
@@ -276,7 +286,17 @@ class ModulePeriodic(Module):
         if self.every == -1:
             return
 
-        self.__periodic.stop()
+        RUNTIME.scheduler.remove(self)
+
+    @property
+    def phase_group(self):
+        """Return the phase group of this module, None if not grouped.
+
+        The scheduler runs the modules of the same group and period in the
+        same tick.
+        """
+
+        return None
 
     def to_dict(self):
         """Return JSON-serializable representation of the object."""
@@ -289,14 +309,11 @@ class ModulePeriodic(Module):
 
         return out
 
-    def __eq__(self, other):
+    @property
+    def key(self):
+        """Return the identity key of this module."""
 
-        if isinstance(other, Module):
-            return self.module_type == other.module_type and \
-                self.tenant_id == other.tenant_id and \
-                self.every == other.every
-
-        return False
+        return super().key + (self.every,)
 
 
 class ModuleWorker:
@@ -306,12 +323,15 @@ class ModuleWorker:
 
     Attributes:
         modules: dictionary of modules currently active in this tenant
+        modules_by_key: dictionary of the same modules indexed by their key
     """
 
     def __init__(self, server, module, pt_type, pt_packet):
 
         self.__module_id = 0
+        self.__keys = {}
         self.modules = {}
+        self.modules_by_key = {}
         self.module = module
 
         self.pt_type = pt_type
@@ -322,7 +342,10 @@ class ModuleWorker:
                                           self.pt_packet,
                                           self.handle_packet)
 
+        RUNTIME.modules.add_worker(self)
+
         self.log = empower.logger.get_logger()
+        self.trace = empower.logger.get_trace_logger(more_frames=1)
 
     @property
     def module_id(self):
@@ -366,10 +389,11 @@ class ModuleWorker:
             setattr(module, arg, kwargs[arg])
 
         # check if an equivalent module has already been defined in the tenant
-        for val in self.modules.values():
-            # if so return a reference to that trigger
-            if val == module:
-                return val
+        key = freeze(module.key)
+
+        # if so return a reference to that trigger
+        if key in self.modules_by_key:
+            return self.modules_by_key[key]
 
         # otherwise generate a new module id
         module.module_id = self.module_id
@@ -377,8 +401,12 @@ class ModuleWorker:
         # set worker
         module.worker = self
 
-        # add to dict
+        # add to dicts, the key is saved since module parameters may change
         self.modules[module.module_id] = module
+        self.modules_by_key[key] = module
+        self.__keys[module.module_id] = key
+
+        RUNTIME.modules.add_module(module)
 
         # start module
         self.modules[module.module_id].start()
@@ -410,6 +438,20 @@ class ModuleWorker:
         module.stop()
 
         del self.modules[module_id]
+        del self.modules_by_key[self.__keys.pop(module_id)]
+
+        RUNTIME.modules.remove_module(module)
+
+    def run_modules(self, modules):
+        """Run the periodic modules that are due in the current tick.
+
+        Called by the runtime scheduler with all the modules of this worker
+        that are due at the same time. Workers can override this method in
+        order to batch the modules.
+        """
+
+        for module in modules:
+            module.run_once()
 
     def handle_packet(self, pnfdev, message):
         """Handle response message."""
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2018 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Index of the module workers and of the running modules."""
+
+# The attributes naming the entity monitored by a module
+ENTITIES = ['lvap', 'block', 'cell', 'ue', 'lvnf']
+
+
+class ModuleRegistry:
+    """Module registry.
+
+    Workers are indexed by module name. Modules are indexed by tenant and
+    module type, and by the entity they monitor (e.g. the LVAP address for
+    lvap_stats), so that the lookups cost as much as the number of modules
+    returned.
+
+    Attributes:
+        workers: the module workers indexed by module name
+    """
+
+    def __init__(self):
+
+        self.workers = {}
+
+        # tenant_id -> module_type -> module_id -> module
+        self.__by_tenant = {}
+
+        # (entity, value) -> (module_type, module_id) -> module
+        self.__by_entity = {}
+
+    def add_worker(self, worker):
+        """Add a module worker."""
+
+        self.workers[worker.module.MODULE_NAME] = worker
+
+    def remove_worker(self, worker):
+        """Remove a module worker."""
+
+        name = worker.module.MODULE_NAME
+
+        if self.workers.get(name) is worker:
+            del self.workers[name]
+
+    def get_worker(self, module_name):
+        """Return the worker of a module name, None if not found."""
+
+        return self.workers.get(module_name)
+
+    @classmethod
+    def __entities(cls, module):
+
+        for entity in ENTITIES:
+
+            value = getattr(module, entity, None)
+
+            if value is not None:
+                yield (entity, value)
+
+    def add_module(self, module):
+        """Add a module."""
+
+        self.__by_tenant.setdefault(module.tenant_id, {}) \
+            .setdefault(module.module_type, {})[module.module_id] = module
+
+        for key in self.__entities(module):
+            modules = self.__by_entity.setdefault(key, {})
+            modules[(module.module_type, module.module_id)] = module
+
+    def remove_module(self, module):
+        """Remove a module."""
+
+        types = self.__by_tenant.get(module.tenant_id, {})
+        modules = types.get(module.module_type, {})
+        modules.pop(module.module_id, None)
+
+        if not modules:
+            types.pop(module.module_type, None)
+
+        if not types:
+            self.__by_tenant.pop(module.tenant_id, None)
+
+        for key in self.__entities(module):
+
+            modules = self.__by_entity.get(key, {})
+            modules.pop((module.module_type, module.module_id), None)
+
+            if not modules:
+                self.__by_entity.pop(key, None)
+
+    def get_module(self, tenant_id, module_type, module_id):
+        """Return a module of a tenant.
+
+        Raises:
+            KeyError, if the module is not found
+        """
+
+        return self.__by_tenant[tenant_id][module_type][module_id]
+
+    def modules(self, tenant_id, module_type=None):
+        """Return the modules of a tenant, optionally filtered by type.
+
+        Modules of the same type are sorted by module id.
+        """
+
+        types = self.__by_tenant.get(tenant_id, {})
+
+        if module_type:
+            return list(types.get(module_type, {}).values())
+
+        return [module for modules in types.values()
+                for module in modules.values()]
+
+    def modules_by_entity(self, entity, value):
+        """Return the modules monitoring an entity (e.g. lvap, addr)."""
+
+        return list(self.__by_entity.get((entity, value), {}).values())
+
+    def to_dict(self):
+        """Return JSON-serializable representation of the object."""
+
+        return {'workers': sorted(self.workers),
+                'tenants': {str(tenant_id): {module_type: len(modules)
+                                             for module_type, modules
+                                             in types.items()}
+                            for tenant_id, types
+                            in self.__by_tenant.items()}}
@@ -152,6 +152,13 @@ class PNFPServer:
 
         slices = Session().query(TblSlice).all()
 
+        # fetch all the memberships at once rather than one query per slice
+        belongs_by_slice = {}
+
+        for belong in Session().query(TblSliceBelongs).all():
+            belongs_by_slice.setdefault((belong.tenant_id, belong.dscp),
+                                        []).append(belong)
+
         for slc in slices:
 
             tenant = RUNTIME.tenants[slc.tenant_id]
@@ -167,11 +174,7 @@ class PNFPServer:
 
             t_slice = tenant.slices[slc.dscp]
 
-            belongs = \
-                Session().query(TblSliceBelongs) \
-                         .filter(TblSliceBelongs.dscp == slc.dscp) \
-                         .filter(TblSliceBelongs.tenant_id == slc.tenant_id) \
-                         .all()
+            belongs = belongs_by_slice.get((slc.tenant_id, slc.dscp), [])
 
             for belong in belongs:
 
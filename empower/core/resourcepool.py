@@ -169,6 +169,14 @@ class ResourceBlock:
 
         self._radio = radio
 
+    @property
+    def lvaps(self):
+        """ Return the LVAPs having this block. """
+
+        from empower.main import RUNTIME
+
+        return RUNTIME.lvaps_by_block(self)
+
     @property
     def supports(self):
         """ Return the list of supported MCS. """
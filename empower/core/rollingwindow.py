@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2018 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Rolling window statistics."""
+
+import array
+import bisect
+import math
+
+DEFAULT_WINDOW = 10
+
+
+class RollingWindow:
+    """Fixed-size window of samples with incremental statistics.
+
+    Samples are stored in a preallocated array used as a ring buffer. Mean
+    and variance are updated in O(1) on every sample (Welford's algorithm
+    extended to the removal of the evicted sample), while a sorted copy of
+    the window is kept for the median.
+
+    Mean, median, and stdev are None until at least two samples have been
+    added, matching the statistics module requirements for stdev.
+
+    Attributes:
+        size: the maximum number of samples in the window
+    """
+
+    __slots__ = ('size', '__samples', '__sorted', '__head', '__count',
+                 '__mean', '__m2')
+
+    def __init__(self, size=DEFAULT_WINDOW):
+
+        if size < 1:
+            raise ValueError("Invalid window size %s" % size)
+
+        self.size = size
+
+        self.__samples = array.array('d', bytes(8 * size))
+        self.__sorted = []
+        self.__head = 0
+        self.__count = 0
+        self.__mean = 0.0
+        self.__m2 = 0.0
+
+    def __len__(self):
+        return self.__count
+
+    def add(self, value):
+        """Add a new sample, evicting the oldest one if the window is full."""
+
+        value = float(value)
+
+        if self.__count < self.size:
+
+            self.__count += 1
+            delta = value - self.__mean
+            self.__mean += delta / self.__count
+            self.__m2 += delta * (value - self.__mean)
+
+        else:
+
+            old = self.__samples[self.__head]
+            mean = self.__mean
+            self.__mean += (value - old) / self.__count
+            self.__m2 += (value - old) * (value - self.__mean + old - mean)
+
+            del self.__sorted[bisect.bisect_left(self.__sorted, old)]
+
+        self.__samples[self.__head] = value
+        self.__head = (self.__head + 1) % self.size
+
+        bisect.insort(self.__sorted, value)
+
+    @property
+    def values(self):
+        """Return the samples from the oldest to the newest."""
+
+        if self.__count < self.size:
+            return self.__samples[0:self.__count].tolist()
+
+        return self.__samples[self.__head:].tolist() + \
+            self.__samples[0:self.__head].tolist()
+
+    @property
+    def last(self):
+        """Return the newest sample or None if the window is empty."""
+
+        if not self.__count:
+            return None
+
+        return self.__samples[self.__head - 1]
+
+    @property
+    def mean(self):
+        """Return the mean of the window."""
+
+        if self.__count < 2:
+            return None
+
+        return self.__mean
+
+    @property
+    def median(self):
+        """Return the median of the window."""
+
+        if self.__count < 2:
+            return None
+
+        middle = self.__count // 2
+
+        if self.__count % 2:
+            return self.__sorted[middle]
+
+        return (self.__sorted[middle - 1] + self.__sorted[middle]) / 2
+
+    @property
+    def stdev(self):
+        """Return the sample standard deviation of the window."""
+
+        if self.__count < 2:
+            return None
+
+        return math.sqrt(max(self.__m2, 0.0) / (self.__count - 1))
+
+    def to_dict(self):
+        """Return JSON-serializable representation of the object."""
+
+        return {'values': self.values,
+                'mean': self.mean,
+                'median': self.median,
+                'stdev': self.stdev}
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2018 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Timer wheel scheduler for periodic modules."""
+
+import time
+import tornado.ioloop
+
+import empower.logger
+
+DEFAULT_TICK_MS = 100
+DEFAULT_WHEEL_SIZE = 512
+
+
+class TimerWheel:
+    """Timer wheel scheduler.
+
+    Periodic modules are not scheduled with a PeriodicCallback each.
+    Instead they are stored in a hashed timing wheel driven by a single
+    PeriodicCallback firing every tick. Periods longer than the wheel are
+    handled by storing the absolute deadline of each entry and skipping it
+    until the wheel has turned enough times.
+
+    Modules sharing the same period are spread over the period (one phase
+    per tick) in order to avoid firing all of them at once. Modules in the
+    same phase group (e.g. the bin counters of the LVAPs of a WTP) share
+    the phase instead, so that they are due in the same tick. The group of
+    a module is read again every time it is due, so a module whose group
+    changes (e.g. after a handover of its LVAP) moves to the phase of the
+    new group. On every tick the due modules are grouped by worker and
+    handed to the worker run_modules() method, so that a worker can batch
+    its modules.
+
+    Attributes:
+        tick_ms: the wheel resolution in ms
+        ticks: the number of ticks processed so far
+        last_lag: delay (ms) of the last tick with respect to its deadline
+        max_lag: largest delay (ms) observed so far
+        overruns: number of ticks whose processing took longer than tick_ms
+        last_duration: processing time (ms) of the last tick
+    """
+
+    def __init__(self, tick_ms=DEFAULT_TICK_MS,
+                 wheel_size=DEFAULT_WHEEL_SIZE):
+
+        self.tick_ms = tick_ms
+        self.wheel_size = wheel_size
+        self.ticks = 0
+        self.last_lag = 0
+        self.max_lag = 0
+        self.overruns = 0
+        self.last_duration = 0
+
+        self.__wheel = [[] for _ in range(wheel_size)]
+        self.__entries = {}
+        self.__phases = {}
+        self.__groups = {}
+        self.__start = None
+        self.__periodic = None
+
+        self.log = empower.logger.get_logger()
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __now(self):
+        """Return the current tick."""
+
+        return int((time.time() - self.__start) * 1000 / self.tick_ms)
+
+    def __schedule(self, entry, deadline):
+
+        entry[2] = deadline
+        self.__wheel[deadline % self.wheel_size].append(entry)
+
+    def add(self, module):
+        """Schedule a periodic module."""
+
+        if self.__periodic is None:
+            self.__start = time.time()
+            self.__periodic = \
+                tornado.ioloop.PeriodicCallback(self.__tick, self.tick_ms)
+            self.__periodic.start()
+
+        period = max(1, int(round(module.every / self.tick_ms)))
+        group = self.__group(module, period)
+
+        # [module, period in ticks, deadline, active, phase group]
+        entry = [module, period, 0, True, group]
+        self.__entries[id(module)] = entry
+        self.__schedule(entry, self.__join(group, period))
+
+    def remove(self, module):
+        """Remove a periodic module. Entries are purged lazily."""
+
+        entry = self.__entries.pop(id(module), None)
+
+        if not entry:
+            return
+
+        entry[3] = False
+
+        self.__leave(entry[4])
+
+    @classmethod
+    def __group(cls, module, period):
+        """Return the phase group of a module (None if it has none)."""
+
+        group = module.phase_group
+
+        return (period, group) if group is not None else None
+
+    def __join(self, group, period):
+        """Add a module to a phase group. Return its first deadline."""
+
+        if group in self.__groups:
+
+            # first deadline after now aligned with the group
+            anchor = self.__groups[group]
+            anchor[1] += 1
+
+            return anchor[0] + \
+                ((self.ticks - anchor[0]) // period + 1) * period
+
+        # spread modules with the same period over the period
+        phase = self.__phases.get(period, 0)
+        self.__phases[period] = (phase + 1) % period
+        deadline = self.ticks + phase + 1
+
+        # [deadline of the first module, modules in the group]
+        if group is not None:
+            self.__groups[group] = [deadline, 1]
+
+        return deadline
+
+    def __leave(self, group):
+        """Remove a module from a phase group."""
+
+        if group not in self.__groups:
+            return
+
+        anchor = self.__groups[group]
+        anchor[1] -= 1
+
+        if not anchor[1]:
+            del self.__groups[group]
+
+    def __tick(self):
+
+        started = time.time()
+        now = self.__now()
+
+        if self.ticks >= now:
+            return
+
+        # the lag is the one of the oldest tick being processed
+        deadline = self.__start + (self.ticks + 1) * self.tick_ms / 1000
+        self.last_lag = max(0, int((started - deadline) * 1000))
+        self.max_lag = max(self.max_lag, self.last_lag)
+
+        # if the IOLoop has been blocked several ticks are due at once:
+        # every module due in any of them runs only once
+        due = {}
+
+        while self.ticks < now:
+            self.ticks += 1
+            self.__collect_slot(self.ticks, now, due)
+
+        self.__run(due.values())
+
+        self.last_duration = int((time.time() - started) * 1000)
+
+        if self.last_duration > self.tick_ms:
+            self.overruns += 1
+            self.log.warning("Scheduler tick took %ums (lag %ums)",
+                             self.last_duration, self.last_lag)
+
+    def __collect_slot(self, tick, now, due):
+        """Move the entries due at tick to due and reschedule them."""
+
+        slot = self.__wheel[tick % self.wheel_size]
+        self.__wheel[tick % self.wheel_size] = []
+
+        for entry in slot:
+
+            if not entry[3]:
+                continue
+
+            if entry[2] > tick:
+                self.__wheel[tick % self.wheel_size].append(entry)
+                continue
+
+            due[id(entry)] = entry
+
+            # the module changed group, move it to the phase of the group
+            group = self.__group(entry[0], entry[1])
+
+            if group != entry[4]:
+                self.__leave(entry[4])
+                entry[4] = group
+                self.__schedule(entry, self.__join(group, entry[1]))
+                continue
+
+            # skip the periods missed, keeping the phase of the entry
+            missed = (now - entry[2]) // entry[1]
+            self.__schedule(entry, entry[2] + (missed + 1) * entry[1])
+
+    def __run(self, entries):
+        """Run the due modules, grouped by worker."""
+
+        due = {}
+
+        for entry in entries:
+            module = entry[0]
+            due.setdefault(module.worker, []).append(module)
+
+        for worker, modules in due.items():
+            try:
+                worker.run_modules(modules)
+            except Exception as ex:
+                self.log.exception(ex)
+
+    def to_dict(self):
+        """Return JSON-serializable representation of the object."""
+
+        return {'tick_ms': self.tick_ms,
+                'modules': len(self.__entries),
+                'groups': len(self.__groups),
+                'ticks': self.ticks,
+                'last_lag': self.last_lag,
+                'max_lag': self.max_lag,
+                'last_duration': self.last_duration,
+                'overruns': self.overruns}
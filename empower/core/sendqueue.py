@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2018 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Outbound message queue for southbound connections."""
+
+import collections
+
+import tornado.ioloop
+
+from tornado.iostream import StreamClosedError
+
+# Pending bytes above which poll requests are shed
+DEFAULT_MAX_PENDING = 256 * 1024
+
+
+class SendQueue:
+    """Send queue coalescing the messages sent to a node.
+
+    Messages are appended to a buffer and written to the stream with a
+    single write at the next IOLoop iteration. Two kinds of messages are
+    supported:
+
+    * control messages (e.g. ADD_LVAP, DEL_LVAP, SET_SLICE) are always
+      sent, in the order in which they have been queued
+    * poll requests, which are sent after the control messages. A poll
+      request replaces the queued one with the same key (e.g. the module
+      id), and is dropped if more than max_pending bytes are pending.
+
+    Pending bytes are the queued bytes plus the bytes written to the stream
+    and not yet delivered to the socket.
+
+    Attributes:
+        max_pending: pending bytes above which poll requests are shed
+        high_water: the maximum number of pending bytes observed
+    """
+
+    def __init__(self, stream, max_pending=DEFAULT_MAX_PENDING):
+
+        self.max_pending = max_pending
+        self.high_water = 0
+
+        # counters
+        self.messages = 0
+        self.polls = 0
+        self.merged = 0
+        self.shed = 0
+        self.writes = 0
+        self.bytes = 0
+
+        self.__stream = stream
+        self.__ioloop = tornado.ioloop.IOLoop.current()
+        self.__control = bytearray()
+        self.__polls = collections.OrderedDict()
+        self.__polls_size = 0
+        self.__inflight = 0
+        self.__scheduled = False
+
+    @property
+    def pending(self):
+        """Return the number of pending bytes."""
+
+        return len(self.__control) + self.__polls_size + self.__inflight
+
+    def put(self, data):
+        """Queue a control message."""
+
+        self.__control += data
+        self.messages += 1
+
+        self.__schedule()
+
+    def put_poll(self, data, key):
+        """Queue a poll request. Return False if the request was shed."""
+
+        if key in self.__polls:
+            self.__polls_size -= len(self.__polls[key])
+            self.__polls[key] = data
+            self.__polls_size += len(data)
+            self.merged += 1
+            return True
+
+        if self.pending >= self.max_pending:
+            self.shed += 1
+            return False
+
+        self.__polls[key] = data
+        self.__polls_size += len(data)
+        self.polls += 1
+
+        self.__schedule()
+
+        return True
+
+    def clear(self):
+        """Drop all the queued messages."""
+
+        self.__control = bytearray()
+        self.__polls.clear()
+        self.__polls_size = 0
+
+    def __schedule(self):
+
+        self.high_water = max(self.high_water, self.pending)
+
+        if self.__scheduled:
+            return
+
+        self.__scheduled = True
+        self.__ioloop.add_callback(self.flush)
+
+    def flush(self):
+        """Write all the queued messages with a single write."""
+
+        self.__scheduled = False
+
+        if self.__stream.closed():
+            self.clear()
+            return
+
+        if self.__polls:
+            self.__control += b''.join(self.__polls.values())
+
+        data = self.__control
+        self.clear()
+
+        if not data:
+            return
+
+        size = len(data)
+
+        try:
+            future = self.__stream.write(bytes(data))
+        except StreamClosedError:
+            return
+
+        self.writes += 1
+        self.bytes += size
+        self.__inflight += size
+
+        future.add_done_callback(lambda future: self.__written(future, size))
+
+    def __written(self, future, size):
+
+        self.__inflight -= size
+
+        # retrieve the exception (if any) so that it is not logged
+        future.exception()
+
+    def to_dict(self):
+        """Return JSON-serializable representation of the object."""
+
+        return {'pending': self.pending,
+                'high_water': self.high_water,
+                'max_pending': self.max_pending,
+                'messages': self.messages,
+                'polls': self.polls,
+                'merged': self.merged,
+                'shed': self.shed,
+                'writes': self.writes,
+                'bytes': self.bytes}
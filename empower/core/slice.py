@@ -346,6 +346,16 @@ class Slice:
 
                     self.lte['vbses'][vbs_addr]['static-properties']['period'] = period
 
+    def wifi_properties(self, wtp_addr):
+        """Return the Wi-Fi properties in effect on the specified WTP."""
+
+        props = dict(self.wifi['static-properties'])
+
+        if wtp_addr in self.wifi['wtps']:
+            props.update(self.wifi['wtps'][wtp_addr]['static-properties'])
+
+        return props
+
     def __repr__(self):
         return "%s:%s" % (self.tenant.tenant_name, self.dscp)
 
@@ -19,8 +19,12 @@
 
 import json
 
+import tornado.ioloop
+
 from sqlalchemy.exc import IntegrityError
 
+import empower.logger
+
 from empower.persistence.persistence import TblSlice
 from empower.persistence.persistence import TblSliceBelongs
 from empower.persistence.persistence import TblTrafficRule
@@ -29,6 +33,7 @@ from empower.persistence import Session
 from empower.core.utils import get_module
 from empower.datatypes.etheraddress import EtherAddress
 from empower.core.trafficrule import TrafficRule
+from empower.core.metrics import MetricsStore
 from empower.vbsp import EP_OPERATION_SET
 from empower.vbsp import EP_OPERATION_ADD
 
@@ -36,6 +41,13 @@ T_TYPE_SHARED = "shared"
 T_TYPE_UNIQUE = "unique"
 T_TYPES = [T_TYPE_SHARED, T_TYPE_UNIQUE]
 
+SLICE_ADD = "add"
+SLICE_SET = "set"
+SLICE_DEL = "del"
+
+# raised on every slice operation with (slice, operation)
+EV_SLICE_CHANGE = "slice_change"
+
 
 class Tenant:
     """Tenant object representing a network slice.
@@ -49,6 +61,10 @@ class Tenant:
         owner: The username of the user that requested this pool
         desc: Human readable description
         bssid_type: shared (VAP) or unique (LVAP)
+        metrics: the metrics published by the apps of this tenant
+        slice_stats: slice messages sent and suppressed (because the block
+            already had the same properties), slice batches flushed, and
+            slice operations reverted because they could not be saved
     """
 
     TO_DICT = ['tenant_id',
@@ -66,7 +82,8 @@ class Tenant:
                'components',
                'slices',
                'endpoints',
-               'traffic_rules']
+               'traffic_rules',
+               'slice_stats']
 
     def __init__(self, tenant_id, tenant_name, owner, desc, bssid_type,
                  plmn_id=None):
@@ -83,7 +100,17 @@ class Tenant:
         self.lvnfs = {}
         self.vaps = {}
         self.slices = {}
+        self.traffic_rules = {}
         self.components = {}
+        self.metrics = MetricsStore()
+        self.slice_stats = {'sent': 0, 'suppressed': 0, 'batches': 0,
+                            'failed': 0}
+
+        self.__staged_slices = {}
+        self.__pushed_slices = {}
+        self.__flush_scheduled = False
+
+        self.log = empower.logger.get_logger()
 
     @property
     def wtps(self):
@@ -177,25 +204,6 @@ class Tenant:
         endpoint.ports.clear()
         del self.endpoints[endpoint_id]
 
-    @property
-    def traffic_rules(self):
-        """Fetch traffic rule queues in this tenant."""
-
-        trs = \
-            Session().query(TblTrafficRule) \
-                     .filter(TblTrafficRule.tenant_id == self.tenant_id) \
-                     .all()
-
-        results = {}
-
-        for rule in trs:
-            results[rule.match] = {'match': rule.match,
-                                   'label': rule.label,
-                                   'priority': rule.priority,
-                                   'dscp': rule.dscp}
-
-        return results
-
     def add_traffic_rule(self, match, dscp, label, priority=0):
         """Add a new traffic rule to the Tenant.
 
@@ -210,6 +218,9 @@ class Tenant:
             Nones
         """
 
+        if match in self.traffic_rules:
+            raise ValueError("Duplicate (%s, %s)" % (self.tenant_id, match))
+
         trule = TrafficRule(tenant=self,
                             match=match,
                             dscp=dscp,
@@ -233,6 +244,16 @@ class Tenant:
             session.rollback()
             raise ValueError("Duplicate (%s, %s)" % (self.tenant_id, match))
 
+        self.cache_traffic_rule(match, dscp, label, str(priority))
+
+    def cache_traffic_rule(self, match, dscp, label, priority):
+        """Add a traffic rule to the in-memory copy of the db."""
+
+        self.traffic_rules[match] = {'match': match,
+                                     'label': label,
+                                     'priority': priority,
+                                     'dscp': dscp}
+
     def del_traffic_rule(self, match):
         """Delete a traffic rule from this tenant.
 
@@ -246,12 +267,8 @@ class Tenant:
             None
         """
 
-        rule = Session().query(TblTrafficRule) \
-                        .filter(TblTrafficRule.tenant_id == self.tenant_id,
-                                TblTrafficRule.match == match) \
-                        .first()
-        if not rule:
-            raise KeyError(rule)
+        if match not in self.traffic_rules:
+            raise KeyError(match)
 
         # Send command to IBN
         from empower.ibnp.ibnpserver import IBNPServer
@@ -260,12 +277,22 @@ class Tenant:
             ibnp_server.del_traffic_rule(self.tenant_id, match)
 
         session = Session()
-        session.delete(rule)
+        session.query(TblTrafficRule) \
+               .filter(TblTrafficRule.tenant_id == self.tenant_id,
+                       TblTrafficRule.match == match) \
+               .delete()
         session.commit()
 
+        del self.traffic_rules[match]
+
     def add_slice(self, dscp, request):
         """Add a new slice to the Tenant.
 
+        The slice is available immediately, while the database and the
+        nodes are updated at the next IOLoop iteration (see flush_slices).
+        Database errors (e.g. an IntegrityError) are therefore not raised
+        here: the slice is removed again when the operation fails at flush.
+
         Args:
             dscp, a DSCP object
             request, the slice descriptor in json format
@@ -274,198 +301,268 @@ class Tenant:
             None
 
         Raises:
-            ValueError, if the dscp is not valid
+            ValueError, if the dscp is not valid or already in use
         """
 
         # create new instance
         slc = Slice(dscp, self, request)
 
-        # descriptors has been parsed, now it is safe to write to the db
-        try:
+        if slc.dscp in self.slices:
+            raise ValueError("Duplicate slice %s" % slc.dscp)
 
-            session = Session()
+        # store slice
+        self.slices[slc.dscp] = slc
 
-            tbl_slc = TblSlice(tenant_id=self.tenant_id,
-                               dscp=slc.dscp,
-                               wifi=json.dumps(slc.wifi['static-properties']),
-                               lte=json.dumps(slc.lte['static-properties']))
+        self.__stage_slice(SLICE_ADD, slc, None)
 
-            session.add(tbl_slc)
+    def set_slice(self, dscp, request):
+        """Update a slice in the Tenant.
 
-            for wtp_addr in slc.wifi['wtps']:
+        The slice is replaced immediately, while the database and the
+        nodes are updated at the next IOLoop iteration (see flush_slices).
+        Database errors (e.g. an IntegrityError) are therefore not raised
+        here: the previous slice is restored when the operation fails at
+        flush.
 
-                properties = \
-                    json.dumps(slc.wifi['wtps'][wtp_addr]['static-properties'])
+        Args:
+            dscp, a DSCP object
+            request, the slice descriptor in json format
 
-                belongs = TblSliceBelongs(tenant_id=self.tenant_id,
-                                          dscp=tbl_slc.dscp,
-                                          addr=wtp_addr,
-                                          properties=properties)
+        Returns:
+            None
 
-                session.add(belongs)
+        Raises:
+            ValueError, if the dscp is not valid
+            KeyError, if the slice does not exist
+        """
 
-            for vbs_addr in slc.lte['vbses']:
+        # create new instance
+        slc = Slice(dscp, self, request)
 
-                properties = \
-                    json.dumps(slc.lte['vbses'][vbs_addr]['static-properties'])
+        if slc.dscp not in self.slices:
+            raise KeyError(slc.dscp)
 
-                belongs = TblSliceBelongs(tenant_id=self.tenant_id,
-                                          dscp=tbl_slc.dscp,
-                                          addr=vbs_addr,
-                                          properties=properties)
+        previous = self.slices[slc.dscp]
 
-                session.add(belongs)
+        # store slice
+        self.slices[slc.dscp] = slc
 
-            session.commit()
+        self.__stage_slice(SLICE_SET, slc, previous)
 
-        except IntegrityError:
-            session.rollback()
-            raise ValueError()
+    def del_slice(self, dscp):
+        """Del slice from.
 
-        # store slice
-        self.slices[dscp] = slc
+        The slice is removed immediately, while the database and the
+        nodes are updated at the next IOLoop iteration (see flush_slices).
 
-        # create slice on WTPs
-        for wtp_addr in self.wtps:
+        Args:
+            dscp, a DSCP object
 
-            wtp = self.wtps[wtp_addr]
+        Returns:
+            None
 
-            if not wtp.is_online():
-                continue
+        Raises:
+            KeyError, if the slice does not exist
+        """
 
-            for block in wtp.supports:
-                wtp.connection.send_set_slice(block, slc)
+        # remove slice
+        slc = self.slices.pop(dscp)
 
-        # create slice on VBSes
-        for vbs_addr in self.vbses:
+        self.__stage_slice(SLICE_DEL, slc, slc)
 
-            vbs = self.vbses[vbs_addr]
+    def __stage_slice(self, operation, slc, previous):
+        """Stage a slice operation, coalescing it with the pending one.
 
-            if not vbs.is_online():
-                continue
+        previous is the slice replaced or removed by the operation (None for
+        an add), which is restored if the operation can not be saved.
+        """
 
-            for cell in vbs.cells.values():
-                vbs.connection.\
-                    send_add_set_ran_mac_slice_request(cell,
-                                                       slc,
-                                                       EP_OPERATION_ADD)
+        from empower.main import RUNTIME
 
-    def set_slice(self, dscp, request):
-        """Update a slice in the Tenant.
+        RUNTIME.events.publish(EV_SLICE_CHANGE, slc, operation,
+                               tenant_id=self.tenant_id)
 
-        Args:
-            dscp, a DSCP object
-            request, the slice descriptor in json format
+        pending = self.__staged_slices.get(slc.dscp)
 
-        Returns:
-            None
+        if pending:
 
-        Raises:
-            ValueError, if the dscp is not valid
-        """
+            pending_operation = pending[0]
 
-        # create new instance
-        slc = Slice(dscp, self, request)
-        tenant_id = self.tenant_id
+            # restore what is in the db, not what the pending one staged
+            previous = pending[2]
 
-        # update db
-        try:
+            if pending_operation == SLICE_ADD and operation == SLICE_DEL:
+                # never written, nothing to do
+                del self.__staged_slices[slc.dscp]
+                return
 
-            session = Session()
+            if pending_operation == SLICE_ADD:
+                operation = SLICE_ADD
 
-            tbl_slice = Session().query(TblSlice) \
-                                 .filter(TblSlice.tenant_id == tenant_id) \
-                                 .filter(TblSlice.dscp == slc.dscp) \
-                                 .first()
+            elif pending_operation == SLICE_DEL and operation == SLICE_ADD:
+                operation = SLICE_SET
 
-            tbl_slice.wifi = json.dumps(slc.wifi['static-properties'])
-            tbl_slice.lte = json.dumps(slc.lte['static-properties'])
+        self.__staged_slices[slc.dscp] = (operation, slc, previous)
 
-            for wtp_addr in slc.wifi['wtps']:
+        if not self.__flush_scheduled:
+            self.__flush_scheduled = True
+            tornado.ioloop.IOLoop.current().add_callback(self.flush_slices)
 
-                properties = \
-                    json.dumps(slc.wifi['wtps'][wtp_addr]['static-properties'])
+    def flush_slices(self):
+        """Write the staged slice operations to the db and to the nodes.
 
-                tbl_belongs = \
-                    Session().query(TblSliceBelongs) \
-                             .filter(TblSliceBelongs.tenant_id == tenant_id) \
-                             .filter(TblSliceBelongs.dscp == slc.dscp) \
-                             .filter(TblSliceBelongs.addr == wtp_addr) \
-                             .first()
+        All the operations are written to the db in a single transaction. If
+        the transaction fails the operations are written one by one, and the
+        ones which still fail are reverted in memory and not sent to the
+        nodes. Wi-Fi slices are only sent to the blocks whose effective
+        properties differ from the ones last sent to them.
+        """
 
-                if not tbl_belongs:
+        self.__flush_scheduled = False
 
-                    belongs = TblSliceBelongs(tenant_id=self.tenant_id,
-                                              dscp=slc.dscp,
-                                              addr=wtp_addr,
-                                              properties=properties)
+        staged = self.__staged_slices
+        self.__staged_slices = {}
 
-                    session.add(belongs)
+        if not staged:
+            return
 
-                else:
+        self.slice_stats['batches'] += 1
 
-                    tbl_belongs.properties = properties
+        entries = list(staged.values())
 
-            for vbs_addr in slc.lte['vbses']:
+        if not self.__db_save_slices(entries):
 
-                properties = \
-                    json.dumps(slc.lte['vbses'][vbs_addr]['static-properties'])
+            # save the operations one by one, so that only the failed ones
+            # are lost
+            saved = []
 
-                tbl_belongs = \
-                    Session().query(TblSliceBelongs) \
-                             .filter(TblSliceBelongs.tenant_id == tenant_id) \
-                             .filter(TblSliceBelongs.dscp == slc.dscp) \
-                             .filter(TblSliceBelongs.addr == vbs_addr) \
-                             .first()
+            for entry in entries:
 
-                if not tbl_belongs:
+                if self.__db_save_slices([entry]):
+                    saved.append(entry)
+                    continue
 
-                    belongs = TblSliceBelongs(tenant_id=self.tenant_id,
-                                              dscp=slc.dscp,
-                                              addr=vbs_addr,
-                                              properties=properties)
+                self.slice_stats['failed'] += 1
+                self.__restore_slice(entry)
 
-                    session.add(belongs)
+            entries = saved
 
-                else:
+        for operation, slc, _ in entries:
+
+            if operation == SLICE_DEL:
+                self.__push_del_slice(slc)
+            else:
+                self.__push_slice(operation, slc)
 
-                    tbl_belongs.properties = properties
+    def __db_save_slices(self, entries):
+        """Save slice operations in a single transaction.
+
+        Return False if the transaction has been rolled back.
+        """
+
+        session = Session()
+
+        try:
+
+            for operation, slc, _ in entries:
+
+                if operation == SLICE_ADD:
+                    self.__db_add_slice(session, slc)
+                elif operation == SLICE_SET:
+                    self.__db_set_slice(session, slc)
+                else:
+                    self.__db_del_slice(session, slc)
 
             session.commit()
 
-        except IntegrityError:
+        except IntegrityError as ex:
             session.rollback()
-            raise ValueError()
+            self.log.error("Unable to save slices of tenant %s: %s",
+                           self.tenant_name, ex)
+            return False
 
-        # store slice
-        self.slices[dscp] = slc
+        return True
 
-        # create slice on WTPs
-        for wtp_addr in self.wtps:
+    def __restore_slice(self, entry):
+        """Undo a slice operation which could not be saved."""
+
+        from empower.main import RUNTIME
+
+        operation, slc, previous = entry
+
+        self.log.error("Reverting slice %s of tenant %s (%s)", slc.dscp,
+                       self.tenant_name, operation)
+
+        if previous:
+            self.slices[slc.dscp] = previous
+            RUNTIME.events.publish(EV_SLICE_CHANGE, previous, SLICE_SET,
+                                   tenant_id=self.tenant_id)
+        else:
+            self.slices.pop(slc.dscp, None)
+            RUNTIME.events.publish(EV_SLICE_CHANGE, slc, SLICE_DEL,
+                                   tenant_id=self.tenant_id)
+
+    def push_slice(self, wtp, slc, force=False):
+        """Send a slice to the blocks of a WTP.
+
+        Blocks which have already been sent the same effective properties
+        are skipped, unless force is True.
+        """
+
+        props = slc.wifi_properties(wtp.addr)
+
+        for block in wtp.supports:
+
+            key = (block, slc.dscp)
+
+            if not force and self.__pushed_slices.get(key) == props:
+                self.slice_stats['suppressed'] += 1
+                continue
+
+            wtp.connection.send_set_slice(block, slc)
+
+            self.__pushed_slices[key] = props
+            self.slice_stats['sent'] += 1
+
+    def mark_slice_pushed(self, block, slc):
+        """Record the slice properties reported by a block."""
 
-            wtp = self.wtps[wtp_addr]
+        self.__pushed_slices[(block, slc.dscp)] = \
+            slc.wifi_properties(block.radio.addr)
+
+    def __push_slice(self, operation, slc):
+
+        # create slice on WTPs
+        for wtp in self.wtps.values():
 
             if not wtp.is_online():
                 continue
 
-            for block in wtp.supports:
-                wtp.connection.send_set_slice(block, slc)
+            self.push_slice(wtp, slc)
 
         # create slice on VBSes
-        for vbs_addr in self.vbses:
-
-            vbs = self.vbses[vbs_addr]
+        for vbs in self.vbses.values():
 
             if not vbs.is_online():
                 continue
 
+            if operation == SLICE_ADD:
+
+                for cell in vbs.cells.values():
+                    vbs.connection.\
+                        send_add_set_ran_mac_slice_request(cell,
+                                                           slc,
+                                                           EP_OPERATION_ADD)
+
+                continue
+
             current_rntis = []
 
             # The UEs in the slice must be confirmed
 
             for ue in list(self.ues.values()):
 
-                if vbs == ue.vbs and dscp == ue.slice:
+                if vbs == ue.vbs and slc.dscp == ue.slice:
                     current_rntis.append(ue.rnti)
 
             for cell in vbs.cells.values():
@@ -475,91 +572,138 @@ class Tenant:
                                                        EP_OPERATION_SET,
                                                        current_rntis)
 
-    def del_slice(self, dscp):
-        """Del slice from.
+    def __push_del_slice(self, slc):
 
-        Args:
-            dscp, a DSCP object
+        # delete it from the WTPs
+        for wtp in self.wtps.values():
 
-        Returns:
-            None
+            if not wtp.is_online():
+                continue
 
-        Raises:
-            ValueError, if the dscp is not valid
-        """
+            for block in wtp.supports:
+                wtp.connection.send_del_slice(block, self.tenant_name,
+                                              slc.dscp)
+                self.slice_stats['sent'] += 1
 
-        # fetch slice
-        slc = self.slices[dscp]
-        tenant_id = self.tenant_id
+        for key in [key for key in self.__pushed_slices
+                    if key[1] == slc.dscp]:
+            del self.__pushed_slices[key]
 
-        # delete it from the db
-        try:
+        # delete it from the VBSes
+        for vbs in self.vbses.values():
 
-            session = Session()
+            if not vbs.is_online():
+                continue
+
+            for cell in vbs.cells.values():
+                vbs.connection.send_del_ran_mac_slice_request(cell,
+                                                              self.plmn_id,
+                                                              slc.dscp)
+
+    def __db_add_slice(self, session, slc):
+
+        tbl_slc = TblSlice(tenant_id=self.tenant_id,
+                           dscp=slc.dscp,
+                           wifi=json.dumps(slc.wifi['static-properties']),
+                           lte=json.dumps(slc.lte['static-properties']))
 
-            rem = Session().query(TblSlice) \
-                           .filter(TblSlice.tenant_id == self.tenant_id) \
-                           .filter(TblSlice.dscp == dscp) \
+        session.add(tbl_slc)
+
+        for wtp_addr in slc.wifi['wtps']:
+
+            properties = \
+                json.dumps(slc.wifi['wtps'][wtp_addr]['static-properties'])
+
+            belongs = TblSliceBelongs(tenant_id=self.tenant_id,
+                                      dscp=tbl_slc.dscp,
+                                      addr=wtp_addr,
+                                      properties=properties)
+
+            session.add(belongs)
+
+        for vbs_addr in slc.lte['vbses']:
+
+            properties = \
+                json.dumps(slc.lte['vbses'][vbs_addr]['static-properties'])
+
+            belongs = TblSliceBelongs(tenant_id=self.tenant_id,
+                                      dscp=tbl_slc.dscp,
+                                      addr=vbs_addr,
+                                      properties=properties)
+
+            session.add(belongs)
+
+    def __db_set_slice(self, session, slc):
+
+        tenant_id = self.tenant_id
+
+        tbl_slice = session.query(TblSlice) \
+                           .filter(TblSlice.tenant_id == tenant_id) \
+                           .filter(TblSlice.dscp == slc.dscp) \
                            .first()
 
-            session.delete(rem)
+        if not tbl_slice:
+            self.__db_add_slice(session, slc)
+            return
 
-            for wtp_addr in slc.wifi['wtps']:
+        tbl_slice.wifi = json.dumps(slc.wifi['static-properties'])
+        tbl_slice.lte = json.dumps(slc.lte['static-properties'])
 
-                rem = \
-                    Session().query(TblSliceBelongs) \
-                             .filter(TblSliceBelongs.tenant_id == tenant_id) \
-                             .filter(TblSliceBelongs.dscp == slc.dscp) \
-                             .filter(TblSliceBelongs.addr == wtp_addr) \
-                             .first()
+        belongs = {}
 
-                if rem:
-                    session.delete(rem)
+        for wtp_addr in slc.wifi['wtps']:
+            belongs[wtp_addr] = \
+                json.dumps(slc.wifi['wtps'][wtp_addr]['static-properties'])
 
-            for vbs_addr in slc.lte['vbses']:
+        for vbs_addr in slc.lte['vbses']:
+            belongs[vbs_addr] = \
+                json.dumps(slc.lte['vbses'][vbs_addr]['static-properties'])
 
-                rem = \
-                    Session().query(TblSliceBelongs) \
-                             .filter(TblSliceBelongs.tenant_id == tenant_id) \
-                             .filter(TblSliceBelongs.dscp == slc.dscp) \
-                             .filter(TblSliceBelongs.addr == vbs_addr) \
-                             .first()
+        for addr, properties in belongs.items():
 
-                if rem:
-                    session.delete(rem)
+            tbl_belongs = \
+                session.query(TblSliceBelongs) \
+                       .filter(TblSliceBelongs.tenant_id == tenant_id) \
+                       .filter(TblSliceBelongs.dscp == slc.dscp) \
+                       .filter(TblSliceBelongs.addr == addr) \
+                       .first()
 
-            session.commit()
+            if not tbl_belongs:
 
-        except IntegrityError:
-            session.rollback()
-            raise ValueError()
+                tbl_belongs = TblSliceBelongs(tenant_id=self.tenant_id,
+                                              dscp=slc.dscp,
+                                              addr=addr,
+                                              properties=properties)
 
-        # delete it from the WTPs
-        for wtp_addr in self.wtps:
+                session.add(tbl_belongs)
 
-            wtp = self.wtps[wtp_addr]
+            else:
 
-            if not wtp.is_online():
-                continue
+                tbl_belongs.properties = properties
 
-            for block in wtp.supports:
-                wtp.connection.send_del_slice(block, self.tenant_name, dscp)
+    def __db_del_slice(self, session, slc):
 
-        # delete it from the VBSes
-        for vbs_addr in self.vbses:
+        tenant_id = self.tenant_id
 
-            vbs = self.vbses[vbs_addr]
+        rem = session.query(TblSlice) \
+                     .filter(TblSlice.tenant_id == tenant_id) \
+                     .filter(TblSlice.dscp == slc.dscp) \
+                     .first()
 
-            if not vbs.is_online():
-                continue
+        if rem:
+            session.delete(rem)
 
-            for cell in vbs.cells.values():
-                vbs.connection.send_del_ran_mac_slice_request(cell,
-                                                              self.plmn_id,
-                                                              dscp)
+        for addr in list(slc.wifi['wtps']) + list(slc.lte['vbses']):
 
-        # remove slice
-        del self.slices[dscp]
+            rem = \
+                session.query(TblSliceBelongs) \
+                       .filter(TblSliceBelongs.tenant_id == tenant_id) \
+                       .filter(TblSliceBelongs.dscp == slc.dscp) \
+                       .filter(TblSliceBelongs.addr == addr) \
+                       .first()
+
+            if rem:
+                session.delete(rem)
 
     def __str__(self):
         return str(self.tenant_id)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2018 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Version counters for the objects exposed by the REST API."""
+
+import collections.abc
+import itertools
+
+# Versions are drawn from a single counter, so that an object never gets the
+# version of another (e.g. deleted) object
+_VERSIONS = itertools.count(1)
+
+
+class Versioned:
+    """Mixin adding a version counter to an object.
+
+    The version changes on every attribute assignment. Changes made in place
+    (e.g. to a dict or a list attribute) must be signalled with touch().
+
+    Attributes:
+        version: the current version of the object
+    """
+
+    version = 0
+
+    def __setattr__(self, name, value):
+
+        object.__setattr__(self, name, value)
+        object.__setattr__(self, 'version', next(_VERSIONS))
+
+    def touch(self):
+        """Mark the object as changed."""
+
+        object.__setattr__(self, 'version', next(_VERSIONS))
+
+    def etag_key(self):
+        """Return the versions the representation of the object depends on.
+
+        Objects whose representation embeds other objects must extend the
+        key with the keys of the embedded objects.
+        """
+
+        return (self.version,)
+
+
+def etag_key(value):
+    """Return the version key of a value.
+
+    The value can be either a versioned object or a collection of versioned
+    objects. Return None if the value can not be versioned.
+    """
+
+    if isinstance(value, Versioned):
+        return value.etag_key()
+
+    # iterators would be consumed before being serialized
+    if isinstance(value, collections.abc.Iterator):
+        return None
+
+    if isinstance(value, dict):
+        # the keys are serialized too
+        items = list(value.items())
+    else:
+        try:
+            items = [(None, item) for item in value]
+        except TypeError:
+            return None
+
+    key = [len(items)]
+
+    for name, item in items:
+
+        if not isinstance(item, Versioned):
+            return None
+
+        key.append(hash(name))
+        key.extend(item.etag_key())
+
+    return tuple(key)
@@ -18,12 +18,11 @@
 """Wireless Termination Point."""
 
 from empower.core.pnfdev import BasePNFDev
-from empower.core.resourcepool import ResourceBlock
 from empower.core.resourcepool import ResourcePool
-from empower.datatypes.etheraddress import EtherAddress
+from empower.core.versioned import Versioned
 
 
-class WTP(BasePNFDev):
+class WTP(BasePNFDev, Versioned):
     """A Wireless Termination Point.
 
     Attributes:
@@ -45,13 +44,30 @@ class WTP(BasePNFDev):
         super().__init__(addr, label)
         self.supports = set()
 
+        # blocks indexed by (hwaddr raw bytes, channel, band)
+        self.__blocks = {}
+
     def to_dict(self):
         """Return a JSON-serializable dictionary representing the CPP."""
 
         out = super().to_dict()
         out['supports'] = self.supports
+        out['send_queue'] = \
+            self.connection.send_queue if self.connection else None
         return out
 
+    def etag_key(self):
+        """Return the versions the representation depends on."""
+
+        key = (self.version,)
+
+        if self.connection:
+            queue = self.connection.send_queue
+            key += (queue.messages, queue.polls, queue.merged, queue.shed,
+                    queue.writes, queue.pending)
+
+        return key
+
     def blocks(self):
         """Return all blocks supported by this WTP."""
 
@@ -63,8 +79,33 @@ class WTP(BasePNFDev):
 
         return pool
 
+    def add_block(self, block):
+        """Add a block to the supported blocks."""
+
+        self.supports.add(block)
+        self.__blocks[(block.hwaddr.to_raw(), block.channel, block.band)] = \
+            block
+
+    def clear_blocks(self):
+        """Remove all the supported blocks."""
+
+        self.supports = set()
+        self.__blocks = {}
+
+    def lookup_block(self, hwaddr, channel, band):
+        """Return the block matching hwaddr, channel, and band.
+
+        hwaddr can be either an EtherAddress or its raw bytes (as found in
+        the LVAPP messages). Return None if the block is not supported.
+        """
+
+        if hwaddr.__class__ is not bytes:
+            hwaddr = hwaddr.to_raw()
+
+        return self.__blocks.get((hwaddr, channel, band))
+
     def get_block(self, hwaddr, channel, band):
-        """Look for block."""
+        """Look for block, return a list with the matching block."""
 
-        incoming = ResourceBlock(self, EtherAddress(hwaddr), channel, band)
-        return [block for block in self.supports if block == incoming]
+        block = self.lookup_block(hwaddr, channel, band)
+        return [block] if block else []
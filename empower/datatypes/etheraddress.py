@@ -17,49 +17,94 @@
 
 """EmPOWER EtherAddress Class."""
 
+import weakref
+
+
+# Maximum number of interned addresses
+MAX_INTERNED = 65536
+
+_INTERNED = weakref.WeakValueDictionary()
+
+
+def _parse(addr):
+    """Return the 6 raw bytes of an address."""
+
+    if isinstance(addr, bytes) and len(addr) == 6:
+        # raw
+        return addr
+
+    if isinstance(addr, str):
+
+        if len(addr) == 17:
+
+            # Address of form xx:xx:xx:xx:xx:xx or xx-xx-xx-xx-xx-xx
+            if addr[2::3] != ':::::' and addr[2::3] != '-----':
+                raise RuntimeError("Bad format for ethernet address")
+
+            return bytes.fromhex(addr.replace(addr[2], ''))
+
+        if addr.count(':') == 5:
+
+            # Assume it's hex digits but they may not all be in two-digit
+            # groupings (e.g., xx:x:x:xx:x:x). This actually comes up.
+            return bytes(int(x, 16) for x in addr.split(":"))
+
+        raise ValueError("Expected 6 raw bytes or some hex")
+
+    if isinstance(addr, EtherAddress):
+        return addr.to_raw()
+
+    if addr is None:
+        return b'\x00' * 6
+
+    raise ValueError("EtherAddress must be a string of 6 raw bytes")
+
 
 class EtherAddress:
-    """An Ethernet (MAC) address type."""
+    """An Ethernet (MAC) address type.
+
+    Instances are immutable and interned: building an address whose raw
+    bytes match a live instance returns that instance. The string and the
+    integer forms are computed once.
+    """
 
-    def __init__(self, addr="00:00:00:00:00:00"):
+    __slots__ = ('_value', '_str', '_int', '__weakref__')
+
+    def __new__(cls, addr="00:00:00:00:00:00"):
         """
         Understands Ethernet address is various forms. Hex strings, raw bytes
         strings, etc.
         """
+
+        if addr.__class__ is cls:
+            return addr
+
         # Always stores as a 6 character string
-        if isinstance(addr, bytes) and len(addr) == 6:
-            # raw
-            self._value = addr
-        elif isinstance(addr, str):
-            if len(addr) == 17 or addr.count(':') == 5:
-                # hex
-                if len(addr) == 17:
-                    if addr[2::3] != ':::::' and addr[2::3] != '-----':
-                        raise RuntimeError("Bad format for ethernet address")
-                    # Address of form xx:xx:xx:xx:xx:xx
-                    # Pick out the hex digits only
-                    addr = ''.join(
-                        (addr[x * 3:x * 3 + 2] for x in range(0, 6)))
-                else:
-                    # Assume it's hex digits but they may not all be in
-                    # two-digit groupings (e.g., xx:x:x:xx:x:x). This actually
-                    # comes up.
-                    addr = ''.join(["%02x" % (int(x, 16),)
-                                    for x in addr.split(":")])
-
-                # We should now have 12 hex digits (xxxxxxxxxxxx).
-                # Convert to 6 raw bytes.
-                addr = b''.join(bytes((int(addr[x * 2:x * 2 + 2], 16),))
-                                for x in range(0, 6))
-            else:
-                raise ValueError("Expected 6 raw bytes or some hex")
-            self._value = addr
-        elif isinstance(addr, EtherAddress):
-            self._value = addr.to_raw()
-        elif addr is None:
-            self._value = b'\x00' * 6
-        else:
-            raise ValueError("EtherAddress must be a string of 6 raw bytes")
+        value = _parse(addr)
+
+        instance = _INTERNED.get(value)
+
+        if instance is not None and instance.__class__ is cls:
+            return instance
+
+        instance = object.__new__(cls)
+        object.__setattr__(instance, '_str', None)
+        object.__setattr__(instance, '_int', None)
+        object.__setattr__(instance, '_value', value)
+
+        if cls is EtherAddress and len(_INTERNED) < MAX_INTERNED:
+            _INTERNED[value] = instance
+
+        return instance
+
+    def __reduce__(self):
+        return (self.__class__, (self._value,))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
 
     def is_global(self):
         """
@@ -97,14 +142,24 @@ class EtherAddress:
         Returns the address as string consisting of 12 hex chars separated
         by separator.
         """
-        return separator.join(('%02x' % (x,) for x in self._value)).upper()
+        if separator != ':':
+            return self._value.hex(separator).upper()
+
+        if self._str is None:
+            object.__setattr__(self, '_str', self._value.hex(':').upper())
+
+        return self._str
 
     def to_int(self, separator=':'):
         """
         Returns the address as string consisting of 12 hex chars separated
         by separator.
         """
-        return int(self.to_str().replace(separator, ""), 16)
+        if self._int is None:
+            object.__setattr__(self, '_int',
+                               int.from_bytes(self._value, 'big'))
+
+        return self._int
 
     def match(self, other):
         """ Bitwise match. """
@@ -128,6 +183,9 @@ class EtherAddress:
 
     def __eq__(self, other):
 
+        if self is other:
+            return True
+
         if isinstance(other, EtherAddress):
             other = other.to_raw()
         elif isinstance(other, bytes):
@@ -148,9 +206,7 @@ class EtherAddress:
         return self.__class__.__name__ + "('" + self.to_str() + "')"
 
     def __setattr__(self, a, v):
-        if hasattr(self, '_value'):
-            raise TypeError("This object is immutable")
-        object.__setattr__(self, a, v)
+        raise TypeError("This object is immutable")
 
     @classmethod
     def bcast(cls):
@@ -15,96 +15,463 @@
 # specific language governing permissions and limitations
 # under the License.
 
+import atexit
+import collections
 import configparser
-import psycopg2
+import sqlite3
+import threading
 import time
 
+try:
+    import psycopg2
+    import psycopg2.extras
+    import psycopg2.pool
+except ImportError:
+    psycopg2 = None
+
+import empower.logger
+
+# overflow policies of the write-behind queue
+DROP_OLDEST = 'drop_oldest'
+DROP_NEWEST = 'drop_newest'
+BLOCK = 'block'
+
+POLICIES = [DROP_OLDEST, DROP_NEWEST, BLOCK]
+
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_FLUSH_INTERVAL_MS = 1000
+DEFAULT_MAX_CONNECTIONS = 2
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_RETRY_BACKOFF_MS = 500
+
+_WRITER = None
+_WRITER_LOCK = threading.Lock()
+
+
+class PostgreSQLBackend:
+    """
+    PostgreSQL backend of the monitoring pipeline
+    * keeps a persistent pool of connections
+    * writes every batch with multi-row inserts in a single transaction
+    """
+
+    def __init__(self, host, port, dbname, user, password,
+                 max_connections=DEFAULT_MAX_CONNECTIONS):
+
+        if psycopg2 is None:
+            raise ValueError('EmpowerMon requires psycopg2 for PostgreSQL!')
+
+        self.__params = {'host': host,
+                         'port': port,
+                         'database': dbname,
+                         'user': user,
+                         'password': password}
+        self.__max_connections = max_connections
+        self.__pool = None
+
+    def write(self, inserts, deletes):
+        """Write a batch of inserts and deletes."""
+
+        # the pool is opened lazily from the writer thread
+        if self.__pool is None:
+            self.__pool = \
+                psycopg2.pool.ThreadedConnectionPool(1,
+                                                     self.__max_connections,
+                                                     **self.__params)
+
+        connection = self.__pool.getconn()
+
+        try:
+            with connection.cursor() as cursor:
+
+                for (table, fields), rows in inserts.items():
+                    query = 'INSERT INTO ' + str(table) + \
+                        ' (' + ','.join(fields) + ') VALUES %s'
+                    psycopg2.extras.execute_values(cursor, query, rows,
+                                                   page_size=len(rows))
+
+                for table, timestamp in deletes.items():
+                    query = 'DELETE FROM ' + str(table) + \
+                        ' WHERE TIMESTAMP_MS < %s'
+                    cursor.execute(query, (timestamp,))
+
+            connection.commit()
+
+        except Exception:
+            connection.rollback()
+            raise
+
+        finally:
+            self.__pool.putconn(connection)
+
+    def close(self):
+        """Close all the connections."""
+
+        if self.__pool is not None:
+            self.__pool.closeall()
+            self.__pool = None
+
+
+class SQLiteBackend:
+    """
+    SQLite stand-in for the PostgreSQL backend
+    * tables are created on first use with the inserted columns
+    * meant for running the monitoring pipeline without PostgreSQL
+    """
+
+    def __init__(self, path=':memory:'):
+        self.__connection = sqlite3.connect(path, check_same_thread=False)
+        self.__tables = set()
+
+    @property
+    def connection(self):
+        """Return the SQLite connection."""
+
+        return self.__connection
+
+    def __create_table(self, table, fields):
+
+        if table in self.__tables:
+            return
+
+        self.__connection.execute('CREATE TABLE IF NOT EXISTS ' + str(table) +
+                                  ' (' + ','.join(fields) + ')')
+        self.__tables.add(table)
+
+    def write(self, inserts, deletes):
+        """Write a batch of inserts and deletes."""
+
+        with self.__connection:
+
+            for (table, fields), rows in inserts.items():
+                self.__create_table(table, fields)
+                query = 'INSERT INTO ' + str(table) + \
+                    ' (' + ','.join(fields) + ') VALUES (' + \
+                    ','.join(['?'] * len(fields)) + ')'
+                self.__connection.executemany(query, rows)
+
+            for table, timestamp in deletes.items():
+                if table not in self.__tables:
+                    continue
+                query = 'DELETE FROM ' + str(table) + \
+                    ' WHERE TIMESTAMP_MS < ?'
+                self.__connection.execute(query, (timestamp,))
+
+    def close(self):
+        """Close the connection."""
+
+        self.__connection.close()
+
+
+class MonitorWriter:
+    """
+    Write-behind pipeline shared by all the EmpowerMon instances
+    * rows are queued in a bounded in-memory queue
+    * a background thread flushes the queue when batch_size rows are
+      pending or every flush_interval_ms
+    * when the queue is full the oldest or the newest rows are dropped, or
+      the caller is blocked until there is room (BLOCK policy)
+    * a batch that cannot be written is put back in front of the queue,
+      under the same policy, and retried up to max_retries times with an
+      exponential backoff starting at retry_backoff_ms, then it is dropped
+    """
+
+    def __init__(self, backend, queue_size=DEFAULT_QUEUE_SIZE,
+                 batch_size=DEFAULT_BATCH_SIZE,
+                 flush_interval_ms=DEFAULT_FLUSH_INTERVAL_MS,
+                 policy=DROP_OLDEST, max_retries=DEFAULT_MAX_RETRIES,
+                 retry_backoff_ms=DEFAULT_RETRY_BACKOFF_MS):
+
+        if policy not in POLICIES:
+            raise ValueError('Invalid overflow policy ' + str(policy))
+
+        self.backend = backend
+        self.queue_size = int(queue_size)
+        self.batch_size = int(batch_size)
+        self.flush_interval = int(flush_interval_ms) / 1000
+        self.policy = policy
+        self.max_retries = int(max_retries)
+        self.retry_backoff = int(retry_backoff_ms) / 1000
+
+        # counters
+        self.queued = 0
+        self.written = 0
+        self.dropped = 0
+        self.retried = 0
+        self.failed = 0
+
+        self.__queue = collections.deque()
+        self.__deletes = {}
+        self.__cond = threading.Condition()
+        self.__stopped = False
+
+        # failed attempts of the batch at the head of the queue
+        self.__retries = 0
+        self.__retry_at = 0
+
+        self.log = empower.logger.get_logger()
+
+        self.__thread = threading.Thread(target=self.__run,
+                                         name='empowermon-writer',
+                                         daemon=True)
+        self.__thread.start()
+
+    def insert(self, table, fields, values):
+        """Queue a new row. Return False if the row has been dropped."""
+
+        with self.__cond:
+
+            if len(self.__queue) >= self.queue_size:
+
+                if self.policy == DROP_NEWEST:
+                    self.dropped += 1
+                    return False
+
+                if self.policy == DROP_OLDEST:
+                    self.__queue.popleft()
+                    self.dropped += 1
+
+                else:
+                    self.__cond.notify_all()
+                    self.__cond.wait_for(
+                        lambda: len(self.__queue) < self.queue_size or
+                        self.__stopped)
+
+            self.__queue.append((table, tuple(fields), tuple(values)))
+            self.queued += 1
+
+            if len(self.__queue) >= self.batch_size:
+                self.__cond.notify_all()
+
+        return True
+
+    def delete_older(self, table, timestamp):
+        """Queue the removal of the rows older than timestamp."""
+
+        with self.__cond:
+            if timestamp > self.__deletes.get(table, timestamp - 1):
+                self.__deletes[table] = timestamp
+
+    def stats(self):
+        """Return the pipeline counters."""
+
+        with self.__cond:
+            return {'pending': len(self.__queue),
+                    'queued': self.queued,
+                    'written': self.written,
+                    'dropped': self.dropped,
+                    'retried': self.retried,
+                    'failed': self.failed}
+
+    def flush(self):
+        """Write all the pending rows.
+
+        If the write fails the rows are queued again for a retry, unless
+        they already failed max_retries times or the writer is closing.
+        """
+
+        with self.__cond:
+
+            if not self.__queue and not self.__deletes:
+                return
+
+            pending = list(self.__queue)
+            self.__queue.clear()
+            deletes = self.__deletes
+            self.__deletes = {}
+
+            # wake up writers blocked by the BLOCK policy
+            self.__cond.notify_all()
+
+        inserts = collections.OrderedDict()
+
+        for table, fields, values in pending:
+            inserts.setdefault((table, fields), []).append(values)
+
+        try:
+            self.backend.write(inserts, deletes)
+        except Exception as ex:
+            self.__failed(pending, deletes, ex)
+            return
+
+        with self.__cond:
+            self.written += len(pending)
+            self.__retries = 0
+            self.__retry_at = 0
+
+    def __failed(self, pending, deletes, ex):
+
+        with self.__cond:
+
+            retry = not self.__stopped and self.__retries < self.max_retries
+
+            if retry:
+                self.__retries += 1
+                self.retried += len(pending)
+                self.__retry_at = time.monotonic() + \
+                    self.retry_backoff * 2 ** (self.__retries - 1)
+                self.__requeue(pending, deletes)
+            else:
+                self.__retries = 0
+                self.__retry_at = 0
+                self.failed += len(pending)
+
+            retries = self.__retries
+
+        if retry:
+            self.log.warning('EmpowerMon could not write %u rows, retry %u '
+                             'of %u: %s', len(pending), retries,
+                             self.max_retries, ex)
+        else:
+            self.log.error('EmpowerMon could not write %u rows: %s',
+                           len(pending), ex)
+
+    def __requeue(self, pending, deletes):
+
+        # the failed rows are older than the ones queued in the meantime
+        self.__queue.extendleft(reversed(pending))
+
+        for table, timestamp in deletes.items():
+            if timestamp > self.__deletes.get(table, timestamp - 1):
+                self.__deletes[table] = timestamp
+
+        excess = len(self.__queue) - self.queue_size
+
+        # with the BLOCK policy nothing is dropped, insert() waits instead
+        if excess <= 0 or self.policy == BLOCK:
+            return
+
+        for _ in range(excess):
+            if self.policy == DROP_OLDEST:
+                self.__queue.popleft()
+            else:
+                self.__queue.pop()
+
+        self.dropped += excess
+
+    def close(self):
+        """Flush the pending rows and stop the writer thread."""
+
+        with self.__cond:
+            self.__stopped = True
+            self.__cond.notify_all()
+
+        self.__thread.join()
+        self.flush()
+        self.backend.close()
+
+    def __run(self):
+
+        while True:
+
+            with self.__cond:
+
+                backoff = self.__retry_at - time.monotonic()
+
+                if backoff > 0:
+                    self.__cond.wait_for(lambda: self.__stopped,
+                                         timeout=backoff)
+                else:
+                    self.__cond.wait_for(
+                        lambda: len(self.__queue) >= self.batch_size or
+                        self.__stopped,
+                        timeout=self.flush_interval)
+
+                if self.__stopped:
+                    return
+
+            self.flush()
+
+
+def get_writer(config):
+    """Return the write-behind pipeline, creating it if needed."""
+
+    global _WRITER
+
+    with _WRITER_LOCK:
+
+        if _WRITER is not None:
+            return _WRITER
+
+        backend_type = config.get('backend', 'postgresql')
+
+        if backend_type == 'sqlite':
+            backend = SQLiteBackend(config.get('sqlite_path', ':memory:'))
+        else:
+            backend = \
+                PostgreSQLBackend(config.get('db_host'),
+                                  config.get('db_port'),
+                                  config.get('db_name'),
+                                  config.get('db_user'),
+                                  config.get('db_pass'),
+                                  int(config.get('max_connections',
+                                                 DEFAULT_MAX_CONNECTIONS)))
+
+        _WRITER = \
+            MonitorWriter(backend,
+                          queue_size=config.get('queue_size',
+                                                DEFAULT_QUEUE_SIZE),
+                          batch_size=config.get('batch_size',
+                                                DEFAULT_BATCH_SIZE),
+                          flush_interval_ms=config.get(
+                              'flush_interval_ms', DEFAULT_FLUSH_INTERVAL_MS),
+                          policy=config.get('overflow_policy', DROP_OLDEST),
+                          max_retries=config.get('max_retries',
+                                                 DEFAULT_MAX_RETRIES),
+                          retry_backoff_ms=config.get(
+                              'retry_backoff_ms', DEFAULT_RETRY_BACKOFF_MS))
+
+        atexit.register(_WRITER.close)
+
+        return _WRITER
+
 
 class EmpowerMon:
     """
     EmpowerMon base class used for monitoring data using PostgreSQL
     * contains common CRUD functions
+    * writes are queued and flushed in batches by a background thread
     """
 
     def __init__(self):
-        self.__db_user = None
-        self.__db_pass = None
-        self.__db_name = None
-        self.__db_port = None
-        self.__db_host = None
         self.__threshold_min = 5
 
         self.__config = configparser.ConfigParser()
         self.__config.read('empower/grafana/config.ini')
 
+        db_config = {}
+
         if 'PostgreSQL' in self.__config:
-            db_config = self.__config['PostgreSQL']
-            params = ['db_host', 'db_port', 'db_name', 'db_user', 'db_pass']
-            if all(param in db_config for param in params):
-                if all(param is not None for param in db_config):
-                    self.__db_user = db_config['db_user']
-                    self.__db_pass = db_config['db_pass']
-                    self.__db_name = db_config['db_name']
-                    self.__db_port = db_config['db_port']
-                    self.__db_host = db_config['db_host']
+            db_config = dict(self.__config['PostgreSQL'])
 
             if 'threshold_min' in db_config:
                 self.__threshold_min = db_config['threshold_min']
 
-    def keep_last_measurements_only(self, table=None):
-        try:
-            connection = psycopg2.connect(user=self.__db_user,
-                                          password=self.__db_pass,
-                                          host=self.__db_host,
-                                          port=self.__db_port,
-                                          database="empower")
-            cursor = connection.cursor()
-            sql_delete_query = 'DELETE FROM ' + str(table) + ' WHERE TIMESTAMP_MS < %s'
-
-            # Keeping only the last measurements (i.e., the last x minutes)
-            cursor.execute(sql_delete_query, (int(round(time.time() - int(self.__threshold_min) * 60)),))
-            connection.commit()
+        self.__writer = get_writer(db_config)
 
-        except (Exception, psycopg2.Error) as error:
-            if (connection):
-                raise ValueError('EmpowerMon could not delete from ' + str(table) + ' with PostgreSQL!')
-        finally:
-            # closing database connection.
-            if (connection):
-                cursor.close()
-                connection.close()
+    @property
+    def writer(self):
+        """Return the write-behind pipeline."""
+
+        return self.__writer
+
+    def keep_last_measurements_only(self, table=None):
+        # Keeping only the last measurements (i.e., the last x minutes)
+        timestamp = int(round(time.time() - int(self.__threshold_min) * 60))
+        self.__writer.delete_older(table, timestamp)
 
     def insert_into_db(self, table, fields, values, crr_time_in_ms=None):
         if isinstance(fields, list) and isinstance(values, list):
             if crr_time_in_ms is None:
                 crr_time_in_ms = int(round(time.time()))
             if fields and values and len(fields) == len(values):
-                fields.append('TIMESTAMP_MS')
-                values.append(crr_time_in_ms)
-                fields_str = ','.join(map(str, fields))
-                values_str = ','.join(['%s'] * len(values))
-                postgres_insert_query = 'INSERT INTO ' + str(table) + ' (' + fields_str + ') VALUES (' + values_str + ')'
-                try:
-                    connection = psycopg2.connect(user=self.__db_user,
-                                                  password=self.__db_pass,
-                                                  host=self.__db_host,
-                                                  port=self.__db_port,
-                                                  database=self.__db_name)
-                    cursor = connection.cursor()
-                    cursor.execute(postgres_insert_query, values)
-                    connection.commit()
-                except (Exception, psycopg2.Error) as error:
-                    if (connection):
-                        raise ValueError('EmpowerMon could not insert into table: ' + str(table) + ' with PostgreSQL!')
-                finally:
-                    # closing database connection.
-                    if (connection):
-                        cursor.close()
-                        connection.close()
+                self.__writer.insert(table,
+                                     fields + ['TIMESTAMP_MS'],
+                                     values + [crr_time_in_ms])
             else:
                 raise ValueError(
                     'EmpowerMon could not insert into table: ' + str(table) + ', fields and values not valid!')
         else:
             raise ValueError(
                 'EmpowerMon could not insert into table: ' + str(table) + ', fields and values must be a list!')
-
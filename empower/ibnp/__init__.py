@@ -27,3 +27,5 @@ PT_UPDATE_ENDPOINT = "update_endpoint"
 PT_REMOVE_ENDPOINT = "remove_endpoint"
 PT_ADD_RULE = "add_rule"
 PT_REMOVE_RULE = "remove_rule"
+PT_ADD_RULES = "add_rules"
+PT_REMOVE_RULES = "remove_rules"
@@ -22,6 +22,7 @@ import json
 
 from uuid import uuid4
 
+import tornado.ioloop
 import tornado.websocket
 
 from empower.datatypes.dpid import DPID
@@ -38,6 +39,12 @@ from empower.ibnp import PT_UPDATE_ENDPOINT
 from empower.ibnp import PT_REMOVE_ENDPOINT
 from empower.ibnp import PT_ADD_RULE
 from empower.ibnp import PT_REMOVE_RULE
+from empower.ibnp import PT_ADD_RULES
+from empower.ibnp import PT_REMOVE_RULES
+from empower.ibnp.ruletable import RuleTable
+from empower.ibnp.ruletable import OFRule
+from empower.ibnp.ruletable import RULE_DOWNLINK
+from empower.ibnp.ruletable import RULE_CLIENT_TO_CLIENT
 
 from empower.core.utils import get_module
 from empower.lvapp.lvappserver import LVAPPServer
@@ -61,7 +68,14 @@ class IBNPMainHandler(tornado.websocket.WebSocketHandler):
 
         self.of_dpid = []
         self.dpid2ep = {}
-        self.of_rules = {}
+        self.of_rules = RuleTable()
+
+        self.__pending_add = {}
+        self.__pending_remove = []
+        self.__flush_scheduled = False
+
+        # uuids of the pending additions never sent to the IBN controller
+        self.__unsent = set()
 
         # map from dscp values to tos
         self.dscp2tos = {'0x00': '0x00',
@@ -105,75 +119,60 @@ class IBNPMainHandler(tornado.websocket.WebSocketHandler):
 
         for lvap in tenant.lvaps.values():
 
-            self._send_add_tr(tenant, lvap, tr.match, tr.dscp, tr.priority)
+            for rule in self._build_rules(tenant, lvap, tr):
+                self._install_rule(rule)
 
     def send_remove_tr(self, tenant_id, match):
 
-        tenant = RUNTIME.tenants[tenant_id]
-
-        if tenant_id not in self.of_rules:
-            return
-
-        tenant_rules = self.of_rules[tenant.tenant_id]
-
-        tr_rule_ids = [(match, _lvap_addr, _of_rule_type) for _match, _lvap_addr, _of_rule_type in tenant_rules
-                       if _match == match]
-
-        for tr_rule_id in tr_rule_ids:
-
-            of_rule_id = tenant_rules[tr_rule_id]
-            self.send_remove_rule(of_rule_id)
-            del tenant_rules[tr_rule_id]
+        for rule in self.of_rules.by_match(tenant_id, match):
+            self._uninstall_rule(rule.key)
 
     def _lvap_join(self, lvap):
 
-        tenant = lvap.tenant
-
         if not self.server.connection:
             return
 
-        if tenant.tenant_id not in self.server.rules:
-            return
+        self._sync_lvap(lvap)
 
-        tenant_rules = self.server.rules[tenant.tenant_id]
+    def _lvap_leave(self, lvap):
 
-        if lvap.tenant.tenant_id not in self.of_rules:
-            self.of_rules[tenant.tenant_id] = {}
+        for rule in self.of_rules.by_lvap(lvap.addr):
+            self._uninstall_rule(rule.key)
 
-        tenant_of_rules = self.of_rules[tenant.tenant_id]
+    def _lvap_handover(self, lvap, _):
 
-        for tr in tenant_rules.values():
+        # ignore handover events if the lvap is not associated
+        if lvap.tenant:
+            self._sync_lvap(lvap)
 
-            if (tr.match, lvap.addr) in tenant_of_rules:
-                continue
+    def _sync_lvap(self, lvap):
+        """Bring the rules of an LVAP in line with its current datapath.
 
-            self._send_add_tr(tenant=tenant,
-                              lvap=lvap,
-                              match=tr.match,
-                              dscp=tr.dscp,
-                              priority=tr.priority)
+        Only the rules that are missing or whose datapath or ports changed
+        are sent, the others are left untouched.
+        """
 
-    def _lvap_leave(self, lvap):
+        tenant = lvap.tenant
+        tenant_rules = self.server.rules.get(tenant.tenant_id, {})
 
-        if lvap.tenant.tenant_id not in self.of_rules:
-            return
+        wanted = {}
 
-        tenant_rules = self.of_rules[lvap.tenant.tenant_id]
+        for tr in tenant_rules.values():
+            for rule in self._build_rules(tenant, lvap, tr):
+                wanted[rule.key] = rule
 
-        tr_rule_ids = [(_, _lvap_addr, _of_rule_type) for _, _lvap_addr, _of_rule_type in tenant_rules
-                       if _lvap_addr == lvap.addr]
+        for rule in self.of_rules.by_lvap(lvap.addr):
+            if rule.key not in wanted:
+                self._uninstall_rule(rule.key)
 
-        for tr_rule_id in tr_rule_ids:
-            of_rule_id = tenant_rules[tr_rule_id]
-            self.send_remove_rule(of_rule_id)
-            del tenant_rules[tr_rule_id]
+        for key, rule in wanted.items():
 
-    def _lvap_handover(self, lvap, _):
+            current = self.of_rules.get(key)
 
-        # ignore handover events if the lvap is not associated
-        if lvap.tenant:
-            self._lvap_leave(lvap)
-            self._lvap_join(lvap)
+            if current and current.location == rule.location:
+                continue
+
+            self._install_rule(rule)
 
     def _of_dp_join(self, dp):
 
@@ -182,7 +181,11 @@ class IBNPMainHandler(tornado.websocket.WebSocketHandler):
         if wtp_addr not in RUNTIME.wtps:
             return
 
-        for lvap in RUNTIME.lvaps.values():
+        # the datapath may have lost the rules that are already installed
+        for rule in self.of_rules.by_dpid(dp.dpid):
+            self._queue_add(rule, new=False)
+
+        for lvap in RUNTIME.lvaps_by_wtp(RUNTIME.wtps[wtp_addr]):
 
             if lvap.wtp.addr != wtp_addr:
                 continue
@@ -192,12 +195,8 @@ class IBNPMainHandler(tornado.websocket.WebSocketHandler):
 
             self._lvap_join(lvap)
 
-    def _send_add_tr(self, tenant, lvap, match, dscp, priority):
-
-        dp = lvap.wtp.datapath
-
-        if dp.dpid not in self.of_dpid:
-            return None
+    def _get_endpoint(self, dp):
+        """Return the traffic rule endpoint of a datapath."""
 
         if dp.dpid not in self.dpid2ep:
 
@@ -227,56 +226,144 @@ class IBNPMainHandler(tornado.websocket.WebSocketHandler):
 
             self.dpid2ep[dp.dpid] = tr_ep
 
-        tr_ep = self.dpid2ep[dp.dpid]
+        return self.dpid2ep[dp.dpid]
+
+    def _build_rules(self, tenant, lvap, tr):
+        """Return the OpenFlow rules implementing tr for lvap.
+
+        The downlink rule goes from the wired port (eth0/eth1) to empower0,
+        the client to client rule from empower0 to empower0. No rule is
+        returned if the datapath of the LVAP has not joined yet.
+        """
+
+        if not lvap.wtp:
+            return []
 
-        of_rule_id = uuid4()
+        dp = lvap.wtp.datapath
+
+        if not dp or dp.dpid not in self.of_dpid:
+            return []
+
+        tr_ep = self._get_endpoint(dp)
+
+        sta_match = Match('%s,dl_dst=%s' % (str(tr.match), lvap.addr))
+        actions = [{'type': 'SET_NW_TOS',
+                    'nw_tos': self.dscp2tos[str(tr.dscp)]}]
+
+        ttp = (tr_ep.uuid, tr_ep.ports[1].virtual_port_id)
+
+        rules = []
+
+        for rule_type, stp in \
+                ((RULE_DOWNLINK, (tr_ep.uuid, tr_ep.ports[0].virtual_port_id)),
+                 (RULE_CLIENT_TO_CLIENT, ttp)):
+
+            of_rule_id = uuid4()
+
+            rule = {'version': '1.0',
+                    'uuid': of_rule_id,
+                    'ttp_uuid': ttp[0],
+                    'ttp_vport': ttp[1],
+                    'stp_uuid': stp[0],
+                    'stp_vport': stp[1],
+                    'match': sta_match.match,
+                    'actions': actions,
+                    'priority': tr.priority}
+
+            rules.append(OFRule(uuid=of_rule_id,
+                                tenant_id=tenant.tenant_id,
+                                match=tr.match,
+                                lvap_addr=lvap.addr,
+                                rule_type=rule_type,
+                                dpid=dp.dpid,
+                                stp=stp,
+                                ttp=ttp,
+                                rule=rule))
 
-        sta_match = Match('%s,dl_dst=%s' % (str(match), lvap.addr))
+        return rules
 
-        rule = {'version': '1.0',
-                'uuid': of_rule_id,
-                'ttp_uuid': tr_ep.uuid,
-                'ttp_vport': tr_ep.ports[1].virtual_port_id,
-                'stp_uuid': tr_ep.uuid,
-                'stp_vport': tr_ep.ports[0].virtual_port_id,
-                'match': sta_match.match,
-                'actions': [{'type': 'SET_NW_TOS',
-                             'nw_tos': self.dscp2tos[str(dscp)]}],
-                'priority': priority}
+    def _install_rule(self, rule):
+        """Add a rule to the table, replacing the one with the same key."""
 
-        self.send_add_rule(rule)
+        old = self.of_rules.add(rule)
 
-        of_rule_type = 'downlink'
-        tr_id = (match, lvap.addr, of_rule_type)
+        if old:
+            self._queue_remove(old.uuid)
 
-        if tenant.tenant_id not in self.of_rules:
-            self.of_rules[tenant.tenant_id] = {}
+        self._queue_add(rule)
 
-        self.of_rules[tenant.tenant_id][tr_id] = of_rule_id
+    def _uninstall_rule(self, key):
+        """Remove a rule from the table."""
 
-        # Creating another OF rule from input port (empower0) to output port (empower0)
-        of_rule_id = uuid4()
+        rule = self.of_rules.remove(key)
 
-        rule = {'version': '1.0',
-                'uuid': of_rule_id,
-                'ttp_uuid': tr_ep.uuid,
-                'ttp_vport': tr_ep.ports[1].virtual_port_id,
-                'stp_uuid': tr_ep.uuid,
-                'stp_vport': tr_ep.ports[1].virtual_port_id,
-                'match': sta_match.match,
-                'actions': [{'type': 'SET_NW_TOS',
-                             'nw_tos': self.dscp2tos[str(dscp)]}],
-                'priority': priority}
+        if rule:
+            self._queue_remove(rule.uuid)
 
-        self.send_add_rule(rule)
+    def _queue_add(self, rule, new=True):
 
-        of_rule_type = 'client_to_client'
-        tr_id = (match, lvap.addr, of_rule_type)
+        if new:
+            self.__unsent.add(rule.uuid)
+
+        self.__pending_add[rule.uuid] = rule.rule
+        self._schedule_flush()
+
+    def _queue_remove(self, rule_uuid):
+
+        self.__pending_add.pop(rule_uuid, None)
+
+        # a rule added and removed before the flush is never sent
+        if rule_uuid in self.__unsent:
+            self.__unsent.discard(rule_uuid)
+            return
+
+        self.__pending_remove.append(rule_uuid)
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+
+        if self.__flush_scheduled:
+            return
 
-        if tenant.tenant_id not in self.of_rules:
-            self.of_rules[tenant.tenant_id] = {}
+        self.__flush_scheduled = True
+        tornado.ioloop.IOLoop.current().add_callback(self.flush_rules)
 
-        self.of_rules[tenant.tenant_id][tr_id] = of_rule_id
+    def flush_rules(self):
+        """Send the pending rule removals and additions.
+
+        Removals are sent before additions. If the IBN controller supports
+        batches (it sets batch in its hello) all the pending removals and
+        additions go out as one message each.
+        """
+
+        self.__flush_scheduled = False
+
+        removes = self.__pending_remove
+        adds = list(self.__pending_add.values())
+
+        self.__pending_remove = []
+        self.__pending_add = {}
+        self.__unsent = set()
+
+        # the socket has been closed in the meantime
+        if not self.ws_connection:
+            return
+
+        if self.server.batch:
+
+            if removes:
+                self.send_remove_rules(removes)
+
+            if adds:
+                self.send_add_rules(adds)
+
+            return
+
+        for rule_uuid in removes:
+            self.send_remove_rule(rule_uuid)
+
+        for rule in adds:
+            self.send_add_rule(rule)
 
     def open(self):
         """On socket opened."""
@@ -328,6 +415,7 @@ class IBNPMainHandler(tornado.websocket.WebSocketHandler):
 
         # reset state
         self.server.connection = None
+        self.server.batch = False
 
     def send_message(self, message_type, message):
         """Add fixed header fields and send message. """
@@ -355,6 +443,7 @@ class IBNPMainHandler(tornado.websocket.WebSocketHandler):
         LOG.info("Hello from IBN seq %u", hello['seq'])
 
         self.server.period = hello['every']
+        self.server.batch = hello.get('batch', False)
         self.server.last_seen = hello['seq']
         self.server.last_seen_ts = time.time()
 
@@ -426,3 +515,13 @@ class IBNPMainHandler(tornado.websocket.WebSocketHandler):
         remove_rule = {'uuid': rule_uuid}
 
         self.send_message(PT_REMOVE_RULE, remove_rule)
+
+    def send_add_rules(self, rules):
+        """Send a batch of add Rule"""
+
+        self.send_message(PT_ADD_RULES, {'rules': rules})
+
+    def send_remove_rules(self, rule_uuids):
+        """Send a batch of remove Rule"""
+
+        self.send_message(PT_REMOVE_RULES, {'uuids': rule_uuids})
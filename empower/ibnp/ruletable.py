@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2018 Giovanni Baggio
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""OpenFlow rule table."""
+
+RULE_DOWNLINK = 'downlink'
+RULE_CLIENT_TO_CLIENT = 'client_to_client'
+
+
+class OFRule:
+    """An OpenFlow rule installed for a traffic rule and an LVAP.
+
+    Attributes:
+        uuid: the rule id on the IBN controller
+        tenant_id: the tenant of the traffic rule
+        match: the traffic rule match
+        lvap_addr: the address of the LVAP
+        rule_type: RULE_DOWNLINK or RULE_CLIENT_TO_CLIENT
+        dpid: the datapath on which the rule is installed
+        stp: the source (endpoint uuid, virtual port id)
+        ttp: the target (endpoint uuid, virtual port id)
+        rule: the rule as sent to the IBN controller
+    """
+
+    __slots__ = ('uuid', 'tenant_id', 'match', 'lvap_addr', 'rule_type',
+                 'dpid', 'stp', 'ttp', 'rule')
+
+    def __init__(self, uuid, tenant_id, match, lvap_addr, rule_type, dpid,
+                 stp, ttp, rule):
+
+        self.uuid = uuid
+        self.tenant_id = tenant_id
+        self.match = match
+        self.lvap_addr = lvap_addr
+        self.rule_type = rule_type
+        self.dpid = dpid
+        self.stp = stp
+        self.ttp = ttp
+        self.rule = rule
+
+    @property
+    def key(self):
+        """Return the (tenant_id, match, lvap_addr, rule_type) key."""
+
+        return (self.tenant_id, self.match, self.lvap_addr, self.rule_type)
+
+    @property
+    def location(self):
+        """Return the (dpid, stp, ttp) the rule is installed on."""
+
+        return (self.dpid, self.stp, self.ttp)
+
+
+class RuleTable:
+    """OpenFlow rules indexed by key, traffic rule, LVAP, and datapath.
+
+    All the lookups are O(1) in the number of installed rules, the returned
+    lists only contain the rules of interest.
+    """
+
+    def __init__(self):
+
+        self.__rules = {}
+        self.__by_match = {}
+        self.__by_lvap = {}
+        self.__by_dpid = {}
+
+    def __len__(self):
+        return len(self.__rules)
+
+    def __contains__(self, key):
+        return key in self.__rules
+
+    def __iter__(self):
+        return iter(list(self.__rules.values()))
+
+    def get(self, key):
+        """Return the rule with the specified key, None if not found."""
+
+        return self.__rules.get(key)
+
+    def add(self, rule):
+        """Add a rule. Return the rule it replaces, if any."""
+
+        old = self.remove(rule.key)
+
+        self.__rules[rule.key] = rule
+
+        self.__by_match.setdefault((rule.tenant_id, rule.match),
+                                   {})[rule.key] = rule
+        self.__by_lvap.setdefault(rule.lvap_addr, {})[rule.key] = rule
+        self.__by_dpid.setdefault(rule.dpid, {})[rule.key] = rule
+
+        return old
+
+    def remove(self, key):
+        """Remove a rule. Return the removed rule, None if not found."""
+
+        rule = self.__rules.pop(key, None)
+
+        if not rule:
+            return None
+
+        self.__unindex(self.__by_match, (rule.tenant_id, rule.match), key)
+        self.__unindex(self.__by_lvap, rule.lvap_addr, key)
+        self.__unindex(self.__by_dpid, rule.dpid, key)
+
+        return rule
+
+    def by_match(self, tenant_id, match):
+        """Return the rules of a traffic rule."""
+
+        return list(self.__by_match.get((tenant_id, match), {}).values())
+
+    def by_lvap(self, lvap_addr):
+        """Return the rules of an LVAP."""
+
+        return list(self.__by_lvap.get(lvap_addr, {}).values())
+
+    def by_dpid(self, dpid):
+        """Return the rules installed on a datapath."""
+
+        return list(self.__by_dpid.get(dpid, {}).values())
+
+    @staticmethod
+    def __unindex(index, value, key):
+
+        rules = index.get(value)
+
+        if rules is None:
+            return
+
+        rules.pop(key, None)
+
+        if not rules:
+            del index[value]
@@ -17,44 +17,148 @@
 
 """EmPOWER logging package."""
 
+import atexit
 import inspect
 import os
+import sys
+import queue
 import logging
+import logging.handlers
 
 PATH = inspect.stack()[0][1]
 EXT_PATH = PATH[0:PATH.rindex(os.sep)]
 EXT_PATH = os.path.dirname(EXT_PATH) + os.sep
 PATH = os.path.dirname(PATH) + os.sep
 
+# Parent of the per-message protocol trace loggers
+TRACE = "trace"
+
+# Levels accepted by set_level()
+LEVELS = ('CRITICAL', 'ERROR', 'WARNING', 'INFO', 'DEBUG', 'NOTSET')
+
+# Logger names already resolved, indexed by source file name
+_NAMES = {}
+
+_LISTENER = None
+
+
+def _resolve_name(filename):
+    """Derive the logger name from a source file name."""
+
+    name = filename
+    if name.endswith('.py'):
+        name = name[0:-3]
+    elif name.endswith('.pyc'):
+        name = name[0:-4]
+    if name.startswith(PATH):
+        name = name[len(PATH):]
+    elif name.startswith(EXT_PATH):
+        name = name[len(EXT_PATH):]
+    name = name.replace('/', '.').replace('\\', '.')
+
+    # Remove double names ("topology.topology" -> "topology")
+    if name.find('.') != -1:
+        toks = name.split('.')
+        if len(toks) >= 2:
+            if toks[-1] == toks[-2]:
+                del toks[-1]
+                name = '.'.join(toks)
+
+    if name.startswith("ext."):
+        name = name.split("ext.", 1)[1]
+
+    if name.endswith(".__init__"):
+        name = name.rsplit(".__init__", 1)[0]
+
+    return name
+
 
 def get_logger(name=None, more_frames=0):
     """Logger factory."""
 
     if name is None:
-        stack = inspect.stack()[1+more_frames]
-        name = stack[1]
-        if name.endswith('.py'):
-            name = name[0:-3]
-        elif name.endswith('.pyc'):
-            name = name[0:-4]
-        if name.startswith(PATH):
-            name = name[len(PATH):]
-        elif name.startswith(EXT_PATH):
-            name = name[len(EXT_PATH):]
-        name = name.replace('/', '.').replace('\\', '.')
-
-        # Remove double names ("topology.topology" -> "topology")
-        if name.find('.') != -1:
-            toks = name.split('.')
-            if len(toks) >= 2:
-                if toks[-1] == toks[-2]:
-                    del toks[-1]
-                    name = '.'.join(toks)
-
-        if name.startswith("ext."):
-            name = name.split("ext.", 1)[1]
-
-        if name.endswith(".__init__"):
-            name = name.rsplit(".__init__", 1)[0]
+
+        # only the caller frame is inspected, names are cached per file
+        filename = sys._getframe(1 + more_frames).f_code.co_filename
+
+        name = _NAMES.get(filename)
+
+        if name is None:
+            name = _resolve_name(filename)
+            _NAMES[filename] = name
 
     return logging.getLogger(name)
+
+
+def get_trace_logger(name=None, more_frames=0):
+    """Protocol trace logger factory.
+
+    Trace loggers are meant for the per-message logs of the southbound
+    protocols. They are children of the TRACE logger so that they can be
+    enabled or silenced as a whole and, once setup_trace() has been called,
+    their records are emitted by a background thread.
+    """
+
+    logger = get_logger(name, more_frames + 1)
+
+    return logging.getLogger(TRACE + "." + logger.name)
+
+
+def setup_trace():
+    """Move the protocol trace output off the calling thread.
+
+    The records of the trace loggers are put in a queue and a QueueListener
+    thread hands them to the handlers of the root logger.
+    """
+
+    global _LISTENER
+
+    if _LISTENER is not None:
+        return
+
+    records = queue.Queue()
+
+    trace = logging.getLogger(TRACE)
+    trace.addHandler(logging.handlers.QueueHandler(records))
+    trace.propagate = False
+
+    _LISTENER = \
+        logging.handlers.QueueListener(records,
+                                       *logging.getLogger().handlers,
+                                       respect_handler_level=True)
+    _LISTENER.start()
+
+    atexit.register(_LISTENER.stop)
+
+
+def get_levels():
+    """Return the level of every configured logger."""
+
+    levels = {'root': logging.getLevelName(logging.getLogger().level)}
+
+    for name in sorted(logging.Logger.manager.loggerDict):
+
+        logger = logging.Logger.manager.loggerDict[name]
+
+        if not isinstance(logger, logging.Logger):
+            continue
+
+        levels[name] = logging.getLevelName(logger.getEffectiveLevel())
+
+    return levels
+
+
+def set_level(name, level):
+    """Set the level of a logger (and of its children) at runtime."""
+
+    if isinstance(level, str):
+        level = level.upper()
+        level_name = level
+    else:
+        level_name = logging.getLevelName(level)
+
+    if level_name not in LEVELS:
+        raise ValueError("Invalid level %s" % level)
+
+    logger = logging.getLogger(None if name == 'root' else name)
+    logger.setLevel(level)
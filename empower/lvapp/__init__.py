@@ -17,6 +17,9 @@
 
 """ LVAPP Server module. """
 
+import struct
+
+from construct import Container
 from construct import Sequence
 from construct import Array
 from construct import Struct
@@ -435,3 +438,100 @@ PT_TYPES = {PT_BYE: None,
 PT_TYPES_HANDLERS = {}
 for k in PT_TYPES:
     PT_TYPES_HANDLERS[k] = []
+
+
+class FastCodec:
+    """Precompiled decoder for fixed-layout LVAPP messages.
+
+    The fixed part of the message is decoded with a precompiled
+    struct.Struct and the optional trailing array of fixed-size entries with
+    struct.iter_unpack. Building and sizeof are delegated to the construct
+    definition, which is also used as a fallback whenever a message can not
+    be decoded by the fast path.
+
+    Attributes:
+        fallback: the construct definition of the message
+        name: the message name (same as the construct one)
+        fmt: struct format of the fixed part of the message
+        fields: field names of the fixed part, in order
+        array: name of the trailing array (optional)
+        entry_fmt: struct format of an array entry (optional)
+        count: function returning the number of entries from the fixed part
+        entry_hook: function applied to every decoded entry (optional)
+    """
+
+    def __init__(self, fallback, fmt, fields, array=None, entry_fmt=None,
+                 count=None, entry_hook=None):
+
+        self.fallback = fallback
+        self.name = fallback.name
+        self.fields = fields
+        self.array = array
+        self.count = count
+        self.entry_hook = entry_hook
+        self.__struct = struct.Struct(fmt)
+        self.__entry = struct.Struct(entry_fmt) if entry_fmt else None
+
+    def sizeof(self):
+        """Return the size of the message (construct version)."""
+
+        return self.fallback.sizeof()
+
+    def build(self, obj):
+        """Build the message (construct version)."""
+
+        return self.fallback.build(obj)
+
+    def parse(self, data):
+        """Parse the message."""
+
+        try:
+            values = self.__struct.unpack_from(data)
+        except struct.error:
+            return self.fallback.parse(data)
+
+        msg = Container(**dict(zip(self.fields, values)))
+
+        if not self.array:
+            return msg
+
+        start = self.__struct.size
+        end = start + self.count(msg) * self.__entry.size
+
+        if len(data) < end:
+            return self.fallback.parse(data)
+
+        entries = list(self.__entry.iter_unpack(data[start:end]))
+
+        if self.entry_hook:
+            entries = [self.entry_hook(entry) for entry in entries]
+
+        setattr(msg, self.array, entries)
+
+        return msg
+
+
+def mcs_flag_hook(index):
+    """Return an entry hook decoding a 16 bits mcs flag at index."""
+
+    def hook(entry):
+        entry = list(entry)
+        entry[index] = Container(mcs=(entry[index] >> 9) & 0x01)
+        return entry
+
+    return hook
+
+
+CODECS = {}
+
+
+def register_codec(pt_type, codec):
+    """Register a fast codec for the specified message type."""
+
+    CODECS[pt_type] = codec
+
+
+register_codec(PT_HELLO,
+               FastCodec(HELLO, "!BBII6sI",
+                         ("version", "type", "length", "seq", "wtp",
+                          "period")))
@@ -19,6 +19,8 @@
 
 import time
 
+from bisect import bisect_left
+
 from construct import UBInt8
 from construct import Bytes
 from construct import Sequence
@@ -35,6 +37,8 @@ from empower.lvapp.lvappserver import ModuleLVAPPWorker
 from empower.core.module import ModulePeriodic
 from empower.core.app import EmpowerApp
 from empower.lvapp import PT_VERSION
+from empower.lvapp import FastCodec
+from empower.lvapp import register_codec
 
 from empower.main import RUNTIME
 
@@ -63,6 +67,14 @@ STATS_RESPONSE = \
            UBInt16("nb_rx"),
            Array(lambda ctx: ctx.nb_tx + ctx.nb_rx, STATS))
 
+register_codec(PT_STATS_RESPONSE,
+               FastCodec(STATS_RESPONSE, "!BBIII6s6sHH",
+                         ("version", "type", "length", "seq", "module_id",
+                          "wtp", "sta", "nb_tx", "nb_rx"),
+                         array="stats",
+                         entry_fmt="!HI",
+                         count=lambda msg: msg.nb_tx + msg.nb_rx))
+
 
 class BinCounter(ModulePeriodic):
     """BinCounter object.
@@ -108,11 +120,24 @@ class BinCounter(ModulePeriodic):
         self.last = None
         self.timestamp = None
 
-    def __eq__(self, other):
+    @property
+    def key(self):
+        """Return the identity key of this module."""
 
-        return super().__eq__(other) and \
-            self.lvap == other.lvap and \
-            self.bins == other.bins
+        return super().key + (self.lvap, self.bins)
+
+    @property
+    def phase_group(self):
+        """Return the WTP of the LVAP, its bin counters are polled together."""
+
+        tenant = RUNTIME.tenants.get(self.tenant_id)
+
+        if not tenant or self.lvap not in tenant.lvaps:
+            return None
+
+        wtp = tenant.lvaps[self.lvap].wtp
+
+        return wtp.addr if wtp else None
 
     @property
     def lvap(self):
@@ -170,108 +195,95 @@ class BinCounter(ModulePeriodic):
 
         return out
 
-    def run_once(self):
-        """ Send out stats request. """
+    def build_request(self):
+        """ Build stats request.
+
+        Returns a (wtp, message) tuple or None if no request must be sent.
+        """
 
         if self.tenant_id not in RUNTIME.tenants:
             self.log.info("Tenant %s not found", self.tenant_id)
             self.unload()
-            return
+            return None
 
         tenant = RUNTIME.tenants[self.tenant_id]
 
         if self.lvap not in tenant.lvaps:
             self.log.info("LVAP %s not found", self.lvap)
             self.unload()
-            return
+            return None
 
         lvap = tenant.lvaps[self.lvap]
 
-        if lvap.wtp is not None:
-            if not lvap.wtp.connection or lvap.wtp.connection.stream.closed():
-                self.log.info("WTP %s not connected", lvap.wtp.addr)
-                self.unload()
-                return
-
-            stats_req = Container(version=PT_VERSION,
-                                  type=PT_STATS_REQUEST,
-                                  length=20,
-                                  seq=lvap.wtp.seq,
-                                  module_id=self.module_id,
-                                  sta=lvap.addr.to_raw())
-
-            self.log.info("Sending %s request to %s @ %s (id=%u)",
-                          self.MODULE_NAME, lvap.addr, lvap.wtp.addr,
-                          self.module_id)
-
-            msg = STATS_REQUEST.build(stats_req)
-            lvap.wtp.connection.stream.write(msg)
+        if lvap.wtp is None:
+            return None
 
-    def fill_bytes_samples(self, data):
-        """ Compute samples.
+        if not lvap.wtp.connection or lvap.wtp.connection.stream.closed():
+            self.log.info("WTP %s not connected", lvap.wtp.addr)
+            self.unload()
+            return None
 
-        Samples are in the following format (after ordering):
+        stats_req = Container(version=PT_VERSION,
+                              type=PT_STATS_REQUEST,
+                              length=20,
+                              seq=lvap.wtp.seq,
+                              module_id=self.module_id,
+                              sta=lvap.addr.to_raw())
 
-        [[60, 3], [66, 2], [74, 1], [98, 40], [167, 2], [209, 2], [1466, 1762]]
+        self.log.info("Sending %s request to %s @ %s (id=%u)",
+                      self.MODULE_NAME, lvap.addr, lvap.wtp.addr,
+                      self.module_id)
 
-        Each 2-tuple has format [ size, count ] where count is the number of packets and
-        size is the size-long (bytes, including the Ethernet 2 header) TX/RX by the LVAP.
+        return lvap.wtp, STATS_REQUEST.build(stats_req)
 
-        """
-
-        samples = sorted(data, key=lambda entry: entry[0])
-        out = [0] * len(self.bins)
+    def run_once(self):
+        """ Send out stats request. """
 
-        for entry in samples:
-            if not entry:
-                continue
-            size = entry[0]
-            count = entry[1]
-            for i in range(0, len(self.bins)):
-                if size <= self.bins[i]:
-                    out[i] = out[i] + size * count
-                    break
+        request = self.build_request()
 
-        return out
+        if request:
+            wtp, msg = request
+            wtp.connection.send_poll(msg, self.module_id)
 
-    def fill_packets_samples(self, data):
-        """ Compute samples.
+    def fill_samples(self, data):
+        """ Compute bytes and packets samples in a single pass.
 
-        Samples are in the following format (after ordering):
+        Samples are in the following format:
 
         [[60, 3], [66, 2], [74, 1], [98, 40], [167, 2], [209, 2], [1466, 1762]]
 
         Each 2-tuple has format [ size, count ] where count is the number of packets and
         size is the size-long (bytes, including the Ethernet 2 header) TX/RX by the LVAP.
 
+        Each entry is classified in the first bin larger than or equal to
+        its size (bins are monotonically increasing). Entries larger than
+        the last bin are discarded.
+
+        Returns a (bytes, packets) tuple of lists.
         """
 
-        samples = sorted(data, key=lambda entry: entry[0])
-        out = [0] * len(self.bins)
+        bins = self.bins
+        nb_bins = len(bins)
+        out_bytes = [0] * nb_bins
+        out_packets = [0] * nb_bins
 
-        for entry in samples:
+        for entry in data:
             if not entry:
                 continue
             size = entry[0]
             count = entry[1]
-            for i in range(0, len(self.bins)):
-                if size <= self.bins[i]:
-                    out[i] = out[i] + count
-                    break
+            i = bisect_left(bins, size)
+            if i < nb_bins:
+                out_bytes[i] += size * count
+                out_packets[i] += count
 
-        return out
+        return out_bytes, out_packets
 
     @classmethod
     def update_stats(cls, delta, last, current):
         """Update stats."""
 
-        stats = []
-
-        for i in range(0, len(last)):
-            diff = current[i] - last[i]
-            stats.append(diff / delta)
-
-        return stats
+        return [(crr - lst) / delta for lst, crr in zip(last, current)]
 
     def handle_response(self, response):
         """Handle an incoming STATS_RESPONSE message.
@@ -292,11 +304,8 @@ class BinCounter(ModulePeriodic):
         old_tx_packets = self.tx_packets
         old_rx_packets = self.rx_packets
 
-        self.tx_bytes = self.fill_bytes_samples(tx_samples)
-        self.rx_bytes = self.fill_bytes_samples(rx_samples)
-
-        self.tx_packets = self.fill_packets_samples(tx_samples)
-        self.rx_packets = self.fill_packets_samples(rx_samples)
+        self.tx_bytes, self.tx_packets = self.fill_samples(tx_samples)
+        self.rx_bytes, self.rx_packets = self.fill_samples(rx_samples)
 
         if self.last:
             delta = time.time() - self.last
@@ -353,9 +362,26 @@ class BinCounter(ModulePeriodic):
 
 
 class BinCounterWorker(ModuleLVAPPWorker):
-    """Counter worker."""
+    """Counter worker.
+
+    The requests of all the bin counters that are due in the same
+    scheduler tick are queued on the WTP send queues, which write them to
+    each WTP with a single write. Responses are dispatched back to each
+    module using the module id.
+    """
+
+    def run_modules(self, modules):
+        """Send out the stats requests of the due modules."""
+
+        for module in modules:
+
+            request = module.build_request()
+
+            if not request:
+                continue
 
-    pass
+            wtp, msg = request
+            wtp.connection.send_poll(msg, module.module_id)
 
 
 def bin_counter(**kwargs):
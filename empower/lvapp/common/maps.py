@@ -31,6 +31,7 @@ from empower.datatypes.etheraddress import EtherAddress
 from empower.core.module import ModulePeriodic
 from empower.core.resourcepool import ResourceBlock
 from empower.lvapp import PT_VERSION
+from empower.lvapp import FastCodec
 
 from empower.main import RUNTIME
 
@@ -63,6 +64,14 @@ POLLER_RESPONSE = Struct("poller_response",
                          UBInt16("nb_entries"),
                          Array(lambda ctx: ctx.nb_entries, POLLER_ENTRY_TYPE))
 
+POLLER_RESPONSE_CODEC = \
+    FastCodec(POLLER_RESPONSE, "!BBIII6sH",
+              ("version", "type", "length", "seq", "module_id", "wtp",
+               "nb_entries"),
+              array="img_entries",
+              entry_fmt="!6sBbIIb",
+              count=lambda msg: msg.nb_entries)
+
 
 class Maps(ModulePeriodic):
     """ A maps poller. """
@@ -81,8 +90,11 @@ class Maps(ModulePeriodic):
         # data structures
         self.maps = {}
 
-    def __eq__(self, other):
-        return super().__eq__(other) and self.block == other.block
+    @property
+    def key(self):
+        """Return the identity key of this module."""
+
+        return super().key + (self.block,)
 
     @property
     def block(self):
@@ -115,19 +127,14 @@ class Maps(ModulePeriodic):
                 raise ValueError("Missing field: wtp")
 
             # Check if block is valid
-            incoming = ResourceBlock(wtp, EtherAddress(value['hwaddr']),
+            block = wtp.lookup_block(EtherAddress(value['hwaddr']),
                                      int(value['channel']),
                                      int(value['band']))
 
-            match = [block for block in wtp.supports if block == incoming]
-
-            if not match:
+            if not block:
                 raise ValueError("No block specified")
 
-            if len(match) > 1:
-                raise ValueError("More than one block specified")
-
-            self._block = match[0]
+            self._block = block
 
     def to_dict(self):
         """ Return a JSON-serializable dictionary. """
@@ -173,7 +180,7 @@ class Maps(ModulePeriodic):
                       self.MODULE_NAME, self.block, self.module_id)
 
         msg = POLLER_REQUEST.build(req)
-        wtp.connection.stream.write(msg)
+        wtp.connection.send_poll(msg, self.module_id)
 
     def handle_response(self, response):
         """Handle an incoming poller response message.
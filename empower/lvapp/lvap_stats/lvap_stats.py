@@ -35,6 +35,9 @@ from empower.datatypes.etheraddress import EtherAddress
 from empower.lvapp.lvappserver import ModuleLVAPPWorker
 from empower.core.module import ModulePeriodic
 from empower.lvapp import PT_VERSION
+from empower.lvapp import FastCodec
+from empower.lvapp import mcs_flag_hook
+from empower.lvapp import register_codec
 
 from empower.main import RUNTIME
 
@@ -67,6 +70,15 @@ RATES_RESPONSE = Struct("rates_response", UBInt8("version"),
                         UBInt16("nb_entries"),
                         Array(lambda ctx: ctx.nb_entries, RATES_ENTRY))
 
+register_codec(PT_RATES_RESPONSE,
+               FastCodec(RATES_RESPONSE, "!BBIII6sH",
+                         ("version", "type", "length", "seq", "module_id",
+                          "wtp", "nb_entries"),
+                         array="rates",
+                         entry_fmt="!BHII",
+                         count=lambda msg: msg.nb_entries,
+                         entry_hook=mcs_flag_hook(1)))
+
 
 class LVAPStats(ModulePeriodic):
     """ LVAPStats object. """
@@ -85,9 +97,11 @@ class LVAPStats(ModulePeriodic):
         self.rates = {}
         self.best_prob = None
 
-    def __eq__(self, other):
+    @property
+    def key(self):
+        """Return the identity key of this module."""
 
-        return super().__eq__(other) and self.lvap == other.lvap
+        return super().key + (self.lvap,)
 
     @property
     def lvap(self):
@@ -146,7 +160,7 @@ class LVAPStats(ModulePeriodic):
                           lvap.addr, lvap.wtp.addr, self.module_id)
 
             msg = RATES_REQUEST.build(rates_req)
-            lvap.wtp.connection.stream.write(msg)
+            lvap.wtp.connection.send_poll(msg, self.module_id)
 
     def handle_response(self, response):
         """Handle an incoming RATES_RESPONSE message.
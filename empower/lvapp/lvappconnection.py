@@ -34,8 +34,13 @@ from empower.core.resourcepool import ResourceBlock
 from empower.core.datapath import Datapath
 from empower.core.networkport import NetworkPort
 from empower.core.utils import get_xid
-from empower.lvapp import HEADER
+from empower.core.framebuffer import FrameBuffer
+from empower.core.framebuffer import READ_CHUNK
+from empower.core.sendqueue import SendQueue
+from empower.core.eventbus import EV_WTP_UP
+from empower.core.eventbus import EV_WTP_DOWN
 from empower.lvapp import PT_VERSION
+from empower.lvapp import CODECS
 from empower.lvapp import PT_BYE
 from empower.lvapp import PT_REGISTER
 from empower.lvapp import PT_AUTH_RESPONSE
@@ -115,27 +120,36 @@ class LVAPPConnection:
       hosting that LVAP. Other WTPs will report probe requests to the AC
       where they will be silently ignored.
 
+    Outgoing messages go through a SendQueue, so all the messages sent to
+    the WTP in the same IOLoop iteration are written at once and periodic
+    poll requests can be shed when the WTP falls behind.
+
     Attributes:
         stream: The stream object used to talk with the WTP.
+        send_queue: The outbound queue of the stream.
         addr: The connection source address, i.e. the WTP IP address.
         server: Pointer to the server object.
         wtp: Pointer to a WTP object.
     """
 
     def __init__(self, stream, addr, server):
+        self.log = empower.logger.get_logger()
+        self.trace = empower.logger.get_trace_logger()
         self.stream = stream
         self.stream.set_nodelay(True)
         self.addr = addr
         self.server = server
         self.wtp = None
+        self.send_queue = SendQueue(stream)
         self.stream.set_close_callback(self._on_disconnect)
-        self.__buffer = b''
+        self.__buffer = FrameBuffer("!I", 2)
         self._hb_interval_ms = 500
         self._hb_worker = tornado.ioloop.PeriodicCallback(self._heartbeat_cb,
                                                           self._hb_interval_ms)
         self._hb_worker.start()
+        # the first read may complete immediately, everything used by the
+        # message handlers must be set before waiting
         self._wait()
-        self.log = empower.logger.get_logger()
 
     def to_dict(self):
         """Return dict representation of object."""
@@ -154,28 +168,22 @@ class LVAPPConnection:
                 self.stream.close()
 
     def _on_read(self, future):
-        """ Appends bytes read from socket to a buffer. Once the full packet
-        has been read the parser is invoked and the buffers is cleared. The
-        parsed packet is then passed to the suitable method or dropped if the
+        """ Appends bytes read from socket to a buffer. Every complete packet
+        in the buffer is then passed to the suitable method or dropped if the
         packet type in unknown. """
 
         try:
             line = future.result()
-            self.__buffer = self.__buffer + line
+            self.__buffer.feed(line)
         except StreamClosedError as stream_ex:
             self.log.error(stream_ex)
             return
 
-        hdr = HEADER.parse(self.__buffer)
-
-        if len(self.__buffer) < hdr.length:
-            remaining = hdr.length - len(self.__buffer)
-            future = self.stream.read_bytes(remaining)
-            future.add_done_callback(self._on_read)
-            return
-
         try:
-            self._trigger_message(hdr.type)
+            for frame in self.__buffer.frames():
+                self._trigger_message(frame)
+                if self.stream.closed():
+                    break
         except Exception as ex:
             self.log.exception(ex)
             self.stream.close()
@@ -183,17 +191,25 @@ class LVAPPConnection:
         if not self.stream.closed():
             self._wait()
 
-    def _trigger_message(self, msg_type):
+    def _trigger_message(self, frame):
+
+        # the message type is the second byte of the header
+        msg_type = frame[1]
 
         if msg_type not in self.server.pt_types:
             self.log.error("Unknown message type %u", msg_type)
             return
 
-        if self.server.pt_types[msg_type]:
+        parser = self.server.pt_types[msg_type]
 
-            msg_name = self.server.pt_types[msg_type].name
+        if parser:
 
-            msg = self.server.pt_types[msg_type].parse(self.__buffer)
+            # use the precompiled codec if one is available
+            parser = CODECS.get(msg_type, parser)
+
+            msg_name = parser.name
+
+            msg = parser.parse(frame)
             addr = EtherAddress(msg.wtp)
 
             try:
@@ -205,23 +221,23 @@ class LVAPPConnection:
 
             valid = [PT_HELLO]
             if not wtp.connection and msg_type not in valid:
-                self.log.info("Got %s message from disconnected %s seq %u",
-                              msg_name,
-                              EtherAddress(addr),
-                              msg.seq)
+                self.trace.info("Got %s message from disconnected %s seq %u",
+                                msg_name,
+                                EtherAddress(addr),
+                                msg.seq)
                 return
 
-            self.log.info("Got %s message from %s seq %u",
-                          msg_name,
-                          EtherAddress(addr),
-                          msg.seq)
+            self.trace.info("Got %s message from %s seq %u",
+                            msg_name,
+                            EtherAddress(addr),
+                            msg.seq)
 
             valid = [PT_HELLO, PT_CAPS_RESPONSE]
             if not wtp.is_online() and msg_type not in valid:
                 self.log.info("WTP %s not ready", wtp.addr)
                 return
 
-            handler_name = "_handle_%s" % self.server.pt_types[msg_type].name
+            handler_name = "_handle_%s" % msg_name
 
             if hasattr(self, handler_name):
                 handler = getattr(self, handler_name)
@@ -231,10 +247,12 @@ class LVAPPConnection:
                 for handler in self.server.pt_types_handlers[msg_type]:
                     handler(wtp, msg)
 
+            # handlers may have changed the WTP state in place
+            wtp.touch()
+
     def _wait(self):
         """ Wait for incoming packets on signalling channel """
-        self.__buffer = b''
-        future = self.stream.read_bytes(6)
+        future = self.stream.read_bytes(READ_CHUNK, partial=True)
         future.add_done_callback(self._on_read)
 
     def _on_disconnect(self):
@@ -246,24 +264,19 @@ class LVAPPConnection:
         self.log.info("WTP disconnected: %s", self.wtp.addr)
 
         # remove hosted lvaps
-        for lvap in list(RUNTIME.lvaps.values()):
-            wtps = [x.radio for x in lvap.blocks]
-            if self.wtp in wtps:
-                RUNTIME.remove_lvap(lvap.addr)
+        for lvap in RUNTIME.lvaps_by_wtp(self.wtp):
+            RUNTIME.remove_lvap(lvap.addr)
 
         # remove hosted vaps
-        for tenant_id in list(RUNTIME.tenants.keys()):
-            for vap_id in list(RUNTIME.tenants[tenant_id].vaps.keys()):
-                vap = RUNTIME.tenants[tenant_id].vaps[vap_id]
-                if vap.block.radio == self.wtp:
-                    self.log.info("Deleting VAP: %s", vap.bssid)
-                    del RUNTIME.tenants[tenant_id].vaps[vap.bssid]
+        for vap in RUNTIME.vaps_by_wtp(self.wtp):
+            self.log.info("Deleting VAP: %s", vap.bssid)
+            RUNTIME.remove_vap(vap)
 
         # reset state
         self.wtp.set_disconnected()
         self.wtp.last_seen = 0
         self.wtp.connection = None
-        self.wtp.supports = set()
+        self.wtp.clear_blocks()
         self.wtp.datapath = None
         self.wtp = None
 
@@ -281,18 +294,34 @@ class LVAPPConnection:
         msg.seq = self.wtp.seq
         msg.type = msg_type
 
-        self.log.info("Sending %s message to %s seq %u",
-                      parser.name,
-                      self.wtp,
-                      msg.seq)
+        self.trace.info("Sending %s message to %s seq %u",
+                        parser.name,
+                        self.wtp,
+                        msg.seq)
 
-        self.stream.write(parser.build(msg))
+        self.send_queue.put(parser.build(msg))
 
         if hasattr(msg, 'module_id'):
             return msg.module_id
 
         return 0
 
+    def send_raw(self, msg):
+        """Send an already built control message."""
+
+        self.send_queue.put(msg)
+
+    def send_poll(self, msg, module_id):
+        """Send an already built poll request.
+
+        The request replaces the one of the same module still in the queue,
+        and is dropped if the WTP is falling behind.
+        """
+
+        if not self.send_queue.put_poll(msg, module_id):
+            self.trace.info("Dropping poll request %u to %s, %u bytes pending",
+                            module_id, self.wtp, self.send_queue.pending)
+
     def _handle_add_lvap_response(self, _, status):
         """Handle an incoming ADD_LVAP_RESPONSE message.
         Args:
@@ -374,7 +403,7 @@ class LVAPPConnection:
         for block in caps.blocks:
             hwaddr = EtherAddress(block[0])
             r_block = ResourceBlock(wtp, hwaddr, block[1], block[2])
-            wtp.supports.add(r_block)
+            wtp.add_block(r_block)
 
         for port in caps.ports:
 
@@ -436,7 +465,7 @@ class LVAPPConnection:
                 vap = VAP(bssid, block, tenant)
 
                 self.send_add_vap(vap)
-                tenant.vaps[bssid] = vap
+                RUNTIME.add_vap(vap)
 
     def update_slices(self):
         """Update active Slices."""
@@ -453,8 +482,8 @@ class LVAPPConnection:
                 if (not slc.wifi['wtps'] or slc.wifi['wtps'] and
                         self.wtp.addr in slc.wifi['wtps']):
 
-                    for block in self.wtp.supports:
-                        self.wtp.connection.send_set_slice(block, slc)
+                    # the wtp may have lost its slices, send them all
+                    tenant.push_slice(self.wtp, slc, force=True)
 
     def _handle_probe_request(self, wtp, request):
         """Handle an incoming PROBE_REQUEST message.
@@ -465,9 +494,9 @@ class LVAPPConnection:
         """
 
         # Check if block is valid
-        valid = wtp.get_block(request.hwaddr, request.channel, request.band)
+        block = wtp.lookup_block(request.hwaddr, request.channel, request.band)
 
-        if not valid:
+        if not block:
             self.log.warning("No valid intersection found. Ignoring request.")
             return
 
@@ -515,7 +544,7 @@ class LVAPPConnection:
             lvap.supported_band = request.supported_band
 
             # this will trigger an LVAP ADD message
-            lvap.blocks = valid[0]
+            lvap.blocks = block
 
             # save LVAP in the runtime
             RUNTIME.lvaps[sta] = lvap
@@ -677,9 +706,9 @@ class LVAPPConnection:
         sta = EtherAddress(status.sta)
 
         # Check if block is valid
-        valid = wtp.get_block(status.hwaddr, status.channel, status.band)
+        block = wtp.lookup_block(status.hwaddr, status.channel, status.band)
 
-        if not valid:
+        if not block:
             self.log.warning("No valid intersection found. Removing block.")
             wtp.connection.send_del_lvap(sta)
             return
@@ -712,13 +741,17 @@ class LVAPPConnection:
 
         # received downlink block but a different downlink block is already
         # present, delete before going any further
-        if set_mask and lvap.blocks[0] and lvap.blocks[0] != valid[0]:
+        if set_mask and lvap.blocks[0] and lvap.blocks[0] != block:
             lvap.blocks[0].radio.connection.send_del_lvap(sta)
 
+        old_blocks = lvap.blocks
+
         if set_mask:
-            lvap._downlink = valid[0]
+            lvap._downlink = block
         else:
-            lvap._uplink.append(valid[0])
+            lvap._uplink.append(block)
+
+        RUNTIME.update_lvap_index(lvap, old_blocks)
 
         # if this is not a DL+UL block then stop here
         if not set_mask:
@@ -758,14 +791,14 @@ class LVAPPConnection:
         """
 
         # Check if block is valid
-        valid = wtp.get_block(status.hwaddr, status.channel, status.band)
+        block = wtp.lookup_block(status.hwaddr, status.channel, status.band)
 
-        if not valid:
+        if not block:
             self.log.warning("No valid intersection found. Removing block.")
             return
 
         sta = EtherAddress(status.sta)
-        tx_policy = valid[0].tx_policies[sta]
+        tx_policy = block.tx_policies[sta]
 
         tx_policy.set_mcs([float(x) / 2 for x in status.mcs])
         tx_policy.set_ht_mcs([int(x) for x in status.ht_mcs])
@@ -797,16 +830,16 @@ class LVAPPConnection:
             return
 
         # Check if block is valid
-        valid = wtp.get_block(status.hwaddr, status.channel, status.band)
+        block = wtp.lookup_block(status.hwaddr, status.channel, status.band)
 
-        if not valid:
+        if not block:
             self.log.warning("No valid intersection found.")
             return
 
         # check if slice is valid
         if dscp not in tenant.slices:
             self.log.warning("DSCP %s not found. Removing slice.", dscp)
-            self.send_del_slice(valid[0], ssid, dscp)
+            self.send_del_slice(block, ssid, dscp)
             return
 
         slc = tenant.slices[dscp]
@@ -829,6 +862,8 @@ class LVAPPConnection:
                 slc.wifi['wtps'][wtp.addr] = {'static-properties': {}}
             slc.wifi['wtps'][wtp.addr]['static-properties']['scheduler'] = status.scheduler
 
+        tenant.mark_slice_pushed(block, slc)
+
         self.log.info("Slice %s updated", slc)
 
     def _handle_status_vap(self, wtp, status):
@@ -848,17 +883,17 @@ class LVAPPConnection:
             return
 
         # Check if block is valid
-        valid = wtp.get_block(status.hwaddr, status.channel, status.band)
+        block = wtp.lookup_block(status.hwaddr, status.channel, status.band)
 
-        if not valid:
+        if not block:
             self.log.warning("No valid intersection found. Removing VAP.")
             wtp.connection.send_del_vap(bssid)
             return
 
         # If the VAP does not exists, then create a new one
         if bssid not in tenant.vaps:
-            vap = VAP(bssid, valid, tenant)
-            tenant.vaps[bssid] = vap
+            vap = VAP(bssid, block, tenant)
+            RUNTIME.add_vap(vap)
 
         vap = tenant.vaps[bssid]
 
@@ -1028,9 +1063,7 @@ class LVAPPConnection:
     def send_bye_message_to_self(self):
         """Send a unsollicited BYE message to senf."""
 
-        for tenant in RUNTIME.tenants.values():
-            for app in tenant.components.values():
-                app.wtp_down(self.wtp)
+        RUNTIME.events.publish(EV_WTP_DOWN, self.wtp, wtp=self.wtp.addr)
 
         for handler in self.server.pt_types_handlers[PT_BYE]:
             handler(self.wtp)
@@ -1038,9 +1071,7 @@ class LVAPPConnection:
     def send_register_message_to_self(self):
         """Send a unsollicited REGISTER message to senf."""
 
-        for tenant in RUNTIME.tenants.values():
-            for app in tenant.components.values():
-                app.wtp_up(self.wtp)
+        RUNTIME.events.publish(EV_WTP_UP, self.wtp, wtp=self.wtp.addr)
 
         for handler in self.server.pt_types_handlers[PT_REGISTER]:
             handler(self.wtp)
@@ -1050,22 +1081,11 @@ class LVAPPConnection:
 
         ssid = slc.tenant.tenant_name
 
-        amsdu_aggregation = slc.wifi['static-properties']['amsdu_aggregation']
-        quantum = slc.wifi['static-properties']['quantum']
-        scheduler = slc.wifi['static-properties']['scheduler']
-
-        if self.wtp.addr in slc.wifi['wtps']:
-
-            static = slc.wifi['wtps'][self.wtp.addr]['static-properties']
-
-            if 'amsdu_aggregation' in static:
-                amsdu_aggregation = static['amsdu_aggregation']
-
-            if 'quantum' in static:
-                quantum = static['quantum']
+        props = slc.wifi_properties(self.wtp.addr)
 
-            if 'scheduler' in static:
-                scheduler = static['scheduler']
+        amsdu_aggregation = props['amsdu_aggregation']
+        quantum = props['quantum']
+        scheduler = props['scheduler']
 
         flags = Container(amsdu_aggregation=amsdu_aggregation)
 
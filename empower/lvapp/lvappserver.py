@@ -70,10 +70,12 @@ class ModuleLVAPPWorker(ModuleWorker):
 
         module = self.modules[message.module_id]
 
-        self.log.info("Received %s response (id=%u) from %s",
-                      self.module.MODULE_NAME, message.module_id, pnfdev.addr)
+        self.trace.info("Received %s response (id=%u) from %s",
+                        self.module.MODULE_NAME, message.module_id,
+                        pnfdev.addr)
 
         module.handle_response(message)
+        module.touch()
 
 
 class LVAPPServer(PNFPServer, TCPServer):
@@ -98,9 +100,11 @@ class LVAPPServer(PNFPServer, TCPServer):
     def send_lvap_leave_message_to_self(self, lvap):
         """Send an LVAP_LEAVE message to self."""
 
-        for tenant in RUNTIME.tenants.values():
-            for app in tenant.components.values():
-                app.lvap_leave(lvap)
+        tenant_id = lvap.tenant.tenant_id if lvap.tenant else None
+
+        RUNTIME.events.publish(PT_LVAP_LEAVE, lvap, tenant_id=tenant_id,
+                               wtp=lvap.wtp.addr if lvap.wtp else None,
+                               blocks=lvap.blocks)
 
         for handler in self.pt_types_handlers[PT_LVAP_LEAVE]:
             handler(lvap)
@@ -108,9 +112,11 @@ class LVAPPServer(PNFPServer, TCPServer):
     def send_lvap_join_message_to_self(self, lvap):
         """Send an LVAP_JOIN message to self."""
 
-        for tenant in RUNTIME.tenants.values():
-            for app in tenant.components.values():
-                app.lvap_join(lvap)
+        tenant_id = lvap.tenant.tenant_id if lvap.tenant else None
+
+        RUNTIME.events.publish(PT_LVAP_JOIN, lvap, tenant_id=tenant_id,
+                               wtp=lvap.wtp.addr if lvap.wtp else None,
+                               blocks=lvap.blocks)
 
         for handler in self.pt_types_handlers[PT_LVAP_JOIN]:
             handler(lvap)
@@ -118,9 +124,12 @@ class LVAPPServer(PNFPServer, TCPServer):
     def send_lvap_handover_message_to_self(self, lvap, source_blocks):
         """Send an LVAP_HANDOVER message to self."""
 
-        for tenant in RUNTIME.tenants.values():
-            for app in tenant.components.values():
-                app.lvap_handover(lvap, source_blocks)
+        tenant_id = lvap.tenant.tenant_id if lvap.tenant else None
+
+        RUNTIME.events.publish(PT_LVAP_HANDOVER, lvap, source_blocks,
+                               tenant_id=tenant_id,
+                               wtp=lvap.wtp.addr if lvap.wtp else None,
+                               blocks=lvap.blocks)
 
         for handler in self.pt_types_handlers[PT_LVAP_HANDOVER]:
             handler(lvap, source_blocks)
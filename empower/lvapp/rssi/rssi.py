@@ -27,7 +27,6 @@ from construct import UBInt16
 from construct import UBInt32
 from construct import Bytes
 
-from empower.core.resourcepool import ResourceBlock
 from empower.lvapp.lvappserver import ModuleLVAPPWorker
 from empower.lvapp import PT_VERSION
 from empower.core.app import EmpowerApp
@@ -99,13 +98,12 @@ class RSSI(ModuleTrigger):
         self.wtps = []
         self.event = None
 
-    def __eq__(self, other):
+    @property
+    def key(self):
+        """Return the identity key of this module."""
 
-        return super().__eq__(other) and \
-            self.lvap == other.lvap and \
-            self.relation == other.relation and \
-            self.value == other.value and \
-            self.period == other.period
+        return super().key + \
+            (self.lvap, self.relation, self.value, self.period)
 
     @property
     def lvap(self):
@@ -211,7 +209,7 @@ class RSSI(ModuleTrigger):
         self.wtps.append(wtp)
 
         msg = ADD_RSSI_TRIGGER.build(req)
-        wtp.connection.stream.write(msg)
+        wtp.connection.send_raw(msg)
 
     def remove_rssi_from_wtp(self, wtp):
         """Remove RSSI to WTP."""
@@ -234,7 +232,7 @@ class RSSI(ModuleTrigger):
         self.wtps.remove(wtp)
 
         msg = DEL_RSSI_TRIGGER.build(req)
-        wtp.connection.stream.write(msg)
+        wtp.connection.send_raw(msg)
 
     def handle_response(self, response):
         """ Handle an incoming RSSI_TRIGGER message.
@@ -254,15 +252,14 @@ class RSSI(ModuleTrigger):
         if wtp_addr not in RUNTIME.tenants[self.tenant_id].wtps:
             return
 
-        hwaddr = EtherAddress(response.hwaddr)
-        channel = response.channel
-        band = response.band
-        incoming = ResourceBlock(wtp, hwaddr, channel, band)
+        block = wtp.lookup_block(response.hwaddr, response.channel,
+                                 response.band)
 
-        match = [block for block in wtp.supports if block == incoming]
+        if not block:
+            return
 
         self.event = \
-            {'block': match[0],
+            {'block': block,
              'timestamp': datetime.now().strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
              'current': response.current}
 
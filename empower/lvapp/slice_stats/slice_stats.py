@@ -31,6 +31,8 @@ from empower.lvapp.lvappserver import ModuleLVAPPWorker
 from empower.core.module import ModulePeriodic
 from empower.core.resourcepool import ResourceBlock
 from empower.lvapp import PT_VERSION
+from empower.lvapp import FastCodec
+from empower.lvapp import register_codec
 
 from empower.main import RUNTIME
 
@@ -67,6 +69,14 @@ SLICE_STATS_RESPONSE = \
            UBInt32("deficit_avg"),
            UBInt32("deficit"))
 
+register_codec(PT_SLICE_STATS_RESPONSE,
+               FastCodec(SLICE_STATS_RESPONSE, "!BBIII6s9I",
+                         ("version", "type", "length", "seq", "module_id",
+                          "wtp", "deficit_used", "max_queue_length",
+                          "crr_queue_length", "tx_packets", "tx_bytes",
+                          "queue_delay_sec", "queue_delay_usec",
+                          "deficit_avg", "deficit")))
+
 
 class SliceStats(ModulePeriodic):
     """SliceStats object.
@@ -97,10 +107,11 @@ class SliceStats(ModulePeriodic):
         # data structures
         self.slice_stats = {}
 
-    def __eq__(self, other):
+    @property
+    def key(self):
+        """Return the identity key of this module."""
 
-        return super().__eq__(other) and self.block == other.block and \
-          self.dscp == other.dscp
+        return super().key + (self.block, self.dscp)
 
     @property
     def dscp(self):
@@ -142,19 +153,14 @@ class SliceStats(ModulePeriodic):
                 raise ValueError("Missing field: wtp")
 
             # Check if block is valid
-            incoming = ResourceBlock(wtp, EtherAddress(value['hwaddr']),
+            block = wtp.lookup_block(EtherAddress(value['hwaddr']),
                                      int(value['channel']),
                                      int(value['band']))
 
-            match = [block for block in wtp.supports if block == incoming]
-
-            if not match:
+            if not block:
                 raise ValueError("No block specified")
 
-            if len(match) > 1:
-                raise ValueError("More than one block specified")
-
-            self._block = match[0]
+            self._block = block
 
     def to_dict(self):
         """ Return a JSON-serializable."""
@@ -203,7 +209,7 @@ class SliceStats(ModulePeriodic):
                               ssid=tenant.tenant_name.to_raw())
 
         msg = SLICE_STATS_REQUEST.build(stats_req)
-        wtp.connection.stream.write(msg)
+        wtp.connection.send_poll(msg, self.module_id)
 
     def handle_response(self, response):
         """Handle an incoming STATS_RESPONSE message.
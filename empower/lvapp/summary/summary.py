@@ -35,6 +35,9 @@ from construct import Bit
 from empower.core.app import EmpowerApp
 from empower.datatypes.etheraddress import EtherAddress
 from empower.lvapp import PT_VERSION
+from empower.lvapp import FastCodec
+from empower.lvapp import mcs_flag_hook
+from empower.lvapp import register_codec
 from empower.lvapp.lvappserver import ModuleLVAPPWorker
 from empower.core.resourcepool import ResourceBlock
 from empower.core.module import ModuleScheduled
@@ -81,6 +84,15 @@ SUMMARY_TRIGGER = Struct("summary", UBInt8("version"),
                          UBInt16("nb_entries"),
                          Array(lambda ctx: ctx.nb_entries, SUMMARY_ENTRY))
 
+register_codec(PT_SUMMARY,
+               FastCodec(SUMMARY_TRIGGER, "!BBIII6sH",
+                         ("version", "type", "length", "seq", "module_id",
+                          "wtp", "nb_entries"),
+                         array="frames",
+                         entry_fmt="!6s6sQHHbBBBI",
+                         count=lambda msg: msg.nb_entries,
+                         entry_hook=mcs_flag_hook(3)))
+
 DEL_SUMMARY = Struct("del_summary", UBInt8("version"),
                      UBInt8("type"),
                      UBInt32("length"),
@@ -107,12 +119,11 @@ class Summary(ModuleScheduled):
         # data structures
         self.frames = []
 
-    def __eq__(self, other):
+    @property
+    def key(self):
+        """Return the identity key of this module."""
 
-        return super().__eq__(other) and \
-            self.addr == other.addr and \
-            self.block == other.block and \
-            self.limit == other.limit
+        return super().key + (self.addr, self.block, self.limit)
 
     @property
     def addr(self):
@@ -155,19 +166,14 @@ class Summary(ModuleScheduled):
                 raise ValueError("Missing field: wtp")
 
             # Check if block is valid
-            incoming = ResourceBlock(wtp, EtherAddress(value['hwaddr']),
+            block = wtp.lookup_block(EtherAddress(value['hwaddr']),
                                      int(value['channel']),
                                      int(value['band']))
 
-            match = [block for block in wtp.supports if block == incoming]
-
-            if not match:
+            if not block:
                 raise ValueError("No block specified")
 
-            if len(match) > 1:
-                raise ValueError("More than one block specified")
-
-            self._block = match[0]
+            self._block = block
 
     @property
     def period(self):
@@ -247,7 +253,7 @@ class Summary(ModuleScheduled):
                       self.MODULE_NAME, self.block, self.module_id)
 
         msg = ADD_SUMMARY.build(req)
-        wtp.connection.stream.write(msg)
+        wtp.connection.send_raw(msg)
 
     def handle_response(self, response):
         """Handle an incoming response message.
@@ -32,6 +32,8 @@ from empower.core.module import ModulePeriodic
 from empower.core.app import EmpowerApp
 from empower.core.resourcepool import ResourceBlock
 from empower.lvapp import PT_VERSION
+from empower.lvapp import FastCodec
+from empower.lvapp import register_codec
 
 from empower.main import RUNTIME
 
@@ -64,6 +66,14 @@ TXP_BIN_COUNTER_RESPONSE = \
            UBInt16("nb_tx"),
            Array(lambda ctx: ctx.nb_tx, STATS))
 
+register_codec(PT_TXP_BIN_COUNTER_RESPONSE,
+               FastCodec(TXP_BIN_COUNTER_RESPONSE, "!BBIII6sH",
+                         ("version", "type", "length", "seq", "module_id",
+                          "wtp", "nb_tx"),
+                         array="stats",
+                         entry_fmt="!HI",
+                         count=lambda msg: msg.nb_tx))
+
 
 class TXPBinCounter(ModulePeriodic):
     """ PacketsCounter object. """
@@ -84,12 +94,11 @@ class TXPBinCounter(ModulePeriodic):
         self.tx_packets = []
         self.tx_bytes = []
 
-    def __eq__(self, other):
+    @property
+    def key(self):
+        """Return the identity key of this module."""
 
-        return super().__eq__(other) and \
-            self.mcast == other.mcast and \
-            self.block == other.block and \
-            self.bins == other.bins
+        return super().key + (self.mcast, self.block, self.bins)
 
     @property
     def mcast(self):
@@ -128,6 +137,7 @@ class TXPBinCounter(ModulePeriodic):
                 raise ValueError("bins values must be positive")
 
             self._bins = bins
+            return
 
         raise ValueError("empty bins")
 
@@ -161,19 +171,14 @@ class TXPBinCounter(ModulePeriodic):
                 raise ValueError("Missing field: wtp")
 
             # Check if block is valid
-            incoming = ResourceBlock(wtp, EtherAddress(value['hwaddr']),
+            block = wtp.lookup_block(EtherAddress(value['hwaddr']),
                                      int(value['channel']),
                                      int(value['band']))
 
-            match = [block for block in wtp.supports if block == incoming]
-
-            if not match:
+            if not block:
                 raise ValueError("No block specified")
 
-            if len(match) > 1:
-                raise ValueError("More than one block specified")
-
-            self._block = match[0]
+            self._block = block
 
     def to_dict(self):
         """ Return a JSON-serializable dictionary representing the Stats """
@@ -225,7 +230,7 @@ class TXPBinCounter(ModulePeriodic):
                       self.module_id)
 
         msg = TXP_BIN_COUNTER_REQUEST.build(stats_req)
-        wtp.connection.stream.write(msg)
+        wtp.connection.send_poll(msg, self.module_id)
 
     def fill_bytes_samples(self, data):
         """ Compute samples.
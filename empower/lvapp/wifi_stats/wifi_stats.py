@@ -32,6 +32,8 @@ from empower.datatypes.etheraddress import EtherAddress
 from empower.core.module import ModulePeriodic
 from empower.core.resourcepool import ResourceBlock
 from empower.lvapp import PT_VERSION
+from empower.lvapp import FastCodec
+from empower.lvapp import register_codec
 
 from empower.main import RUNTIME
 
@@ -61,6 +63,14 @@ WIFI_STATS_RESPONSE = Struct("wifi_stats_response", UBInt8("version"),
                              UBInt16("nb_entries"),
                              Array(lambda ctx: ctx.nb_entries, ENTRY_TYPE))
 
+register_codec(PT_WIFI_STATS_RESPONSE,
+               FastCodec(WIFI_STATS_RESPONSE, "!BBIII6sH",
+                         ("version", "type", "length", "seq", "module_id",
+                          "wtp", "nb_entries"),
+                         array="entries",
+                         entry_fmt="!BII",
+                         count=lambda msg: msg.nb_entries))
+
 
 class WiFiStats(ModulePeriodic):
     """Wi-Fi Stats."""
@@ -82,8 +92,11 @@ class WiFiStats(ModulePeriodic):
         self.ed_per_second = 0
         self.last = {}
 
-    def __eq__(self, other):
-        return super().__eq__(other) and self.block == other.block
+    @property
+    def key(self):
+        """Return the identity key of this module."""
+
+        return super().key + (self.block,)
 
     @property
     def block(self):
@@ -115,19 +128,14 @@ class WiFiStats(ModulePeriodic):
                 raise ValueError("Missing field: wtp")
 
             # Check if block is valid
-            incoming = ResourceBlock(wtp, EtherAddress(value['hwaddr']),
+            block = wtp.lookup_block(EtherAddress(value['hwaddr']),
                                      int(value['channel']),
                                      int(value['band']))
 
-            match = [block for block in wtp.supports if block == incoming]
-
-            if not match:
+            if not block:
                 raise ValueError("No block specified")
 
-            if len(match) > 1:
-                raise ValueError("More than one block specified")
-
-            self._block = match[0]
+            self._block = block
 
         else:
 
@@ -177,7 +185,7 @@ class WiFiStats(ModulePeriodic):
                       self.MODULE_NAME, self.block, self.module_id)
 
         msg = WIFI_STATS_REQUEST.build(req)
-        wtp.connection.stream.write(msg)
+        wtp.connection.send_poll(msg, self.module_id)
 
     def handle_response(self, response):
         """Handle an incoming poller response message.
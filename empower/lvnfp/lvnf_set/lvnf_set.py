@@ -48,12 +48,11 @@ class LVNFSet(ModulePeriodic):
         self.samples = None
         self.retcode = None
 
-    def __eq__(self, other):
+    @property
+    def key(self):
+        """Return the identity key of this module."""
 
-        return super().__eq__(other) and \
-            self.lvnf == other.lvnf and \
-            self.handler == other.handler and \
-            self.value == other.value
+        return super().key + (self.lvnf, self.handler, self.value)
 
     @property
     def handler(self):
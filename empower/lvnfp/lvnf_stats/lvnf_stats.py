@@ -52,9 +52,11 @@ class LVNFStats(ModulePeriodic):
     def lvnf(self, value):
         self._lvnf = UUID(str(value))
 
-    def __eq__(self, other):
+    @property
+    def key(self):
+        """Return the identity key of this module."""
 
-        return super().__eq__(other) and self.lvnf == other.lvnf
+        return super().key + (self.lvnf,)
 
     def to_dict(self):
         """Return a JSON-serializable representation of this object."""
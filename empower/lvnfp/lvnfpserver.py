@@ -84,10 +84,11 @@ class ModuleLVNFPWorker(ModuleWorker):
 
         module = self.modules[msg['module_id']]
 
-        self.log.info("Received %s response (id=%u)", self.module.MODULE_NAME,
-                      msg['module_id'])
+        self.trace.info("Received %s response (id=%u)",
+                        self.module.MODULE_NAME, msg['module_id'])
 
         module.handle_response(msg)
+        module.touch()
 
 
 class LVNFPServer(PNFPServer, tornado.web.Application):
@@ -28,6 +28,8 @@ import inspect
 import types
 import tornado.ioloop
 
+import empower.logger
+
 from empower.core.core import EmpowerRuntime
 
 RUNTIME = None
@@ -268,6 +270,9 @@ def _setup_logging():
         logging.config.fileConfig(_OPTIONS.log_config,
                                   disable_existing_loggers=False)
 
+    # per-message protocol logs are written by a background thread
+    empower.logger.setup_trace()
+
 
 def _pre_startup():
     """Perform pre-startup operation.
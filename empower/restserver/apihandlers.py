@@ -22,16 +22,25 @@ import base64
 import re
 
 from uuid import UUID
+from uuid import uuid4
 
 import tornado.web
 import tornado.httpserver
 
 from empower.core.account import ROLE_ADMIN, ROLE_USER
-from empower.core.jsonserializer import EmpowerEncoder
+from empower.core.jsonserializer import dumps
+from empower.core.versioned import etag_key
 from empower.main import RUNTIME
 
 import empower.logger
 
+# Maximum number of serialized responses kept by the REST server
+JSON_CACHE_SIZE = 128
+
+# Versions restart from scratch with the controller, the ETags of different
+# runs must not match
+ETAG_PREFIX = uuid4().hex[:8]
+
 
 class EmpowerAPIHandler(tornado.web.RequestHandler):
     """ Base class for all the REST call. """
@@ -41,6 +50,9 @@ class EmpowerAPIHandler(tornado.web.RequestHandler):
               'PUT': [ROLE_ADMIN],
               'DELETE': [ROLE_ADMIN]}
 
+    # set by write_as_json when If-None-Match matches the ETag
+    __not_modified = False
+
     def initialize(self, server=None):
         """Set pointer to actual rest server."""
 
@@ -60,10 +72,89 @@ class EmpowerAPIHandler(tornado.web.RequestHandler):
         self.finish(json.dumps(out))
 
     def write_as_json(self, value):
-        """Return reply as a json document."""
+        """Return reply as a json document.
+
+        The document is compact unless the pretty query argument is set.
+        Versioned values (and collections of versioned values) get an ETag
+        derived from their version counters: if it matches If-None-Match
+        a 304 is returned without serializing the value, otherwise the
+        last serialization of the same URL is reused if still current.
+        """
+
+        pretty = self.get_query_argument("pretty", None) is not None
+
+        key = etag_key(value) if self.request.method == "GET" else None
+
+        if key is None:
+            self.write(dumps(value, pretty))
+            return
+
+        etag = '"%s-%u-%x"' % (ETAG_PREFIX, pretty,
+                               hash(key) & 0xFFFFFFFFFFFFFFFF)
+
+        self.set_header("Etag", etag)
+
+        # the reply is turned into a 304 when finishing the request
+        if self.check_etag_header():
+            self.__not_modified = True
+            return
+
+        cache = self.application.json_cache
+        cache_key = (self.request.path, pretty)
+        cached = cache.get(cache_key)
+
+        if cached and cached[0] == etag:
+            cache.move_to_end(cache_key)
+            self.write(cached[1])
+            return
+
+        data = dumps(value, pretty)
+
+        cache[cache_key] = (etag, data)
+        cache.move_to_end(cache_key)
+
+        if len(cache) > JSON_CACHE_SIZE:
+            cache.popitem(last=False)
+
+        self.write(data)
+
+    def paginate(self, values):
+        """Return the page of values selected by the offset/limit arguments.
+
+        The total number of values is returned in the X-Total-Count header.
+
+        Raises:
+            ValueError, if offset or limit are not valid
+        """
+
+        offset = int(self.get_query_argument("offset", 0))
+        limit = self.get_query_argument("limit", None)
+
+        if offset < 0:
+            raise ValueError("Invalid offset %d" % offset)
+
+        values = list(values)
+
+        self.set_header("X-Total-Count", len(values))
+
+        if limit is None:
+            return values[offset:]
+
+        limit = int(limit)
+
+        if limit < 0:
+            raise ValueError("Invalid limit %d" % limit)
+
+        return values[offset:offset + limit]
+
+    def finish(self, chunk=None):
+        """Finish the request, replying 304 if the resource is unchanged."""
+
+        if self.__not_modified and self.get_status() == 200:
+            self.clear_header('Content-Type')
+            self.set_status(304)
 
-        self.write(json.dumps(value, sort_keys=True, indent=4,
-                              cls=EmpowerEncoder))
+        return super().finish(chunk)
 
     def prepare(self):
         """Prepare to handler reply."""
@@ -17,6 +17,8 @@
 
 """Exposes a RESTful interface for EmPOWER."""
 
+import collections
+
 from uuid import UUID
 from uuid import uuid4
 from importlib import import_module
@@ -29,7 +31,8 @@ from empower import settings
 from empower.core.account import ROLE_ADMIN, ROLE_USER
 from empower.restserver.apihandlers import EmpowerAPIHandler
 from empower.restserver.apihandlers import EmpowerAPIHandlerUsers
-from empower.core.module import ModuleWorker
+from empower.restserver.stream import StreamHub
+from empower.restserver.stream import StreamHandler
 from empower.main import RUNTIME
 from empower.core.tenant import T_TYPE_UNIQUE
 from empower.datatypes.ssid import SSID
@@ -682,6 +685,10 @@ class TenantSliceHandler(EmpowerAPIHandlerUsers):
 
         Check Slice object documentation for descriptors examples.
 
+        The slice is written to the database at the next IOLoop iteration.
+        A slice rejected by the database (e.g. an IntegrityError) is still
+        answered with 201 and is then removed, check the slice with a GET.
+
         Args:
             tenant_id: network name of a tenant
             dscp: the slice DSCP (optional)
@@ -730,6 +737,10 @@ class TenantSliceHandler(EmpowerAPIHandlerUsers):
 
         Check Slice object documentation for descriptors examples.
 
+        The slice is written to the database at the next IOLoop iteration.
+        An update rejected by the database (e.g. an IntegrityError) is still
+        answered with 204 and is then reverted, check the slice with a GET.
+
         Args:
             tenant_id: network name of a tenant
             dscp: the slice DSCP (optional)
@@ -1348,8 +1359,8 @@ class TrafficRuleHandler(EmpowerAPIHandler):
 
             for rule in tenant.traffic_rules.values():
 
-                rule['tenant_id'] = tenant.tenant_id
-                traffic_rules.append(rule)
+                # the rules are shared with the tenant, do not modify them
+                traffic_rules.append(dict(rule, tenant_id=tenant.tenant_id))
 
         return traffic_rules
 
@@ -1385,23 +1396,6 @@ class ModuleHandler(EmpowerAPIHandlerUsers):
                 r"/api/v1/tenants/([a-zA-Z0-9:-]*)/modules/([a-zA-Z_.]*)/"
                 "([0-9]*)/?"]
 
-    @classmethod
-    def __get_worker(cls, module_name):
-        """Look for the worker associated to the specified module_name."""
-
-        worker = None
-
-        for value in RUNTIME.components.values():
-
-            if not isinstance(value, ModuleWorker):
-                continue
-
-            if value.module.MODULE_NAME == module_name:
-                worker = value
-                break
-
-        return worker
-
     def get(self, *args, **kwargs):
         """List traffic rules .
 
@@ -1411,9 +1405,16 @@ class ModuleHandler(EmpowerAPIHandlerUsers):
             module_name: the name of the module
             module_id: the id of the module
 
+        Query arguments:
+
+            offset: the index of the first module listed (default 0)
+            limit: the maximum number of modules listed (default all)
+
         Example URLs:
 
             GET /api/v1/tenants/52313ecb-9d00-4b7d-b873-b55d3d9ada26/wifi_stats
+            GET /api/v1/tenants/52313ecb-9d00-4b7d-b873-b55d3d9ada26/wifi_stats?
+              offset=100&limit=50
         """
 
         try:
@@ -1422,21 +1423,21 @@ class ModuleHandler(EmpowerAPIHandlerUsers):
                 raise ValueError("Invalid URL")
 
             module_name = str(args[1])
-            worker = self.__get_worker(module_name)
+            worker = RUNTIME.modules.get_worker(module_name)
 
             if not worker:
                 raise KeyError("Unable to find module %s" % module_name)
 
             tenant_id = UUID(args[0])
 
-            resp = {k: v for k, v in worker.modules.items()
-                    if v.tenant_id == tenant_id}
-
             if len(args) == 2:
-                self.write_as_json(resp.values())
+                modules = RUNTIME.modules.modules(tenant_id, module_name)
+                self.write_as_json(self.paginate(modules))
             else:
                 module_id = int(args[2])
-                self.write_as_json(resp[module_id])
+                self.write_as_json(RUNTIME.modules.get_module(tenant_id,
+                                                              module_name,
+                                                              module_id))
 
         except KeyError as ex:
             self.send_error(404, message=ex)
@@ -1465,7 +1466,7 @@ class ModuleHandler(EmpowerAPIHandlerUsers):
                 raise ValueError("Invalid URL")
 
             module_name = str(args[1])
-            worker = self.__get_worker(module_name)
+            worker = RUNTIME.modules.get_worker(module_name)
 
             if not worker:
                 raise KeyError("Unable to find module %s" % module_name)
@@ -1517,15 +1518,12 @@ class ModuleHandler(EmpowerAPIHandlerUsers):
             module_id = int(args[2])
 
             module_name = str(args[1])
-            worker = self.__get_worker(module_name)
 
-            if not worker:
+            if not RUNTIME.modules.get_worker(module_name):
                 raise KeyError("Unable to find module %s" % module_name)
 
-            module = worker.modules[module_id]
-
-            if module.tenant_id != tenant_id:
-                raise KeyError("Module %u not found" % module_id)
+            module = RUNTIME.modules.get_module(tenant_id, module_name,
+                                                module_id)
 
             module.unload()
 
@@ -1576,6 +1574,113 @@ class DocHandler(EmpowerAPIHandlerUsers):
         self.write('\n'.join(accum))
 
 
+class SchedulerHandler(EmpowerAPIHandler):
+    """Scheduler handler. Used to view the periodic modules scheduler."""
+
+    HANDLERS = [r"/api/v1/scheduler/?"]
+
+    @validate()
+    def get(self, *args, **kwargs):
+        """Returns the scheduler metrics (tick lag and overruns).
+
+        Args:
+            None
+
+        Example URLs:
+            GET /api/v1/scheduler
+        """
+
+        return RUNTIME.scheduler
+
+
+class CallbacksHandler(EmpowerAPIHandler):
+    """Callbacks handler. Used to view the remote callbacks executor."""
+
+    HANDLERS = [r"/api/v1/callbacks/?"]
+
+    @validate()
+    def get(self, *args, **kwargs):
+        """Returns the remote callbacks counters.
+
+        Args:
+            None
+
+        Example URLs:
+            GET /api/v1/callbacks
+        """
+
+        return RUNTIME.callbacks
+
+
+class EventsHandler(EmpowerAPIHandler):
+    """Events handler. Used to view the event bus subscriptions."""
+
+    HANDLERS = [r"/api/v1/events/?"]
+
+    @validate()
+    def get(self, *args, **kwargs):
+        """Returns the event bus subscriptions and dispatch times.
+
+        Args:
+            None
+
+        Example URLs:
+            GET /api/v1/events
+        """
+
+        return RUNTIME.events
+
+
+class LoggingHandler(EmpowerAPIHandler):
+    """Logging handler. Used to view and change the log levels."""
+
+    HANDLERS = [r"/api/v1/logging/?",
+                r"/api/v1/logging/([a-zA-Z0-9_.]*)/?"]
+
+    @validate(min_args=0, max_args=1)
+    def get(self, *args, **kwargs):
+        """Returns the level of the loggers.
+
+        Args:
+            [0]: the logger name (optional)
+
+        Example URLs:
+            GET /api/v1/logging
+            GET /api/v1/logging/trace
+        """
+
+        levels = empower.logger.get_levels()
+
+        return levels if not args else levels[args[0]]
+
+    @validate(returncode=204,
+              min_args=1,
+              max_args=1,
+              input_schema={
+                  "version": {"type": float, "mandatory": True},
+                  "level": {"type": str, "mandatory": True}
+              })
+    def put(self, *args, **kwargs):
+        """Set the level of a logger and of its children.
+
+        Args:
+            [0]: the logger name, e.g. lvapp or trace
+
+        Request:
+            version: protocol version (1.0)
+            level: the new level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
+
+        Example URLs:
+            PUT /api/v1/logging/trace
+            {
+              "version" : 1.0,
+              "level" : "WARNING"
+            }
+        """
+
+        empower.logger.set_level(args[0], kwargs['level'])
+
+
 class RESTServer(tornado.web.Application):
     """Exposes the REST API."""
 
@@ -1584,7 +1689,8 @@ class RESTServer(tornado.web.Application):
         "static_path": settings.STATIC_PATH,
         "debug": settings.DEBUG,
         "cookie_secret": settings.COOKIE_SECRET,
-        "login_url": "/auth/login"
+        "login_url": "/auth/login",
+        "compress_response": True
     }
 
     def __init__(self, port, cert, key):
@@ -1595,6 +1701,12 @@ class RESTServer(tornado.web.Application):
         self.handlers = []
         self.log = empower.logger.get_logger()
 
+        # serialized responses by (path, pretty), see write_as_json
+        self.json_cache = collections.OrderedDict()
+
+        # clients of the websocket stream, see StreamHandler
+        self.stream_hub = StreamHub()
+
         tornado.web.Application.__init__(self, [], **self.parms)
 
         if not cert or not key:
@@ -1614,7 +1726,9 @@ class RESTServer(tornado.web.Application):
                            TenantSliceHandler, TenantEndpointHandler,
                            TenantEndpointNextHandler, IndexHandler,
                            TenantEndpointPortHandler, TenantTrafficRuleHandler,
-                           TrafficRuleHandler, SliceHandler, DocHandler]
+                           TrafficRuleHandler, SliceHandler, SchedulerHandler,
+                           CallbacksHandler, LoggingHandler, EventsHandler,
+                           DocHandler, StreamHandler]
 
         for handler_class in handler_classes:
             self.add_handler_class(handler_class, http_server)
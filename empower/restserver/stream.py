@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2018 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Push the changes of the runtime state over a WebSocket."""
+
+import base64
+import collections
+import time
+
+from uuid import UUID
+
+import tornado.escape
+import tornado.ioloop
+import tornado.websocket
+
+import empower.logger
+
+from empower.core.account import ROLE_ADMIN
+from empower.core.eventbus import EV_WTP_UP
+from empower.core.eventbus import EV_WTP_DOWN
+from empower.core.jsonserializer import dumps
+from empower.core.module import EV_MODULE_RESULT
+from empower.core.tenant import EV_SLICE_CHANGE
+from empower.core.tenant import SLICE_DEL
+from empower.lvapp import PT_LVAP_JOIN
+from empower.lvapp import PT_LVAP_LEAVE
+from empower.lvapp import PT_LVAP_HANDOVER
+from empower.main import RUNTIME
+
+TOPIC_WTPS = "wtps"
+TOPIC_LVAPS = "lvaps"
+TOPIC_SLICES = "slices"
+TOPIC_MODULES = "modules"
+
+TOPICS = [TOPIC_WTPS, TOPIC_LVAPS, TOPIC_SLICES, TOPIC_MODULES]
+
+# Minimum and default time between two messages sent to a client (ms)
+MIN_INTERVAL = 100
+DEFAULT_INTERVAL = 500
+
+# Maximum number of changes waiting to be sent to a client, a client
+# falling behind is sent a new snapshot instead
+MAX_PENDING = 1000
+
+
+class StreamClient:
+    """A client of the stream.
+
+    Changes are coalesced by object, so only the last change of every object
+    is sent. The state of the objects is serialized when the changes are
+    sent, not when they are raised.
+
+    Attributes:
+        handler: the websocket handler of the client
+        tenant_ids: the tenants the client is interested in (None for all,
+            admins only)
+        topics: the topics the client is interested in
+        interval: the minimum time between two messages (ms)
+    """
+
+    def __init__(self, handler, tenant_ids, topics, interval):
+
+        self.handler = handler
+        self.tenant_ids = tenant_ids
+        self.topics = topics
+        self.interval = interval
+
+        self.seq = 0
+        self.resync = True
+        self.pending = collections.OrderedDict()
+        self.last_sent = 0
+        self.writing = None
+
+    def accepts(self, topic, tenant_id):
+        """Return True if the client is interested in the change."""
+
+        if topic not in self.topics:
+            return False
+
+        if self.tenant_ids is None:
+            return True
+
+        # wtps are shared by all the tenants, but not visible without one
+        if topic == TOPIC_WTPS:
+            return bool(self.tenant_ids)
+
+        return tenant_id in self.tenant_ids
+
+    def push(self, topic, event, key, obj):
+        """Queue a change."""
+
+        if self.resync:
+            return
+
+        # keep the order of the last change
+        self.pending.pop((topic, key), None)
+        self.pending[(topic, key)] = (event, obj)
+
+        if len(self.pending) > MAX_PENDING:
+            self.pending.clear()
+            self.resync = True
+
+    def ready(self, now):
+        """Return True if a message can be sent to the client now."""
+
+        if not self.resync and not self.pending:
+            return False
+
+        # the previous message has not been sent yet
+        if self.writing and not self.writing.done():
+            return False
+
+        return (now - self.last_sent) * 1000 >= self.interval
+
+    def send(self, msg_type, body):
+        """Send a message to the client.
+
+        The body is the already serialized remainder of the message.
+        """
+
+        self.seq += 1
+        self.last_sent = time.time()
+
+        message = '{"type":"%s","seq":%u,%s}' % (msg_type, self.seq, body)
+
+        try:
+            self.writing = self.handler.write_message(message)
+        except tornado.websocket.WebSocketClosedError:
+            self.writing = None
+
+
+class StreamHub:
+    """Collect the changes of the runtime state and send them to the clients.
+
+    The hub subscribes to the event bus only while there are clients. All
+    the clients are served by the same periodic callback, so an object
+    changed is serialized once per tick regardless of the number of the
+    clients interested in it.
+    """
+
+    def __init__(self):
+
+        self.clients = []
+
+        self.__periodic = None
+        self.__cache = {}
+
+        self.log = empower.logger.get_logger()
+
+    def add_client(self, client):
+        """Add a new client."""
+
+        if not self.clients:
+            self.__start()
+
+        self.clients.append(client)
+
+    def remove_client(self, client):
+        """Remove a client."""
+
+        if client not in self.clients:
+            return
+
+        self.clients.remove(client)
+
+        if not self.clients:
+            self.__stop()
+
+    def __start(self):
+
+        events = RUNTIME.events
+
+        events.subscribe(PT_LVAP_JOIN, self._lvap_join, owner=self)
+        events.subscribe(PT_LVAP_LEAVE, self._lvap_leave, owner=self)
+        events.subscribe(PT_LVAP_HANDOVER, self._lvap_handover, owner=self)
+        events.subscribe(EV_WTP_UP, self._wtp_up, owner=self)
+        events.subscribe(EV_WTP_DOWN, self._wtp_down, owner=self)
+        events.subscribe(EV_SLICE_CHANGE, self._slice_change, owner=self)
+        events.subscribe(EV_MODULE_RESULT, self._module_result, owner=self)
+
+        self.__periodic = \
+            tornado.ioloop.PeriodicCallback(self.flush, MIN_INTERVAL)
+        self.__periodic.start()
+
+    def __stop(self):
+
+        RUNTIME.events.unsubscribe_owner(self)
+
+        self.__periodic.stop()
+        self.__periodic = None
+
+    def _lvap_join(self, lvap):
+
+        tenant_id = lvap.tenant.tenant_id if lvap.tenant else None
+        self.__dispatch(TOPIC_LVAPS, "join", tenant_id, lvap.addr, lvap)
+
+    def _lvap_leave(self, lvap):
+
+        tenant_id = lvap.tenant.tenant_id if lvap.tenant else None
+        self.__dispatch(TOPIC_LVAPS, "leave", tenant_id, lvap.addr, None)
+
+    def _lvap_handover(self, lvap, _):
+
+        tenant_id = lvap.tenant.tenant_id if lvap.tenant else None
+        self.__dispatch(TOPIC_LVAPS, "handover", tenant_id, lvap.addr, lvap)
+
+    def _wtp_up(self, wtp):
+
+        self.__dispatch(TOPIC_WTPS, "up", None, wtp.addr, wtp)
+
+    def _wtp_down(self, wtp):
+
+        self.__dispatch(TOPIC_WTPS, "down", None, wtp.addr, wtp)
+
+    def _slice_change(self, slc, operation):
+
+        key = "%s:%s" % (slc.tenant.tenant_id, slc.dscp)
+        obj = slc if operation != SLICE_DEL else None
+
+        self.__dispatch(TOPIC_SLICES, operation, slc.tenant.tenant_id, key,
+                        obj)
+
+    def _module_result(self, module):
+
+        key = "%s:%u" % (module.module_type, module.module_id)
+
+        self.__dispatch(TOPIC_MODULES, "result", module.tenant_id, key,
+                        module)
+
+    def __dispatch(self, topic, event, tenant_id, key, obj):
+
+        for client in self.clients:
+            if client.accepts(topic, tenant_id):
+                client.push(topic, event, str(key), obj)
+
+    def __serialize(self, obj):
+        """Serialize an object at most once per tick."""
+
+        if obj is None:
+            return "null"
+
+        if id(obj) not in self.__cache:
+            self.__cache[id(obj)] = dumps(obj)
+
+        return self.__cache[id(obj)]
+
+    def flush(self):
+        """Send the pending changes to the clients that are ready."""
+
+        now = time.time()
+
+        try:
+
+            for client in self.clients:
+
+                if not client.ready(now):
+                    continue
+
+                if client.resync:
+                    client.resync = False
+                    client.pending.clear()
+                    client.send("snapshot", self.snapshot(client))
+                    continue
+
+                events = []
+
+                for (topic, key), (event, obj) in client.pending.items():
+                    events.append('{"topic":"%s","event":"%s","key":%s,'
+                                  '"data":%s}' % (topic, event, dumps(key),
+                                                  self.__serialize(obj)))
+
+                client.pending.clear()
+
+                client.send("deltas", '"events":[%s]' % ",".join(events))
+
+        finally:
+
+            # objects may change before the next tick
+            self.__cache.clear()
+
+    def snapshot(self, client):
+        """Return the serialized state the client is interested in."""
+
+        tenants = [tenant for tenant in RUNTIME.tenants.values()
+                   if client.tenant_ids is None or
+                   tenant.tenant_id in client.tenant_ids]
+
+        out = {}
+
+        if TOPIC_WTPS in client.topics:
+            visible = client.tenant_ids is None or client.tenant_ids
+            out[TOPIC_WTPS] = list(RUNTIME.wtps.values()) if visible else []
+
+        if TOPIC_LVAPS in client.topics:
+            out[TOPIC_LVAPS] = [lvap for tenant in tenants
+                                for lvap in tenant.lvaps.values()]
+
+        if TOPIC_SLICES in client.topics:
+            out[TOPIC_SLICES] = [slc for tenant in tenants
+                                 for slc in tenant.slices.values()]
+
+        if TOPIC_MODULES in client.topics:
+            out[TOPIC_MODULES] = [module for tenant in tenants
+                                  for module in RUNTIME.modules.modules(
+                                      tenant.tenant_id)]
+
+        return '"data":%s' % dumps(out)
+
+
+class StreamHandler(tornado.websocket.WebSocketHandler):
+    """Stream of the changes of the runtime state.
+
+    The client receives a snapshot of the current state followed by the
+    changes. Changes are coalesced and sent at most every interval ms. A
+    client that falls behind receives a new snapshot.
+
+    Query arguments:
+
+        tenant_id: the tenants of interest, can be repeated (default all
+            the tenants the user can access)
+        topics: comma separated list of topics (default all)
+        interval: the minimum time between two messages in ms
+
+    Client messages:
+
+        {"type": "subscribe", "tenant_ids": [...], "topics": [...],
+         "interval": 500}, change the subscription and get a new snapshot
+        {"type": "resync"}, get a new snapshot
+
+    Example URLs:
+
+        ws://127.0.0.1:8888/api/v1/stream?topics=lvaps,wtps
+    """
+
+    HANDLERS = [r"/api/v1/stream/?"]
+
+    def initialize(self, server=None):
+        """Set pointer to actual rest server."""
+
+        self.server = server
+        self.account = None
+        self.client = None
+        self.log = empower.logger.get_logger()
+
+    def get_current_user(self):
+        """Return the username from the cookie or the basic auth header."""
+
+        if self.get_secure_cookie("username"):
+            return self.get_secure_cookie("username").decode('UTF-8')
+
+        auth_header = self.request.headers.get('Authorization')
+
+        if auth_header is None or not auth_header.startswith('Basic '):
+            return None
+
+        auth_bytes = bytes(auth_header[6:], 'utf-8')
+        auth_decoded = base64.b64decode(auth_bytes).decode()
+        username, password = auth_decoded.split(':', 2)
+
+        if not RUNTIME.check_permission(username, password):
+            return None
+
+        return username
+
+    def prepare(self):
+        """Authenticate the client."""
+
+        username = self.get_current_user()
+
+        if not username or username not in RUNTIME.accounts:
+            self.set_header('WWW-Authenticate', 'Basic realm=Restricted')
+            self.send_error(401)
+            return
+
+        self.account = RUNTIME.get_account(username)
+
+    def __parse(self, tenant_ids, topics, interval):
+        """Validate a subscription. Return tenant_ids, topics, interval."""
+
+        tenant_ids = set(UUID(str(tenant_id)) for tenant_id in tenant_ids)
+
+        if self.account.role == ROLE_ADMIN:
+
+            # admins only see all the tenants unless they pick some
+            if not tenant_ids:
+                tenant_ids = None
+
+        else:
+
+            owned = set(tenant.tenant_id
+                        for tenant in RUNTIME.tenants.values()
+                        if tenant.owner == self.account.username)
+
+            # users always get an explicit, possibly empty, set
+            if not tenant_ids:
+                tenant_ids = owned
+
+            for tenant_id in tenant_ids:
+                if tenant_id not in owned:
+                    raise KeyError(tenant_id)
+
+        topics = set(topics) if topics else set(TOPICS)
+
+        for topic in topics:
+            if topic not in TOPICS:
+                raise ValueError("Invalid topic %s" % topic)
+
+        interval = int(interval)
+
+        if interval < MIN_INTERVAL:
+            raise ValueError("Invalid interval %u" % interval)
+
+        return tenant_ids, topics, interval
+
+    def open(self, *args, **kwargs):
+        """Register the client."""
+
+        topics = self.get_query_argument("topics", "")
+
+        try:
+
+            tenant_ids, topics, interval = \
+                self.__parse(self.get_query_arguments("tenant_id"),
+                             [t for t in topics.split(",") if t],
+                             self.get_query_argument("interval",
+                                                     DEFAULT_INTERVAL))
+
+        except (KeyError, ValueError) as ex:
+            self.log.warning("Invalid stream request: %s", ex)
+            self.close(1008, "Invalid subscription")
+            return
+
+        self.client = StreamClient(self, tenant_ids, topics, interval)
+        self.application.stream_hub.add_client(self.client)
+
+    def on_message(self, message):
+        """Handle a client message."""
+
+        if not self.client:
+            return
+
+        try:
+
+            request = tornado.escape.json_decode(message)
+
+            if request["type"] == "resync":
+                self.client.resync = True
+                return
+
+            if request["type"] != "subscribe":
+                raise ValueError("Invalid message type %s" % request["type"])
+
+            tenant_ids, topics, interval = \
+                self.__parse(request.get("tenant_ids", []),
+                             request.get("topics", []),
+                             request.get("interval", self.client.interval))
+
+        except (KeyError, TypeError, ValueError) as ex:
+            self.log.warning("Invalid stream message: %s", ex)
+            return
+
+        self.client.tenant_ids = tenant_ids
+        self.client.topics = topics
+        self.client.interval = interval
+        self.client.resync = True
+
+    def on_close(self):
+        """Unregister the client."""
+
+        if self.client:
+            self.application.stream_hub.remove_client(self.client)
@@ -118,10 +118,11 @@ class UEMeasurements(ModulePeriodic):
         # set this for auto-cleanup
         self.vbs = None
 
-    def __eq__(self, other):
+    @property
+    def key(self):
+        """Return the identity key of this module."""
 
-        return super().__eq__(other) and self.ue == other.ue and \
-            self.rrc_measurements_param == other.rrc_measurements_param
+        return super().key + (self.ue, self.rrc_measurements_param)
 
     @property
     def rrc_measurements_param(self):
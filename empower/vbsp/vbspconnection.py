@@ -67,6 +67,8 @@ from empower.vbsp import SET_RAN_MAC_SLICE_REQUEST
 from empower.core.cellpool import Cell
 from empower.core.ue import UE
 from empower.core.utils import get_xid
+from empower.core.framebuffer import FrameBuffer
+from empower.core.framebuffer import READ_CHUNK
 
 from empower.main import RUNTIME
 
@@ -95,13 +97,14 @@ class VBSPConnection:
         self.server = server
         self.vbs = None
         self.stream.set_close_callback(self._on_disconnect)
-        self.__buffer = b''
+        self.__buffer = FrameBuffer("!H", 22)
         self._hb_interval_ms = 500
         self._hb_worker = tornado.ioloop.PeriodicCallback(self._heartbeat_cb,
                                                           self._hb_interval_ms)
         self._hb_worker.start()
         self._wait()
         self.log = empower.logger.get_logger()
+        self.trace = empower.logger.get_trace_logger()
 
     def to_dict(self):
         """Return dict representation of object."""
@@ -119,28 +122,22 @@ class VBSPConnection:
                 self.stream.close()
 
     def _on_read(self, future):
-        """ Appends bytes read from socket to a buffer. Once the full packet
-        has been read the parser is invoked and the buffers is cleared. The
-        parsed packet is then passed to the suitable method or dropped if the
+        """ Appends bytes read from socket to a buffer. Every complete packet
+        in the buffer is then passed to the suitable method or dropped if the
         packet type in unknown. """
 
         try:
             line = future.result()
-            self.__buffer = self.__buffer + line
+            self.__buffer.feed(line)
         except StreamClosedError as stream_ex:
             self.log.error(stream_ex)
             return
 
-        hdr = HEADER.parse(self.__buffer)
-
-        if len(self.__buffer) < hdr.length:
-            remaining = hdr.length - len(self.__buffer)
-            future = self.stream.read_bytes(remaining)
-            future.add_done_callback(self._on_read)
-            return
-
         try:
-            self._trigger_message(hdr)
+            for frame in self.__buffer.frames():
+                self._trigger_message(frame)
+                if self.stream.closed():
+                    break
         except Exception as ex:
             self.log.exception(ex)
             self.stream.close()
@@ -148,16 +145,18 @@ class VBSPConnection:
         if not self.stream.closed():
             self._wait()
 
-    def _trigger_message(self, hdr):
+    def _trigger_message(self, frame):
+
+        hdr = HEADER.parse(frame)
 
         if hdr.type == E_TYPE_SINGLE:
-            event = E_SINGLE.parse(self.__buffer[HEADER.sizeof():])
+            event = E_SINGLE.parse(frame[HEADER.sizeof():])
             offset = HEADER.sizeof() + E_SINGLE.sizeof()
         elif hdr.type == E_TYPE_SCHED:
-            event = E_SCHED.parse(self.__buffer[HEADER.sizeof():])
+            event = E_SCHED.parse(frame[HEADER.sizeof():])
             offset = HEADER.sizeof() + E_SCHED.sizeof()
         elif hdr.type == E_TYPE_TRIG:
-            event = E_TRIG.parse(self.__buffer[HEADER.sizeof():])
+            event = E_TRIG.parse(frame[HEADER.sizeof():])
             offset = HEADER.sizeof() + E_TRIG.sizeof()
         else:
             self.log.error("Unknown event %u", hdr.type)
@@ -171,7 +170,7 @@ class VBSPConnection:
 
         if self.server.pt_types[msg_type]:
 
-            msg = self.server.pt_types[msg_type].parse(self.__buffer[offset:])
+            msg = self.server.pt_types[msg_type].parse(frame[offset:])
             msg_name = self.server.pt_types[msg_type].name
 
             addr = EtherAddress(hdr.enbid[2:8])
@@ -188,18 +187,18 @@ class VBSPConnection:
 
             valid = [EP_ACT_HELLO]
             if not self.vbs.is_connected() and msg_type not in valid:
-                self.log.info("Got %s message from disconnected VBS %s seq %u",
-                              msg_name, addr, hdr.seq)
+                self.trace.info("Got %s message from disconnected VBS %s "
+                                "seq %u", msg_name, addr, hdr.seq)
                 return
 
             valid = [EP_ACT_HELLO, EP_ACT_CAPS]
             if not self.vbs.is_online() and msg_type not in valid:
-                self.log.info("Got %s message from offline VBS %s seq %u",
-                              msg_name, addr, hdr.seq)
+                self.trace.info("Got %s message from offline VBS %s seq %u",
+                                msg_name, addr, hdr.seq)
                 return
 
-            self.log.info("Got %s message from %s seq %u xid %u",
-                          msg_name, self.vbs.addr, hdr.seq, hdr.xid)
+            self.trace.info("Got %s message from %s seq %u xid %u",
+                            msg_name, self.vbs.addr, hdr.seq, hdr.xid)
 
             handler_name = "_handle_%s" % msg_name
 
@@ -214,8 +213,7 @@ class VBSPConnection:
     def _wait(self):
         """ Wait for incoming packets on signalling channel """
 
-        self.__buffer = b''
-        future = self.stream.read_bytes(HEADER.sizeof())
+        future = self.stream.read_bytes(READ_CHUNK, partial=True)
         future.add_done_callback(self._on_read)
 
     def _on_disconnect(self):
@@ -274,7 +272,7 @@ class VBSPConnection:
         msg.action = action
         msg.opcode = opcode
 
-        self.log.info("Sending %s to %s", parser.name, self.vbs)
+        self.trace.info("Sending %s to %s", parser.name, self.vbs)
         self.stream.write(parser.build(msg))
 
         return msg.xid
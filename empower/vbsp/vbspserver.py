@@ -77,11 +77,12 @@ class ModuleVBSPWorker(ModuleWorker):
 
         module = self.modules[hdr.xid]
 
-        self.log.info("Received %s from %s response xid=%u seq=%u)",
-                      self.module.MODULE_NAME, vbs.addr, hdr.xid, hdr.seq)
+        self.trace.info("Received %s from %s response xid=%u seq=%u)",
+                        self.module.MODULE_NAME, vbs.addr, hdr.xid, hdr.seq)
 
         if event.opcode == 1:
             module.handle_response(msg)
+            module.touch()
 
 
 class VBSPServer(PNFPServer, TCPServer):
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2018 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Bin counter polling benchmark.
+
+Runs one bin_counter module per LVAP on an IOLoop, with the WTP streams
+replaced by counters, and reports the timers, the writes and the IOLoop
+time spent polling. Two schedulers are compared:
+
+    legacy: every module owns a PeriodicCallback and writes its request
+        to the WTP stream (the polling before the timer wheel)
+    wheel: the modules are scheduled by the runtime TimerWheel and
+        BinCounterWorker queues their requests on the WTP send queues, which
+        write them with a single write per WTP and tick
+
+The IOLoop lag is measured with a probe rescheduling itself every 10ms.
+
+Example:
+
+    python3 -m empower.wtpsim.binbench --lvaps 100,1000,5000 --duration 10
+"""
+
+import asyncio
+import time
+import uuid
+
+from optparse import OptionParser
+from types import SimpleNamespace
+
+import tornado.ioloop
+
+from tornado.concurrent import Future
+
+import empower.core.module
+import empower.lvapp.bin_counter.bin_counter
+
+from empower.core.moduleregistry import ModuleRegistry
+from empower.core.scheduler import TimerWheel
+from empower.core.sendqueue import SendQueue
+from empower.lvapp.bin_counter.bin_counter import BinCounter
+from empower.lvapp.bin_counter.bin_counter import BinCounterWorker
+from empower.lvapp.bin_counter.bin_counter import PT_STATS_RESPONSE
+from empower.lvapp.bin_counter.bin_counter import STATS_RESPONSE
+from empower.lvapp.lvappserver import LVAPPServer
+from empower.wtpsim.wtp import mac
+
+TENANT_ID = uuid.UUID("52313ecb-9d00-4b7d-b873-b55d3d9ada26")
+
+# period of the IOLoop lag probe (s)
+PROBE_PERIOD = 0.01
+
+
+class BenchStream:
+    """WTP stream counting the writes."""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def write(self, data):
+        """Account the write and return a completed future."""
+
+        self.stats.writes += 1
+        self.stats.bytes += len(data)
+
+        future = Future()
+        future.set_result(None)
+
+        return future
+
+    def closed(self):
+        """The stream is never closed."""
+
+        return False
+
+
+class BenchWTP:
+    """WTP with a benchmark connection."""
+
+    def __init__(self, addr, stats):
+
+        self.addr = addr
+        self.__seq = 0
+
+        stream = BenchStream(stats)
+        self.connection = SimpleNamespace(stream=stream,
+                                          send_queue=SendQueue(stream))
+        self.connection.send_poll = self.connection.send_queue.put_poll
+
+    @property
+    def seq(self):
+        """Return the next sequence number."""
+
+        self.__seq += 1
+        return self.__seq
+
+
+class LegacyScheduler:
+    """One PeriodicCallback per module, one write per request."""
+
+    def __init__(self):
+        self.timers = {}
+
+    def add(self, module):
+        """Start the timer of a module."""
+
+        def poll():
+            request = module.build_request()
+            if request:
+                wtp, msg = request
+                wtp.connection.stream.write(msg)
+
+        timer = tornado.ioloop.PeriodicCallback(poll, module.every)
+        timer.start()
+
+        self.timers[id(module)] = timer
+
+    def remove(self, module):
+        """Stop the timer of a module."""
+
+        self.timers.pop(id(module)).stop()
+
+    def __len__(self):
+        return len(self.timers)
+
+
+class Probe:
+    """IOLoop lag probe."""
+
+    def __init__(self):
+
+        self.samples = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.__deadline = None
+        self.__handle = None
+        self.__ioloop = tornado.ioloop.IOLoop.current()
+
+    def start(self):
+        """Start probing."""
+
+        self.__deadline = time.monotonic() + PROBE_PERIOD
+        self.__handle = self.__ioloop.call_later(PROBE_PERIOD, self.__probe)
+
+    def stop(self):
+        """Stop probing."""
+
+        self.__ioloop.remove_timeout(self.__handle)
+
+    def __probe(self):
+
+        lag = max(0.0, time.monotonic() - self.__deadline)
+
+        self.samples += 1
+        self.total += lag
+        self.max = max(self.max, lag)
+
+        self.start()
+
+
+def scheduled_timers():
+    """Return the timers pending on the asyncio loop, None if unknown."""
+
+    ioloop = tornado.ioloop.IOLoop.current()
+    loop = getattr(ioloop, 'asyncio_loop', None)
+    scheduled = getattr(loop, '_scheduled', None)
+
+    if scheduled is None:
+        return None
+
+    return len([handle for handle in scheduled if not handle.cancelled()])
+
+
+def run(mode, lvaps, lvaps_per_wtp, every, duration):
+    """Run the modules of lvaps LVAPs for duration seconds."""
+
+    stats = SimpleNamespace(writes=0, bytes=0)
+
+    wtps = [BenchWTP(mac(0x02, i), stats)
+            for i in range((lvaps + lvaps_per_wtp - 1) // lvaps_per_wtp)]
+
+    tenant = SimpleNamespace(lvaps={})
+
+    for i in range(lvaps):
+        addr = mac(0x12, i)
+        tenant.lvaps[addr] = SimpleNamespace(addr=addr,
+                                             wtp=wtps[i // lvaps_per_wtp])
+
+    scheduler = LegacyScheduler() if mode == "legacy" else TimerWheel()
+
+    server = SimpleNamespace(register_message=lambda *args: None)
+    runtime = SimpleNamespace(tenants={TENANT_ID: tenant},
+                              scheduler=scheduler,
+                              modules=ModuleRegistry(),
+                              components={LVAPPServer.__module__: server})
+
+    # the modules run outside the controller
+    empower.core.module.RUNTIME = runtime
+    empower.lvapp.bin_counter.bin_counter.RUNTIME = runtime
+
+    worker = BinCounterWorker(BinCounter, PT_STATS_RESPONSE, STATS_RESPONSE)
+
+    for addr in tenant.lvaps:
+        worker.add_module(tenant_id=TENANT_ID, lvap=addr, every=every)
+
+    timers = len(scheduler) if mode == "legacy" else 1
+    pending = scheduled_timers()
+
+    ioloop = tornado.ioloop.IOLoop.current()
+
+    # warm up for one period, the modules are not measured while added
+    ioloop.call_later(every / 1000, ioloop.stop)
+    ioloop.start()
+
+    stats.writes = 0
+    polls = sum(wtp.connection.send_queue.polls for wtp in wtps)
+
+    probe = Probe()
+    probe.start()
+
+    started = time.monotonic()
+    cpu = time.process_time()
+
+    ioloop.call_later(duration, ioloop.stop)
+    ioloop.start()
+
+    cpu = time.process_time() - cpu
+    elapsed = time.monotonic() - started
+
+    probe.stop()
+
+    for module_id in list(worker.modules):
+        worker.remove_module(module_id)
+
+    if mode == "wheel":
+        polls = sum(wtp.connection.send_queue.polls for wtp in wtps) - polls
+    else:
+        polls = stats.writes
+
+    return {'mode': mode,
+            'lvaps': lvaps,
+            'timers': timers,
+            'pending': pending,
+            'requests': polls / elapsed,
+            'writes': stats.writes / elapsed,
+            'cpu': cpu / elapsed * 1000,
+            'lag_avg': probe.total / max(1, probe.samples) * 1000,
+            'lag_max': probe.max * 1000}
+
+
+def main():
+    """Run the benchmark."""
+
+    parser = OptionParser(usage="%prog [options]")
+
+    parser.add_option("--lvaps", dest="lvaps", default="100,1000,5000",
+                      help="Comma separated numbers of LVAPs, "
+                           "default: 100,1000,5000")
+    parser.add_option("--lvaps-per-wtp", dest="lvaps_per_wtp", type="int",
+                      default=10, help="LVAPs per WTP, default: 10")
+    parser.add_option("--every", dest="every", type="int", default=1000,
+                      help="Bin counter period (ms), default: 1000")
+    parser.add_option("--duration", dest="duration", type="float",
+                      default=10.0,
+                      help="Duration of every run (s), default: 10")
+    parser.add_option("--mode", dest="modes", action="append",
+                      choices=["legacy", "wheel"], default=None,
+                      help="Scheduler to run (legacy or wheel), "
+                           "default: both")
+
+    (args, _) = parser.parse_args()
+
+    modes = args.modes or ["legacy", "wheel"]
+
+    print("%-7s %6s %7s %8s %10s %9s %12s %9s %9s" %
+          ("mode", "lvaps", "timers", "pending", "requests/s", "writes/s",
+           "ioloop ms/s", "lag avg", "lag max"))
+
+    for lvaps in [int(value) for value in args.lvaps.split(",")]:
+        for mode in modes:
+
+            # a fresh IOLoop for every run
+            asyncio.set_event_loop(asyncio.new_event_loop())
+
+            result = run(mode, lvaps, args.lvaps_per_wtp, args.every,
+                         args.duration)
+
+            pending = result['pending']
+
+            print("%-7s %6u %7u %8s %10.0f %9.0f %12.1f %9.2f %9.2f" %
+                  (result['mode'], result['lvaps'], result['timers'],
+                   "n/a" if pending is None else pending,
+                   result['requests'], result['writes'], result['cpu'],
+                   result['lag_avg'], result['lag_max']))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2018 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Bin counter binning benchmark.
+
+Classifies the [size, count] samples of bin counter responses in the
+size bins of the module, then computes the per second rates, and
+reports the time spent per response. Two implementations are compared:
+
+    legacy: the samples are sorted and every sample is compared with the
+        bins one by one, once for the bytes and once for the packets
+        (fill_bytes_samples and fill_packets_samples before the single
+        pass), the rates are computed with an indexed loop
+    bisect: BinCounter.fill_samples and BinCounter.update_stats
+
+The outputs of the two implementations are checked to be identical.
+
+Example:
+
+    python3 -m empower.wtpsim.binningbench --bins 10,1000,5000 \
+        --entries 1500
+"""
+
+import random
+import time
+
+from optparse import OptionParser
+
+from empower.lvapp.bin_counter.bin_counter import BinCounter
+
+# largest sample size (bytes)
+MAX_SIZE = 9000
+
+
+def legacy_fill_bytes_samples(bins, data):
+    """Return the bytes per bin, as computed before the single pass."""
+
+    samples = sorted(data, key=lambda entry: entry[0])
+    out = [0] * len(bins)
+
+    for entry in samples:
+        if not entry:
+            continue
+        size = entry[0]
+        count = entry[1]
+        for i in range(0, len(bins)):
+            if size <= bins[i]:
+                out[i] = out[i] + size * count
+                break
+
+    return out
+
+
+def legacy_fill_packets_samples(bins, data):
+    """Return the packets per bin, as computed before the single pass."""
+
+    samples = sorted(data, key=lambda entry: entry[0])
+    out = [0] * len(bins)
+
+    for entry in samples:
+        if not entry:
+            continue
+        size = entry[0]
+        count = entry[1]
+        for i in range(0, len(bins)):
+            if size <= bins[i]:
+                out[i] = out[i] + count
+                break
+
+    return out
+
+
+def legacy_update_stats(delta, last, current):
+    """Return the rates, as computed before the single comprehension."""
+
+    stats = []
+
+    for i in range(0, len(last)):
+        diff = current[i] - last[i]
+        stats.append(diff / delta)
+
+    return stats
+
+
+def generate_bins(count):
+    """Return count monotonically increasing bins up to MAX_SIZE."""
+
+    step = max(1, MAX_SIZE // count)
+
+    return [step * (i + 1) for i in range(count)]
+
+
+def generate_samples(rng, entries):
+    """Return the samples of a response, sizes up to 10% over MAX_SIZE."""
+
+    sizes = rng.sample(range(1, MAX_SIZE + MAX_SIZE // 10), entries)
+
+    return [[size, rng.randrange(1 << 20)] for size in sizes]
+
+
+def legacy(bins, responses, delta):
+    """Process the responses as before, return the last outputs."""
+
+    last_bytes = last_packets = None
+    rates = None
+
+    for samples in responses:
+
+        out_bytes = legacy_fill_bytes_samples(bins, samples)
+        out_packets = legacy_fill_packets_samples(bins, samples)
+
+        if last_bytes is not None:
+            rates = (legacy_update_stats(delta, last_bytes, out_bytes),
+                     legacy_update_stats(delta, last_packets, out_packets))
+
+        last_bytes, last_packets = out_bytes, out_packets
+
+    return last_bytes, last_packets, rates
+
+
+def single_pass(module, responses, delta):
+    """Process the responses with the module, return the last outputs."""
+
+    last_bytes = last_packets = None
+    rates = None
+
+    for samples in responses:
+
+        out_bytes, out_packets = module.fill_samples(samples)
+
+        if last_bytes is not None:
+            rates = (module.update_stats(delta, last_bytes, out_bytes),
+                     module.update_stats(delta, last_packets, out_packets))
+
+        last_bytes, last_packets = out_bytes, out_packets
+
+    return last_bytes, last_packets, rates
+
+
+def main():
+    """Run the benchmark."""
+
+    parser = OptionParser(usage="%prog [options]")
+
+    parser.add_option("--bins", dest="bins", default="10,1000,5000",
+                      help="Comma separated numbers of bins, "
+                           "default: 10,1000,5000")
+    parser.add_option("--entries", dest="entries", type="int", default=1500,
+                      help="Samples per response, default: 1500")
+    parser.add_option("--responses", dest="responses", type="int",
+                      default=20, help="Responses per run, default: 20")
+    parser.add_option("--seed", dest="seed", type="int", default=0,
+                      help="Random seed, default: 0")
+
+    (args, _) = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    responses = [generate_samples(rng, args.entries)
+                 for _ in range(args.responses)]
+
+    print("%6s %8s %12s %12s %8s %10s" %
+          ("bins", "entries", "legacy ms", "bisect ms", "speedup",
+           "identical"))
+
+    for count in [int(value) for value in args.bins.split(",")]:
+
+        bins = generate_bins(count)
+
+        module = BinCounter()
+        module.bins = bins
+
+        started = time.perf_counter()
+        legacy_out = legacy(bins, responses, 2.0)
+        legacy_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        single_out = single_pass(module, responses, 2.0)
+        single_time = time.perf_counter() - started
+
+        print("%6u %8u %12.2f %12.2f %7.1fx %10s" %
+              (count, args.entries,
+               legacy_time / args.responses * 1000,
+               single_time / args.responses * 1000,
+               legacy_time / single_time,
+               "yes" if legacy_out == single_out else "no"))
+
+
+if __name__ == "__main__":
+    main()
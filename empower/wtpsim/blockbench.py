@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2018 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Resource block lookup benchmark.
+
+Resolves the (hwaddr, channel, band) triples found in the LVAPP messages
+to the blocks of a WTP and reports the cost of every lookup. Two lookups
+are compared:
+
+    scan: a throwaway ResourceBlock is built from the message fields and
+        compared with every supported block (the lookup before the block
+        index)
+    index: WTP.lookup_block() with the raw hwaddr of the message
+
+Half of the lookups hit a supported block, half of them miss.
+
+Example:
+
+    python3 -m empower.wtpsim.blockbench --blocks 4 --lookups 200000
+"""
+
+import time
+
+from optparse import OptionParser
+
+from empower.core.resourcepool import BT_HT20
+from empower.core.resourcepool import BT_L20
+from empower.core.resourcepool import ResourceBlock
+from empower.core.wtp import WTP
+from empower.datatypes.etheraddress import EtherAddress
+from empower.wtpsim.wtp import mac
+
+# channels of the simulated blocks
+CHANNELS = [1, 6, 11, 36, 40, 44, 48, 149]
+
+
+def scan_lookup(wtp, hwaddr, channel, band):
+    """Return the matching blocks, scanning the supported blocks."""
+
+    incoming = ResourceBlock(wtp, EtherAddress(hwaddr), channel, band)
+    return [block for block in wtp.supports if block == incoming]
+
+
+def index_lookup(wtp, hwaddr, channel, band):
+    """Return the matching blocks, using the block index."""
+
+    block = wtp.lookup_block(hwaddr, channel, band)
+    return [block] if block else []
+
+
+def generate(blocks):
+    """Return a WTP with the given number of blocks and the requests."""
+
+    wtp = WTP(mac(0x02, 0), "wtp")
+    requests = []
+
+    for i in range(blocks):
+
+        hwaddr = mac(0x04, i)
+        channel = CHANNELS[i % len(CHANNELS)]
+        band = BT_HT20 if i % 2 else BT_L20
+
+        wtp.add_block(ResourceBlock(wtp, hwaddr, channel, band))
+
+        # a hit and a miss (unknown channel)
+        requests.append((hwaddr.to_raw(), channel, band))
+        requests.append((hwaddr.to_raw(), channel + 1, band))
+
+    return wtp, requests
+
+
+def measure(lookup, wtp, requests, lookups, runs):
+    """Return the best time per lookup (us) out of runs."""
+
+    rounds = max(1, lookups // len(requests))
+    best = None
+
+    for _ in range(runs):
+
+        started = time.perf_counter()
+
+        for _ in range(rounds):
+            for hwaddr, channel, band in requests:
+                lookup(wtp, hwaddr, channel, band)
+
+        elapsed = time.perf_counter() - started
+
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return best / (rounds * len(requests)) * 1e6
+
+
+def main():
+    """Run the benchmark."""
+
+    parser = OptionParser(usage="%prog [options]")
+
+    parser.add_option("--blocks", dest="blocks", default="2,4,8",
+                      help="Comma separated numbers of blocks per WTP, "
+                           "default: 2,4,8")
+    parser.add_option("--lookups", dest="lookups", type="int",
+                      default=200000,
+                      help="Lookups per run, default: 200000")
+    parser.add_option("--runs", dest="runs", type="int", default=3,
+                      help="Runs of every lookup, the best one is reported, "
+                           "default: 3")
+
+    (args, _) = parser.parse_args()
+
+    print("%6s %10s %10s %8s" % ("blocks", "scan us", "index us",
+                                 "speedup"))
+
+    for blocks in [int(value) for value in args.blocks.split(",")]:
+
+        wtp, requests = generate(blocks)
+
+        for hwaddr, channel, band in requests:
+            if scan_lookup(wtp, hwaddr, channel, band) != \
+                    index_lookup(wtp, hwaddr, channel, band):
+                raise RuntimeError("Lookups differ for %s" %
+                                   ((EtherAddress(hwaddr), channel, band),))
+
+        scan = measure(scan_lookup, wtp, requests, args.lookups, args.runs)
+        index = measure(index_lookup, wtp, requests, args.lookups, args.runs)
+
+        print("%6u %10.2f %10.2f %7.1fx" % (blocks, scan, index,
+                                            scan / index))
+
+
+if __name__ == "__main__":
+    main()
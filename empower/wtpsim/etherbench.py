@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2018 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""EtherAddress benchmark.
+
+Processes UCQM maps the way the ucqm module and its REST/JSON output do:
+every entry address is built from the raw bytes of the response (twice,
+as in handle_response), the map is indexed by address, then every
+address is converted to a string. Addresses are also parsed back from
+their string form, as done for the REST requests. Two implementations
+are compared:
+
+    legacy: a new object per call, the string form is computed at every
+        str() (the EtherAddress before interning)
+    interned: the EtherAddress in the tree, live instances are reused and
+        the string form is computed once
+
+Example:
+
+    python3 -m empower.wtpsim.etherbench --entries 50,200 --rounds 1000
+"""
+
+import time
+
+from optparse import OptionParser
+
+from empower.datatypes.etheraddress import EtherAddress
+from empower.wtpsim.wtp import mac
+
+
+class LegacyEtherAddress:
+    """EtherAddress without interning and string caching."""
+
+    def __init__(self, addr="00:00:00:00:00:00"):
+
+        if isinstance(addr, bytes) and len(addr) == 6:
+            self._value = addr
+        elif isinstance(addr, str):
+            if len(addr) == 17 or addr.count(':') == 5:
+                if len(addr) == 17:
+                    if addr[2::3] != ':::::' and addr[2::3] != '-----':
+                        raise RuntimeError("Bad format for ethernet address")
+                    addr = ''.join(
+                        (addr[x * 3:x * 3 + 2] for x in range(0, 6)))
+                else:
+                    addr = ''.join(["%02x" % (int(x, 16),)
+                                    for x in addr.split(":")])
+                addr = b''.join(bytes((int(addr[x * 2:x * 2 + 2], 16),))
+                                for x in range(0, 6))
+            else:
+                raise ValueError("Expected 6 raw bytes or some hex")
+            self._value = addr
+        elif isinstance(addr, LegacyEtherAddress):
+            self._value = addr.to_raw()
+        elif addr is None:
+            self._value = b'\x00' * 6
+        else:
+            raise ValueError("EtherAddress must be a string of 6 raw bytes")
+
+    def to_raw(self):
+        """Return the address as a 6-long bytes object."""
+
+        return self._value
+
+    def to_str(self, separator=':'):
+        """Return the address as a string."""
+
+        return separator.join(('%02x' % (x,) for x in self._value)).upper()
+
+    def __str__(self):
+        return self.to_str()
+
+    def __eq__(self, other):
+
+        if isinstance(other, LegacyEtherAddress):
+            other = other.to_raw()
+        elif isinstance(other, bytes):
+            pass
+        else:
+            try:
+                other = LegacyEtherAddress(other).to_raw()
+            except RuntimeError:
+                return False
+
+        return self._value == other
+
+    def __hash__(self):
+        return self._value.__hash__()
+
+    def __setattr__(self, a, v):
+        if hasattr(self, '_value'):
+            raise TypeError("This object is immutable")
+        object.__setattr__(self, a, v)
+
+
+def process_maps(cls, entries, rounds):
+    """Process rounds UCQM maps, return the elapsed time."""
+
+    started = time.perf_counter()
+
+    for _ in range(rounds):
+
+        addrs = [cls(entry) for entry in entries]
+
+        maps = {}
+
+        for entry in entries:
+            addr = cls(entry)
+            maps[addr] = {'addr': addr}
+
+        out = [str(addr) for addr in maps]
+
+    elapsed = time.perf_counter() - started
+
+    assert out == [str(addr) for addr in addrs]
+
+    return elapsed
+
+
+def parse_strings(cls, strings, rounds):
+    """Parse rounds times the addresses in strings, return the elapsed time."""
+
+    started = time.perf_counter()
+
+    for _ in range(rounds):
+        for string in strings:
+            cls(string)
+
+    return time.perf_counter() - started
+
+
+def main():
+    """Run the benchmark."""
+
+    parser = OptionParser(usage="%prog [options]")
+
+    parser.add_option("--entries", dest="entries", default="50,200",
+                      help="Comma separated numbers of entries per map, "
+                           "default: 50,200")
+    parser.add_option("--rounds", dest="rounds", type="int", default=1000,
+                      help="Maps processed per run, default: 1000")
+
+    (args, _) = parser.parse_args()
+
+    print("%-8s %-8s %8s %10s %12s %8s" %
+          ("test", "impl", "entries", "time (s)", "us/address", "speedup"))
+
+    for count in [int(value) for value in args.entries.split(",")]:
+
+        entries = [mac(0x12, i).to_raw() for i in range(count)]
+        strings = [str(mac(0x12, i)) for i in range(count)]
+
+        for test, run, data in (("maps", process_maps, entries),
+                                ("parse", parse_strings, strings)):
+
+            legacy = run(LegacyEtherAddress, data, args.rounds)
+            interned = run(EtherAddress, data, args.rounds)
+
+            for impl, elapsed in (("legacy", legacy),
+                                  ("interned", interned)):
+
+                print("%-8s %-8s %8u %10.3f %12.3f %7.1fx" %
+                      (test, impl, count, elapsed,
+                       elapsed / (count * args.rounds) * 1e6,
+                       legacy / elapsed))
+
+
+if __name__ == "__main__":
+    main()
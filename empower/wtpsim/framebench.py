@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2018 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""LVAPP receive path benchmark.
+
+Replays a trace of LVAPP messages, as sent by the WTPs, through the receive
+path of the controller and reports the messages decoded per second. Two
+paths are compared:
+
+    concat: the header is read first, the rest of the message is appended
+        to a bytes buffer and the message is parsed with construct (the
+        receive path before the frame buffer)
+    framebuffer: the trace is fed to a FrameBuffer in reads of --chunk
+        bytes, every complete frame is parsed with the fast codec of its
+        type, or with construct if there is none
+
+The trace is generated from the simulated WTP messages (hello, bin counter,
+ucqm, wifi_stats, slice_stats and lvap_stats responses) or loaded from a
+file with the raw messages, one after the other.
+
+Example:
+
+    python3 -m empower.wtpsim.framebench --messages 100000 --chunk 1500
+"""
+
+import random
+import time
+
+from optparse import OptionParser
+
+from construct import Container
+
+from empower.core.framebuffer import FrameBuffer
+from empower.core.framebuffer import READ_CHUNK
+from empower.lvapp import CODECS
+from empower.lvapp import HEADER
+from empower.lvapp import HELLO
+from empower.lvapp import PT_HELLO
+from empower.lvapp.bin_counter.bin_counter import PT_STATS_RESPONSE
+from empower.lvapp.bin_counter.bin_counter import STATS_RESPONSE
+from empower.lvapp.common.maps import POLLER_RESPONSE
+from empower.lvapp.ucqm.ucqm import PT_POLLER_RESPONSE as PT_UCQM_RESPONSE
+from empower.lvapp.wifi_stats.wifi_stats import PT_WIFI_STATS_RESPONSE
+from empower.lvapp.wifi_stats.wifi_stats import WIFI_STATS_RESPONSE
+from empower.lvapp.slice_stats.slice_stats import PT_SLICE_STATS_RESPONSE
+from empower.lvapp.slice_stats.slice_stats import SLICE_STATS_RESPONSE
+from empower.lvapp.lvap_stats.lvap_stats import PT_RATES_RESPONSE
+from empower.lvapp.lvap_stats.lvap_stats import RATES_RESPONSE
+from empower.wtpsim.wtp import WIFI_STATS_ENTRIES
+from empower.wtpsim.wtp import build
+from empower.wtpsim.wtp import mac
+
+# the construct definition of every message in the trace
+PARSERS = {PT_HELLO: HELLO,
+           PT_STATS_RESPONSE: STATS_RESPONSE,
+           PT_UCQM_RESPONSE: POLLER_RESPONSE,
+           PT_WIFI_STATS_RESPONSE: WIFI_STATS_RESPONSE,
+           PT_SLICE_STATS_RESPONSE: SLICE_STATS_RESPONSE,
+           PT_RATES_RESPONSE: RATES_RESPONSE}
+
+
+def generate_round(rng, wtp, lvaps, seq):
+    """Return the messages sent by a WTP in one polling round."""
+
+    addr = mac(0x02, wtp).to_raw()
+    stations = [mac(0x12, wtp * lvaps + i).to_raw() for i in range(lvaps)]
+
+    messages = [build(HELLO, PT_HELLO, seq, wtp=addr, period=2000)]
+
+    for sta in stations:
+
+        stats = [[64, rng.randrange(1 << 20)], [1500, rng.randrange(1 << 20)],
+                 [64, rng.randrange(1 << 20)], [1500, rng.randrange(1 << 20)],
+                 [0, 0]]
+
+        messages.append(build(STATS_RESPONSE, PT_STATS_RESPONSE, seq,
+                              module_id=1, wtp=addr, sta=sta, nb_tx=2,
+                              nb_rx=3, stats=stats))
+
+        rates = [[rate, Container(mcs=False), rng.randrange(10000), 9000]
+                 for rate in (12, 24, 48, 108)]
+
+        messages.append(build(RATES_RESPONSE, PT_RATES_RESPONSE, seq,
+                              module_id=2, wtp=addr, nb_entries=len(rates),
+                              rates=rates))
+
+    entries = [[sta, 1, -rng.randrange(30, 90), 10, 100, -60]
+               for sta in stations]
+
+    messages.append(build(POLLER_RESPONSE, PT_UCQM_RESPONSE, seq,
+                          module_id=3, wtp=addr, nb_entries=len(entries),
+                          img_entries=entries))
+
+    entries = [[entry_type, i * 10, rng.randrange(1800)]
+               for entry_type in (0, 1, 2)
+               for i in range(WIFI_STATS_ENTRIES)]
+
+    messages.append(build(WIFI_STATS_RESPONSE, PT_WIFI_STATS_RESPONSE, seq,
+                          module_id=4, wtp=addr, nb_entries=len(entries),
+                          entries=entries))
+
+    messages.append(build(SLICE_STATS_RESPONSE, PT_SLICE_STATS_RESPONSE,
+                          seq, module_id=5, wtp=addr, deficit_used=0,
+                          max_queue_length=100, crr_queue_length=lvaps,
+                          tx_packets=rng.randrange(1 << 20), tx_bytes=0,
+                          queue_delay_sec=0, queue_delay_usec=1000,
+                          deficit_avg=0, deficit=0))
+
+    return messages
+
+
+def generate_trace(messages, wtps, lvaps, seed):
+    """Return a trace with the given number of messages."""
+
+    rng = random.Random(seed)
+    trace = []
+    seq = 0
+
+    while len(trace) < messages:
+        seq += 1
+        for wtp in range(wtps):
+            trace.extend(generate_round(rng, wtp, lvaps, seq))
+
+    return b''.join(trace[:messages])
+
+
+def replay_concat(trace, parse):
+    """Replay the trace through the bytes concatenation receive path."""
+
+    count = 0
+    start = 0
+
+    while start < len(trace):
+
+        # read_bytes(6), then read_bytes(remaining)
+        buffer = b''
+        buffer = buffer + trace[start:start + 6]
+        hdr = HEADER.parse(buffer)
+        buffer = buffer + trace[start + 6:start + hdr.length]
+
+        if parse:
+            PARSERS[hdr.type].parse(buffer)
+
+        start += hdr.length
+        count += 1
+
+    return count
+
+
+def replay_framebuffer(trace, parse, chunk):
+    """Replay the trace through the frame buffer receive path."""
+
+    count = 0
+    view = memoryview(trace)
+    buffer = FrameBuffer("!I", 2)
+
+    for start in range(0, len(trace), chunk):
+
+        buffer.feed(view[start:start + chunk])
+
+        for frame in buffer.frames():
+
+            if parse:
+                msg_type = frame[1]
+                CODECS.get(msg_type, PARSERS[msg_type]).parse(frame)
+
+            count += 1
+
+    return count
+
+
+def measure(replay, runs, *args):
+    """Return the messages replayed and the best time out of runs."""
+
+    best = None
+
+    for _ in range(runs):
+
+        started = time.perf_counter()
+        count = replay(*args)
+        elapsed = time.perf_counter() - started
+
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return count, best
+
+
+def main():
+    """Run the benchmark."""
+
+    parser = OptionParser(usage="%prog [options]")
+
+    parser.add_option("--messages", dest="messages", type="int",
+                      default=50000,
+                      help="Messages in the generated trace, "
+                           "default: 50000")
+    parser.add_option("--wtps", dest="wtps", type="int", default=10,
+                      help="WTPs in the generated trace, default: 10")
+    parser.add_option("--lvaps", dest="lvaps", type="int", default=10,
+                      help="LVAPs per WTP in the generated trace, "
+                           "default: 10")
+    parser.add_option("--seed", dest="seed", type="int", default=0,
+                      help="Random seed, default: 0")
+    parser.add_option("--trace", dest="trace", default=None,
+                      help="Replay the raw messages in this file")
+    parser.add_option("--save-trace", dest="save_trace", default=None,
+                      help="Save the trace to a file")
+    parser.add_option("--chunk", dest="chunk", type="int",
+                      default=READ_CHUNK,
+                      help="Bytes returned by every socket read, "
+                           "default: %u" % READ_CHUNK)
+    parser.add_option("--runs", dest="runs", type="int", default=3,
+                      help="Runs of every path, the best one is reported, "
+                           "default: 3")
+    parser.add_option("--no-parse", dest="parse", action="store_false",
+                      default=True,
+                      help="Only split the messages, do not parse them")
+
+    (args, _) = parser.parse_args()
+
+    if args.trace:
+        with open(args.trace, "rb") as trace_file:
+            trace = trace_file.read()
+    else:
+        trace = generate_trace(args.messages, args.wtps, args.lvaps,
+                               args.seed)
+
+    if args.save_trace:
+        with open(args.save_trace, "wb") as trace_file:
+            trace_file.write(trace)
+
+    results = [("concat",) +
+               measure(replay_concat, args.runs, trace, args.parse),
+               ("framebuffer",) +
+               measure(replay_framebuffer, args.runs, trace, args.parse,
+                       args.chunk)]
+
+    print("trace: %u bytes, chunk: %u bytes, parse: %s" %
+          (len(trace), args.chunk, args.parse))
+    print("%-12s %10s %10s %12s %10s" %
+          ("path", "messages", "time (s)", "messages/s", "MB/s"))
+
+    for name, count, elapsed in results:
+        print("%-12s %10u %10.3f %12.0f %10.1f" %
+              (name, count, elapsed, count / elapsed,
+               len(trace) / elapsed / 1e6))
+
+    print("speedup: %.2fx" % (results[0][2] / results[1][2]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,486 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2018 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""WTP load simulator harness.
+
+Connects the simulated WTPs to a running controller and replays a scenario
+of station joins and handovers, either generated from the command line
+options or loaded from a file. The statistics requests of the applications
+running on the controller (e.g. bin_counter, ucqm, ncqm, wifi_stats,
+slice_stats, lvap_stats) are answered with synthetic data.
+
+Every simulated WTP uses one socket, the open files limit (ulimit -n) must
+be raised accordingly when simulating thousands of WTPs.
+
+Example:
+
+    python3 -m empower.wtpsim.harness --setup --wtps 1000 --stations 4 \\
+        --tenant EmPOWER --duration 60 --handovers 500
+"""
+
+import json
+import random
+import time
+import zlib
+
+from optparse import OptionParser
+
+import tornado.httpclient
+import tornado.ioloop
+
+from empower.datatypes.etheraddress import EtherAddress
+from empower.datatypes.ssid import SSID
+from empower.wtpsim.report import Report
+from empower.wtpsim.wtp import SimStation
+from empower.wtpsim.wtp import SimWTP
+from empower.wtpsim.wtp import STA_ASSOCIATED
+from empower.wtpsim.wtp import mac
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 4433
+DEFAULT_REST = "http://127.0.0.1:8888"
+DEFAULT_USER = "root"
+DEFAULT_PASSWORD = "root"
+
+EV_JOIN = "join"
+EV_HANDOVER = "handover"
+
+# WTPs heard on each side of a WTP (the WTPs are placed on a ring)
+NEIGHBOURS = 2
+
+# Maximum number of entries of a poller response
+MAX_POLLER_ENTRIES = 32
+
+# Maximum number of concurrent REST requests
+REST_CONCURRENCY = 16
+
+# Period (ms) of the simulator IOLoop lag probe
+LAG_PERIOD = 100
+
+# Period (ms) of the controller scheduler polling
+SCHEDULER_PERIOD = 1000
+
+
+def station_addr(wtp_index, sta_index):
+    """Return the address of a simulated station."""
+
+    return mac(0x06, (wtp_index << 8) | sta_index)
+
+
+def generate_scenario(wtps, stations, join_rate, handovers, duration,
+                      seed):
+    """Generate a scenario.
+
+    Every WTP gets the specified number of stations, joining at join_rate
+    joins per second. The handovers are evenly spread between the end of
+    the joins and the end of the run, each moving a random station to the
+    next WTP on the ring.
+    """
+
+    rng = random.Random(seed)
+    events = []
+    current = {}
+
+    for sta_index in range(stations):
+        for wtp_index in range(wtps):
+            sta = station_addr(wtp_index, sta_index)
+            current[sta] = wtp_index
+            events.append({'at': round(len(events) / join_rate, 3),
+                           'type': EV_JOIN,
+                           'sta': str(sta),
+                           'wtp': str(mac(0x02, wtp_index))})
+
+    if wtps < 2 or not current:
+        return {'wtps': wtps, 'events': events}
+
+    start = len(events) / join_rate + 1.0
+    step = max(0.0, duration - start - 1.0) / max(1, handovers)
+    addrs = list(current)
+
+    for i in range(handovers):
+        sta = rng.choice(addrs)
+        current[sta] = (current[sta] + 1) % wtps
+        events.append({'at': round(start + i * step, 3),
+                       'type': EV_HANDOVER,
+                       'sta': str(sta),
+                       'wtp': str(mac(0x02, current[sta]))})
+
+    return {'wtps': wtps, 'events': events}
+
+
+class Simulator:
+    """The load simulator.
+
+    Attributes:
+        report: the run report
+        wtps: the simulated WTPs
+        stations: the simulated stations, by address
+        ssid: the SSID the stations associate with (None for any)
+        hello_period: the hello period of the WTPs (ms)
+    """
+
+    def __init__(self, options, scenario):
+
+        self.options = options
+        self.report = Report()
+        self.hello_period = options.period
+        self.ssid = SSID(options.tenant) if options.tenant else None
+        self.wtps = [SimWTP(self, index) for index in range(scenario['wtps'])]
+        self.stations = {}
+        self.events = scenario['events']
+        self.joined = 0
+
+        self.__wtps = {wtp.addr: wtp for wtp in self.wtps}
+        self.__waiting = {}
+        self.__handovers = {}
+        self.__lag_last = None
+        self.__lag_probe = None
+        self.__scheduler_probe = None
+        self.__ioloop = tornado.ioloop.IOLoop.current()
+        self.__http = tornado.httpclient.AsyncHTTPClient(
+            max_clients=REST_CONCURRENCY)
+
+        rng = random.Random(options.seed)
+
+        for event in self.events:
+            if event['type'] != EV_JOIN:
+                continue
+            addr = EtherAddress(event['sta'])
+            wtp = self.__wtps[EtherAddress(event['wtp'])]
+            self.stations[addr] = SimStation(self, addr, wtp,
+                                             rng.randint(10, 1000))
+
+    def start(self):
+        """Start the simulation."""
+
+        if self.options.setup:
+            self.setup(self.run)
+        else:
+            self.run()
+
+    def setup(self, callback):
+        """Register the WTPs, the stations, and the tenant over REST."""
+
+        requests = []
+
+        for wtp in self.wtps:
+            requests.append(("/api/v1/wtps",
+                             {"version": 1.0,
+                              "addr": str(wtp.addr),
+                              "label": "sim-%u" % wtp.index}))
+
+        for sta in self.stations:
+            requests.append(("/api/v1/allow",
+                             {"version": 1.0,
+                              "sta": str(sta),
+                              "label": "sim"}))
+
+        if self.options.tenant and self.options.owner:
+            requests.append(("/api/v1/tenants",
+                             {"version": 1.0,
+                              "owner": self.options.owner,
+                              "desc": "Load simulator",
+                              "tenant_name": self.options.tenant,
+                              "bssid_type": "unique"}))
+
+        pending = [len(requests)]
+
+        def done(response):
+            if response.code >= 300:
+                # entries already registered are reported as errors too
+                self.report.error('setup_%u' % response.code)
+            pending[0] -= 1
+            if not pending[0]:
+                callback()
+
+        if not requests:
+            callback()
+            return
+
+        for path, body in requests:
+            self.rest("POST", path, body, done)
+
+    def run(self):
+        """Connect the WTPs and replay the scenario."""
+
+        self.report.start()
+
+        rate = self.options.rate
+
+        for wtp in self.wtps:
+            self.__ioloop.call_later(wtp.index / rate, wtp.connect,
+                                     self.options.host, self.options.port)
+
+        for event in self.events:
+            self.__ioloop.call_later(event['at'], self.dispatch, event)
+
+        self.__lag_last = time.time()
+        self.__lag_probe = \
+            tornado.ioloop.PeriodicCallback(self.__probe_lag, LAG_PERIOD)
+        self.__lag_probe.start()
+
+        self.__scheduler_probe = \
+            tornado.ioloop.PeriodicCallback(self.__probe_scheduler,
+                                            SCHEDULER_PERIOD)
+        self.__scheduler_probe.start()
+
+        self.__ioloop.call_later(self.options.duration, self.stop)
+
+    def stop(self):
+        """Stop the simulation and output the report."""
+
+        self.report.stop()
+
+        self.__lag_probe.stop()
+        self.__scheduler_probe.stop()
+
+        for wtp in self.wtps:
+            wtp.close()
+
+        out = self.report.to_dict()
+        out['wtps'] = {'total': len(self.wtps),
+                       'online': len([w for w in self.wtps if w.online])}
+        out['stations'] = {'total': len(self.stations),
+                           'joined': self.joined,
+                           'associated':
+                               len([s for s in self.stations.values()
+                                    if s.state == STA_ASSOCIATED])}
+        out['handovers'] = {'pending': len(self.__handovers)}
+
+        output = json.dumps(out, indent=2, sort_keys=True)
+
+        if self.options.output:
+            with open(self.options.output, "w") as out_file:
+                out_file.write(output)
+        else:
+            print(output)
+
+        self.__ioloop.stop()
+
+    def rest(self, method, path, body=None, callback=None):
+        """Send a REST request to the controller."""
+
+        request = tornado.httpclient.HTTPRequest(
+            self.options.rest + path,
+            method=method,
+            body=json.dumps(body) if body is not None else None,
+            headers={'Content-Type': 'application/json'},
+            auth_username=self.options.user,
+            auth_password=self.options.password)
+
+        future = self.__http.fetch(request, raise_error=False)
+
+        def done(future):
+            try:
+                response = future.result()
+            except Exception as ex:
+                response = tornado.httpclient.HTTPResponse(request, 599,
+                                                           error=ex)
+            if callback:
+                callback(response)
+
+        future.add_done_callback(done)
+
+    def dispatch(self, event):
+        """Replay a scenario event."""
+
+        station = self.stations.get(EtherAddress(event['sta']))
+
+        if not station:
+            self.report.error('unknown_station')
+            return
+
+        if event['type'] == EV_JOIN:
+            if station.wtp.online:
+                station.join()
+            else:
+                self.__waiting.setdefault(station.wtp.addr, []) \
+                    .append(station)
+            return
+
+        if event['type'] == EV_HANDOVER:
+            self.handover(station, self.__wtps[EtherAddress(event['wtp'])])
+            return
+
+        self.report.error('unknown_event')
+
+    def handover(self, station, target):
+        """Move the LVAP of a station to the target WTP."""
+
+        if station.state != STA_ASSOCIATED:
+            self.report.error('handover_not_associated')
+            return
+
+        if station.wtp is target or station.addr in self.__handovers:
+            self.report.error('handover_skipped')
+            return
+
+        self.__handovers[station.addr] = (target, time.time())
+
+        def done(response):
+            if response.code >= 300:
+                self.report.error('handover_%u' % response.code)
+                self.__handovers.pop(station.addr, None)
+
+        self.rest("PUT", "/api/v1/lvaps/%s" % station.addr,
+                  {"version": "1.0", "wtp": str(target.addr)}, done)
+
+    def wtp_online(self, wtp):
+        """Called when a WTP is online, releases the pending joins."""
+
+        for station in self.__waiting.pop(wtp.addr, []):
+            station.join()
+
+    def station_joined(self, _):
+        """Called when a station is associated."""
+
+        self.joined += 1
+
+    def lvap_added(self, wtp, sta):
+        """Called when an LVAP is added to a WTP."""
+
+        pending = self.__handovers.get(sta)
+
+        if pending and pending[0] is wtp:
+            del self.__handovers[sta]
+            self.report.latency('handover', pending[1])
+
+    def neighbours(self, wtp):
+        """Return the WTPs heard by a WTP (itself included)."""
+
+        count = len(self.wtps)
+        indexes = {(wtp.index + i) % count
+                   for i in range(-NEIGHBOURS, NEIGHBOURS + 1)}
+
+        return [self.wtps[index] for index in sorted(indexes)]
+
+    def heard_stations(self, wtp):
+        """Return the stations heard by a WTP."""
+
+        addrs = []
+
+        for neighbour in self.neighbours(wtp):
+            addrs.extend(neighbour.lvaps)
+
+        return addrs[:MAX_POLLER_ENTRIES]
+
+    def heard_wtps(self, wtp):
+        """Return the resource blocks of the neighbouring WTPs."""
+
+        return [neighbour.hwaddr for neighbour in self.neighbours(wtp)
+                if neighbour is not wtp][:MAX_POLLER_ENTRIES]
+
+    @staticmethod
+    def rssi(wtp, addr):
+        """Return the (constant) RSSI of a link."""
+
+        return -30 - zlib.crc32(wtp.addr.to_raw() + addr.to_raw()) % 50
+
+    def __probe_lag(self):
+
+        now = time.time()
+        lag = (now - self.__lag_last) * 1000 - LAG_PERIOD
+        self.__lag_last = now
+
+        self.report.value('simulator_lag_ms', max(0, round(lag, 3)))
+
+    def __probe_scheduler(self):
+
+        def done(response):
+            if response.code != 200:
+                self.report.error('scheduler_%u' % response.code)
+                return
+            scheduler = json.loads(response.body.decode('UTF-8'))
+            self.report.value('controller_lag_ms', scheduler['last_lag'])
+            self.report.value('controller_max_lag_ms', scheduler['max_lag'])
+
+        self.rest("GET", "/api/v1/scheduler", callback=done)
+
+
+def main():
+    """Run the load simulator."""
+
+    parser = OptionParser(usage="%prog [options]")
+
+    parser.add_option("--host", dest="host", default=DEFAULT_HOST,
+                      help="Controller address, default: %s" % DEFAULT_HOST)
+    parser.add_option("--port", dest="port", type="int",
+                      default=DEFAULT_PORT,
+                      help="Controller LVAPP port, default: %u"
+                      % DEFAULT_PORT)
+    parser.add_option("--rest", dest="rest", default=DEFAULT_REST,
+                      help="Controller REST URL, default: %s" % DEFAULT_REST)
+    parser.add_option("--user", dest="user", default=DEFAULT_USER,
+                      help="REST username, default: %s" % DEFAULT_USER)
+    parser.add_option("--password", dest="password",
+                      default=DEFAULT_PASSWORD,
+                      help="REST password, default: %s" % DEFAULT_PASSWORD)
+    parser.add_option("--wtps", dest="wtps", type="int", default=10,
+                      help="Number of WTPs, default: 10")
+    parser.add_option("--stations", dest="stations", type="int", default=1,
+                      help="Number of stations per WTP, default: 1")
+    parser.add_option("--rate", dest="rate", type="float", default=100.0,
+                      help="WTP connections (and station joins) per "
+                           "second, default: 100")
+    parser.add_option("--period", dest="period", type="int", default=2000,
+                      help="Hello period (ms), default: 2000")
+    parser.add_option("--duration", dest="duration", type="float",
+                      default=30.0,
+                      help="Duration of the run (s), default: 30")
+    parser.add_option("--handovers", dest="handovers", type="int",
+                      default=0, help="Number of handovers, default: 0")
+    parser.add_option("--seed", dest="seed", type="int", default=0,
+                      help="Random seed, default: 0")
+    parser.add_option("--tenant", dest="tenant", default=None,
+                      help="The SSID the stations associate with, "
+                           "default: any")
+    parser.add_option("--owner", dest="owner", default=None,
+                      help="Create the tenant with this owner during the "
+                           "setup, default: do not create")
+    parser.add_option("--setup", dest="setup", action="store_true",
+                      default=False,
+                      help="Register WTPs and stations before the run")
+    parser.add_option("--scenario", dest="scenario", default=None,
+                      help="Replay a scenario file")
+    parser.add_option("--save-scenario", dest="save_scenario",
+                      default=None, help="Save the scenario to a file")
+    parser.add_option("--output", dest="output", default=None,
+                      help="Write the report to a file, default: stdout")
+
+    (args, _) = parser.parse_args()
+
+    if args.scenario:
+        with open(args.scenario) as scenario_file:
+            scenario = json.load(scenario_file)
+    else:
+        scenario = generate_scenario(args.wtps, args.stations, args.rate,
+                                     args.handovers, args.duration,
+                                     args.seed)
+
+    if args.save_scenario:
+        with open(args.save_scenario, "w") as scenario_file:
+            json.dump(scenario, scenario_file, indent=2)
+
+    simulator = Simulator(args, scenario)
+
+    ioloop = tornado.ioloop.IOLoop.current()
+    ioloop.add_callback(simulator.start)
+    ioloop.start()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2018 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Load simulator report."""
+
+import time
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def summarize(samples):
+    """Return count, mean, percentiles and max of a list of samples."""
+
+    if not samples:
+        return {'count': 0}
+
+    ordered = sorted(samples)
+    count = len(ordered)
+
+    out = {'count': count,
+           'mean': round(sum(ordered) / count, 3),
+           'max': round(ordered[-1], 3)}
+
+    # nearest-rank percentiles
+    for pct in PERCENTILES:
+        rank = max(0, -(-pct * count // 100) - 1)
+        out['p%u' % pct] = round(ordered[rank], 3)
+
+    return out
+
+
+class Report:
+    """Counters and latency samples collected during a run.
+
+    Attributes:
+        rx: messages received from the controller, by message name
+        tx: messages sent to the controller, by message name
+        latencies: latency samples (ms), by name
+        values: other samples (e.g. the controller tick lag), by name
+        errors: error counters, by name
+    """
+
+    def __init__(self):
+
+        self.rx = {}
+        self.tx = {}
+        self.rx_bytes = 0
+        self.tx_bytes = 0
+        self.latencies = {}
+        self.values = {}
+        self.errors = {}
+
+        self.started = None
+        self.stopped = None
+
+    def start(self):
+        """Start the measurement, resetting the message counters."""
+
+        self.rx.clear()
+        self.tx.clear()
+        self.rx_bytes = 0
+        self.tx_bytes = 0
+        self.started = time.time()
+
+    def stop(self):
+        """Stop the measurement."""
+
+        self.stopped = time.time()
+
+    def received(self, name, size):
+        """Account a message received from the controller."""
+
+        self.rx[name] = self.rx.get(name, 0) + 1
+        self.rx_bytes += size
+
+    def sent(self, name, size):
+        """Account a message sent to the controller."""
+
+        self.tx[name] = self.tx.get(name, 0) + 1
+        self.tx_bytes += size
+
+    def latency(self, name, started):
+        """Add a latency sample (ms) measured from started."""
+
+        self.latencies.setdefault(name, []) \
+            .append((time.time() - started) * 1000)
+
+    def value(self, name, value):
+        """Add a sample."""
+
+        self.values.setdefault(name, []).append(value)
+
+    def error(self, name):
+        """Increment an error counter."""
+
+        self.errors[name] = self.errors.get(name, 0) + 1
+
+    def to_dict(self):
+        """Return JSON-serializable representation of the object."""
+
+        stopped = self.stopped or time.time()
+        duration = stopped - self.started if self.started else 0
+
+        rx_total = sum(self.rx.values())
+        tx_total = sum(self.tx.values())
+
+        return {'duration': round(duration, 3),
+                'messages': {
+                    'from_controller': rx_total,
+                    'to_controller': tx_total,
+                    'from_controller_per_second':
+                        round(rx_total / duration, 1) if duration else 0,
+                    'to_controller_per_second':
+                        round(tx_total / duration, 1) if duration else 0,
+                    'from_controller_bytes': self.rx_bytes,
+                    'to_controller_bytes': self.tx_bytes,
+                    'rx': self.rx,
+                    'tx': self.tx},
+                'latencies_ms': {name: summarize(samples)
+                                 for name, samples in self.latencies.items()},
+                'values': {name: summarize(samples)
+                           for name, samples in self.values.items()},
+                'errors': self.errors}
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2018 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Slice stats handler benchmark.
+
+Feeds rounds of slice_stats responses (one per WTP and slice) to the
+slice stats handler callback and reports the time spent in the callbacks.
+Two handlers are compared:
+
+    legacy: the stats are kept in the nested string-keyed dictionary,
+        windows are lists trimmed with pop(0) and mean, median and stdev
+        are recomputed with the statistics module at every sample (the
+        handler before RollingWindow)
+    window: the SliceStatsHandler in the tree, windows are RollingWindow
+        instances in the tenant metrics store
+
+At the end of the run the dictionary of the legacy handler is compared
+with the to_dict() of the current one.
+
+Example:
+
+    python3 -m empower.wtpsim.slicebench --wtps 500 --slices 8 --rounds 15
+"""
+
+import math
+import random
+import statistics
+import time
+import uuid
+
+from optparse import OptionParser
+from types import SimpleNamespace
+
+import empower.core.app
+
+from empower.apps.handlers.slicestatshandler import SliceStatsHandler
+from empower.core.eventbus import EventBus
+from empower.core.metrics import MetricsStore
+from empower.core.resourcepool import BT_L20
+from empower.core.resourcepool import ResourceBlock
+from empower.core.wtp import WTP
+from empower.datatypes.dscp import DSCP
+from empower.grafana.postgresql.common import get_writer
+from empower.lvapp.slice_stats.slice_stats import SliceStats
+from empower.wtpsim.wtp import mac
+
+TENANT_ID = uuid.UUID("52313ecb-9d00-4b7d-b873-b55d3d9ada26")
+
+TX_METRICS = ['tx_bytes', 'tx_packets']
+RAW_METRICS = ['deficit_used', 'deficit_avg', 'deficit', 'max_queue_length',
+               'crr_queue_length']
+MOVING_WINDOW_METRICS = ['queue_delay_ms', 'throughput_mbps']
+
+# samples in the windows of the legacy handler
+WINDOW = 10
+
+
+def new_window():
+    """Return an empty window of the legacy handler."""
+
+    return {"values": [], "mean": None, "median": None, "stdev": None}
+
+
+def update_window(window):
+    """Trim a window of the legacy handler and update its statistics."""
+
+    if len(window['values']) > WINDOW:
+        window['values'].pop(0)
+
+    if len(window['values']) >= 2:
+        window['mean'] = statistics.mean(window['values'])
+        window['median'] = statistics.median(window['values'])
+        window['stdev'] = statistics.stdev(window['values'])
+
+
+class LegacySliceStatsHandler:
+    """Slice stats callback before RollingWindow."""
+
+    def __init__(self):
+
+        self.slice_stats_handler = {"message": "Slice stats handler is "
+                                               "online!", "wtps": {}}
+
+    def slice_stats_callback(self, slice_stats):
+        """New stats available."""
+
+        crr_wtp_addr = str(slice_stats.block.addr)
+        crr_dscp = str(slice_stats.dscp)
+
+        wtps = self.slice_stats_handler['wtps']
+
+        if crr_wtp_addr not in wtps:
+            wtps[crr_wtp_addr] = \
+                {'slices': {},
+                 'overall': {'queue_delay_ms': new_window(),
+                             'throughput_mbps': new_window()}}
+
+        slices = wtps[crr_wtp_addr]['slices']
+
+        if crr_dscp not in slices:
+            slices[crr_dscp] = {'tx_bytes': 0,
+                                'tx_packets': 0,
+                                'throughput_mbps': new_window(),
+                                'deficit_used': None,
+                                'deficit_avg': None,
+                                'deficit': None,
+                                'queue_delay_ms': new_window(),
+                                'max_queue_length': None,
+                                'crr_queue_length': None,
+                                'tx_bytes_moving': [],
+                                'tx_packets_moving': []}
+
+        crr_slice = slices[crr_dscp]
+
+        for metric in TX_METRICS:
+            moving = crr_slice[metric + '_moving']
+            moving.append(slice_stats.to_dict()['slice_stats'][metric])
+            if len(moving) >= 2:
+                crr_slice[metric] = moving[1] - moving[0]
+                moving.pop(0)
+
+        crr_throughput_mbps = 0
+        if crr_slice['tx_bytes'] > 0:
+            crr_throughput_mbps = crr_slice['tx_bytes'] / 1000 / 1000 * 8
+        crr_slice['throughput_mbps']['values'].append(crr_throughput_mbps)
+
+        crr_queue_delay_ms = 0
+        if crr_slice['tx_bytes'] > 0:
+            crr_queue_delay_sec = \
+                slice_stats.to_dict()['slice_stats']['queue_delay_sec']
+            crr_queue_delay_ms = \
+                slice_stats.to_dict()['slice_stats']['queue_delay_usec'] / 1000
+            crr_queue_delay_ms += crr_queue_delay_sec * 1000
+        crr_slice['queue_delay_ms']['values'].append(crr_queue_delay_ms)
+
+        for metric in MOVING_WINDOW_METRICS:
+            update_window(crr_slice[metric])
+
+        for metric in RAW_METRICS:
+            if crr_slice['tx_bytes'] == 0:
+                crr_slice[metric] = 0
+            else:
+                crr_slice[metric] = \
+                    slice_stats.to_dict()['slice_stats'][metric]
+
+        overall = wtps[crr_wtp_addr]['overall']
+
+        for metric in MOVING_WINDOW_METRICS:
+            overall[metric]['values'].append(
+                sum(slc[metric]['values'][-1] for slc in slices.values()))
+            update_window(overall[metric])
+
+
+def generate_modules(wtps, slices):
+    """Return a slice_stats module per WTP and slice."""
+
+    modules = []
+
+    for i in range(wtps):
+
+        block = ResourceBlock(WTP(mac(0x02, i), "wtp"), mac(0x04, i), 1,
+                              BT_L20)
+
+        for dscp in range(slices):
+
+            module = SliceStats()
+            module.tenant_id = TENANT_ID
+            module.block = block
+            module.dscp = DSCP(dscp)
+
+            modules.append(module)
+
+    return modules
+
+
+def new_handler():
+    """Return a SliceStatsHandler running outside the controller."""
+
+    tenant = SimpleNamespace(tenant_id=TENANT_ID, metrics=MetricsStore(),
+                             slices={})
+
+    empower.core.app.RUNTIME = SimpleNamespace(tenants={TENANT_ID: tenant},
+                                               events=EventBus())
+
+    # the monitoring writer is not used without db_monitor
+    get_writer({'backend': 'sqlite'})
+
+    # db_monitor is only assigned when not None, so preset it
+    handler = SliceStatsHandler.__new__(SliceStatsHandler)
+    handler._SliceStatsHandler__db_monitor = None
+    handler.__init__(tenant_id=TENANT_ID)
+
+    return handler
+
+
+def close(first, second):
+    """Return True if the two representations match (floats up to 1e-9)."""
+
+    if isinstance(first, dict):
+        return isinstance(second, dict) and first.keys() == second.keys() \
+            and all(close(first[key], second[key]) for key in first)
+
+    if isinstance(first, list):
+        return isinstance(second, list) and len(first) == len(second) \
+            and all(close(x, y) for x, y in zip(first, second))
+
+    if isinstance(first, float) or isinstance(second, float):
+        return first is not None and second is not None and \
+            math.isclose(first, second, rel_tol=1e-9, abs_tol=1e-9)
+
+    return first == second
+
+
+def main():
+    """Run the benchmark."""
+
+    parser = OptionParser(usage="%prog [options]")
+
+    parser.add_option("--wtps", dest="wtps", type="int", default=500,
+                      help="WTPs, default: 500")
+    parser.add_option("--slices", dest="slices", type="int", default=8,
+                      help="Slices per WTP, default: 8")
+    parser.add_option("--rounds", dest="rounds", type="int", default=15,
+                      help="Responses per WTP and slice, default: 15")
+    parser.add_option("--seed", dest="seed", type="int", default=0,
+                      help="Random seed, default: 0")
+
+    (args, _) = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    modules = generate_modules(args.wtps, args.slices)
+
+    rounds = []
+    counters = [0] * len(modules)
+
+    for _ in range(args.rounds):
+
+        responses = []
+
+        for i in range(len(modules)):
+            counters[i] += rng.randrange(1 << 20)
+            responses.append({'tx_bytes': counters[i],
+                              'tx_packets': counters[i] // 1000,
+                              'deficit_used': rng.randrange(100),
+                              'queue_delay_sec': 0,
+                              'queue_delay_usec': rng.randrange(10000),
+                              'deficit_avg': rng.randrange(100),
+                              'deficit': rng.randrange(100),
+                              'max_queue_length': 100,
+                              'crr_queue_length': rng.randrange(100)})
+
+        rounds.append(responses)
+
+    results = []
+
+    for name, handler in (("legacy", LegacySliceStatsHandler()),
+                          ("window", new_handler())):
+
+        elapsed = 0.0
+
+        for responses in rounds:
+
+            for module, response in zip(modules, responses):
+                module.slice_stats = response
+
+            started = time.perf_counter()
+
+            for module in modules:
+                handler.slice_stats_callback(module)
+
+            elapsed += time.perf_counter() - started
+
+        results.append((name, elapsed, handler))
+
+    callbacks = len(modules) * args.rounds
+
+    print("%u WTPs x %u slices x %u rounds" %
+          (args.wtps, args.slices, args.rounds))
+    print("%-8s %10s %12s" % ("handler", "time (s)", "us/callback"))
+
+    for name, elapsed, _ in results:
+        print("%-8s %10.3f %12.1f" %
+              (name, elapsed, elapsed / callbacks * 1e6))
+
+    print("speedup: %.1fx" % (results[0][1] / results[1][1]))
+
+    identical = close(results[0][2].slice_stats_handler,
+                      results[1][2].to_dict())
+
+    print("identical output: %s" % ("yes" if identical else "no"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2018 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Module and LVAP spawn benchmark.
+
+Creates bin_counter modules (through their worker, as apps do) and LVAPs
+and reports the time spent per object. Every constructor gets its logger
+from empower.logger.get_logger(), two implementations are compared:
+
+    stack: the logger name is derived from inspect.stack() at every call
+        (the logger factory before the per-file name cache)
+    frame: the logger name is read from the caller frame and cached per
+        source file
+
+Example:
+
+    python3 -m empower.wtpsim.spawnbench --count 10000
+"""
+
+import inspect
+import logging
+import time
+import uuid
+
+from optparse import OptionParser
+from types import SimpleNamespace
+
+import empower.core.module
+import empower.logger
+import empower.lvapp.bin_counter.bin_counter
+
+from empower.core.lvap import LVAP
+from empower.core.moduleregistry import ModuleRegistry
+from empower.core.scheduler import TimerWheel
+from empower.lvapp.bin_counter.bin_counter import BinCounter
+from empower.lvapp.bin_counter.bin_counter import BinCounterWorker
+from empower.lvapp.bin_counter.bin_counter import PT_STATS_RESPONSE
+from empower.lvapp.bin_counter.bin_counter import STATS_RESPONSE
+from empower.lvapp.lvappserver import LVAPPServer
+from empower.wtpsim.wtp import mac
+
+TENANT_ID = uuid.UUID("52313ecb-9d00-4b7d-b873-b55d3d9ada26")
+
+
+def stack_get_logger(name=None, more_frames=0):
+    """Logger factory inspecting the whole stack at every call."""
+
+    if name is None:
+        name = inspect.stack()[1 + more_frames][1]
+        name = empower.logger._resolve_name(name)
+
+    return logging.getLogger(name)
+
+
+def spawn_modules(count):
+    """Create count bin_counter modules, return the elapsed time."""
+
+    scheduler = TimerWheel()
+
+    server = SimpleNamespace(register_message=lambda *args: None)
+    runtime = SimpleNamespace(tenants={TENANT_ID: SimpleNamespace(lvaps={})},
+                              scheduler=scheduler,
+                              modules=ModuleRegistry(),
+                              components={LVAPPServer.__module__: server})
+
+    # the modules run outside the controller
+    empower.core.module.RUNTIME = runtime
+    empower.lvapp.bin_counter.bin_counter.RUNTIME = runtime
+
+    worker = BinCounterWorker(BinCounter, PT_STATS_RESPONSE, STATS_RESPONSE)
+
+    started = time.perf_counter()
+
+    for i in range(count):
+        worker.add_module(tenant_id=TENANT_ID, lvap=mac(0x12, i), every=1000)
+
+    elapsed = time.perf_counter() - started
+
+    for module_id in list(worker.modules):
+        worker.remove_module(module_id)
+
+    return elapsed
+
+
+def spawn_lvaps(count):
+    """Create count LVAPs, return the elapsed time."""
+
+    addrs = [mac(0x12, i) for i in range(count)]
+
+    started = time.perf_counter()
+
+    for i, addr in enumerate(addrs):
+        LVAP(addr, i)
+
+    return time.perf_counter() - started
+
+
+def main():
+    """Run the benchmark."""
+
+    parser = OptionParser(usage="%prog [options]")
+
+    parser.add_option("--count", dest="count", type="int", default=10000,
+                      help="Modules and LVAPs to create, default: 10000")
+
+    (args, _) = parser.parse_args()
+
+    get_logger = empower.logger.get_logger
+
+    print("%-7s %-8s %8s %10s %12s" %
+          ("object", "logger", "count", "time (s)", "us/object"))
+
+    for target, spawn in (("module", spawn_modules), ("lvap", spawn_lvaps)):
+
+        results = []
+
+        for factory, impl in (("stack", stack_get_logger),
+                              ("frame", get_logger)):
+
+            empower.logger.get_logger = impl
+
+            try:
+                elapsed = spawn(args.count)
+            finally:
+                empower.logger.get_logger = get_logger
+
+            results.append(elapsed)
+
+            print("%-7s %-8s %8u %10.3f %12.1f" %
+                  (target, factory, args.count, elapsed,
+                   elapsed / args.count * 1e6))
+
+        print("%-7s speedup: %.1fx" % (target, results[0] / results[1]))
+
+
+if __name__ == "__main__":
+    main()
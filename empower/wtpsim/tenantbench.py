@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2018 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Tenant listing benchmark.
+
+Creates tenants with traffic rules on a running controller over REST,
+then times GET /api/v1/tenants and reports the mean, median and 90th
+percentile latency of the requests and the size of the response body.
+
+Run it against two controllers (e.g. two checkouts) to compare them.
+
+Example:
+
+    python3 -m empower.wtpsim.tenantbench --tenants 500 --rules 50 \
+        --requests 20
+"""
+
+import json
+import statistics
+import time
+import uuid
+
+from optparse import OptionParser
+
+import tornado.httpclient
+
+DEFAULT_REST = "http://127.0.0.1:8888"
+DEFAULT_USER = "root"
+DEFAULT_PASSWORD = "root"
+DEFAULT_OWNER = "foo"
+
+# the ids of the benchmark tenants are derived from this one
+BASE_ID = uuid.UUID("b3a6c4e0-0000-4000-8000-000000000000")
+
+
+def tenant_id(index):
+    """Return the id of a benchmark tenant."""
+
+    return uuid.UUID(int=BASE_ID.int + index)
+
+
+class Client:
+    """Blocking REST client."""
+
+    def __init__(self, options):
+
+        self.options = options
+        self.http = tornado.httpclient.HTTPClient()
+
+    def request(self, method, path, body=None):
+        """Send a request, return the response."""
+
+        request = tornado.httpclient.HTTPRequest(
+            self.options.rest + path,
+            method=method,
+            body=json.dumps(body) if body is not None else None,
+            headers={'Content-Type': 'application/json'},
+            auth_username=self.options.user,
+            auth_password=self.options.password,
+            request_timeout=self.options.timeout)
+
+        return self.http.fetch(request, raise_error=False)
+
+
+def setup(client, tenants, rules, owner):
+    """Create the tenants and their traffic rules."""
+
+    errors = 0
+
+    for index in range(tenants):
+
+        path = "/api/v1/tenants/%s" % tenant_id(index)
+
+        response = client.request("POST", path,
+                                  {"version": 1.0,
+                                   "owner": owner,
+                                   "desc": "Tenant benchmark",
+                                   "tenant_name": "bench_%u" % index,
+                                   "bssid_type": "unique"})
+
+        if response.code >= 300:
+            errors += 1
+            continue
+
+        for rule in range(rules):
+
+            response = client.request("POST", path + "/trs",
+                                      {"version": 1.0,
+                                       "dscp": "0x00",
+                                       "label": "rule %u" % rule,
+                                       "match": "dl_vlan=%u,tp_dst=80"
+                                                % (rule + 1)})
+
+            if response.code >= 300:
+                errors += 1
+
+    return errors
+
+
+def cleanup(client, tenants):
+    """Delete the tenants."""
+
+    for index in range(tenants):
+        client.request("DELETE", "/api/v1/tenants/%s" % tenant_id(index))
+
+
+def percentile(samples, value):
+    """Return the value-th percentile of the samples."""
+
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * value / 100))]
+
+
+def main():
+    """Run the benchmark."""
+
+    parser = OptionParser(usage="%prog [options]")
+
+    parser.add_option("--rest", dest="rest", default=DEFAULT_REST,
+                      help="Controller REST URL, default: %s" % DEFAULT_REST)
+    parser.add_option("--user", dest="user", default=DEFAULT_USER,
+                      help="REST username, default: %s" % DEFAULT_USER)
+    parser.add_option("--password", dest="password",
+                      default=DEFAULT_PASSWORD,
+                      help="REST password, default: %s" % DEFAULT_PASSWORD)
+    parser.add_option("--owner", dest="owner", default=DEFAULT_OWNER,
+                      help="Owner of the tenants, default: %s"
+                      % DEFAULT_OWNER)
+    parser.add_option("--tenants", dest="tenants", type="int", default=500,
+                      help="Tenants to create, default: 500")
+    parser.add_option("--rules", dest="rules", type="int", default=50,
+                      help="Traffic rules per tenant, default: 50")
+    parser.add_option("--requests", dest="requests", type="int", default=20,
+                      help="GET requests to time, default: 20")
+    parser.add_option("--timeout", dest="timeout", type="float",
+                      default=60.0,
+                      help="Request timeout (s), default: 60")
+    parser.add_option("--no-setup", dest="setup", action="store_false",
+                      default=True,
+                      help="Do not create the tenants (already created)")
+    parser.add_option("--cleanup", dest="cleanup", action="store_true",
+                      default=False,
+                      help="Delete the tenants at the end of the run")
+
+    (args, _) = parser.parse_args()
+
+    client = Client(args)
+
+    if args.setup:
+
+        started = time.monotonic()
+        errors = setup(client, args.tenants, args.rules, args.owner)
+
+        print("setup: %u tenants x %u rules in %.1fs, %u errors" %
+              (args.tenants, args.rules, time.monotonic() - started, errors))
+
+    samples = []
+    size = 0
+
+    for _ in range(args.requests):
+
+        started = time.monotonic()
+        response = client.request("GET", "/api/v1/tenants")
+        samples.append((time.monotonic() - started) * 1000)
+
+        if response.code != 200:
+            raise RuntimeError("GET /api/v1/tenants: %u" % response.code)
+
+        size = len(response.body)
+
+    print("GET /api/v1/tenants: %u requests, %.1f MB body" %
+          (args.requests, size / 1e6))
+    print("mean %.0fms, p50 %.0fms, p90 %.0fms, max %.0fms" %
+          (statistics.mean(samples), percentile(samples, 50),
+           percentile(samples, 90), max(samples)))
+
+    if args.cleanup:
+        cleanup(client, args.tenants)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,592 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2018 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Simulated WTP and stations."""
+
+import struct
+import time
+
+import tornado.ioloop
+import tornado.tcpclient
+
+from tornado.iostream import StreamClosedError
+
+from construct import Container
+
+import empower.logger
+
+from empower.datatypes.etheraddress import EtherAddress
+from empower.datatypes.ssid import SSID
+from empower.core.framebuffer import FrameBuffer
+from empower.core.framebuffer import READ_CHUNK
+from empower.core.resourcepool import BT_HT20
+from empower.lvapp import PT_VERSION
+from empower.lvapp import PT_HELLO
+from empower.lvapp import PT_CAPS_REQUEST
+from empower.lvapp import PT_CAPS_RESPONSE
+from empower.lvapp import PT_PROBE_REQUEST
+from empower.lvapp import PT_PROBE_RESPONSE
+from empower.lvapp import PT_AUTH_REQUEST
+from empower.lvapp import PT_AUTH_RESPONSE
+from empower.lvapp import PT_ASSOC_REQUEST
+from empower.lvapp import PT_ASSOC_RESPONSE
+from empower.lvapp import PT_ADD_LVAP
+from empower.lvapp import PT_DEL_LVAP
+from empower.lvapp import PT_ADD_LVAP_RESPONSE
+from empower.lvapp import PT_DEL_LVAP_RESPONSE
+from empower.lvapp import PT_LVAP_STATUS_REQUEST
+from empower.lvapp import PT_TYPES
+from empower.lvapp import HELLO
+from empower.lvapp import CAPS_RESPONSE
+from empower.lvapp import PROBE_REQUEST
+from empower.lvapp import AUTH_REQUEST
+from empower.lvapp import ASSOC_REQUEST
+from empower.lvapp import ADD_LVAP_RESPONSE
+from empower.lvapp import DEL_LVAP_RESPONSE
+from empower.lvapp.bin_counter.bin_counter import PT_STATS_REQUEST
+from empower.lvapp.bin_counter.bin_counter import PT_STATS_RESPONSE
+from empower.lvapp.bin_counter.bin_counter import STATS_REQUEST
+from empower.lvapp.bin_counter.bin_counter import STATS_RESPONSE
+from empower.lvapp.common.maps import POLLER_REQUEST
+from empower.lvapp.common.maps import POLLER_RESPONSE
+from empower.lvapp.ucqm.ucqm import PT_POLLER_REQUEST as PT_UCQM_REQUEST
+from empower.lvapp.ucqm.ucqm import PT_POLLER_RESPONSE as PT_UCQM_RESPONSE
+from empower.lvapp.ncqm.ncqm import PT_POLLER_REQUEST as PT_NCQM_REQUEST
+from empower.lvapp.ncqm.ncqm import PT_POLLER_RESPONSE as PT_NCQM_RESPONSE
+from empower.lvapp.wifi_stats.wifi_stats import PT_WIFI_STATS_REQUEST
+from empower.lvapp.wifi_stats.wifi_stats import PT_WIFI_STATS_RESPONSE
+from empower.lvapp.wifi_stats.wifi_stats import WIFI_STATS_REQUEST
+from empower.lvapp.wifi_stats.wifi_stats import WIFI_STATS_RESPONSE
+from empower.lvapp.slice_stats.slice_stats import PT_SLICE_STATS_REQUEST
+from empower.lvapp.slice_stats.slice_stats import PT_SLICE_STATS_RESPONSE
+from empower.lvapp.slice_stats.slice_stats import SLICE_STATS_REQUEST
+from empower.lvapp.slice_stats.slice_stats import SLICE_STATS_RESPONSE
+from empower.lvapp.lvap_stats.lvap_stats import PT_RATES_REQUEST
+from empower.lvapp.lvap_stats.lvap_stats import PT_RATES_RESPONSE
+from empower.lvapp.lvap_stats.lvap_stats import RATES_REQUEST
+from empower.lvapp.lvap_stats.lvap_stats import RATES_RESPONSE
+
+STA_IDLE = "idle"
+STA_PROBING = "probing"
+STA_AUTHENTICATING = "authenticating"
+STA_ASSOCIATING = "associating"
+STA_ASSOCIATED = "associated"
+
+DEFAULT_CHANNEL = 36
+DEFAULT_BAND = BT_HT20
+
+# the entries of a WIFI_STATS_RESPONSE: tx, rx, and energy detection
+WIFI_STATS_ENTRIES = 100
+
+# packet sizes of the synthetic bin counters
+SMALL_PACKET = 64
+LARGE_PACKET = 1500
+
+# the messages sent by the controller that are parsed, the others are only
+# accounted
+PARSERS = {PT_CAPS_REQUEST: PT_TYPES[PT_CAPS_REQUEST],
+           PT_LVAP_STATUS_REQUEST: PT_TYPES[PT_LVAP_STATUS_REQUEST],
+           PT_ADD_LVAP: PT_TYPES[PT_ADD_LVAP],
+           PT_DEL_LVAP: PT_TYPES[PT_DEL_LVAP],
+           PT_PROBE_RESPONSE: PT_TYPES[PT_PROBE_RESPONSE],
+           PT_AUTH_RESPONSE: PT_TYPES[PT_AUTH_RESPONSE],
+           PT_ASSOC_RESPONSE: PT_TYPES[PT_ASSOC_RESPONSE],
+           PT_STATS_REQUEST: STATS_REQUEST,
+           PT_UCQM_REQUEST: POLLER_REQUEST,
+           PT_NCQM_REQUEST: POLLER_REQUEST,
+           PT_WIFI_STATS_REQUEST: WIFI_STATS_REQUEST,
+           PT_SLICE_STATS_REQUEST: SLICE_STATS_REQUEST,
+           PT_RATES_REQUEST: RATES_REQUEST}
+
+NAMES = {msg_type: parser.name
+         for msg_type, parser in PT_TYPES.items()
+         if isinstance(msg_type, int) and parser}
+
+NAMES.update({msg_type: parser.name for msg_type, parser in PARSERS.items()})
+
+
+def mac(prefix, index):
+    """Return a locally administered address from a prefix and an index."""
+
+    return EtherAddress(bytes([prefix, 0]) + struct.pack("!I", index))
+
+
+def build(parser, msg_type, seq, **fields):
+    """Build a message, filling in the header and the length."""
+
+    msg = Container(version=PT_VERSION, type=msg_type, length=0, seq=seq,
+                    **fields)
+
+    data = parser.build(msg)
+
+    return data[:2] + struct.pack("!I", len(data)) + data[6:]
+
+
+class SimStation:
+    """A simulated station.
+
+    The station joins through the probe, authentication, and association
+    exchange and keeps cumulative traffic counters growing at a constant
+    rate, which are used to answer the statistics requests.
+
+    Attributes:
+        addr: the station address
+        wtp: the WTP currently hosting the station LVAP
+        state: the join state
+        bssid: the BSSID the station is authenticating or associated with
+        networks: the (bssid, ssid) advertised by the controller
+    """
+
+    def __init__(self, sim, addr, wtp, pps):
+
+        self.sim = sim
+        self.addr = addr
+        self.wtp = wtp
+        self.state = STA_IDLE
+        self.bssid = None
+        self.ssid = None
+        self.networks = []
+        self.pps = pps
+
+        self.__started = None
+        self.__created = time.time()
+
+    def join(self):
+        """Start the join procedure."""
+
+        self.state = STA_PROBING
+        self.__started = time.time()
+
+        self.wtp.send_probe_request(self)
+
+    def counters(self, direction):
+        """Return the cumulative (small, large) packets sent so far."""
+
+        elapsed = time.time() - self.__created
+        pps = self.pps if direction == 'tx' else self.pps / 2
+
+        return (int(pps * elapsed / 4) & 0xFFFFFFFF,
+                int(pps * elapsed) & 0xFFFFFFFF)
+
+    def handle_add_lvap(self, wtp, msg):
+        """Handle an ADD_LVAP message for this station."""
+
+        self.wtp = wtp
+        self.networks = [(EtherAddress(network.bssid), SSID(network.ssid))
+                         for network in msg.networks]
+
+    def handle_probe_response(self):
+        """Handle a PROBE_RESPONSE message for this station."""
+
+        if self.state != STA_PROBING:
+            return
+
+        for bssid, ssid in self.networks:
+            if not self.sim.ssid or ssid == self.sim.ssid:
+                self.bssid = bssid
+                self.ssid = ssid
+                break
+        else:
+            self.sim.report.error('no_network')
+            self.state = STA_IDLE
+            return
+
+        self.state = STA_AUTHENTICATING
+        self.wtp.send_auth_request(self)
+
+    def handle_auth_response(self):
+        """Handle an AUTH_RESPONSE message for this station."""
+
+        if self.state != STA_AUTHENTICATING:
+            return
+
+        self.state = STA_ASSOCIATING
+        self.wtp.send_assoc_request(self)
+
+    def handle_assoc_response(self):
+        """Handle an ASSOC_RESPONSE message for this station."""
+
+        if self.state != STA_ASSOCIATING:
+            return
+
+        self.state = STA_ASSOCIATED
+        self.sim.report.latency('sta_join', self.__started)
+        self.sim.station_joined(self)
+
+
+class SimWTP:
+    """A simulated WTP.
+
+    Connects to the controller, sends hellos, answers the capabilities
+    request with a single resource block, and hosts the LVAPs spawned by
+    the controller. Statistics requests are answered with synthetic data
+    derived from the hosted stations.
+
+    Attributes:
+        sim: the simulator
+        index: the WTP index in the simulation
+        addr: the WTP address
+        hwaddr: the address of the resource block
+        online: True once the controller has processed the capabilities
+        lvaps: the station addresses of the hosted LVAPs
+    """
+
+    def __init__(self, sim, index, channel=DEFAULT_CHANNEL,
+                 band=DEFAULT_BAND):
+
+        self.sim = sim
+        self.index = index
+        self.addr = mac(0x02, index)
+        self.hwaddr = mac(0x0A, index)
+        self.channel = channel
+        self.band = band
+        self.online = False
+        self.lvaps = set()
+
+        self.__seq = 0
+        self.__stream = None
+        self.__buffer = FrameBuffer("!I", 2)
+        self.__hello = None
+        self.__connect_started = None
+        self.__created = time.time()
+
+        self.log = empower.logger.get_logger()
+
+    @property
+    def seq(self):
+        """Return new sequence id."""
+
+        self.__seq += 1
+        return self.__seq
+
+    def connect(self, host, port):
+        """Open the connection to the controller."""
+
+        self.__connect_started = time.time()
+
+        future = tornado.tcpclient.TCPClient().connect(host, port)
+        future.add_done_callback(self._on_connect)
+
+    def close(self):
+        """Close the connection to the controller."""
+
+        if self.__hello:
+            self.__hello.stop()
+
+        if self.__stream:
+            self.__stream.set_close_callback(None)
+            self.__stream.close()
+
+    def _on_connect(self, future):
+
+        try:
+            self.__stream = future.result()
+        except Exception as ex:
+            self.log.error("WTP %s unable to connect: %s", self.addr, ex)
+            self.sim.report.error('connect')
+            return
+
+        self.__stream.set_nodelay(True)
+        self.__stream.set_close_callback(self._on_disconnect)
+
+        self.send_hello()
+
+        self.__hello = \
+            tornado.ioloop.PeriodicCallback(self.send_hello,
+                                            self.sim.hello_period)
+        self.__hello.start()
+
+        self._wait()
+
+    def _on_disconnect(self):
+
+        self.online = False
+
+        if self.__hello:
+            self.__hello.stop()
+
+        self.sim.report.error('disconnected')
+
+    def _wait(self):
+
+        future = self.__stream.read_bytes(READ_CHUNK, partial=True)
+        future.add_done_callback(self._on_read)
+
+    def _on_read(self, future):
+
+        try:
+            self.__buffer.feed(future.result())
+        except StreamClosedError:
+            return
+
+        for frame in self.__buffer.frames():
+
+            msg_type = frame[1]
+            name = NAMES.get(msg_type, "unknown_%u" % msg_type)
+
+            self.sim.report.received(name, len(frame))
+
+            if msg_type not in PARSERS:
+                continue
+
+            msg = PARSERS[msg_type].parse(bytes(frame))
+            handler = getattr(self, "_handle_%s" % name, None)
+
+            if handler:
+                handler(msg)
+
+        if not self.__stream.closed():
+            self._wait()
+
+    def send(self, name, data):
+        """Send a message to the controller."""
+
+        if not self.__stream or self.__stream.closed():
+            return
+
+        try:
+            self.__stream.write(data)
+        except StreamClosedError:
+            return
+
+        self.sim.report.sent(name, len(data))
+
+    def send_hello(self):
+        """Send a HELLO message."""
+
+        self.send(HELLO.name, build(HELLO, PT_HELLO, self.seq,
+                                    wtp=self.addr.to_raw(),
+                                    period=self.sim.hello_period))
+
+    def send_probe_request(self, station):
+        """Send a PROBE_REQUEST on behalf of a station."""
+
+        self.send(PROBE_REQUEST.name,
+                  build(PROBE_REQUEST, PT_PROBE_REQUEST, self.seq,
+                        wtp=self.addr.to_raw(),
+                        sta=station.addr.to_raw(),
+                        hwaddr=self.hwaddr.to_raw(),
+                        channel=self.channel,
+                        band=self.band,
+                        supported_band=self.band,
+                        ssid=SSID().to_raw()))
+
+    def send_auth_request(self, station):
+        """Send an AUTH_REQUEST on behalf of a station."""
+
+        self.send(AUTH_REQUEST.name,
+                  build(AUTH_REQUEST, PT_AUTH_REQUEST, self.seq,
+                        wtp=self.addr.to_raw(),
+                        sta=station.addr.to_raw(),
+                        bssid=station.bssid.to_raw()))
+
+    def send_assoc_request(self, station):
+        """Send an ASSOC_REQUEST on behalf of a station."""
+
+        self.send(ASSOC_REQUEST.name,
+                  build(ASSOC_REQUEST, PT_ASSOC_REQUEST, self.seq,
+                        wtp=self.addr.to_raw(),
+                        sta=station.addr.to_raw(),
+                        bssid=station.bssid.to_raw(),
+                        hwaddr=self.hwaddr.to_raw(),
+                        channel=self.channel,
+                        band=self.band,
+                        supported_band=self.band,
+                        ssid=station.ssid.to_raw()))
+
+    def _handle_caps_request(self, _):
+
+        ports = [[self.addr.to_raw(), 1, b'eth0'.ljust(10, b'\0')],
+                 [self.hwaddr.to_raw(), 2, b'empower0'.ljust(10, b'\0')]]
+
+        self.send(CAPS_RESPONSE.name,
+                  build(CAPS_RESPONSE, PT_CAPS_RESPONSE, self.seq,
+                        wtp=self.addr.to_raw(),
+                        dpid=b'\0\0' + self.addr.to_raw(),
+                        nb_resources_elements=1,
+                        nb_ports_elements=len(ports),
+                        blocks=[[self.hwaddr.to_raw(), self.channel,
+                                 self.band]],
+                        ports=ports))
+
+    def _handle_lvap_status_request(self, _):
+
+        # sent by the controller right after processing the capabilities
+        if self.online:
+            return
+
+        self.online = True
+        self.sim.report.latency('wtp_attach', self.__connect_started)
+        self.sim.wtp_online(self)
+
+    def _handle_add_lvap(self, msg):
+
+        sta = EtherAddress(msg.sta)
+
+        self.lvaps.add(sta)
+
+        station = self.sim.stations.get(sta)
+
+        if station:
+            station.handle_add_lvap(self, msg)
+
+        self.send(ADD_LVAP_RESPONSE.name,
+                  build(ADD_LVAP_RESPONSE, PT_ADD_LVAP_RESPONSE, self.seq,
+                        wtp=self.addr.to_raw(),
+                        sta=msg.sta,
+                        module_id=msg.module_id,
+                        status=0))
+
+        self.sim.lvap_added(self, sta)
+
+    def _handle_del_lvap(self, msg):
+
+        self.lvaps.discard(EtherAddress(msg.sta))
+
+        self.send(DEL_LVAP_RESPONSE.name,
+                  build(DEL_LVAP_RESPONSE, PT_DEL_LVAP_RESPONSE, self.seq,
+                        wtp=self.addr.to_raw(),
+                        sta=msg.sta,
+                        module_id=msg.module_id,
+                        status=0))
+
+    def _handle_probe_response(self, msg):
+
+        station = self.sim.stations.get(EtherAddress(msg.sta))
+
+        if station:
+            station.handle_probe_response()
+
+    def _handle_auth_response(self, msg):
+
+        station = self.sim.stations.get(EtherAddress(msg.sta))
+
+        if station:
+            station.handle_auth_response()
+
+    def _handle_assoc_response(self, msg):
+
+        station = self.sim.stations.get(EtherAddress(msg.sta))
+
+        if station:
+            station.handle_assoc_response()
+
+    def _handle_stats_request(self, msg):
+
+        station = self.sim.stations.get(EtherAddress(msg.sta))
+
+        stats = []
+
+        for direction in ('tx', 'rx'):
+            small, large = station.counters(direction) if station else (0, 0)
+            stats.append([SMALL_PACKET, small])
+            stats.append([LARGE_PACKET, large])
+
+        # the controller drops the last rx entry
+        stats.append([0, 0])
+
+        self.send(STATS_RESPONSE.name,
+                  build(STATS_RESPONSE, PT_STATS_RESPONSE, self.seq,
+                        module_id=msg.module_id,
+                        wtp=self.addr.to_raw(),
+                        sta=msg.sta,
+                        nb_tx=2,
+                        nb_rx=3,
+                        stats=stats))
+
+    def _handle_poller_request(self, msg):
+
+        if msg.type == PT_UCQM_REQUEST:
+            addrs = self.sim.heard_stations(self)
+            response_type = PT_UCQM_RESPONSE
+        else:
+            addrs = self.sim.heard_wtps(self)
+            response_type = PT_NCQM_RESPONSE
+
+        entries = []
+
+        for addr in addrs:
+            rssi = self.sim.rssi(self, addr)
+            entries.append([addr.to_raw(), 1, rssi, 10, 100, rssi])
+
+        self.send(POLLER_RESPONSE.name,
+                  build(POLLER_RESPONSE, response_type, self.seq,
+                        module_id=msg.module_id,
+                        wtp=self.addr.to_raw(),
+                        nb_entries=len(entries),
+                        img_entries=entries))
+
+    def _handle_wifi_stats_request(self, msg):
+
+        # the utilization grows with the number of hosted LVAPs
+        busy = min(180, 18 * len(self.lvaps))
+        now = int((time.time() - self.__created) * 1000) & 0xFFFFFFFF
+
+        entries = []
+
+        for entry_type, sample in ((0, busy), (1, busy // 2), (2, 5)):
+            for i in range(WIFI_STATS_ENTRIES):
+                entries.append([entry_type,
+                                (now - 10 * (WIFI_STATS_ENTRIES - i)) &
+                                0xFFFFFFFF,
+                                sample * 10])
+
+        self.send(WIFI_STATS_RESPONSE.name,
+                  build(WIFI_STATS_RESPONSE, PT_WIFI_STATS_RESPONSE,
+                        self.seq,
+                        module_id=msg.module_id,
+                        wtp=self.addr.to_raw(),
+                        nb_entries=len(entries),
+                        entries=entries))
+
+    def _handle_slice_stats_request(self, msg):
+
+        tx_packets = 0
+
+        for sta in self.lvaps:
+            station = self.sim.stations.get(sta)
+            if station:
+                tx_packets += sum(station.counters('tx'))
+
+        tx_packets &= 0xFFFFFFFF
+
+        self.send(SLICE_STATS_RESPONSE.name,
+                  build(SLICE_STATS_RESPONSE, PT_SLICE_STATS_RESPONSE,
+                        self.seq,
+                        module_id=msg.module_id,
+                        wtp=self.addr.to_raw(),
+                        deficit_used=0,
+                        max_queue_length=100,
+                        crr_queue_length=len(self.lvaps),
+                        tx_packets=tx_packets,
+                        tx_bytes=(tx_packets * LARGE_PACKET) & 0xFFFFFFFF,
+                        queue_delay_sec=0,
+                        queue_delay_usec=1000 * len(self.lvaps),
+                        deficit_avg=0,
+                        deficit=0))
+
+    def _handle_rates_request(self, msg):
+
+        rates = [[rate, Container(mcs=False), 9000, 9000]
+                 for rate in (12, 24, 48, 108)]
+
+        self.send(RATES_RESPONSE.name,
+                  build(RATES_RESPONSE, PT_RATES_RESPONSE, self.seq,
+                        module_id=msg.module_id,
+                        wtp=self.addr.to_raw(),
+                        nb_entries=len(rates),
+                        rates=rates))
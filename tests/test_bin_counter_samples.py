@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2018 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Bin counter binning: same output as the former two pass binning."""
+
+import random
+import unittest
+
+from empower.lvapp.bin_counter.bin_counter import BinCounter
+from empower.wtpsim.binningbench import generate_bins
+from empower.wtpsim.binningbench import legacy_fill_bytes_samples
+from empower.wtpsim.binningbench import legacy_fill_packets_samples
+from empower.wtpsim.binningbench import legacy_update_stats
+
+BINS = [[8192], [512, 1514, 8192], [64, 128, 256, 512, 1024, 1514],
+        generate_bins(1000), generate_bins(5000)]
+
+SAMPLES = [
+    [],
+    [[60, 3], [66, 2], [74, 1], [98, 40], [167, 2], [209, 2], [1466, 1762]],
+    # unsorted, with repeated sizes and zero counts
+    [[1466, 1762], [60, 3], [1466, 5], [60, 0], [209, 2]],
+    # sizes equal to the bins and over the last bin
+    [[64, 1], [128, 2], [512, 3], [1514, 4], [8192, 5], [8193, 6],
+     [65535, 7]],
+]
+
+
+class TestBinCounterSamples(unittest.TestCase):
+    """Compare fill_samples and update_stats with the former code."""
+
+    @classmethod
+    def module(cls, bins):
+        """Return a bin counter with the given bins."""
+
+        module = BinCounter()
+        module.bins = bins
+
+        return module
+
+    def assertSameBinning(self, bins, samples):
+
+        out_bytes, out_packets = self.module(bins).fill_samples(samples)
+
+        self.assertEqual(out_bytes, legacy_fill_bytes_samples(bins, samples))
+        self.assertEqual(out_packets,
+                         legacy_fill_packets_samples(bins, samples))
+
+    def test_samples(self):
+        """Hand written samples are binned as before."""
+
+        for bins in BINS:
+            for samples in SAMPLES:
+                with self.subTest(bins=len(bins), samples=samples):
+                    self.assertSameBinning(bins, samples)
+
+    def test_random_samples(self):
+        """Random samples are binned as before."""
+
+        rng = random.Random(0)
+
+        for bins in BINS:
+            for _ in range(20):
+
+                samples = [[rng.randrange(1, 10000), rng.randrange(1 << 20)]
+                           for _ in range(rng.randrange(200))]
+
+                with self.subTest(bins=len(bins), entries=len(samples)):
+                    self.assertSameBinning(bins, samples)
+
+    def test_update_stats(self):
+        """Rates are computed as before."""
+
+        rng = random.Random(0)
+
+        for size in (0, 1, 10, 5000):
+
+            last = [rng.randrange(1 << 30) for _ in range(size)]
+            current = [value + rng.randrange(1 << 20) for value in last]
+
+            for delta in (0.5, 2.0, 3.7):
+                with self.subTest(size=size, delta=delta):
+                    self.assertEqual(
+                        BinCounter.update_stats(delta, last, current),
+                        legacy_update_stats(delta, last, current))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2018 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Equivalence of the LVAPP fast codecs and the construct definitions."""
+
+import copy
+import importlib
+import pkgutil
+import random
+import unittest
+
+from construct import Struct
+
+import empower.lvapp
+
+from empower.lvapp import CODECS
+
+
+# Import every LVAPP module so that all the codecs are registered
+for MODULE in pkgutil.walk_packages(empower.lvapp.__path__, 'empower.lvapp.'):
+    importlib.import_module(MODULE.name)
+
+# Number of entries of every array field in the generated messages
+COUNTS = [0, 1, 7]
+
+
+class NoFallback:
+    """Construct stand-in failing the test if the fast path gives up."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def parse(self, data):
+        raise AssertionError("%s: fast path fell back to construct" %
+                             self.name)
+
+
+def random_message(codec, count, rng):
+    """Build a random message with count entries per array field."""
+
+    subcons = codec.fallback.subcons
+
+    if codec.array:
+        fixed = Struct(codec.name, *subcons[:-1])
+        entry = subcons[-1].subcon
+    else:
+        fixed = codec.fallback
+        entry = None
+
+    def random_bytes(size):
+        return bytes(rng.getrandbits(8) for _ in range(size))
+
+    msg = fixed.parse(random_bytes(fixed.sizeof()))
+
+    if entry is not None:
+
+        for field in codec.fields:
+            if field.startswith('nb_'):
+                msg[field] = count
+
+        entries = [entry.parse(random_bytes(entry.sizeof()))
+                   for _ in range(codec.count(msg))]
+
+        msg[codec.array] = entries
+
+    # build once to know the length, then again with the right length
+    msg.length = len(codec.fallback.build(msg))
+
+    # the build drops the padding bits, so parse the canonical bytes
+    return codec.fallback.build(msg)
+
+
+def normalize(msg):
+    """Return the message as a dict, with the entries as lists."""
+
+    out = dict(msg)
+
+    for key, value in out.items():
+        if isinstance(value, list):
+            out[key] = [list(entry) for entry in value]
+
+    return out
+
+
+class TestLVAPPCodecs(unittest.TestCase):
+    """Check every registered codec against its construct definition."""
+
+    def setUp(self):
+        self.rng = random.Random(0)
+
+    def test_codecs_registered(self):
+        """Codecs are registered."""
+
+        self.assertTrue(CODECS)
+
+    def test_parse(self):
+        """The fast path decodes like construct."""
+
+        for pt_type, codec in sorted(CODECS.items()):
+            for count in COUNTS if codec.array else [0]:
+                with self.subTest(codec=codec.name, count=count):
+
+                    data = random_message(codec, count, self.rng)
+
+                    fast = copy.copy(codec)
+                    fast.fallback = NoFallback(codec.name)
+
+                    expected = normalize(codec.fallback.parse(data))
+                    self.assertEqual(normalize(fast.parse(data)), expected)
+
+                    if codec.array:
+                        self.assertEqual(len(expected[codec.array]),
+                                         codec.count(fast.parse(data)))
+
+    def test_round_trip(self):
+        """Building a decoded message gives back the same bytes."""
+
+        for pt_type, codec in sorted(CODECS.items()):
+            for count in COUNTS if codec.array else [0]:
+                with self.subTest(codec=codec.name, count=count):
+
+                    data = random_message(codec, count, self.rng)
+
+                    self.assertEqual(codec.build(codec.parse(data)), data)
+
+                    if not codec.array:
+                        self.assertEqual(codec.sizeof(), len(data))
+
+    def test_truncated(self):
+        """Truncated messages are handed over to construct."""
+
+        for pt_type, codec in sorted(CODECS.items()):
+            with self.subTest(codec=codec.name):
+
+                count = 1 if codec.array else 0
+                data = random_message(codec, count, self.rng)[:-1]
+
+                with self.assertRaises(Exception):
+                    codec.fallback.parse(data)
+
+                with self.assertRaises(Exception):
+                    codec.parse(data)
+
+
+if __name__ == '__main__':
+    unittest.main()
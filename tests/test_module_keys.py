@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2018 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Identity of the modules: equivalent requests share the same key."""
+
+import importlib
+import pkgutil
+import sys
+import unittest
+import uuid
+
+from types import SimpleNamespace
+from unittest import mock
+
+import empower.lvapp
+import empower.lvnfp
+import empower.vbsp
+
+from empower.core.cellpool import Cell
+from empower.core.module import Module
+from empower.core.module import ModulePeriodic
+from empower.core.module import ModuleWorker
+from empower.core.module import freeze
+from empower.core.moduleregistry import ModuleRegistry
+from empower.core.resourcepool import BT_L20
+from empower.core.resourcepool import ResourceBlock
+from empower.core.ue import UE
+from empower.core.wtp import WTP
+from empower.datatypes.etheraddress import EtherAddress
+
+
+# Import every module so that all the Module subclasses are defined
+for PACKAGE in [empower.lvapp, empower.lvnfp, empower.vbsp]:
+    for MODULE in pkgutil.walk_packages(PACKAGE.__path__,
+                                        PACKAGE.__name__ + '.'):
+        importlib.import_module(MODULE.name)
+
+TENANT_ID = uuid.UUID("52313ecb-9d00-4b7d-b873-b55d3d9ada26")
+OTHER_TENANT_ID = uuid.UUID("7a2c9f3e-6f1c-4b4e-9e2a-0c2d6d9f1a11")
+
+LVNF_ID = uuid.UUID("20c7ecf7-be9e-4643-8f98-8ac582b4bc03")
+OTHER_LVNF_ID = uuid.UUID("3f1e9c52-5f8a-4d5e-9f0a-8b3c1e2d4a77")
+
+WTP_ADDR = EtherAddress("00:0D:B9:2F:56:64")
+
+BLOCK = ResourceBlock(WTP(WTP_ADDR, "wtp"),
+                      EtherAddress("04:F0:21:09:F9:93"), 1, BT_L20)
+OTHER_BLOCK = ResourceBlock(WTP(WTP_ADDR, "wtp"),
+                            EtherAddress("04:F0:21:09:F9:93"), 6, BT_L20)
+
+CELL = Cell(EtherAddress("00:00:00:00:01:9B"), 1)
+OTHER_CELL = Cell(EtherAddress("00:00:00:00:01:9B"), 2)
+
+UE_ID = uuid.UUID("ae4d6b5c-25b3-4e23-9e1b-5b2c0bde3a40")
+OTHER_UE_ID = uuid.UUID("c4a3e1d2-8b7f-4e6a-a5d9-2f1b0c9e8d76")
+
+RRC = [{"earfcn": 3400, "interval": 2000, "max_cells": 2,
+        "max_measure": 2}]
+OTHER_RRC = [{"earfcn": 1850, "interval": 2000, "max_cells": 2,
+              "max_measure": 2}]
+
+# Module parameters: for each parameter, two values to be told apart.
+# Parameters are set in order, e.g. the lvnf before its handler.
+PARAMS = {
+    'bin_counter': [
+        ('lvap', "00:18:DE:CC:D3:40", "00:18:DE:CC:D3:41"),
+        ('bins', [512, 1514, 8192], [8192]),
+    ],
+    'lvap_stats': [
+        ('lvap', "00:18:DE:CC:D3:40", "00:18:DE:CC:D3:41"),
+    ],
+    'rssi': [
+        ('lvap', "00:18:DE:CC:D3:40", "00:18:DE:CC:D3:41"),
+        ('relation', 'GT', 'LT'),
+        ('value', -90, -60),
+        ('period', 2000, 3000),
+    ],
+    'slice_stats': [
+        ('block', BLOCK, OTHER_BLOCK),
+        ('dscp', "0x00", "0x40"),
+    ],
+    'summary': [
+        ('addr', "FF:FF:FF:FF:FF:FF", "00:18:DE:CC:D3:40"),
+        ('block', BLOCK, OTHER_BLOCK),
+        ('limit', -1, 10),
+    ],
+    'txp_bin_counter': [
+        ('mcast', "FF:FF:FF:FF:FF:FF", "01:00:5E:00:00:FB"),
+        ('block', BLOCK, OTHER_BLOCK),
+        ('bins', [512, 1514, 8192], [8192]),
+    ],
+    'ucqm': [
+        ('block', BLOCK, OTHER_BLOCK),
+    ],
+    'ncqm': [
+        ('block', BLOCK, OTHER_BLOCK),
+    ],
+    'wifi_stats': [
+        ('block', BLOCK, OTHER_BLOCK),
+    ],
+    'lvnf_stats': [
+        ('lvnf', LVNF_ID, OTHER_LVNF_ID),
+    ],
+    'lvnf_get': [
+        ('lvnf', LVNF_ID, OTHER_LVNF_ID),
+        ('handler', 'read_handler', 'other_handler'),
+    ],
+    'lvnf_set': [
+        ('lvnf', LVNF_ID, OTHER_LVNF_ID),
+        ('handler', 'write_handler', 'other_handler'),
+        ('value', '1', '2'),
+    ],
+    'cell_measurements': [
+        ('cell', CELL, OTHER_CELL),
+        ('interval', 2000, 3000),
+    ],
+    'ue_measurements': [
+        ('ue', UE(UE_ID, 1, 1, 1, CELL, None),
+         UE(OTHER_UE_ID, 2, 2, 2, CELL, None)),
+        ('rrc_measurements_param', RRC, OTHER_RRC),
+    ],
+}
+
+
+def module_classes():
+    """Return all the concrete Module subclasses."""
+
+    classes = []
+    pending = list(Module.__subclasses__())
+
+    while pending:
+        cls = pending.pop()
+        pending.extend(cls.__subclasses__())
+        if cls.MODULE_NAME:
+            classes.append(cls)
+
+    return sorted(classes, key=lambda cls: cls.MODULE_NAME)
+
+
+def fake_runtime():
+    """Return a runtime with a tenant owning the LVNFs."""
+
+    handlers = {'read_handler': None, 'write_handler': None,
+                'other_handler': None}
+
+    image = SimpleNamespace(handlers=handlers)
+    lvnfs = {LVNF_ID: SimpleNamespace(image=image),
+             OTHER_LVNF_ID: SimpleNamespace(image=image)}
+
+    tenants = {TENANT_ID: SimpleNamespace(lvnfs=lvnfs),
+               OTHER_TENANT_ID: SimpleNamespace(lvnfs=lvnfs)}
+
+    server = SimpleNamespace(register_message=lambda *args: None)
+
+    return SimpleNamespace(tenants=tenants,
+                           components={'server': server},
+                           modules=ModuleRegistry())
+
+
+class TestModuleKeys(unittest.TestCase):
+    """Check the key of every Module subclass."""
+
+    def setUp(self):
+
+        self.runtime = fake_runtime()
+
+        for cls in module_classes() + [ModuleWorker]:
+            patcher = mock.patch.object(sys.modules[cls.__module__],
+                                        'RUNTIME', self.runtime)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    @classmethod
+    def params(cls, module_cls, **changes):
+        """Return the first value of every parameter, with changes."""
+
+        params = {'tenant_id': TENANT_ID}
+
+        for name, first, _ in PARAMS[module_cls.MODULE_NAME]:
+            params[name] = first
+
+        params.update(changes)
+
+        return params
+
+    @classmethod
+    def module(cls, module_cls, **params):
+        """Return a new module."""
+
+        module = module_cls()
+        module.module_type = module_cls.MODULE_NAME
+
+        for name, value in params.items():
+            setattr(module, name, value)
+
+        return module
+
+    def assertSameKey(self, first, second):
+        self.assertEqual(first, second)
+        self.assertEqual(freeze(first.key), freeze(second.key))
+        self.assertEqual(hash(freeze(first.key)), hash(freeze(second.key)))
+
+    def assertOtherKey(self, first, second):
+        self.assertNotEqual(first, second)
+        self.assertNotEqual(freeze(first.key), freeze(second.key))
+
+    def test_all_modules_covered(self):
+        """Every module has its parameters listed."""
+
+        for module_cls in module_classes():
+            with self.subTest(module=module_cls.MODULE_NAME):
+                self.assertIn(module_cls.MODULE_NAME, PARAMS)
+
+    def test_equivalent(self):
+        """Modules with the same parameters have the same key."""
+
+        for module_cls in module_classes():
+            with self.subTest(module=module_cls.MODULE_NAME):
+
+                params = self.params(module_cls)
+
+                self.assertSameKey(self.module(module_cls, **params),
+                                   self.module(module_cls, **params))
+
+    def test_parameters(self):
+        """Modules differing in one parameter have different keys."""
+
+        for module_cls in module_classes():
+
+            first = self.module(module_cls, **self.params(module_cls))
+
+            for name, _, other in PARAMS[module_cls.MODULE_NAME]:
+                with self.subTest(module=module_cls.MODULE_NAME, param=name):
+
+                    params = self.params(module_cls, **{name: other})
+                    second = self.module(module_cls, **params)
+
+                    self.assertOtherKey(first, second)
+
+    def test_tenant(self):
+        """Modules of different tenants have different keys."""
+
+        for module_cls in module_classes():
+            with self.subTest(module=module_cls.MODULE_NAME):
+
+                params = self.params(module_cls, tenant_id=OTHER_TENANT_ID)
+
+                self.assertOtherKey(
+                    self.module(module_cls, **self.params(module_cls)),
+                    self.module(module_cls, **params))
+
+    def test_every(self):
+        """Periodic modules with different periods have different keys."""
+
+        for module_cls in module_classes():
+
+            if not issubclass(module_cls, ModulePeriodic):
+                continue
+
+            with self.subTest(module=module_cls.MODULE_NAME):
+
+                params = self.params(module_cls)
+
+                self.assertSameKey(
+                    self.module(module_cls, every=2000, **params),
+                    self.module(module_cls, every="2000", **params))
+
+                self.assertOtherKey(
+                    self.module(module_cls, every=2000, **params),
+                    self.module(module_cls, every=5000, **params))
+
+    def test_module_type(self):
+        """Modules of different types have different keys."""
+
+        ucqm, ncqm = [cls for cls in module_classes()
+                      if cls.MODULE_NAME in ('ucqm', 'ncqm')]
+
+        self.assertOtherKey(self.module(ucqm, **self.params(ucqm)),
+                            self.module(ncqm, **self.params(ncqm)))
+
+    def test_worker_dedupe(self):
+        """Workers return the running module for an equivalent request."""
+
+        for module_cls in module_classes():
+            with self.subTest(module=module_cls.MODULE_NAME), \
+                    mock.patch.object(module_cls, 'start'), \
+                    mock.patch.object(module_cls, 'stop'):
+
+                worker = ModuleWorker('server', module_cls, None, None)
+
+                module = worker.add_module(**self.params(module_cls))
+
+                self.assertIs(worker.add_module(**self.params(module_cls)),
+                              module)
+
+                for name, _, other in PARAMS[module_cls.MODULE_NAME]:
+
+                    params = self.params(module_cls, **{name: other})
+                    self.assertIsNot(worker.add_module(**params), module)
+
+                count = len(worker.modules)
+                self.assertEqual(count, len(worker.modules_by_key))
+
+                worker.remove_module(module.module_id)
+
+                self.assertEqual(len(worker.modules), count - 1)
+                self.assertIsNot(worker.add_module(**self.params(module_cls)),
+                                 module)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2018 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Monitoring write-behind pipeline: retries and overflow policies."""
+
+import sqlite3
+import threading
+import unittest
+
+from empower.grafana.postgresql.common import BLOCK
+from empower.grafana.postgresql.common import DROP_NEWEST
+from empower.grafana.postgresql.common import DROP_OLDEST
+from empower.grafana.postgresql.common import MonitorWriter
+from empower.grafana.postgresql.common import SQLiteBackend
+
+TABLE = 'samples'
+FIELDS = ['NAME', 'TIMESTAMP_MS']
+
+
+class FlakyBackend(SQLiteBackend):
+    """SQLite backend failing the first writes.
+
+    Attributes:
+        failures: the number of writes still to fail
+        during_write: called at every write, before failing
+    """
+
+    def __init__(self, failures=0):
+        super().__init__()
+        self.failures = failures
+        self.during_write = None
+
+    def write(self, inserts, deletes):
+
+        if self.during_write:
+            self.during_write()
+
+        if self.failures:
+            self.failures -= 1
+            raise sqlite3.OperationalError("database is locked")
+
+        super().write(inserts, deletes)
+
+    def rows(self):
+        """Return the names of the rows written, in order."""
+
+        try:
+            cursor = self.connection.execute('SELECT NAME FROM ' + TABLE +
+                                             ' ORDER BY rowid')
+        except sqlite3.OperationalError:
+            return []
+
+        return [row[0] for row in cursor]
+
+
+class TestMonitorWriter(unittest.TestCase):
+    """Check the retries of the failed batches."""
+
+    def writer(self, backend, **kwargs):
+        """Return a writer flushed only by the test."""
+
+        params = {'queue_size': 5,
+                  'batch_size': 1000,
+                  'flush_interval_ms': 3600000,
+                  'retry_backoff_ms': 0}
+        params.update(kwargs)
+
+        writer = MonitorWriter(backend, **params)
+        self.addCleanup(writer.close)
+
+        return writer
+
+    @classmethod
+    def insert(cls, writer, *names):
+        """Queue a row per name."""
+
+        for name in names:
+            writer.insert(TABLE, FIELDS, [name, 0])
+
+    def test_retry(self):
+        """A failed batch is retried and written."""
+
+        backend = FlakyBackend(failures=2)
+        writer = self.writer(backend)
+
+        self.insert(writer, 'a0', 'a1', 'a2')
+
+        writer.flush()
+        writer.flush()
+
+        self.assertEqual(backend.rows(), [])
+        self.assertEqual(writer.stats()['pending'], 3)
+        self.assertEqual(writer.stats()['retried'], 6)
+
+        writer.flush()
+
+        self.assertEqual(backend.rows(), ['a0', 'a1', 'a2'])
+        self.assertEqual(writer.stats()['written'], 3)
+        self.assertEqual(writer.stats()['failed'], 0)
+
+    def test_retries_exhausted(self):
+        """A batch failing more than max_retries times is dropped."""
+
+        backend = FlakyBackend(failures=3)
+        writer = self.writer(backend, max_retries=2)
+
+        self.insert(writer, 'a0', 'a1')
+
+        for _ in range(3):
+            writer.flush()
+
+        stats = writer.stats()
+
+        self.assertEqual(stats['pending'], 0)
+        self.assertEqual(stats['failed'], 2)
+        self.assertEqual(stats['retried'], 4)
+
+        # the next batch starts from a fresh retry count
+        self.insert(writer, 'b0')
+        writer.flush()
+
+        self.assertEqual(backend.rows(), ['b0'])
+
+    def requeue(self, policy):
+        """Fail a batch of 3 rows while 4 more are queued (queue size 5)."""
+
+        backend = FlakyBackend(failures=1)
+        writer = self.writer(backend, policy=policy)
+
+        self.insert(writer, 'a0', 'a1', 'a2')
+
+        def during_write():
+            backend.during_write = None
+            self.insert(writer, 'b0', 'b1', 'b2', 'b3')
+
+        backend.during_write = during_write
+
+        writer.flush()
+
+        return backend, writer
+
+    def test_drop_oldest(self):
+        """DROP_OLDEST drops the oldest failed rows to make room."""
+
+        backend, writer = self.requeue(DROP_OLDEST)
+
+        self.assertEqual(writer.stats()['dropped'], 2)
+
+        writer.flush()
+
+        self.assertEqual(backend.rows(), ['a2', 'b0', 'b1', 'b2', 'b3'])
+
+    def test_drop_newest(self):
+        """DROP_NEWEST drops the rows queued during the failed write."""
+
+        backend, writer = self.requeue(DROP_NEWEST)
+
+        self.assertEqual(writer.stats()['dropped'], 2)
+
+        writer.flush()
+
+        self.assertEqual(backend.rows(), ['a0', 'a1', 'a2', 'b0', 'b1'])
+
+    def test_block(self):
+        """BLOCK keeps every row and blocks the writers until a flush."""
+
+        backend, writer = self.requeue(BLOCK)
+
+        self.assertEqual(writer.stats()['dropped'], 0)
+        self.assertEqual(writer.stats()['pending'], 7)
+
+        inserter = threading.Thread(target=self.insert,
+                                    args=(writer, 'c0'))
+        inserter.start()
+        inserter.join(timeout=0.2)
+
+        self.assertTrue(inserter.is_alive())
+
+        writer.flush()
+        inserter.join(timeout=5)
+
+        self.assertFalse(inserter.is_alive())
+
+        writer.flush()
+
+        self.assertEqual(backend.rows(), ['a0', 'a1', 'a2', 'b0', 'b1', 'b2',
+                                          'b3', 'c0'])
+
+    def test_close(self):
+        """Rows failing while the writer is closed are not retried."""
+
+        backend = FlakyBackend(failures=1)
+        writer = MonitorWriter(backend, batch_size=1000,
+                               flush_interval_ms=3600000)
+
+        self.insert(writer, 'a0', 'a1')
+
+        writer.close()
+
+        self.assertEqual(writer.stats()['failed'], 2)
+        self.assertEqual(writer.stats()['retried'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
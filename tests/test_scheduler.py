@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2018 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Timer wheel: phase groups of the periodic modules."""
+
+import unittest
+
+from types import SimpleNamespace
+from unittest import mock
+
+import empower.core.scheduler
+
+from empower.core.scheduler import TimerWheel
+
+TICK_MS = 1000
+
+
+class Worker:
+    """Worker recording the modules run at every tick."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.runs = []
+
+    def run_modules(self, modules):
+        """Record the modules due in this tick."""
+
+        self.runs.append((self.clock.tick,
+                          {module.name for module in modules}))
+
+
+class Clock:
+    """Time source advanced one tick (TICK_MS, one second) at a time."""
+
+    def __init__(self):
+        self.tick = 0
+
+    def time(self):
+        """Return the current time (s), in the middle of the tick."""
+
+        return self.tick + 0.5
+
+
+class TestTimerWheel(unittest.TestCase):
+    """Check the phase groups."""
+
+    def setUp(self):
+
+        self.clock = Clock()
+        self.worker = Worker(self.clock)
+
+        patcher = mock.patch.object(empower.core.scheduler, 'time',
+                                    self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        patcher = mock.patch.object(empower.core.scheduler.tornado.ioloop,
+                                    'PeriodicCallback')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.wheel = TimerWheel(tick_ms=TICK_MS)
+
+    def module(self, name, group, every=10000):
+        """Return a new module."""
+
+        return SimpleNamespace(name=name, phase_group=group, every=every,
+                               worker=self.worker)
+
+    def advance(self, ticks):
+        """Run the wheel for the given number of ticks."""
+
+        for _ in range(ticks):
+            self.clock.tick += 1
+            self.wheel._TimerWheel__tick()
+
+    def runs(self, name):
+        """Return the ticks at which a module ran."""
+
+        return [tick for tick, names in self.worker.runs if name in names]
+
+    def test_same_group(self):
+        """Modules in the same group run in the same tick."""
+
+        self.wheel.add(self.module('a', 'wtp1'))
+        self.advance(3)
+        self.wheel.add(self.module('b', 'wtp1'))
+        self.wheel.add(self.module('c', 'wtp2'))
+
+        self.advance(30)
+
+        self.assertEqual(self.runs('a'), [1, 11, 21, 31])
+        self.assertEqual(self.runs('b'), [11, 21, 31])
+        self.assertEqual(self.runs('c'), [5, 15, 25])
+        self.assertEqual(self.wheel.to_dict()['groups'], 2)
+
+    def test_group_change(self):
+        """A module whose group changes moves to the phase of the group."""
+
+        module_a = self.module('a', 'wtp1')
+        module_b = self.module('b', 'wtp2')
+
+        self.wheel.add(module_a)
+        self.wheel.add(module_b)
+
+        self.advance(5)
+
+        self.assertEqual(self.runs('a'), [1])
+        self.assertEqual(self.runs('b'), [2])
+
+        # handover of the LVAP of b to the WTP of a
+        module_b.phase_group = 'wtp1'
+
+        self.advance(30)
+
+        self.assertEqual(self.runs('a'), [1, 11, 21, 31])
+        self.assertEqual(self.runs('b'), [2, 12, 21, 31])
+        self.assertEqual(self.wheel.to_dict()['groups'], 1)
+
+    def test_remove(self):
+        """Removed modules do not run and leave their group."""
+
+        module_a = self.module('a', 'wtp1')
+        module_b = self.module('b', 'wtp1')
+
+        self.wheel.add(module_a)
+        self.wheel.add(module_b)
+
+        self.advance(5)
+
+        self.wheel.remove(module_a)
+        self.wheel.remove(module_b)
+
+        self.advance(20)
+
+        self.assertEqual(self.runs('a'), [1])
+        self.assertEqual(self.wheel.to_dict()['groups'], 0)
+        self.assertEqual(len(self.wheel), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()